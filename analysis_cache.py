@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from typing import Any, Optional
+
+# Bump whenever parser or external metric output changes so stale entries are ignored
+ANALYZER_VERSION = "2"
+ANALYSIS_NAMESPACE = f"analysis-v{ANALYZER_VERSION}"
+
+DEFAULT_CACHE_APP_NAME = "repo_analyzer"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Bytes written by put, one line per entry; summed by evict instead of walking the cache
+SIZE_JOURNAL = "size.journal"
+
+def blob_oid(data: bytes) -> str:
+    """Returns the git blob object id of the given content."""
+    header = f"blob {len(data)}\0".encode('ascii')
+    return hashlib.sha1(header + data).hexdigest()
+
+def default_cache_dir(repo_root: str) -> str:
+    """
+    Per-user cache directory of a repository, outside its work tree:
+    $XDG_CACHE_HOME (default ~/.cache)/repo_analyzer/<hash of the repository path>.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    repo_key = hashlib.sha1(os.path.realpath(repo_root).encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+    return os.path.join(base, DEFAULT_CACHE_APP_NAME, repo_key)
+
+class AnalysisCache:
+    """
+    Content-addressed on-disk cache of per-file analysis results.
+    Entries are JSON files under <cache_dir>/<namespace>/<oid[:2]>/<oid>.json, keyed by the
+    git blob id of the file content. Writes go through a temp file and os.replace, so
+    concurrent runs never see partial entries. Least recently used entries are evicted
+    once the cache grows beyond max_bytes. Every put appends the size it wrote to a journal
+    (also from worker processes), so evict only walks the cache once the journal says it
+    is over the limit; overwritten entries count twice until the next walk.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, key: str, namespace: str) -> str:
+        return os.path.join(self.cache_dir, namespace, key[:2], f"{key}.json")
+
+    def get(self, key: str, namespace: str = ANALYSIS_NAMESPACE) -> Optional[Any]:
+        path = self._entry_path(key, namespace)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Refresh mtime so eviction drops least recently used entries first
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value: Any, namespace: str = ANALYSIS_NAMESPACE):
+        path = self._entry_path(key, namespace)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(value, f)
+                    size = f.tell()
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            # Appends of one short line are atomic, so concurrent writers do not mix lines
+            with open(os.path.join(self.cache_dir, SIZE_JOURNAL), 'a', encoding='ascii') as f:
+                f.write(f"{size}\n")
+        except OSError as e:
+            logging.debug(f"Failed to write cache entry {path}: {e}")
+
+    def record(self, hit: bool):
+        """Counts a lookup; called in the main process so worker lookups are included."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def _journal_size(self) -> Optional[int]:
+        """Bytes recorded in the size journal, or None without one."""
+        try:
+            with open(os.path.join(self.cache_dir, SIZE_JOURNAL), 'r', encoding='ascii') as f:
+                return sum(int(line) for line in f if line.strip().isdigit())
+        except OSError:
+            return None
+
+    def _write_journal(self, total: int):
+        """Replaces the journal by a single line holding total."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='ascii') as f:
+                f.write(f"{total}\n")
+            os.replace(tmp_path, os.path.join(self.cache_dir, SIZE_JOURNAL))
+        except OSError as e:
+            logging.debug(f"Failed to write the cache size journal: {e}")
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        estimate = self._journal_size()
+        if estimate is not None and estimate <= self.max_bytes:
+            self._write_journal(estimate)
+            return 0
+
+        # Caches without a journal, or over the limit by the journal, are measured exactly
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if root == self.cache_dir and name == SIZE_JOURNAL:
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            self._write_journal(total)
+            return 0
+
+        # Evict down to 90% so we don't evict again on the next run
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._write_journal(total)
+        logging.debug(f"Evicted {removed} cache entries from {self.cache_dir}")
+        return removed
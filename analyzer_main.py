@@ -15,7 +15,25 @@ except ImportError:
         return iterable
 
 from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
-from dashboard_generator import generate_dashboard_json
+from dashboard_generator import (OUTPUT_FORMATS, generate_dashboard_json, generate_dashboard_columnar,
+                                 generate_dashboard_shards, load_dashboard)
+from incremental_update import update_dashboard
+from include_graph import IncludePaths, load_compile_commands
+from analysis_cache import AnalysisCache, DEFAULT_MAX_BYTES, default_cache_dir
+from scan_repo import SCANNER_MODES, ScanOptions
+from streaming_pipeline import stream_dashboard_json
+from external_metrics import load_external_reports
+from elf_symbols import SymbolSizeProvider
+from live_server import (WATCH_MODES, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_POLL_INTERVAL, LiveDashboard,
+                         create_watcher, serve)
+from profiler import Profiler, DEFAULT_TOP_FILES, get_profiler, set_profiler
+from git_analyzer import BlameIndex, DEFAULT_BLAME_JOBS, set_reference_time
+from revision_analysis import RevisionAnalyzer, build_trend, recent_tags, write_trend_json
+from sharding import SHARD_MODES, Shard, analyze_shard, merge_partials, write_partial
+from results_store import query_main, write_results_db
+from change_coupling import (DEFAULT_MAX_COMMIT_FILES, DEFAULT_MIN_SUPPORT, apply_change_coupling,
+                             build_change_coupling, strip_change_coupling)
+from duplicates import DEFAULT_MIN_SIMILARITY, apply_duplicates, strip_duplicates
 
 def setup_logging(debug_mode: bool):
     """Configures logging for the execution."""
@@ -23,13 +41,241 @@ def setup_logging(debug_mode: bool):
     format_str = '%(asctime)s - %(levelname)s - %(message)s'
     logging.basicConfig(level=level, format=format_str, datefmt='%H:%M:%S')
 
+def run_full_analysis(args, repo_path: str, jobs: int, cache, include_paths, scan_options, external, blame) -> dict:
+    """Scans, analyzes and aggregates the whole repository."""
+    # Step 1: Collect Metrics
+    # We pass a progress bar callback or handle tqdm inside
+    logging.info("Scanning repository and collecting metrics...")
+    repo_data = collect_metrics_for_repo(repo_path, debug=args.debug, jobs=jobs, cache=cache,
+                                         include_paths=include_paths, scan_options=scan_options,
+                                         external=external, blame=blame)
+    
+    # Step 2: Aggregate Metrics
+    logging.info("Aggregating folder metrics...")
+    with get_profiler().stage("aggregate"):
+        return aggregate_metrics_for_dashboard(repo_data, repo_path)
+
+def run_streaming_analysis(args, repo_path: str, jobs: int, cache, include_paths, scan_options, external, blame):
+    """Full analysis written straight to args.output with bounded memory."""
+    logging.info("Scanning repository and streaming metrics to the dashboard data...")
+    stream_dashboard_json(repo_path, args.output, debug=args.debug, jobs=jobs, cache=cache,
+                          include_paths=include_paths, scan_options=scan_options,
+                          external=external, blame=blame)
+
+def run_incremental_update(args, repo_path: str, jobs: int, cache, include_paths, scan_options, external, blame) -> dict:
+    """Patches a previous dashboard with the files changed since args.base."""
+    logging.info(f"Updating {args.update_from} with changes since {args.base}...")
+    with get_profiler().stage("load dashboard"):
+        previous = load_dashboard(args.update_from)
+    return update_dashboard(previous, repo_path, args.base, debug=args.debug, jobs=jobs, cache=cache,
+                            include_paths=include_paths, scan_options=scan_options,
+                            external=external, blame=blame)
+
+def run_shard_analysis(args, repo_path: str, jobs: int, cache, scan_options, external, blame, shard: Shard):
+    """Analyzes one shard of the files and writes its partial result to args.output."""
+    logging.info(f"Analyzing shard {shard} (by {shard.mode})...")
+    partial = analyze_shard(repo_path, shard, debug=args.debug, jobs=jobs, cache=cache, scan_options=scan_options,
+                            external=external, blame=blame)
+    with get_profiler().stage("write"):
+        write_partial(partial, args.output)
+
+def run_merge(args, repo_path: str, include_paths) -> dict:
+    """Combines the partial results of all shards and aggregates them."""
+    logging.info(f"Merging {len(args.merge)} partial results...")
+    repo_data = merge_partials(args.merge, repo_path, include_paths, now=args.now)
+    logging.info("Aggregating folder metrics...")
+    with get_profiler().stage("aggregate"):
+        return aggregate_metrics_for_dashboard(repo_data, repo_path)
+
+def run_revision_analysis(args, repo_path: str, cache, include_paths, scan_options) -> dict:
+    """Analyzes the tree of args.rev from the object store (no checkout needed)."""
+    logging.info(f"Analyzing {args.rev} from the object store...")
+    with RevisionAnalyzer(repo_path, cache=cache, include_paths=include_paths, scan_options=scan_options) as analyzer:
+        repo_data = analyzer.analyze(args.rev)
+    if cache is not None:
+        cache.evict()
+    logging.info("Aggregating folder metrics...")
+    with get_profiler().stage("aggregate"):
+        return aggregate_metrics_for_dashboard(repo_data, repo_path)
+
+def run_trend_analysis(args, repo_path: str, cache, include_paths, scan_options):
+    """Writes the folder metric time series over the revisions of --trend and --trend-tags."""
+    revisions = list(args.trend)
+    if args.trend_tags:
+        revisions = recent_tags(repo_path, args.trend_tags) + revisions
+    if not revisions:
+        raise ValueError("No revisions to analyze (the repository has no tags?)")
+    logging.info(f"Analyzing {len(revisions)} revisions from the object store...")
+    with RevisionAnalyzer(repo_path, cache=cache, include_paths=include_paths, scan_options=scan_options) as analyzer:
+        trend = build_trend(analyzer, revisions)
+        logging.info(f"Parsed {analyzer.parsed} distinct blobs")
+    if cache is not None:
+        logging.info(f"Analysis cache: {cache.hits} hits, {cache.misses} misses")
+        cache.evict()
+    with get_profiler().stage("write"):
+        write_trend_json(trend, args.output)
+
 def main():
+    # 'query' reports on a results store instead of analyzing a repository
+    if sys.argv[1:2] == ["query"]:
+        sys.exit(query_main(sys.argv[2:]))
     parser = argparse.ArgumentParser(description="Analyze C++ repository for code metrics and staleness.")
     parser.add_argument("path", help="Path to the local git repository")
-    parser.add_argument("-o", "--output", default="dashboard_data.json", help="Output JSON filename")
+    parser.add_argument("-o", "--output",
+                        help="Output JSON filename (a directory for --format sharded; default: dashboard_data.json, "
+                             "trend_data.json with --trend)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json",
+                        help="Output format: pretty-printed 'json' tree, compact 'columnar' tables or a "
+                             "'sharded' directory the dashboard loads folder by folder")
+    parser.add_argument("--gzip", action="store_true", help="gzip-compress the output (columnar format)")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of parallel workers for file analysis (0 = all CPUs)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent analysis cache")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Analysis cache directory (default: $XDG_CACHE_HOME/repo_analyzer/<hash of path>, "
+                             "outside the analyzed work tree)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Maximum analysis cache size in MB before old entries are evicted")
+    parser.add_argument("-I", "--include-dir", action="append", default=[], metavar="DIR",
+                        help="Include search path used to resolve #include directives (repeatable)")
+    parser.add_argument("--compile-commands", metavar="JSON",
+                        help="compile_commands.json to take include search paths from")
+    parser.add_argument("--update-from", metavar="JSON",
+                        help="Incrementally update a previous dashboard JSON (or --db store) instead of a full run "
+                             "(requires --base)")
+    parser.add_argument("--base", metavar="COMMIT",
+                        help="Commit the --update-from dashboard was generated at")
+    parser.add_argument("--scanner", choices=SCANNER_MODES, default="walk",
+                        help="How files are listed: 'walk' (directory walk, the default), "
+                             "'git' (git ls-files, respects .gitignore) or 'auto' (git inside a work tree)")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="Only analyze files matching this gitignore-style glob (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Skip files and directories matching this gitignore-style glob (repeatable)")
+    parser.add_argument("--submodules", action="store_true",
+                        help="Also list files of checked out submodules (git scanner)")
+    parser.add_argument("--lcov", action="append", default=[], metavar="FILE",
+                        help="lcov tracefile to take line coverage from (repeatable)")
+    parser.add_argument("--cobertura", action="append", default=[], metavar="XML",
+                        help="Cobertura XML coverage report to take line coverage from (repeatable)")
+    parser.add_argument("--sarif", action="append", default=[], metavar="FILE",
+                        help="SARIF log of a MISRA checker; errors count as critical, warnings as medium (repeatable)")
+    parser.add_argument("--build-dir", action="append", default=[], metavar="DIR",
+                        help="Build directory whose ELF objects and static libraries give each source file's "
+                             "symbol sizes (repeatable)")
+    parser.add_argument("--link-map", action="append", default=[], metavar="FILE",
+                        help="Linker map file (-Wl,-Map) to take the linked section sizes of the --build-dir "
+                             "objects from (repeatable)")
+    parser.add_argument("--report-base-dir", metavar="DIR",
+                        help="Directory relative report paths are resolved against (default: <path>)")
+    parser.add_argument("--blame", action="store_true",
+                        help="Line-level ownership: top authors by surviving lines per file and folder, from git blame")
+    parser.add_argument("--blame-jobs", type=int, default=DEFAULT_BLAME_JOBS, metavar="N",
+                        help=f"Concurrent git blame processes with --blame (default: {DEFAULT_BLAME_JOBS})")
+    parser.add_argument("--coupling", action="store_true",
+                        help="Add change coupling (files changed together) and churn x LOC hotspot scores")
+    parser.add_argument("--coupling-max-files", type=int, default=DEFAULT_MAX_COMMIT_FILES, metavar="N",
+                        help=f"Ignore commits touching more files for coupling (default: {DEFAULT_MAX_COMMIT_FILES})")
+    parser.add_argument("--coupling-min-support", type=int, default=DEFAULT_MIN_SUPPORT, metavar="N",
+                        help=f"Only report pairs changed together at least N times (default: {DEFAULT_MIN_SUPPORT})")
+    parser.add_argument("--duplicates", action="store_true",
+                        help="Detect duplicated code blocks (MinHash signatures with LSH banding)")
+    parser.add_argument("--dup-similarity", type=float, default=DEFAULT_MIN_SIMILARITY, metavar="FRACTION",
+                        help="Share of block signatures that must agree for a duplicate "
+                             f"(default: {DEFAULT_MIN_SIMILARITY})")
+    parser.add_argument("--rev", metavar="REV",
+                        help="Analyze the tree of this revision straight from the object store instead of the "
+                             "working tree (works on bare repositories)")
+    parser.add_argument("--trend", action="append", default=[], metavar="REV",
+                        help="Trend mode: analyze this revision (repeatable) and write per-folder time series")
+    parser.add_argument("--trend-tags", type=int, default=0, metavar="N",
+                        help="Trend mode over the N most recently created tags (plus any --trend revisions)")
+    parser.add_argument("--shard", metavar="K/N",
+                        help="Analyze only shard K of N of the files and write a partial result for --merge")
+    parser.add_argument("--shard-by", choices=SHARD_MODES, default="hash",
+                        help="Assign files to shards by a hash of their path or of their top-level directory "
+                             "(default: hash)")
+    parser.add_argument("--merge", nargs="+", metavar="PARTIAL",
+                        help="Combine the partial results of all shards into the dashboard data")
+    parser.add_argument("--now", type=float, metavar="TIMESTAMP",
+                        help="Measure staleness at this unix time instead of the current time (pass the same "
+                             "value to every shard for reproducible output)")
+    parser.add_argument("--db", metavar="SQLITE",
+                        help="Also store the results in this SQLite database for 'analyzer_main.py query'; "
+                             "an existing store is updated in place")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream files from the scan to the output JSON; memory does not grow with the "
+                             "per-file records (full runs only)")
+    parser.add_argument("--serve", action="store_true",
+                        help="After the run, keep the results in memory, watch the repository and serve the "
+                             "live dashboard over HTTP")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Address to serve on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to serve on (default: {DEFAULT_PORT})")
+    parser.add_argument("--watch", choices=WATCH_MODES, default="auto",
+                        help="How changes are detected with --serve: 'inotify', 'poll' (mtimes) or 'auto'")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"Seconds between polling passes with --watch poll (default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument("--profile", metavar="TRACE",
+                        help="Profile the run: write a Chrome trace-event JSON file and log a summary of "
+                             "per-stage times, subprocesses and the slowest files")
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_TOP_FILES, metavar="N",
+                        help=f"Slowest files listed per stage with --profile (default: {DEFAULT_TOP_FILES})")
     
     args = parser.parse_args()
+    if args.update_from and not args.base:
+        parser.error("--update-from requires --base")
+    if args.stream and args.update_from:
+        parser.error("--stream cannot be combined with --update-from")
+    if args.stream and args.format != "json":
+        parser.error("--stream only writes the json format")
+    if args.gzip and args.format != "columnar":
+        parser.error("--gzip requires --format columnar")
+    if args.db and args.stream:
+        parser.error("--db needs the results in memory and cannot be combined with --stream")
+    if args.coupling and (args.stream or args.serve):
+        parser.error("--coupling cannot be combined with --stream or --serve")
+    if args.duplicates and (args.stream or args.serve or args.rev):
+        parser.error("--duplicates reads the working tree and cannot be combined with --stream, --serve or --rev")
+    if args.serve and args.stream:
+        parser.error("--serve keeps the results in memory and cannot be combined with --stream")
+    trend = bool(args.trend or args.trend_tags)
+    if args.rev or trend:
+        option = "--rev" if args.rev else "--trend"
+        if args.rev and trend:
+            parser.error("--rev cannot be combined with --trend")
+        if args.update_from or args.stream or args.serve or args.blame:
+            parser.error(f"{option} cannot be combined with --update-from, --stream, --serve or --blame")
+        if trend and (args.db or args.coupling or args.duplicates):
+            parser.error("--trend cannot be combined with --db, --coupling or --duplicates")
+        if args.lcov or args.cobertura or args.sarif or args.build_dir or args.link_map:
+            parser.error(f"{option} reads no working tree, so coverage, MISRA and symbol size reports do not apply")
+    if args.link_map and not args.build_dir:
+        parser.error("--link-map requires --build-dir")
+    if trend and args.format != "json":
+        parser.error("--trend only writes the json format")
+    shard = None
+    if args.shard:
+        try:
+            shard = Shard.parse(args.shard, args.shard_by)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.shard or args.merge:
+        option = "--shard" if args.shard else "--merge"
+        if args.shard and args.merge:
+            parser.error("--shard cannot be combined with --merge")
+        if args.update_from or args.stream or args.serve or args.rev or trend:
+            parser.error(f"{option} cannot be combined with --update-from, --stream, --serve, --rev or --trend")
+        if args.shard and (args.db or args.coupling or args.duplicates):
+            parser.error("--shard writes a partial result and cannot be combined with --db, --coupling or "
+                         "--duplicates")
+    if args.output is None:
+        if trend:
+            args.output = "trend_data.json"
+        elif shard is not None:
+            args.output = f"dashboard_partial_{shard.index}_of_{shard.count}.json"
+        else:
+            args.output = "dashboard_data.json"
     
     setup_logging(args.debug)
     
@@ -38,26 +284,102 @@ def main():
         logging.error(f"Invalid repository path: {repo_path}")
         sys.exit(1)
         
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    cache = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or default_cache_dir(repo_path)
+        cache = AnalysisCache(cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+
+    if args.compile_commands:
+        include_paths = load_compile_commands(args.compile_commands, extra_dirs=args.include_dir)
+    else:
+        include_paths = IncludePaths(args.include_dir)
+
+    scan_options = ScanOptions(args.scanner, include=args.include, exclude=args.exclude,
+                               submodules=args.submodules)
+
+    profiler = Profiler(top_files=args.profile_top) if args.profile else None
+    set_profiler(profiler)
+    set_reference_time(args.now)
+
     start_time = time.time()
     logging.info(f"Starting analysis of {repo_path}")
     
     try:
-        # Step 1: Collect Metrics
-        # We pass a progress bar callback or handle tqdm inside
-        logging.info("Scanning repository and collecting metrics...")
-        repo_data = collect_metrics_for_repo(repo_path, debug=args.debug)
-        
-        # Step 2: Aggregate Metrics
-        logging.info("Aggregating folder metrics...")
-        aggregated_data = aggregate_metrics_for_dashboard(repo_data, repo_path)
-        
-        # Step 3: Generate Dashboard Data
-        logging.info("Generating dashboard data...")
-        generate_dashboard_json(aggregated_data, args.output)
+        reports = [("lcov", p) for p in args.lcov] + [("cobertura", p) for p in args.cobertura] \
+            + [("sarif", p) for p in args.sarif] \
+            + [(SymbolSizeProvider.name, p) for p in args.build_dir + args.link_map]
+        if reports:
+            with get_profiler().stage("reports"):
+                # Build artifacts are read on jobs processes and cached by mtime and size
+                external = load_external_reports(repo_path, reports, args.report_base_dir, cache=cache, jobs=jobs)
+        else:
+            external = None
+        blame = BlameIndex(repo_path, cache=cache, jobs=args.blame_jobs) if args.blame else None
+
+        if trend:
+            run_trend_analysis(args, repo_path, cache, include_paths, scan_options)
+        elif shard is not None:
+            run_shard_analysis(args, repo_path, jobs, cache, scan_options, external, blame, shard)
+        elif args.stream:
+            run_streaming_analysis(args, repo_path, jobs, cache, include_paths, scan_options, external, blame)
+        else:
+            if args.merge:
+                aggregated_data = run_merge(args, repo_path, include_paths)
+            elif args.rev:
+                aggregated_data = run_revision_analysis(args, repo_path, cache, include_paths, scan_options)
+            elif args.update_from:
+                aggregated_data = run_incremental_update(args, repo_path, jobs, cache, include_paths, scan_options,
+                                                         external, blame)
+            else:
+                aggregated_data = run_full_analysis(args, repo_path, jobs, cache, include_paths, scan_options,
+                                                    external, blame)
+
+            if args.coupling:
+                coupling = build_change_coupling(repo_path, scan_options, rev=args.rev or "HEAD",
+                                                 max_commit_files=args.coupling_max_files,
+                                                 min_support=args.coupling_min_support)
+                apply_change_coupling(aggregated_data, coupling)
+            elif args.update_from:
+                # Coupling of a previous run would no longer match the updated files
+                strip_change_coupling(aggregated_data)
+            if args.duplicates:
+                # Signatures of unchanged files come from the cache
+                apply_duplicates(aggregated_data, repo_path, cache=cache, jobs=jobs, min_similarity=args.dup_similarity)
+            elif args.update_from:
+                strip_duplicates(aggregated_data)
+
+            # Step 3: Generate Dashboard Data
+            logging.info("Generating dashboard data...")
+            with get_profiler().stage("write"):
+                if args.format == "columnar":
+                    generate_dashboard_columnar(aggregated_data, args.output, compress=args.gzip)
+                elif args.format == "sharded":
+                    shards = generate_dashboard_shards(aggregated_data, args.output)
+                    logging.info(f"Wrote {shards} shard files")
+                else:
+                    generate_dashboard_json(aggregated_data, args.output)
+                if args.db:
+                    changed = write_results_db(aggregated_data, args.db)
+                    logging.info(f"Results store {args.db} updated ({changed} rows written or deleted)")
         
         duration = time.time() - start_time
         logging.info(f"Analysis complete in {duration:.2f} seconds.")
-        logging.info(f"Dashboard data written to {args.output}")
+        kind = "Trend data" if trend else "Partial result" if shard is not None else "Dashboard data"
+        logging.info(f"{kind} written to {args.output}")
+
+        if profiler is not None:
+            profiler.write_trace(args.profile)
+            logging.info(f"Profile ({duration:.2f}s total; per-file stages are summed over workers):\n"
+                         f"{profiler.summary()}")
+            logging.info(f"Profile trace written to {args.profile}")
+
+        if args.serve:
+            live = LiveDashboard(aggregated_data, repo_path, debug=args.debug, jobs=jobs, cache=cache,
+                                 include_paths=include_paths, scan_options=scan_options, external=external,
+                                 blame=blame)
+            serve(live, create_watcher(repo_path, scan_options, args.watch, args.poll_interval),
+                  args.host, args.port)
         
     except Exception as e:
         logging.error(f"An error occurred during analysis: {e}", exc_info=True)
@@ -0,0 +1,74 @@
+"""
+Benchmarks the change coupling counter (change_coupling.ChangeCoupling: interned path ids,
+integer pair keys, capped commit sizes and pruning of rare pairs) against counting every pair
+of path strings of every commit, on a synthetic stream of commits as `git log --name-only`
+yields them. Commit sizes follow an exponential distribution around --mean-files and stay
+within a module-sized window of paths, so most pairs are rare. The git log itself is not timed.
+
+Usage:
+    python benchmarks/bench_change_coupling.py [--commits 500000] [--files 100000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from itertools import combinations
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from change_coupling import ChangeCoupling
+
+
+def synthetic_commits(commits, files, mean_files, seed=1):
+    rng = random.Random(seed)
+    paths = [os.path.join("src", f"module{i // 100}", f"file{i}.cpp") for i in range(files)]
+    window = 200
+    for _ in range(commits):
+        size = min(int(rng.expovariate(1 / mean_files)) + 1, 500)
+        base = rng.randrange(files - window)
+        yield [paths[base + rng.randrange(window)] for _ in range(size)]
+
+
+def naive_coupling(commits):
+    changes, pairs = {}, {}
+    for paths in commits:
+        unique = sorted(set(paths))
+        for path in unique:
+            changes[path] = changes.get(path, 0) + 1
+        for pair in combinations(unique, 2):
+            pairs[pair] = pairs.get(pair, 0) + 1
+    return pairs
+
+
+def bounded_coupling(commits):
+    coupling = ChangeCoupling()
+    for paths in commits:
+        coupling.add_commit(paths)
+    coupling.top_pairs()
+    return coupling
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark change coupling.")
+    parser.add_argument("--commits", type=int, default=500000)
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--mean-files", type=float, default=6)
+    parser.add_argument("--skip-naive", action="store_true", help="Skip the unbounded string-pair counter")
+    args = parser.parse_args()
+
+    commits = list(synthetic_commits(args.commits, args.files, args.mean_files))
+    print(f"{args.commits} commits over {args.files} files")
+
+    start = time.perf_counter()
+    coupling = bounded_coupling(commits)
+    print(f"{'ChangeCoupling':<16} {time.perf_counter() - start:7.2f}s  {len(coupling.pairs):>10} pairs held "
+          f"({coupling.skipped} large commits skipped, pairs below {coupling.pruned_below} pruned)")
+    if not args.skip_naive:
+        start = time.perf_counter()
+        pairs = naive_coupling(commits)
+        print(f"{'all pairs':<16} {time.perf_counter() - start:7.2f}s  {len(pairs):>10} pairs held")
+
+
+if __name__ == "__main__":
+    main()
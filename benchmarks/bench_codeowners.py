@@ -0,0 +1,96 @@
+"""
+Benchmarks the compiled CodeOwners matcher against the previous fnmatch scan.
+
+Usage:
+    python benchmarks/bench_codeowners.py [--rules 1000 10000] [--paths 100000]
+"""
+import argparse
+import fnmatch
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import git_analyzer
+
+
+def legacy_owner(rel_path, rules):
+    """The pre-CodeOwners matcher: reverse scan with fnmatch, first owner only."""
+    for pattern, owner in reversed(rules):
+        if pattern.endswith('/'):
+            if rel_path.startswith(pattern) or rel_path == pattern[:-1]:
+                return owner
+        elif fnmatch.fnmatch(rel_path, pattern):
+            return owner
+    return "Unassigned"
+
+
+def generate(num_rules: int, num_paths: int, seed: int = 0):
+    rng = random.Random(seed)
+    top = [f"comp{i}" for i in range(max(10, num_rules // 50))]
+    subs = [f"mod{i}" for i in range(20)]
+    exts = ['.cpp', '.h', '.hpp', '.c', '.cc']
+
+    paths = []
+    for i in range(num_paths):
+        depth = rng.randint(1, 4)
+        dirs = [rng.choice(top)] + [rng.choice(subs) for _ in range(depth)]
+        paths.append('/'.join(dirs) + f"/file{i}{rng.choice(exts)}")
+
+    rules = [("*", ["@default"])]
+    for i in range(num_rules - 1):
+        kind = i % 5
+        owner = [f"@team{rng.randint(0, 200)}"]
+        if kind == 0:
+            rules.append((f"/{rng.choice(top)}/{rng.choice(subs)}/", owner))
+        elif kind == 1:
+            rules.append((f"{rng.choice(top)}/{rng.choice(subs)}/*{rng.choice(exts)}", owner))
+        elif kind == 2:
+            rules.append((f"/{rng.choice(top)}/**/{rng.choice(subs)}/", owner))
+        elif kind == 3:
+            rules.append((f"{rng.choice(subs)}/", owner))
+        else:
+            rules.append((f"/{rng.choice(top)}/{rng.choice(subs)}/file{rng.randint(0, num_paths)}*", owner))
+    return rules, paths
+
+
+def run(num_rules: int, num_paths: int, legacy_sample: int):
+    rules, paths = generate(num_rules, num_paths)
+
+    start = time.perf_counter()
+    matcher = git_analyzer.CodeOwners(rules)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in paths:
+        matcher.owners_for(path)
+    match_time = time.perf_counter() - start
+
+    legacy_rules = [(pattern, owners[0] if owners else "") for pattern, owners in rules]
+    sample = paths[:legacy_sample]
+    start = time.perf_counter()
+    for path in sample:
+        legacy_owner(path, legacy_rules)
+    legacy_time = (time.perf_counter() - start) * len(paths) / max(1, len(sample))
+
+    print(f"{num_rules:>6} rules x {num_paths} paths: build {build_time:.2f}s, "
+          f"match {match_time:.2f}s ({match_time / len(paths) * 1e6:.1f} us/path), "
+          f"legacy ~{legacy_time:.1f}s (extrapolated from {len(sample)} paths), "
+          f"speedup {legacy_time / max(match_time, 1e-9):.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CODEOWNERS matching.")
+    parser.add_argument("--rules", type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument("--paths", type=int, default=100000)
+    parser.add_argument("--legacy-sample", type=int, default=500,
+                        help="Paths matched with the legacy matcher (result is extrapolated)")
+    args = parser.parse_args()
+    for num_rules in args.rules:
+        run(num_rules, args.paths, args.legacy_sample)
+
+
+if __name__ == "__main__":
+    main()
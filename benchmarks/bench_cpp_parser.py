@@ -0,0 +1,102 @@
+"""
+Benchmarks the single-pass cpp_parser scanner against the previous readlines + regex parser.
+
+Usage:
+    python benchmarks/bench_cpp_parser.py [--files 2000] [--lines 800]
+"""
+import argparse
+import io
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cpp_parser
+
+LEGACY_INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s+["<](.*?)[">]', re.MULTILINE)
+LEGACY_CLASS_PATTERN = re.compile(r'\b(class|struct)\s+([A-Za-z0-9_]+)\s*(?:final|:\s*[^{]+)?\s*\{')
+
+
+def legacy_parse(file_path):
+    """The previous parser: decoded line list, filtered copy for LOC, joined copy for the regexes."""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    lines = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='ignore').readlines()
+    content = "".join(lines)
+    return {
+        "loc": len([line for line in lines if line.strip()]),
+        "includes": LEGACY_INCLUDE_PATTERN.findall(content),
+        "classes": [m[1] for m in LEGACY_CLASS_PATTERN.findall(content)]
+    }
+
+
+def generate_source(rng, num_lines):
+    out = ["// Copyright header", "/*", " * Licensed under the project license.", " */", ""]
+    out += [f'#include "module{rng.randint(0, 500)}/header{rng.randint(0, 50)}.h"' for _ in range(rng.randint(3, 15))]
+    out += [f"#include <vector>", ""]
+    while len(out) < num_lines:
+        kind = rng.random()
+        name = f"Type{rng.randint(0, 10 ** 6)}"
+        if kind < 0.05:
+            out += [f"class {name} : public Base {{", "public:", f"    {name}();", "    int value_ = 0;", "};", ""]
+        elif kind < 0.25:
+            out.append(f"    // {name} keeps the invariant checked by the caller")
+        elif kind < 0.30:
+            out.append(f'    log("{name}: value=%d", value); /* trace */')
+        elif kind < 0.35:
+            out.append("")
+        else:
+            out.append(f"    int v{rng.randint(0, 999)} = compute(a, b) * {rng.randint(0, 99)};")
+    return "\r\n".join(out) + "\r\n"
+
+
+def create_corpus(path, num_files, num_lines, seed=0):
+    rng = random.Random(seed)
+    files = []
+    for i in range(num_files):
+        file_path = os.path.join(path, f"file{i}.cpp")
+        with open(file_path, 'w', newline='') as f:
+            f.write(generate_source(rng, num_lines))
+        files.append(file_path)
+    return files
+
+
+def measure(parse, files, total_bytes):
+    start = time.perf_counter()
+    for file_path in files:
+        parse(file_path)
+    elapsed = time.perf_counter() - start
+    return elapsed, total_bytes / max(elapsed, 1e-9) / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the C++ parser throughput.")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=800, help="Lines per generated file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_cpp_parser_")
+    try:
+        files = create_corpus(work_dir, args.files, args.lines)
+        total_bytes = sum(os.path.getsize(f) for f in files)
+        print(f"Corpus: {len(files)} files, {total_bytes / (1024 * 1024):.1f} MB")
+
+        # Warm the page cache so both parsers read from memory
+        measure(legacy_parse, files, total_bytes)
+        legacy_time, legacy_rate = measure(legacy_parse, files, total_bytes)
+        new_time, new_rate = measure(cpp_parser.parse_cpp_file, files, total_bytes)
+
+        print(f"legacy parser : {legacy_time:.2f}s ({legacy_rate:.1f} MB/s)")
+        print(f"single pass   : {new_time:.2f}s ({new_rate:.1f} MB/s)")
+        print(f"speedup       : {legacy_time / max(new_time, 1e-9):.2f}x")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Compares size and load time of the JSON, columnar (optionally gzip) and sharded dashboard formats.
+
+Load times are measured in Python (dashboard_generator.load_dashboard) and, when `node` is
+available, with the browser decoder from metrics_dashboard.html (JSON.parse + decodeColumnar).
+For the sharded layout the node time is the cost of opening the dashboard: index.json plus the
+shards of the root folder, which is all the dashboard reads before a folder is expanded.
+
+Usage:
+    python benchmarks/bench_dashboard_format.py [--files 200000]
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import dashboard_generator
+from metrics_collector import aggregate_metrics_for_dashboard
+
+DASHBOARD_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metrics_dashboard.html')
+
+NODE_LOADER = """
+const fs = require('fs');
+const zlib = require('zlib');
+%s
+const path = process.argv[1];
+const start = process.hrtime.bigint();
+let buffer = fs.readFileSync(path);
+if (buffer[0] === 0x1f && buffer[1] === 0x8b) buffer = zlib.gunzipSync(buffer);
+const data = JSON.parse(buffer.toString('utf-8'));
+const tree = data.format === 'repo_analyzer-columnar' ? decodeColumnar(data) : data;
+process.stdout.write(String(Number(process.hrtime.bigint() - start) / 1e9));
+"""
+
+NODE_SHARD_OPENER = """
+const fs = require('fs');
+const path = require('path');
+const dir = process.argv[1];
+const start = process.hrtime.bigint();
+const root = JSON.parse(fs.readFileSync(path.join(dir, 'index.json'), 'utf-8')).root;
+const children = [].concat(...(root.shards || []).map(
+    name => JSON.parse(fs.readFileSync(path.join(dir, name), 'utf-8')).children));
+process.stdout.write(String(Number(process.hrtime.bigint() - start) / 1e9));
+"""
+
+
+def synthetic_records(repo_root, num_files, seed=0):
+    rng = random.Random(seed)
+    owners = [f"@team{i}" for i in range(40)]
+    authors = [f"Developer {i}" for i in range(300)]
+    for i in range(num_files):
+        rel_dir = os.path.join(f"component{i % 30}", f"module{(i // 30) % 40}", f"sub{i % 9}")
+        name = f"source_file_{i}{'.h' if i % 3 else '.cpp'}"
+        rel_path = os.path.join(rel_dir, name)
+        yield {
+            "name": name, "path": os.path.join(repo_root, rel_path), "rel_path": rel_path, "type": "file",
+            "size": rng.randint(100, 100000), "loc": rng.randint(10, 3000), "comment_loc": rng.randint(0, 500),
+            "classes": [f"Class{rng.randint(0, 50000)}" for _ in range(rng.randint(0, 4))],
+            "includes": [f"component{rng.randint(0, 29)}/module{rng.randint(0, 39)}/header{rng.randint(0, 999)}.h"
+                         for _ in range(rng.randint(0, 12))],
+            "included_by": [], "included_by_transitive": rng.randint(0, 500), "rebuild_tus": rng.randint(0, 200),
+            "owner": rng.choice(owners),
+            "git": {"staleness_score": round(rng.random() * 100, 2), "last_author": rng.choice(authors),
+                    "commit_count": rng.randint(1, 400)},
+            "external": {"misra_critical": 0, "misra_medium": rng.randint(0, 3), "coverage": 0.0},
+        }
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def node_load_time(path, decoder):
+    if shutil.which('node') is None:
+        return None
+    output = subprocess.run(['node', '-e', NODE_LOADER % decoder, path], stdout=subprocess.PIPE, check=True).stdout
+    return float(output)
+
+
+def node_open_time(out_dir):
+    if shutil.which('node') is None:
+        return None
+    output = subprocess.run(['node', '-e', NODE_SHARD_OPENER, out_dir], stdout=subprocess.PIPE, check=True).stdout
+    return float(output)
+
+
+def directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(os.path.join(path, dashboard_generator.SHARD_DIR_NAME))) \
+        + os.path.getsize(os.path.join(path, dashboard_generator.SHARD_INDEX_NAME))
+
+
+def extract_decoder():
+    with open(DASHBOARD_HTML, encoding='utf-8') as f:
+        html = f.read()
+    start = html.index("function decodeColumnar(")
+    depth = 0
+    for i in range(html.index('{', start), len(html)):
+        depth += {'{': 1, '}': -1}.get(html[i], 0)
+        if depth == 0:
+            return html[start:i + 1]
+    raise ValueError("decodeColumnar not found")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard output formats.")
+    parser.add_argument("--files", type=int, default=200000)
+    args = parser.parse_args()
+
+    repo_root = "/work/monorepo"
+    tree, build_time = timed(lambda: aggregate_metrics_for_dashboard(list(synthetic_records(repo_root, args.files)),
+                                                                    repo_root))
+    print(f"{args.files} files, tree built in {build_time:.1f}s")
+    decoder = extract_decoder()
+
+    out_dir = tempfile.mkdtemp(prefix="bench_dashboard_format_")
+    try:
+        outputs = [
+            ("json", os.path.join(out_dir, "dashboard.json"),
+             lambda p: dashboard_generator.generate_dashboard_json(tree, p)),
+            ("columnar", os.path.join(out_dir, "dashboard.columnar.json"),
+             lambda p: dashboard_generator.generate_dashboard_columnar(tree, p)),
+            ("columnar+gzip", os.path.join(out_dir, "dashboard.columnar.json.gz"),
+             lambda p: dashboard_generator.generate_dashboard_columnar(tree, p, compress=True)),
+        ]
+        print(f"{'format':<14} {'size':>10} {'write':>8} {'py load':>8} {'node load':>10}")
+        for label, path, write in outputs:
+            _, write_time = timed(lambda: write(path))
+            loaded, load_time = timed(lambda: dashboard_generator.load_dashboard(path))
+            assert loaded == tree
+            node_time = node_load_time(path, decoder)
+            node_text = f"{node_time:9.2f}s" if node_time is not None else "      n/a"
+            print(f"{label:<14} {os.path.getsize(path) / (1024 * 1024):8.1f}MB {write_time:7.2f}s "
+                  f"{load_time:7.2f}s {node_text}")
+
+        shard_dir = os.path.join(out_dir, "sharded")
+        shards, write_time = timed(lambda: dashboard_generator.generate_dashboard_shards(tree, shard_dir))
+        loaded, load_time = timed(lambda: dashboard_generator.load_dashboard(shard_dir))
+        assert loaded == tree
+        node_time = node_open_time(shard_dir)
+        node_text = f"{node_time:9.3f}s" if node_time is not None else "      n/a"
+        print(f"{'sharded':<14} {directory_size(shard_dir) / (1024 * 1024):8.1f}MB {write_time:7.2f}s "
+              f"{load_time:7.2f}s {node_text} (open)")
+        shard_sizes = [entry.stat().st_size for entry in os.scandir(os.path.join(shard_dir, "shards"))]
+        print(f"  {shards} shards, index {os.path.getsize(os.path.join(shard_dir, 'index.json')) / 1024:.1f}KB, "
+              f"largest shard {max(shard_sizes) / 1024:.1f}KB")
+    finally:
+        shutil.rmtree(out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmarks duplicate detection (duplicates.py) on synthetic C++ sources held in memory:
+tokenizing and MinHash block signatures per file, then LSH matching over all blocks,
+against comparing every pair of files' shingle sets, which is only timed on a sample and
+extrapolated. A share of the files carries a copy of a block of another file.
+
+Usage:
+    python benchmarks/bench_duplicates.py [--files 100000] [--lines 150] [--copies 0.1]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import duplicates
+from duplicates import DuplicateIndex, block_signatures, tokenize
+
+
+def synthetic_sources(files, lines, copies, seed=1):
+    rng = random.Random(seed)
+    sources = []
+    for i in range(files):
+        body = [f"    int v{j} = f{rng.randrange(1000)}(a{rng.randrange(50)}, b{j}) + {j};"
+                for j in range(lines)]
+        if sources and rng.random() < copies:
+            donor = sources[rng.randrange(len(sources))].split("\n")
+            start = rng.randrange(max(len(donor) - 40, 1))
+            body[:40] = donor[start:start + 40]
+        sources.append(f"int func{i}(int a, int b) {{\n" + "\n".join(body) + "\n}\n")
+    return sources
+
+
+def shingle_set(codes):
+    k = duplicates.SHINGLE_TOKENS
+    return {tuple(codes[i:i + k]) for i in range(len(codes) - k + 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark duplicate detection.")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--lines", type=int, default=150)
+    parser.add_argument("--copies", type=float, default=0.1, help="Share of files with a copied block")
+    parser.add_argument("--sample", type=int, default=300, help="Files of the all-pairs sample")
+    args = parser.parse_args()
+
+    sources = [source.encode() for source in synthetic_sources(args.files, args.lines, args.copies)]
+    print(f"{args.files} files, {sum(map(len, sources)) / 1e6:.0f} MB, NumPy: {duplicates.numpy is not None}")
+
+    start = time.perf_counter()
+    codes = [tokenize(source) for source in sources]
+    tokenized = time.perf_counter() - start
+    index = DuplicateIndex()
+    for i, file_codes in enumerate(codes):
+        index.add(f"file{i}.cpp", len(file_codes), block_signatures(file_codes))
+    signed = time.perf_counter() - start - tokenized
+    print(f"{'tokenize':<22} {tokenized:7.2f}s  ({sum(map(len, codes)) / 1e6:.1f}M tokens)")
+    print(f"{'signatures':<22} {signed:7.2f}s  ({len(index.block_file)} blocks)")
+    start = time.perf_counter()
+    flagged, pairs = index.find()
+    print(f"{'LSH matching':<22} {time.perf_counter() - start:7.2f}s  "
+          f"({sum(flagged)} duplicated blocks, {len(pairs)} file pairs)")
+
+    sample = [shingle_set(file_codes) for file_codes in codes[:args.sample]]
+    start = time.perf_counter()
+    for i in range(len(sample)):
+        for j in range(i + 1, len(sample)):
+            len(sample[i] & sample[j])
+    elapsed = time.perf_counter() - start
+    pairs_total = args.files * (args.files - 1) / 2
+    pairs_sample = len(sample) * (len(sample) - 1) / 2
+    print(f"{'all pairs (estimate)':<22} {elapsed * pairs_total / pairs_sample:7.0f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmarks the symbol size ingester (elf_symbols.ingest_artifacts: mmap'd ELF objects and
+archives, symbol tables and DWARF compile unit names) on a synthetic build directory:
+--sources generated C files are compiled once with gcc -g and their objects copied until there
+are --objects of them, one in ten inside a static library. Ingestion is timed on one process,
+on --jobs processes and from a warm cache, against one `nm -S` plus `readelf --debug-dump=info`
+per artifact (timed on a sample and extrapolated). Needs gcc, ar and binutils.
+
+Usage:
+    python benchmarks/bench_elf_symbols.py [--objects 5000] [--sources 50] [--jobs 4]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from analysis_cache import AnalysisCache
+from elf_symbols import find_artifacts, ingest_artifacts
+
+
+def synthetic_source(index, functions=40):
+    lines = [f"static int table{index}[{64 + index % 32}] = {{{index}}};"]
+    for i in range(functions):
+        lines.append(f"int f{index}_{i}(int x) {{ return table{index}[(x + {i}) % 64] * {i + 1} + x; }}")
+    return "\n".join(lines) + "\n"
+
+
+def build_tree(work_dir, sources, objects):
+    src_dir = os.path.join(work_dir, "src")
+    build_dir = os.path.join(work_dir, "build")
+    os.makedirs(src_dir)
+    compiled = []
+    for i in range(sources):
+        source = os.path.join(src_dir, f"unit{i}.c")
+        with open(source, "w") as f:
+            f.write(synthetic_source(i))
+        obj = os.path.join(work_dir, f"unit{i}.o")
+        subprocess.check_call(["gcc", "-g", "-O1", "-c", source, "-o", obj])
+        compiled.append(obj)
+    archived = []
+    for i in range(objects):
+        target_dir = os.path.join(build_dir, f"module{i // 100}")
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, f"obj{i}.o")
+        shutil.copyfile(compiled[i % sources], target)
+        if i % 10 == 0:
+            archived.append(target)
+    subprocess.check_call(["ar", "rcs", os.path.join(build_dir, "libsynthetic.a")] + archived)
+    return build_dir
+
+
+def run_tools(paths):
+    for path in paths:
+        subprocess.run(["nm", "-S", "--defined-only", path], stdout=subprocess.DEVNULL, check=True)
+        subprocess.run(["readelf", "--debug-dump=info", path], stdout=subprocess.DEVNULL, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ELF symbol size ingestion.")
+    parser.add_argument("--objects", type=int, default=5000)
+    parser.add_argument("--sources", type=int, default=50)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tool-sample", type=int, default=200, help="Artifacts run through nm/readelf")
+    args = parser.parse_args()
+    if not all(shutil.which(tool) for tool in ("gcc", "ar", "nm", "readelf")):
+        sys.exit("gcc, ar, nm and readelf are required")
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        build_dir = build_tree(work_dir, args.sources, args.objects)
+        paths = find_artifacts(build_dir)
+        print(f"{len(paths)} artifacts, {sum(os.path.getsize(path) for path in paths) / 2 ** 20:.1f} MiB")
+
+        cache = AnalysisCache(os.path.join(work_dir, "cache"))
+        for label, jobs, run_cache in (("serial", 1, None), (f"{args.jobs} jobs, caching", args.jobs, cache),
+                                       ("warm cache", args.jobs, cache)):
+            start = time.perf_counter()
+            objects = ingest_artifacts(paths, cache=run_cache, jobs=jobs)
+            print(f"{label:<16} {time.perf_counter() - start:7.2f}s  {len(objects)} objects")
+
+        sample = paths[:args.tool_sample]
+        start = time.perf_counter()
+        run_tools(sample)
+        elapsed = (time.perf_counter() - start) * len(paths) / max(len(sample), 1)
+        print(f"{'nm + readelf':<16} {elapsed:7.2f}s  (extrapolated from {len(sample)} artifacts)")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measures loading of lcov, Cobertura and SARIF reports into the external metrics index:
+load time, throughput and peak Python heap (which grows with the number of files and
+instrumented lines, not with the report size), plus the per-file lookup cost.
+
+Usage:
+    python benchmarks/bench_external_reports.py [--files 20000] [--tests 5]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import external_metrics
+from external_metrics import load_external_reports
+
+
+def rel_paths(num_files):
+    return [f"comp{i % 20}/mod{(i // 20) % 25}/file{i}.cpp" for i in range(num_files)]
+
+
+def write_lcov(path, repo_root, files, tests, rng):
+    """One record per file and test, as lcov writes for per-test tracefiles merged with -a."""
+    with open(path, 'w') as f:
+        for test in range(tests):
+            for rel_path in files:
+                f.write(f"TN:test{test}\nSF:{repo_root}/{rel_path}\n")
+                for line in range(1, 200):
+                    f.write(f"DA:{line},{rng.randint(0, 3)}\n")
+                f.write("end_of_record\n")
+
+
+def write_cobertura(path, repo_root, files, rng):
+    with open(path, 'w') as f:
+        f.write(f'<?xml version="1.0" ?>\n<coverage><sources><source>{repo_root}</source></sources>'
+                '<packages><package name="all"><classes>\n')
+        for rel_path in files:
+            f.write(f'<class name="{rel_path}" filename="{rel_path}"><methods/><lines>')
+            f.write(''.join(f'<line number="{line}" hits="{rng.randint(0, 3)}"/>' for line in range(1, 200)))
+            f.write('</lines></class>\n')
+        f.write('</classes></package></packages></coverage>\n')
+
+
+def write_sarif(path, repo_root, files, rng):
+    results = [{"ruleId": f"misra-c2012-{rng.randint(1, 22)}.{rng.randint(1, 9)}",
+                "level": rng.choice(("error", "warning", "note")),
+                "locations": [{"physicalLocation": {"artifactLocation": {"uri": rel_path, "uriBaseId": "SRC"},
+                                                    "region": {"startLine": rng.randint(1, 200)}}}]}
+               for rel_path in files for _ in range(rng.randint(0, 6))]
+    with open(path, 'w') as f:
+        json.dump({"version": "2.1.0", "runs": [{"tool": {"driver": {"name": "cppcheck"}}, "results": results,
+                                                 "originalUriBaseIds": {"SRC": {"uri": f"file://{repo_root}/"}}}]}, f)
+
+
+def measure(label, report_format, path, repo_root, files):
+    start = time.perf_counter()
+    index = load_external_reports(repo_root, [(report_format, path)])
+    elapsed = time.perf_counter() - start
+    # Separate run: tracing slows allocation-heavy parsing down several times
+    tracemalloc.start()
+    load_external_reports(repo_root, [(report_format, path)])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    keys = [p.replace('/', os.sep) for p in files]
+    start = time.perf_counter()
+    for key in keys:
+        index.overlay(key, external_metrics.get_all_external_metrics(key))
+    lookup = (time.perf_counter() - start) / len(keys)
+
+    size = os.path.getsize(path) / (1024 * 1024)
+    print(f"{label:<10} {size:8.1f}MB {elapsed:7.2f}s {size / elapsed:7.1f}MB/s "
+          f"peak {peak / (1024 * 1024):6.1f}MB  lookup {lookup * 1e6:5.2f}us/file")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark external report providers.")
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--tests", type=int, default=5, help="lcov records per file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    repo_root = "/work/monorepo"
+    files = rel_paths(args.files)
+    work_dir = tempfile.mkdtemp(prefix="bench_external_reports_")
+    try:
+        lcov = os.path.join(work_dir, "coverage.info")
+        cobertura = os.path.join(work_dir, "coverage.xml")
+        sarif = os.path.join(work_dir, "misra.sarif")
+        write_lcov(lcov, repo_root, files, args.tests, rng)
+        write_cobertura(cobertura, repo_root, files, rng)
+        write_sarif(sarif, repo_root, files, rng)
+
+        print(f"{args.files} files (sarif via {'ijson' if external_metrics.ijson else 'json.load'})")
+        measure("lcov", "lcov", lcov, repo_root, files)
+        measure("cobertura", "cobertura", cobertura, repo_root, files)
+        measure("sarif", "sarif", sarif, repo_root, files)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Benchmarks building and rolling up the dashboard folder tree from prebuilt file nodes
+(aggregate_metrics_for_dashboard minus build_file_node, which both share) on synthetic records:
+the array-backed folder_tree.FolderTree, with and without NumPy, against the previous recursive
+dict-based aggregation. The previous code computes fewer metrics (no LOC-weighted averages, no
+percentiles) and fails on trees deeper than the recursion limit. Each is timed best of --repeat.
+
+Also times incremental_update.DashboardTree.reaggregate after changing single files, which
+updates the kept per-folder values by delta, against the previous reaggregate that collected
+the percentile and blame values of all files for every update.
+
+Usage:
+    python benchmarks/bench_folder_rollup.py [--files 1000000] [--repeat 3] [--updates 50]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import folder_tree
+import metrics_collector
+from incremental_update import DashboardTree
+from metrics_collector import build_file_node, build_folder_node
+from bench_dashboard_format import synthetic_records
+
+
+def legacy_aggregate_folder(node):
+    """The previous rollup: two passes over the children, plain averages, no percentiles."""
+    keys = folder_tree.SUM_METRICS
+    totals = dict.fromkeys(keys, 0)
+    maxima = dict.fromkeys(folder_tree.MAX_METRICS, 0)
+    staleness_sum = coverage_sum = count = 0
+    unique_owners = set()
+    for child in node["children"].values():
+        child_metrics = child["metrics"]
+        for key in keys:
+            totals[key] += child_metrics.get(key, 0)
+        for key in maxima:
+            maxima[key] = max(maxima[key], child_metrics.get(key, 0))
+        staleness_sum += child_metrics.get("staleness", 0)
+        coverage_sum += child_metrics.get("coverage", 0)
+        if "owner" in child_metrics:
+            unique_owners.add(child_metrics["owner"])
+        count += 1
+    node["metrics"].update(totals)
+    node["metrics"].update(maxima)
+    if count > 0:
+        node["metrics"]["staleness"] = round(staleness_sum / count, 2)
+        node["metrics"]["coverage"] = round(coverage_sum / count, 2)
+    node["metrics"]["owner"] = (list(unique_owners)[0] if len(unique_owners) == 1
+                                else "Mixed" if unique_owners else "Unassigned")
+    return node["metrics"]
+
+
+def legacy_aggregate_recursive(node):
+    if node["type"] == "file":
+        return node["metrics"]
+    for child in node["children"].values():
+        legacy_aggregate_recursive(child)
+    return legacy_aggregate_folder(node)
+
+
+def legacy_convert_children_to_list(node):
+    if "children" in node and isinstance(node["children"], dict):
+        children_list = list(node["children"].values())
+        children_list.sort(key=lambda x: (x["type"] != "folder", x["name"]))
+        node["children"] = children_list
+        for child in children_list:
+            legacy_convert_children_to_list(child)
+
+
+def legacy_aggregate(file_nodes, repo_root):
+    root = build_folder_node("Root", ".", repo_root, children={})
+    for node in file_nodes:
+        parts = node["path"].split(os.sep)
+        current = root
+        current_abs_path = repo_root
+        for part in parts[:-1]:
+            current_abs_path = os.path.join(current_abs_path, part)
+            if part not in current["children"]:
+                path = os.path.join(current["path"], part) if current["path"] != "." else part
+                current["children"][part] = build_folder_node(part, path, current_abs_path, children={})
+            current = current["children"][part]
+        current["children"][parts[-1]] = node
+    legacy_aggregate_recursive(root)
+    legacy_convert_children_to_list(root)
+    return root
+
+
+def folder_tree_aggregate(file_nodes, repo_root):
+    tree = folder_tree.FolderTree(repo_root)
+    tree.add_files(file_nodes)
+    return tree.to_nested()
+
+
+class LegacyDashboardTree(DashboardTree):
+    """DashboardTree with the previous reaggregate: a pass over all files per update."""
+
+    def reaggregate(self) -> int:
+        affected = set()
+        for path in self.dirty:
+            while path not in affected and path in self.folders:
+                affected.add(path)
+                if path == ".":
+                    break
+                path = self._parent_path(path)
+        for path in sorted(affected, key=lambda p: -1 if p == "." else p.count(os.sep), reverse=True):
+            folder = self.folders[path]
+            folder["children"].sort(key=lambda x: (x["type"] != "folder", x["name"]))
+            metrics_collector.aggregate_folder(folder)
+        metrics = {metric for metric, _ in folder_tree.PERCENTILE_METRICS.values()}
+        values = {path: {metric: [] for metric in metrics} for path in affected}
+        blame = {path: {} for path in affected}
+        for path, node in self.files.items():
+            counts = folder_tree.blame_counts(node["metrics"])
+            folder = self._parent_path(path)
+            while True:
+                folder_values = values.get(folder)
+                if folder_values is not None:
+                    for metric in metrics:
+                        folder_values[metric].append(node["metrics"].get(metric, 0))
+                    folder_tree.merge_blame_counts(blame[folder], counts)
+                if folder == ".":
+                    break
+                folder = self._parent_path(folder)
+        for path, folder_values in values.items():
+            folder_metrics = self.folders[path]["metrics"]
+            folder_metrics.update(folder_tree.percentile_metrics(folder_values))
+            if blame[path]:
+                folder_metrics.update(folder_tree.blame_metrics(blame[path], folder_tree.BLAME_TOP_AUTHORS))
+        self.dirty.clear()
+        self.dirty_files.clear()
+        return len(affected)
+
+
+def incremental_updates(tree_class, file_nodes, repo_root, updates):
+    """Seconds per reaggregate after changing the staleness of one random file."""
+    tree = tree_class(folder_tree_aggregate(file_nodes, repo_root), repo_root)
+    rng = random.Random(0)
+    paths = sorted(tree.files)
+    # The first update builds the kept values of the root and the folders on the way
+    tree.mark_file_dirty(paths[0])
+    tree.reaggregate()
+    start = time.perf_counter()
+    for _ in range(updates):
+        path = rng.choice(paths)
+        tree.files[path]["metrics"]["staleness"] = round(rng.random() * 100, 2)
+        tree.mark_file_dirty(path)
+        tree.reaggregate()
+    return (time.perf_counter() - start) / updates, tree.root
+
+
+def timed(label, func, repeat=1):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<22} {best:7.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark folder tree rollups.")
+    parser.add_argument("--files", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--updates", type=int, default=50)
+    args = parser.parse_args()
+
+    repo_root = "/work/monorepo"
+    file_nodes = [build_file_node(record) for record in synthetic_records(repo_root, args.files)]
+    print(f"{args.files} files")
+
+    timed("previous (recursive)", lambda: legacy_aggregate(file_nodes, repo_root), args.repeat)
+    numpy = folder_tree.numpy
+    if numpy is not None:
+        timed("FolderTree (numpy)", lambda: folder_tree_aggregate(file_nodes, repo_root), args.repeat)
+    folder_tree.numpy = None
+    try:
+        timed("FolderTree (python)", lambda: folder_tree_aggregate(file_nodes, repo_root), args.repeat)
+    finally:
+        folder_tree.numpy = numpy
+
+    previous, previous_root = incremental_updates(LegacyDashboardTree, file_nodes, repo_root, args.updates)
+    kept, kept_root = incremental_updates(DashboardTree, file_nodes, repo_root, args.updates)
+    print(f"{'previous reaggregate':<22} {previous * 1000:7.1f}ms per changed file")
+    print(f"{'delta reaggregate':<22} {kept * 1000:7.1f}ms per changed file")
+    assert previous_root["metrics"] == kept_root["metrics"]
+
+    # A chain deeper than the recursion limit
+    deep_dirs = [f"d{i}" for i in range(sys.getrecursionlimit() + 100)]
+    deep = [dict(file_nodes[0], path=os.path.join(*deep_dirs, "deep.cpp"))]
+    try:
+        legacy_aggregate(deep, repo_root)
+        print("previous: deep tree ok")
+    except RecursionError:
+        print("previous: RecursionError on a deep tree")
+    folder_tree_aggregate(deep, repo_root)
+    print("FolderTree: deep tree ok")
+
+
+if __name__ == "__main__":
+    main()
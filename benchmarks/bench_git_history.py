@@ -0,0 +1,104 @@
+"""
+Compares per-file git lookups with the single-pass GitHistoryIndex.
+
+Usage:
+    python benchmarks/bench_git_history.py [--files 2000] [--commits 500]
+    python benchmarks/bench_git_history.py --repo /path/to/repo
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import git_analyzer
+import scan_repo
+
+
+def create_repo(path: str, num_files: int, num_commits: int, seed: int = 0):
+    """Creates a git repository with random history using git fast-import."""
+    rng = random.Random(seed)
+    subprocess.check_call(['git', 'init', '-q', path])
+    files = [f"dir{i % 50}/sub{i % 7}/file{i}.cpp" for i in range(num_files)]
+    authors = [f"Author {i}" for i in range(10)]
+    start = int(time.time()) - 5 * 365 * 24 * 3600
+    step = (5 * 365 * 24 * 3600) // max(1, num_commits)
+
+    lines = []
+    for c in range(num_commits):
+        ts = start + c * step
+        author = rng.choice(authors)
+        touched = files if c == 0 else rng.sample(files, min(len(files), rng.randint(1, 10)))
+        msg = f"commit {c}"
+        lines.append("commit refs/heads/master")
+        lines.append(f"author {author} <dev@example.com> {ts} +0000")
+        lines.append(f"committer {author} <dev@example.com> {ts} +0000")
+        lines.append(f"data {len(msg)}")
+        lines.append(msg)
+        for rel in touched:
+            content = f"// {c}\n"
+            lines.append(f"M 100644 inline {rel}")
+            lines.append(f"data {len(content)}")
+            lines.append(content)
+    stream = ("\n".join(lines) + "\n").encode('utf-8')
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=path, input=stream, check=True)
+    subprocess.check_call(['git', 'checkout', '-q', '-f', 'master'], cwd=path)
+
+
+def run(repo_root: str, sample: int):
+    files = scan_repo.collect_files(repo_root)
+
+    start = time.perf_counter()
+    index = git_analyzer.build_history_index(repo_root)
+    indexed = {f: git_analyzer.get_git_info(f, repo_root, history=index) for f in files}
+    index_time = time.perf_counter() - start
+
+    sampled = files if sample <= 0 else random.Random(1).sample(files, min(sample, len(files)))
+    start = time.perf_counter()
+    per_file = {f: git_analyzer.get_git_info(f, repo_root) for f in sampled}
+    per_file_time = time.perf_counter() - start
+    per_file_estimate = per_file_time * len(files) / max(1, len(sampled))
+
+    mismatches = 0
+    for f, expected in per_file.items():
+        actual = indexed[f]
+        if (expected is None) != (actual is None):
+            mismatches += 1
+        elif expected and any(expected[k] != actual[k] for k in ("last_author", "commit_count", "last_modified_ts")):
+            mismatches += 1
+
+    print(f"Files:                 {len(files)}")
+    print(f"History index:         {index_time:.2f}s for all files ({len(index)} paths indexed)")
+    print(f"Per-file lookups:      {per_file_time:.2f}s for {len(sampled)} files "
+          f"(~{per_file_estimate:.2f}s extrapolated to all files)")
+    print(f"Speedup:               {per_file_estimate / max(index_time, 1e-9):.1f}x")
+    print(f"Mismatches:            {mismatches}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark git history indexing against per-file git calls.")
+    parser.add_argument("--repo", help="Existing repository to benchmark (default: generate one)")
+    parser.add_argument("--files", type=int, default=2000, help="Files in the generated repository")
+    parser.add_argument("--commits", type=int, default=500, help="Commits in the generated repository")
+    parser.add_argument("--sample", type=int, default=300, help="Files to time with per-file calls (0 = all)")
+    args = parser.parse_args()
+
+    if args.repo:
+        run(os.path.abspath(args.repo), args.sample)
+        return
+
+    tmp = tempfile.mkdtemp()
+    try:
+        create_repo(tmp, args.files, args.commits)
+        run(tmp, args.sample)
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
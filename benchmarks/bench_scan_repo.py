@@ -0,0 +1,95 @@
+"""
+Measures repository scanning: the git ls-files and os.scandir scanners vs. the previous os.walk.
+
+Usage:
+    python benchmarks/bench_scan_repo.py [--entries 500000]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import scan_repo
+
+EXTENSIONS = ['.cpp', '.h', '.py', '.txt', '.o']
+
+
+def legacy_collect(repo_root):
+    """The previous collector: os.walk skipping dot directories, full list in memory."""
+    file_list = []
+    for root, dirs, files in os.walk(repo_root):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for file in files:
+            if scan_repo._is_collected_name(file):
+                file_list.append(os.path.join(root, file))
+    return file_list
+
+
+def create_tree(path, entries, files_per_dir=40):
+    """Creates about `entries` files and directories; build/ holds ignored output."""
+    tracked = []
+    count = 0
+    d = 0
+    while count < entries:
+        top = 'build' if d % 10 == 9 else f"comp{d % 50}"
+        rel_dir = f"{top}/mod{d // 50}/sub{d}"
+        os.makedirs(os.path.join(path, rel_dir))
+        count += 1
+        for i in range(files_per_dir):
+            rel_path = f"{rel_dir}/file{i}{EXTENSIONS[i % len(EXTENSIONS)]}"
+            open(os.path.join(path, rel_path), 'w').close()
+            if top != 'build':
+                tracked.append(rel_path)
+        count += files_per_dir
+        d += 1
+    with open(os.path.join(path, '.gitignore'), 'w') as f:
+        f.write('build/\n')
+    return tracked
+
+
+def init_git(path, tracked):
+    """Tracks the files through the index directly; `git add` of 500k files takes minutes."""
+    subprocess.check_call(['git', 'init', '-q'], cwd=path)
+    empty = subprocess.check_output(['git', 'hash-object', '-w', '--stdin'], cwd=path,
+                                    stdin=subprocess.DEVNULL).decode().strip()
+    index_info = ''.join(f"100644 {empty}\t{p}\n" for p in tracked)
+    subprocess.run(['git', 'update-index', '--add', '--index-info'], cwd=path,
+                   input=index_info.encode(), check=True)
+    subprocess.check_call(['git', 'update-index', '-q', '--refresh'], cwd=path)
+
+
+def measure(label, func):
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:6.2f}s  {count} files")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark repository scanning.")
+    parser.add_argument("--entries", type=int, default=500000, help="Files and directories in the tree")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_scan_repo_")
+    try:
+        start = time.perf_counter()
+        tracked = create_tree(work_dir, args.entries)
+        init_git(work_dir, tracked)
+        print(f"Created {args.entries} entries in {time.perf_counter() - start:.1f}s")
+
+        measure("legacy os.walk", lambda: len(legacy_collect(work_dir)))
+        measure("walk (scandir)", lambda: sum(1 for _ in scan_repo.iter_files(work_dir, scan_repo.ScanOptions('walk'))))
+        measure("walk --exclude build/", lambda: sum(1 for _ in scan_repo.iter_files(
+            work_dir, scan_repo.ScanOptions('walk', exclude=['build/']))))
+        measure("git ls-files", lambda: sum(1 for _ in scan_repo.iter_files(work_dir, scan_repo.ScanOptions('git'))))
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares peak Python heap usage of the in-memory pipeline and the --stream pipeline.
+
+Usage:
+    python benchmarks/bench_streaming.py [--files 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from dashboard_generator import generate_dashboard_json
+from streaming_pipeline import stream_dashboard_json
+
+
+def create_tree(path, num_files, seed=0):
+    rng = random.Random(seed)
+    for i in range(num_files):
+        rel_dir = os.path.join(f"comp{i % 20}", f"mod{(i // 20) % 25}", f"sub{i % 7}")
+        os.makedirs(os.path.join(path, rel_dir), exist_ok=True)
+        includes = ''.join(f'#include "header{rng.randint(0, num_files)}.h"\n' for _ in range(5))
+        classes = ''.join(f'class Type{i}_{k} {{}};\n' for k in range(3))
+        ext = '.h' if i % 2 else '.cpp'
+        with open(os.path.join(path, rel_dir, f"header{i}{ext}"), 'w') as f:
+            f.write(includes + classes)
+
+
+def measure(label, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {elapsed:6.2f}s  peak {peak / (1024 * 1024):7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory of the streaming pipeline.")
+    parser.add_argument("--files", type=int, default=20000)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_streaming_")
+    out_dir = tempfile.mkdtemp(prefix="bench_streaming_out_")
+    try:
+        create_tree(work_dir, args.files)
+        print(f"{args.files} files")
+        measure("in-memory", lambda: generate_dashboard_json(
+            aggregate_metrics_for_dashboard(collect_metrics_for_repo(work_dir, debug=True), work_dir),
+            os.path.join(out_dir, 'memory.json')))
+        measure("stream", lambda: stream_dashboard_json(work_dir, os.path.join(out_dir, 'stream.json'), debug=True))
+    finally:
+        shutil.rmtree(work_dir)
+        shutil.rmtree(out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Benchmark suite: generates a synthetic C++ repository (see synthetic_repo.py), times each stage
+of the analysis on it and stores the results as JSON. Given a baseline results file, stages
+that got slower than the threshold are reported and the exit status is 1, so the suite can
+gate CI jobs. Runs offline; needs nothing but `git`.
+
+Stages: collect_files, parse_cpp_file, get_git_info (history index plus per-file lookups),
+get_owner (CODEOWNERS parsing plus per-file matching), collect_metrics_for_repo (the whole
+per-file pipeline), aggregate_metrics_for_dashboard and generate_dashboard_json. Each stage
+runs --repeat times; the fastest run, the one least disturbed by other
+load on the machine, is compared.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--files 5000] [--depth 4] [--fanout 6] [--codeowners 500]
+                                        [--commits 1000] [--authors 30] [--repeat 3]
+                                        [--output results.json] [--work-dir DIR]
+    python benchmarks/run_benchmarks.py --baseline baseline.json [--threshold 0.2]
+                                        [--stage-threshold get_owner=0.5] [--min-delta 0.01]
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import cpp_parser
+import git_analyzer
+import scan_repo
+from dashboard_generator import generate_dashboard_json
+from include_graph import IncludePaths
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from synthetic_repo import RepoSpec, create_repo
+
+RESULTS_VERSION = 1
+DEFAULT_THRESHOLD = 0.2
+# Differences below this many seconds are noise, whatever the ratio
+DEFAULT_MIN_DELTA = 0.01
+SPEC_FILE = "spec.json"
+
+
+def prepare_repo(spec: RepoSpec, work_dir: str) -> str:
+    """The repository for spec under work_dir, generated unless it is there already."""
+    repo = os.path.join(work_dir, "repo")
+    spec_path = os.path.join(work_dir, SPEC_FILE)
+    if os.path.isdir(repo) and os.path.isfile(spec_path):
+        with open(spec_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == spec.to_dict():
+                return repo
+    shutil.rmtree(repo, ignore_errors=True)
+    start = time.perf_counter()
+    create_repo(repo, spec)
+    print(f"Generated repository in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        json.dump(spec.to_dict(), f)
+    return repo
+
+
+def stage_functions(repo: str, output_dir: str) -> list:
+    """(stage name, function) in pipeline order; later stages use the output of earlier ones."""
+    state = {}
+    include_paths = IncludePaths([repo])
+
+    def collect_files():
+        state["files"] = scan_repo.collect_files(repo, scan_repo.ScanOptions('git'))
+
+    def parse_files():
+        for file_path in state["files"]:
+            cpp_parser.parse_cpp_file(file_path)
+
+    def git_info():
+        history = git_analyzer.build_history_index(repo)
+        for file_path in state["files"]:
+            git_analyzer.get_git_info(file_path, repo, history=history)
+
+    def owners():
+        rules = git_analyzer.parse_codeowners(repo)
+        for file_path in state["files"]:
+            git_analyzer.get_owner(file_path, repo, rules)
+
+    def collect_metrics():
+        state["records"] = collect_metrics_for_repo(repo, debug=True, include_paths=include_paths,
+                                                    scan_options=scan_repo.ScanOptions('git'))
+
+    def aggregate():
+        state["tree"] = aggregate_metrics_for_dashboard(state["records"], repo)
+
+    def write_json():
+        generate_dashboard_json(state["tree"], os.path.join(output_dir, "dashboard_data.json"))
+
+    return [
+        ("collect_files", collect_files),
+        ("parse_cpp_file", parse_files),
+        ("get_git_info", git_info),
+        ("get_owner", owners),
+        ("collect_metrics_for_repo", collect_metrics),
+        ("aggregate_metrics_for_dashboard", aggregate),
+        ("generate_dashboard_json", write_json),
+    ]
+
+
+def run_suite(repo: str, repeat: int) -> dict:
+    """Times every stage repeat times; returns stage -> {median, min, runs}."""
+    runs = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        stages = stage_functions(repo, output_dir)
+        for _ in range(repeat):
+            for name, func in stages:
+                start = time.perf_counter()
+                func()
+                runs.setdefault(name, []).append(round(time.perf_counter() - start, 6))
+    return {name: {"median": statistics.median(times), "min": min(times), "runs": times}
+            for name, times in runs.items()}
+
+
+def environment() -> dict:
+    try:
+        git_version = subprocess.check_output(['git', '--version']).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        git_version = None
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "git": git_version}
+
+
+def compare(results: dict, baseline: dict, threshold: float, stage_thresholds: dict, min_delta: float) -> list:
+    """
+    Rows (stage, baseline s, current s, change, threshold, regressed) for the stages of both
+    results. A stage regresses if its fastest run grew by more than its threshold (a fraction of
+    the baseline) and by more than min_delta seconds.
+    """
+    rows = []
+    for stage, current in results["stages"].items():
+        previous = baseline["stages"].get(stage)
+        if previous is None:
+            continue
+        before, after = previous["min"], current["min"]
+        change = (after - before) / before if before > 0 else 0.0
+        limit = stage_thresholds.get(stage, threshold)
+        rows.append((stage, before, after, change, limit, change > limit and after - before > min_delta))
+    return rows
+
+
+def format_results(results: dict) -> str:
+    lines = [f"{'Stage':<34}{'Median s':>10}{'Min s':>10}"]
+    for stage, timing in results["stages"].items():
+        lines.append(f"{stage:<34}{timing['median']:>10.3f}{timing['min']:>10.3f}")
+    return "\n".join(lines)
+
+
+def format_comparison(rows: list) -> str:
+    lines = [f"{'Stage':<34}{'Base s':>10}{'Now s':>10}{'Change':>9}{'Limit':>8}"]
+    for stage, before, after, change, limit, regressed in rows:
+        lines.append(f"{stage:<34}{before:>10.3f}{after:>10.3f}{change:>+9.1%}{limit:>+8.0%}"
+                     f"{'  REGRESSION' if regressed else ''}")
+    return "\n".join(lines)
+
+
+def parse_stage_thresholds(values: list, parser) -> dict:
+    thresholds = {}
+    for value in values:
+        stage, sep, fraction = value.partition('=')
+        try:
+            thresholds[stage] = float(fraction)
+        except ValueError:
+            sep = ''
+        if not sep:
+            parser.error(f"--stage-threshold expects STAGE=FRACTION, got {value!r}")
+    return thresholds
+
+
+def main():
+    defaults = RepoSpec(files=5000, codeowners=500, commits=1000, authors=30)
+    parser = argparse.ArgumentParser(description="Times the analysis stages on a synthetic C++ repository.")
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="Folder depth")
+    parser.add_argument("--fanout", type=int, default=defaults.fanout, help="Includes per file")
+    parser.add_argument("--codeowners", type=int, default=defaults.codeowners, help="CODEOWNERS rules")
+    parser.add_argument("--commits", type=int, default=defaults.commits, help="Commits in the git history")
+    parser.add_argument("--authors", type=int, default=defaults.authors, help="Distinct commit authors")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the fastest one is compared")
+    parser.add_argument("-o", "--output", help="Write the results JSON here")
+    parser.add_argument("--work-dir", help="Keep the generated repository here and reuse it on the next run")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Allowed slowdown as a fraction of the baseline (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--stage-threshold", action="append", default=[], metavar="STAGE=FRACTION",
+                        help="Allowed slowdown of one stage (repeatable)")
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA,
+                        help=f"Ignore slowdowns below this many seconds (default: {DEFAULT_MIN_DELTA})")
+    args = parser.parse_args()
+    stage_thresholds = parse_stage_thresholds(args.stage_threshold, parser)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("version") != RESULTS_VERSION:
+            parser.error(f"{args.baseline} is not a results file of this suite")
+
+    spec = RepoSpec(args.files, args.depth, args.fanout, args.codeowners, args.commits, args.authors, args.seed)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="repo_analyzer_bench_")
+    try:
+        repo = prepare_repo(spec, work_dir)
+        stages = run_suite(repo, max(1, args.repeat))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "spec": spec.to_dict(),
+        "repeat": max(1, args.repeat),
+        "environment": environment(),
+        "stages": stages,
+    }
+    print(format_results(results))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        if baseline.get("spec") != results["spec"]:
+            print("Warning: the baseline was measured on a different repository spec", file=sys.stderr)
+        rows = compare(results, baseline, args.threshold, stage_thresholds, args.min_delta)
+        print()
+        print(format_comparison(rows))
+        regressed = [row[0] for row in rows if row[5]]
+        if regressed:
+            print(f"\nRegressions: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Generates reproducible synthetic C++ repositories for the benchmarks: a folder tree of a
+given depth, sources and headers whose includes reference other headers of the tree
+(include fan-out), a CODEOWNERS file with a given number of rules and a local git history
+of N commits by several authors. Everything is derived from the seed; history is written
+with `git fast-import` at fixed timestamps, so two runs with the same arguments produce the
+same commits. Needs nothing but `git`.
+
+Usage:
+    python benchmarks/synthetic_repo.py OUTPUT_DIR [--files 2000] [--depth 4] [--fanout 6]
+                                                  [--codeowners 200] [--commits 500] [--authors 20]
+"""
+import argparse
+import os
+import random
+import subprocess
+
+# Last commit of the generated history (2024-01-01), so the history does not depend on the clock
+HISTORY_END_TS = 1704067200
+HISTORY_YEARS = 4
+BRANCH = "master"
+
+
+class RepoSpec:
+    """Size parameters of a synthetic repository."""
+
+    def __init__(self, files: int = 2000, depth: int = 4, fanout: int = 6, codeowners: int = 200,
+                 commits: int = 500, authors: int = 20, seed: int = 0):
+        self.files = files
+        self.depth = depth
+        self.fanout = fanout
+        self.codeowners = codeowners
+        self.commits = commits
+        self.authors = authors
+        self.seed = seed
+
+    def to_dict(self) -> dict:
+        return dict(vars(self))
+
+
+def _folders(rng: random.Random, spec: RepoSpec) -> list:
+    """Leaf folders: a tree with about sqrt(files) leaves, spread over depth levels."""
+    leaves = max(1, int(spec.files ** 0.5))
+    branching = max(2, round(leaves ** (1 / max(1, spec.depth))))
+    folders = []
+    for i in range(leaves):
+        parts = []
+        value = i
+        for level in range(spec.depth):
+            parts.append(f"{'comp' if level == 0 else 'mod'}{value % branching}")
+            value //= branching
+        # Some files live above the deepest level
+        folders.append("/".join(parts[:rng.randint(1, spec.depth)] if spec.depth > 1 else parts))
+    return sorted(set(folders))
+
+
+def _source(rng: random.Random, index: int, includes: list, header: bool) -> str:
+    lines = []
+    if header:
+        lines.append("#pragma once")
+    lines.extend(f'#include "{include}"' for include in includes)
+    lines.append("#include <vector>")
+    lines.append("")
+    for c in range(rng.randint(1, 3)):
+        lines.append(f"// Class {c} of file {index}")
+        lines.append(f"class Synthetic{index}_{c} {{")
+        lines.append("public:")
+        for m in range(rng.randint(2, 12)):
+            lines.append(f"    int method{m}(int value) {{ return value * {m} + {c}; }} /* inline */")
+        lines.append("};")
+        lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def _codeowners(rng: random.Random, folders: list, count: int) -> str:
+    lines = ["# Generated CODEOWNERS", "* @default-owners"]
+    for i in range(max(0, count - 1)):
+        owner = f"@team{rng.randint(0, max(1, count // 10))}"
+        folder = rng.choice(folders)
+        kind = i % 4
+        if kind == 0:
+            lines.append(f"/{folder}/ {owner}")
+        elif kind == 1:
+            lines.append(f"{folder}/*.h {owner}")
+        elif kind == 2:
+            lines.append(f"**/{folder.rsplit('/', 1)[-1]}/*.cpp {owner}")
+        else:
+            lines.append(f"/{folder.split('/', 1)[0]}/**/file{rng.randint(0, 999)}* {owner} @reviewers")
+    return "\n".join(lines) + "\n"
+
+
+def generate_files(spec: RepoSpec) -> dict:
+    """rel_path -> content of the initial tree."""
+    rng = random.Random(spec.seed)
+    folders = _folders(rng, spec)
+    paths = []
+    for i in range(spec.files):
+        folder = folders[i % len(folders)]
+        paths.append(f"{folder}/file{i}{'.h' if i % 2 else '.cpp'}")
+    headers = [p for p in paths if p.endswith('.h')] or paths
+
+    files = {}
+    for i, rel_path in enumerate(paths):
+        includes = rng.sample(headers, min(spec.fanout, len(headers)))
+        # Repository-relative includes, resolved with the repository root on the include path
+        files[rel_path] = _source(rng, i, [h for h in includes if h != rel_path], rel_path.endswith('.h'))
+    files["CODEOWNERS"] = _codeowners(rng, folders, spec.codeowners)
+    return files
+
+
+def _data(lines: list, content: str):
+    data = content.encode('utf-8')
+    lines.append(f"data {len(data)}".encode('ascii'))
+    lines.append(data)
+
+
+def create_repo(path: str, spec: RepoSpec):
+    """Creates the repository at path (which must not contain a git repository yet)."""
+    rng = random.Random(spec.seed + 1)
+    files = generate_files(spec)
+    sources = sorted(p for p in files if p != "CODEOWNERS")
+    authors = [(f"Developer {i}", f"dev{i}@example.com") for i in range(max(1, spec.authors))]
+    commits = max(1, spec.commits)
+    span = HISTORY_YEARS * 365 * 24 * 3600
+    step = span // commits
+
+    os.makedirs(path, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', path], check=True)
+    subprocess.run(['git', 'symbolic-ref', 'HEAD', f'refs/heads/{BRANCH}'], cwd=path, check=True)
+
+    lines = []
+    for c in range(commits):
+        ts = HISTORY_END_TS - span + (c + 1) * step
+        # A few authors do most of the work
+        name, email = authors[min(int(rng.paretovariate(1.2)) - 1, len(authors) - 1)]
+        if c == 0:
+            touched = sorted(files)
+        else:
+            touched = rng.sample(sources, min(len(sources), rng.randint(1, 8)))
+            for rel_path in touched:
+                files[rel_path] += f"// revision {c}\n"
+        lines.append(f"commit refs/heads/{BRANCH}".encode('ascii'))
+        lines.append(f"author {name} <{email}> {ts} +0000".encode('utf-8'))
+        lines.append(f"committer {name} <{email}> {ts} +0000".encode('utf-8'))
+        _data(lines, f"Change {c}\n")
+        for rel_path in touched:
+            lines.append(f"M 100644 inline {rel_path}".encode('utf-8'))
+            _data(lines, files[rel_path])
+        lines.append(b"")
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=path, input=b"\n".join(lines) + b"\n", check=True)
+    subprocess.run(['git', 'checkout', '-q', '-f', BRANCH], cwd=path, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output", help="Directory to create the repository in")
+    defaults = RepoSpec()
+    parser.add_argument("--files", type=int, default=defaults.files)
+    parser.add_argument("--depth", type=int, default=defaults.depth)
+    parser.add_argument("--fanout", type=int, default=defaults.fanout, help="Includes per file")
+    parser.add_argument("--codeowners", type=int, default=defaults.codeowners, help="CODEOWNERS rules")
+    parser.add_argument("--commits", type=int, default=defaults.commits)
+    parser.add_argument("--authors", type=int, default=defaults.authors)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+    spec = RepoSpec(args.files, args.depth, args.fanout, args.codeowners, args.commits, args.authors, args.seed)
+    create_repo(args.output, spec)
+    print(f"Created {args.output}: {spec.to_dict()}")
+
+
+if __name__ == '__main__':
+    main()
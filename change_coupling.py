@@ -0,0 +1,202 @@
+import os
+import heapq
+import logging
+from collections import Counter
+from itertools import combinations
+from typing import Dict, List, Tuple
+
+import scan_repo
+import git_analyzer
+from profiler import get_profiler
+
+# Commits touching more files are bulk changes (reformatting, renames, imports) and are skipped
+DEFAULT_MAX_COMMIT_FILES = 50
+# Pairs changed together fewer times are not reported
+DEFAULT_MIN_SUPPORT = 3
+# Pair counts kept in memory before rare pairs are pruned
+DEFAULT_MAX_PAIRS = 4_000_000
+# Coupled pairs kept per file and per folder
+COUPLING_TOP = 5
+COUPLING_METRICS = ("coupling", "coupled", "churn", "hotspot")
+
+_SHIFT = 32
+
+class ChangeCoupling:
+    """
+    Co-change counts of the files of a history: changes[i] is the number of commits touching
+    path i and pairs maps a pair of path ids (a < b, as a << 32 | b) to the number of commits
+    touching both. Paths are interned to ids in the order they are first seen.
+    """
+
+    def __init__(self, max_commit_files: int = DEFAULT_MAX_COMMIT_FILES, min_support: int = DEFAULT_MIN_SUPPORT,
+                 max_pairs: int = DEFAULT_MAX_PAIRS):
+        self.max_commit_files = max_commit_files
+        self.min_support = min_support
+        self.max_pairs = max_pairs
+        self.ids: Dict[str, int] = {}
+        self.paths: List[str] = []
+        self.changes: List[int] = []
+        self.pairs: Counter = Counter()
+        self.commits = 0
+        self.skipped = 0
+        # Pairs below this count may have been dropped by pruning
+        self.pruned_below = 0
+
+    def _intern(self, path: str) -> int:
+        index = self.ids.get(path)
+        if index is None:
+            index = self.ids[path] = len(self.paths)
+            self.paths.append(path)
+            self.changes.append(0)
+        return index
+
+    def add_commit(self, paths: List[str]):
+        self.commits += 1
+        known = self.ids
+        changes = self.changes
+        ids = []
+        for path in dict.fromkeys(paths):
+            index = known.get(path)
+            if index is None:
+                index = self._intern(path)
+            changes[index] += 1
+            ids.append(index)
+        if len(ids) > self.max_commit_files:
+            self.skipped += 1
+            return
+        ids.sort()
+        # Counter.update counts in C
+        self.pairs.update([a << _SHIFT | b for a, b in combinations(ids, 2)])
+        if len(self.pairs) > self.max_pairs:
+            self._prune()
+
+    def _prune(self):
+        """Drops the rarest pairs until at most half of max_pairs are left."""
+        floor = max(self.pruned_below - 1, 0)
+        while len(self.pairs) > self.max_pairs // 2:
+            floor += 1
+            self.pairs = Counter({key: count for key, count in self.pairs.items() if count > floor})
+        self.pruned_below = floor + 1
+        logging.debug(f"Change coupling: pruned pairs changed together less than {self.pruned_below} times")
+
+    def degree(self, shared: int, a: int, b: int) -> float:
+        """Coupling strength: shared changes as a percentage of the mean changes of both files."""
+        return round(200 * shared / (self.changes[a] + self.changes[b]), 1)
+
+    def coupled_pairs(self) -> List[Tuple[int, int, int, float]]:
+        """(a, b, shared, degree) of the pairs with at least min_support shared changes."""
+        mask = (1 << _SHIFT) - 1
+        return [(key >> _SHIFT, key & mask, shared, self.degree(shared, key >> _SHIFT, key & mask))
+                for key, shared in self.pairs.items() if shared >= self.min_support]
+
+    def top_pairs(self, top: int = COUPLING_TOP) -> Tuple[Dict[str, list], Dict[str, list]]:
+        """
+        The top coupled pairs by degree (then shared changes) per file, as [other path, shared,
+        degree], and per folder, as [path, other path, shared, degree] for the pairs with a file
+        below the folder.
+        """
+        files: Dict[str, list] = {}
+        folders: Dict[str, list] = {}
+
+        def push(ranking: Dict[str, list], key: str, entry: tuple):
+            heap = ranking.setdefault(key, [])
+            if len(heap) < top:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+        for a, b, shared, degree in self.coupled_pairs():
+            # Ties prefer the lexically smaller paths
+            path_a, path_b = sorted((self.paths[a], self.paths[b]))
+            rank = (degree, shared, _Reversed(path_a), _Reversed(path_b))
+            push(files, path_a, rank + (path_b,))
+            push(files, path_b, rank + (path_a,))
+            for folder in _ancestors(path_a) | _ancestors(path_b):
+                push(folders, folder, rank)
+
+        def ranked(heap):
+            return sorted(heap, reverse=True)
+
+        return ({path: [[entry[4], entry[1], entry[0]] for entry in ranked(heap)] for path, heap in files.items()},
+                {path: [[entry[2].value, entry[3].value, entry[1], entry[0]] for entry in ranked(heap)]
+                 for path, heap in folders.items()})
+
+class _Reversed:
+    """Orders strings in reverse, so that a min-heap of ranks evicts the larger path on ties."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __gt__(self, other):
+        return self.value < other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+def _ancestors(path: str) -> set:
+    """The dashboard paths of the folders containing path, the root included."""
+    result = {"."}
+    parent = os.path.dirname(path)
+    while parent:
+        result.add(parent)
+        parent = os.path.dirname(parent)
+    return result
+
+def build_change_coupling(repo_root: str, scan_options=None, rev: str = "HEAD",
+                          max_commit_files: int = DEFAULT_MAX_COMMIT_FILES, min_support: int = DEFAULT_MIN_SUPPORT,
+                          max_pairs: int = DEFAULT_MAX_PAIRS) -> ChangeCoupling:
+    """
+    Counts co-changes of the analyzed files over the history of rev from one streamed
+    `git log --name-only`. Commits touching more than max_commit_files of them only count as
+    changes of each file; once more than max_pairs pairs are counted, the rarest are pruned.
+    """
+    coupling = ChangeCoupling(max_commit_files, min_support, max_pairs)
+    with get_profiler().stage("change coupling"):
+        for _, _, _, paths in git_analyzer.iter_log_commits(repo_root, rev=rev):
+            paths = [path for path in paths if scan_repo.is_collected_path(path, scan_options)]
+            if paths:
+                coupling.add_commit(paths)
+    logging.info(f"Change coupling: {coupling.commits} commits, {len(coupling.paths)} files, "
+                 f"{len(coupling.pairs)} pairs ({coupling.skipped} commits over {max_commit_files} files skipped)")
+    return coupling
+
+def apply_change_coupling(root: dict, coupling: ChangeCoupling, top: int = COUPLING_TOP):
+    """
+    Adds the COUPLING_METRICS to the nodes of a dashboard tree, in place: coupled holds the
+    top coupled pairs (see ChangeCoupling.top_pairs), coupling the highest degree among them,
+    churn the number of commits of the history touching a file and hotspot the churn x LOC
+    score. Folders sum churn and hotspot over their files.
+    """
+    file_pairs, folder_pairs = coupling.top_pairs(top)
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        metrics = node["metrics"]
+        if node["type"] == "file":
+            pairs = file_pairs.get(node["path"], [])
+            index = coupling.ids.get(node["path"])
+            metrics["churn"] = coupling.changes[index] if index is not None else 0
+            metrics["hotspot"] = metrics["churn"] * metrics["loc"]
+        elif not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.get("children", ()))
+            continue
+        else:
+            pairs = folder_pairs.get(node["path"], [])
+            for key in ("churn", "hotspot"):
+                metrics[key] = sum(child["metrics"][key] for child in node.get("children", ()))
+        metrics["coupled"] = pairs
+        metrics["coupling"] = pairs[0][-1] if pairs else 0
+
+def strip_change_coupling(root: dict):
+    """Removes the COUPLING_METRICS from all nodes of a dashboard tree."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for key in COUPLING_METRICS:
+            node["metrics"].pop(key, None)
+        stack.extend(node.get("children", ()))
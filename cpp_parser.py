@@ -1,43 +1,165 @@
 import re
 import os
+import mmap
+import bisect
+
+# Single-pass scanner: one regex walks the file once and stops only at tokens that
+# matter. Comments and string/char literals are consumed whole, so includes inside
+# them are never reported. The lookahead lets the regex engine skip ahead to the
+# next candidate character instead of trying every alternative at every offset.
+_TOKEN_PATTERN = re.compile(
+    rb'(?=[/"\'#R])(?:'
+    rb'(?P<comment>//[^\\\n]*(?:\\.[^\\\n]*)*|/\*.*?(?:\*/|\Z))'
+    rb'|(?P<raw>R"(?P<delim>[^()\\\s"]{0,16})\(.*?\)(?P=delim)")'
+    rb'|(?P<literal>"[^"\\\n]*(?:\\.[^"\\\n]*)*"?|\'[^\'\\\n]*(?:\\.[^\'\\\n]*)*\'?)'
+    # Matches #include <...> or #include "..."
+    rb'|\#[ \t]*include[ \t]*(?:<(?P<angle>[^>\n]*)>|"(?P<quote>[^"\n]*)"))',
+    re.DOTALL)
+
+# Simplified parser: looks for "class Name" or "struct Name" followed by a body
+# This is not a full C++ parser so it might miss complex cases or have false positives.
+# One pattern per keyword so each search starts from a literal prefix.
+_CLASS_PATTERNS = [
+    re.compile(keyword + rb'\s+([A-Za-z0-9_]+)\s*(?:final|:\s*[^{;]+)?\s*\{')
+    for keyword in (rb'class', rb'struct')
+]
+
+_NEWLINE_PATTERN = re.compile(rb'\n')
+# Blank lines that are preceded and followed by a newline; the first and last line are checked separately
+_BLANK_LINE_PATTERN = re.compile(rb'\n[ \t\r\f\v]*(?=\n)')
+_LEADING_BLANK_PATTERN = re.compile(rb'[ \t\r\f\v]*(?:\n|\Z)')
+
+_IDENTIFIER_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
 
 def parse_cpp_file(file_path: str):
     """
     Parses a C++ file to extract metrics.
     Returns a dictionary with:
-    - loc: Lines of Code (non-empty)
+    - loc: Lines of Code (lines with code outside comments)
+    - comment_loc: Lines that only contain comments
     - includes: List of included files
     - classes: List of class/struct names
+    The file is scanned through mmap without building line lists or extra copies.
     """
+    try:
+        with open(file_path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty files and special files cannot be mapped
+                data = f.read()
+            try:
+                return parse_cpp_bytes(data)
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+    except OSError:
+        # In case of read errors, just return 0s
+        return parse_cpp_bytes(b'')
+
+def parse_cpp_bytes(data):
+    """Same as parse_cpp_file, for content in a bytes-like buffer (bytes or mmap)."""
     metrics = {
         "loc": 0,
+        "comment_loc": 0,
         "includes": [],
         "classes": []
     }
-    
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-            
-        metrics["loc"] = len([line for line in lines if line.strip()])
-        
-        content = "".join(lines)
-        
-        # Regex for Includes
-        # Matches #include <...> or #include "..."
-        include_pattern = re.compile(r'^\s*#\s*include\s+["<](.*?)[">]', re.MULTILINE)
-        metrics["includes"] = include_pattern.findall(content)
-        
-        # Regex for Classes and Structs
-        # Simplified parser: looks for "class Name" or "struct Name"
-        # This is not a full C++ parser so it might miss complex cases or have false positives
-        class_pattern = re.compile(r'\b(class|struct)\s+([A-Za-z0-9_]+)\s*(?:final|:\s*[^{]+)?\s*\{')
-        matches = class_pattern.findall(content)
-        metrics["classes"] = [m[1] for m in matches]
-        
-    except Exception as e:
-        # In case of read errors, just return 0s but maybe log it?
-        # For now, we assume caller handles exceptions or we just return partial data
-        pass
-        
+    if not len(data):
+        return metrics
+
+    includes = metrics["includes"]
+    # Sorted, non-overlapping spans of comments and literals
+    skip_starts = []
+    skip_ends = []
+    # line start offset -> [line end, [(start, end) comment spans on that line]]
+    comment_lines = {}
+    comment_only = 0
+
+    for m in _TOKEN_PATTERN.finditer(data):
+        kind = m.lastgroup
+        start = m.start()
+        if kind == "angle" or kind == "quote":
+            # '#' must be the first thing on its line
+            line_start = data.rfind(b'\n', 0, start) + 1
+            if not data[line_start:start].strip():
+                includes.append(m.group(kind).decode('utf-8', 'ignore'))
+            continue
+        end = m.end()
+        skip_starts.append(start)
+        skip_ends.append(end)
+        if kind == "comment":
+            line_start = data.rfind(b'\n', 0, start) + 1
+            if line_start in comment_lines or data.find(b'\n', start, end) != -1:
+                _record_comment(data, start, end, line_start, comment_lines)
+            elif not data[line_start:start].strip():
+                if data[start + 1] == 0x2f:
+                    # A leading // comment runs to the end of its line
+                    comment_only += 1
+                else:
+                    _record_comment(data, start, end, line_start, comment_lines)
+            # Otherwise the line already has code before the comment
+
+    found = []
+    for pattern in _CLASS_PATTERNS:
+        _find_classes(pattern, data, skip_starts, skip_ends, found)
+    found.sort()
+    metrics["classes"] = [name for _, name in found]
+
+    lines = len(_NEWLINE_PATTERN.findall(data))
+    blank = len(_BLANK_LINE_PATTERN.findall(data))
+    if _LEADING_BLANK_PATTERN.match(data):
+        blank += 1
+    last_newline = data.rfind(b'\n')
+    if last_newline != len(data) - 1:
+        # Unterminated last line
+        lines += 1
+        if last_newline != -1 and not data[last_newline + 1:].strip():
+            blank += 1
+
+    for line_start, (line_end, spans) in comment_lines.items():
+        residue_start = line_start
+        residue_blank = True
+        for span_start, span_end in spans:
+            if data[residue_start:span_start].strip():
+                residue_blank = False
+                break
+            if span_end > residue_start:
+                residue_start = span_end
+        if residue_blank and not data[residue_start:line_end].strip():
+            # Lines inside a block comment that are empty stay blank lines
+            if data[line_start:line_end].strip():
+                comment_only += 1
+
+    metrics["comment_loc"] = comment_only
+    metrics["loc"] = lines - blank - comment_only
     return metrics
+
+def _find_classes(pattern, data, skip_starts: list, skip_ends: list, found: list):
+    """Appends (offset, name) for each match of pattern that starts in code."""
+    search = pattern.search
+    m = search(data)
+    while m:
+        start = m.start()
+        index = bisect.bisect_right(skip_starts, start) - 1
+        in_skipped = index >= 0 and skip_ends[index] > start
+        if in_skipped or (start and data[start - 1] in _IDENTIFIER_BYTES):
+            # Retry right after the rejected keyword; its match may have swallowed a real one
+            m = search(data, start + 1)
+            continue
+        found.append((start, m.group(1).decode('utf-8', 'ignore')))
+        m = search(data, m.end())
+
+def _record_comment(data, start: int, end: int, line_start: int, comment_lines: dict):
+    """Registers the part of every line covered by the comment [start, end)."""
+    while True:
+        line_end = data.find(b'\n', line_start)
+        if line_end == -1:
+            line_end = len(data)
+        entry = comment_lines.get(line_start)
+        if entry is None:
+            entry = comment_lines[line_start] = [line_end, []]
+        entry[1].append((start if start > line_start else line_start, end if end < line_end else line_end))
+        if line_end >= end - 1 or line_end == len(data):
+            break
+        line_start = line_end + 1
@@ -1,5 +1,26 @@
 import json
 import os
+import gzip
+
+from results_store import SQLITE_MAGIC, load_results_tree
+
+OUTPUT_FORMATS = ('json', 'columnar', 'sharded')
+
+# Marker of the columnar dashboard format, checked by the loaders
+COLUMNAR_FORMAT = "repo_analyzer-columnar"
+COLUMNAR_VERSION = 1
+
+# Marker of the sharded layout's index file
+SHARDED_FORMAT = "repo_analyzer-sharded"
+SHARDED_VERSION = 1
+SHARD_INDEX_NAME = "index.json"
+SHARD_DIR_NAME = "shards"
+# Nodes per shard file, and subtree size up to which a folder is inlined into its parent's shard
+DEFAULT_SHARD_NODES = 4096
+DEFAULT_INLINE_NODES = 256
+
+# Node keys that are stored in the node table rather than derived from the parent chain
+_NODE_KEYS = ("name", "type", "path", "full_path", "children", "metrics")
 
 def generate_dashboard_json(aggregated_data: dict, output_path: str):
     """
@@ -8,6 +29,282 @@ def generate_dashboard_json(aggregated_data: dict, output_path: str):
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(aggregated_data, f, indent=2)
-            
+
+    except Exception as e:
+        raise IOError(f"Failed to write dashboard data to {output_path}: {e}")
+
+def generate_dashboard_columnar(aggregated_data: dict, output_path: str, compress: bool = False):
+    """
+    Writes the aggregated data structure in the columnar format (see encode_columnar),
+    gzip-compressed if requested.
+    """
+    try:
+        data = json.dumps(encode_columnar(aggregated_data), separators=(',', ':')).encode('utf-8')
+        if compress:
+            data = gzip.compress(data, compresslevel=6)
+        with open(output_path, 'wb') as f:
+            f.write(data)
+
     except Exception as e:
         raise IOError(f"Failed to write dashboard data to {output_path}: {e}")
+
+def generate_dashboard_shards(aggregated_data: dict, output_dir: str, shard_nodes: int = DEFAULT_SHARD_NODES,
+                              inline_nodes: int = DEFAULT_INLINE_NODES) -> int:
+    """
+    Writes the tree as a sharded layout the dashboard loads lazily: output_dir/index.json holds
+    the root, and the children of every folder with more than inline_nodes nodes below it are
+    moved to shard files of at most about shard_nodes nodes each. Such a folder keeps its
+    metrics plus "child_count" and the list of its "shards". Returns the number of shard files.
+    """
+    shard_dir = os.path.join(output_dir, SHARD_DIR_NAME)
+    try:
+        os.makedirs(shard_dir, exist_ok=True)
+        # Shards of a previous run would be left dangling
+        for name in os.listdir(shard_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(shard_dir, name))
+
+        writer = _ShardWriter(shard_dir, _subtree_sizes(aggregated_data), shard_nodes, inline_nodes)
+        index = {"format": SHARDED_FORMAT, "version": SHARDED_VERSION, "root": writer.stub(aggregated_data)}
+        with open(os.path.join(output_dir, SHARD_INDEX_NAME), 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+
+    except Exception as e:
+        raise IOError(f"Failed to write dashboard data to {output_dir}: {e}")
+    return writer.count
+
+def _subtree_sizes(root: dict) -> dict:
+    """id(node) -> number of nodes in its subtree, computed without recursion."""
+    sizes = {}
+    stack = [(root, False)]
+    while stack:
+        node, done = stack.pop()
+        children = node.get("children") or []
+        if done:
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in children)
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in children)
+    return sizes
+
+class _ShardWriter:
+    """Splits folders into shard files, see generate_dashboard_shards."""
+
+    def __init__(self, shard_dir: str, sizes: dict, shard_nodes: int, inline_nodes: int):
+        self.shard_dir = shard_dir
+        self.sizes = sizes
+        self.shard_nodes = shard_nodes
+        self.inline_nodes = inline_nodes
+        self.count = 0
+
+    def stub(self, node: dict) -> dict:
+        """The node as it appears in its parent's listing."""
+        if node["type"] != "folder" or self.sizes[id(node)] <= self.inline_nodes:
+            return node
+        stub = {key: node[key] for key in ("name", "type", "path", "full_path")}
+        stub["child_count"] = len(node["children"])
+        stub["shards"] = self._write_children(node)
+        stub["metrics"] = node["metrics"]
+        return stub
+
+    def _write_children(self, folder: dict) -> list:
+        names = []
+        bucket = []
+        weight = 0
+        for child in folder["children"]:
+            item = self.stub(child)
+            item_weight = self.sizes[id(child)] if item is child else 1
+            if bucket and weight + item_weight > self.shard_nodes:
+                names.append(self._write_shard(folder, bucket))
+                bucket = []
+                weight = 0
+            bucket.append(item)
+            weight += item_weight
+        if bucket:
+            names.append(self._write_shard(folder, bucket))
+        return names
+
+    def _write_shard(self, folder: dict, children: list) -> str:
+        name = f"{SHARD_DIR_NAME}/{self.count}.json"
+        self.count += 1
+        with open(os.path.join(self.shard_dir, f"{self.count - 1}.json"), 'w', encoding='utf-8') as f:
+            json.dump({"path": folder["path"], "children": children}, f, separators=(',', ':'))
+        return name
+
+def load_dashboard(input_path: str) -> dict:
+    """
+    Reads a dashboard tree written in any output format, gzip-compressed or not.
+    For the sharded layout, input_path is the output directory or its index.json. A results
+    store written with --db is read as well.
+    """
+    if os.path.isdir(input_path):
+        input_path = os.path.join(input_path, SHARD_INDEX_NAME)
+    with open(input_path, 'rb') as f:
+        data = f.read()
+    if data[:len(SQLITE_MAGIC)] == SQLITE_MAGIC:
+        return load_results_tree(input_path)
+    if data[:2] == b'\x1f\x8b':
+        data = gzip.decompress(data)
+    loaded = json.loads(data.decode('utf-8'))
+    if loaded.get("format") == COLUMNAR_FORMAT:
+        return decode_columnar(loaded)
+    if loaded.get("format") == SHARDED_FORMAT:
+        return _assemble_shards(loaded["root"], os.path.dirname(input_path))
+    return loaded
+
+def _assemble_shards(root: dict, base_dir: str) -> dict:
+    """Replaces shard references by the children they hold, in place."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        shards = node.pop("shards", None)
+        if shards is not None:
+            del node["child_count"]
+            children = []
+            for name in shards:
+                with open(os.path.join(base_dir, name), 'r', encoding='utf-8') as f:
+                    children.extend(json.load(f)["children"])
+            # Keep the key order of the other formats
+            metrics = node.pop("metrics")
+            node["children"] = children
+            node["metrics"] = metrics
+        stack.extend(node.get("children") or [])
+    return root
+
+class _StringTable:
+    """Interns strings into a list; each distinct string is stored once."""
+
+    def __init__(self):
+        self.strings = []
+        self._index = {}
+
+    def intern(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+def _iter_preorder(root: dict):
+    """Yields (node, parent index) in pre-order, children in stored order."""
+    stack = [(root, -1)]
+    index = 0
+    while stack:
+        node, parent = stack.pop()
+        yield node, parent
+        children = node.get("children") or []
+        stack.extend((child, index) for child in reversed(children))
+        index += 1
+
+def _child_paths(parent_path: str, parent_full_path: str, name: str, sep: str):
+    path = name if parent_path == "." else parent_path + sep + name
+    full_path = parent_full_path + name if parent_full_path.endswith(sep) else parent_full_path + sep + name
+    return path, full_path
+
+def encode_columnar(root: dict, sep: str = os.sep) -> dict:
+    """
+    Converts the dashboard tree into a compact columnar structure:
+    - nodes are stored in pre-order as parallel columns (parent index, interned name and type);
+      path and full_path are rebuilt from the parent chain and the root's full_path
+    - every metric is a column over all nodes; string columns hold indexes into the shared
+      string table, string-list columns (classes_list, ...) are CSR encoded (offsets + values)
+    - nodes that lack a metric are listed in the column's "missing" entry
+    """
+    strings = _StringTable()
+    parents = []
+    names = []
+    types = []
+    paths = []
+    metric_rows = []
+    for node, parent in _iter_preorder(root):
+        extra = set(node) - set(_NODE_KEYS)
+        if extra:
+            raise ValueError(f"Node {node.get('path')} has keys the columnar format does not store: {sorted(extra)}")
+        if parent >= 0:
+            expected = _child_paths(paths[parent][0], paths[parent][1], node["name"], sep)
+            if expected != (node["path"], node["full_path"]):
+                raise ValueError(f"Node path {node['path']} does not follow from its parent")
+        parents.append(parent)
+        names.append(strings.intern(node["name"]))
+        types.append(strings.intern(node["type"]))
+        paths.append((node["path"], node["full_path"]))
+        metric_rows.append(node.get("metrics", {}))
+
+    keys = []
+    for row in metric_rows:
+        for key in row:
+            if key not in keys:
+                keys.append(key)
+
+    columns = {}
+    for key in keys:
+        values = [row.get(key) for row in metric_rows]
+        present = [v for row, v in zip(metric_rows, values) if key in row]
+        if all(isinstance(v, str) for v in present):
+            column = {"kind": "str", "values": [strings.intern(v) if isinstance(v, str) else -1 for v in values]}
+        elif all(isinstance(v, list) and all(isinstance(s, str) for s in v) for v in present):
+            offsets = [0]
+            flat = []
+            for v in values:
+                if v:
+                    flat.extend(strings.intern(s) for s in v)
+                offsets.append(len(flat))
+            column = {"kind": "list", "offsets": offsets, "values": flat}
+        else:
+            column = {"kind": "raw", "values": values}
+        missing = [i for i, row in enumerate(metric_rows) if key not in row]
+        if missing:
+            column["missing"] = missing
+        columns[key] = column
+
+    return {
+        "format": COLUMNAR_FORMAT,
+        "version": COLUMNAR_VERSION,
+        "sep": sep,
+        "root": {"path": root["path"], "full_path": root["full_path"]},
+        "strings": strings.strings,
+        "nodes": {"count": len(parents), "parent": parents, "name": names, "type": types},
+        "metrics": columns,
+    }
+
+def decode_columnar(data: dict) -> dict:
+    """Rebuilds the nested dashboard tree from encode_columnar output."""
+    if data.get("format") != COLUMNAR_FORMAT or data.get("version") != COLUMNAR_VERSION:
+        raise ValueError("Unsupported dashboard data format")
+    strings = data["strings"]
+    sep = data["sep"]
+    table = data["nodes"]
+    count = table["count"]
+
+    metrics = [{} for _ in range(count)]
+    for key, column in data["metrics"].items():
+        kind = column["kind"]
+        values = column["values"]
+        if kind == "str":
+            decoded = [strings[v] if v >= 0 else None for v in values]
+        elif kind == "list":
+            offsets = column["offsets"]
+            decoded = [[strings[s] for s in values[offsets[i]:offsets[i + 1]]] for i in range(count)]
+        else:
+            decoded = values
+        missing = set(column.get("missing", ()))
+        for i, (row, value) in enumerate(zip(metrics, decoded)):
+            if not missing or i not in missing:
+                row[key] = value
+
+    nodes = []
+    for i in range(count):
+        parent = table["parent"][i]
+        name = strings[table["name"][i]]
+        if parent < 0:
+            path, full_path = data["root"]["path"], data["root"]["full_path"]
+        else:
+            path, full_path = _child_paths(nodes[parent]["path"], nodes[parent]["full_path"], name, sep)
+        node = {"name": name, "type": strings[table["type"][i]], "path": path, "full_path": full_path}
+        if node["type"] == "folder":
+            node["children"] = []
+        node["metrics"] = metrics[i]
+        if parent >= 0:
+            nodes[parent]["children"].append(node)
+        nodes.append(node)
+    return nodes[0]
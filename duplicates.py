@@ -0,0 +1,382 @@
+import os
+import re
+import zlib
+import heapq
+import logging
+import functools
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import analysis_cache
+from change_coupling import _Reversed
+from profiler import get_profiler
+
+# Bump whenever tokens, shingles or signatures change so cached signatures are ignored
+DUPLICATES_VERSION = "2"
+DUPLICATES_NAMESPACE = f"duplicates-v{DUPLICATES_VERSION}"
+
+# Tokens per shingle, and shingles per block; blocks overlap by half
+SHINGLE_TOKENS = 8
+BLOCK_SHINGLES = 64
+BLOCK_STRIDE = BLOCK_SHINGLES // 2
+# MinHash permutations; the similarity estimate of two blocks has a standard deviation of
+# sqrt(s * (1 - s) / NUM_PERM), at most about 0.09. They are split into LSH bands by lsh_bands
+NUM_PERM = 32
+# Candidates are duplicates if at least this share of their signatures agrees
+DEFAULT_MIN_SIMILARITY = 0.5
+# Members of larger buckets are only compared with the first, so boilerplate stays linear
+MAX_BUCKET = 64
+# Duplicate partners kept per file
+DUPLICATES_TOP = 5
+DUPLICATE_METRICS = ("tokens", "dup_tokens", "duplicated", "duplicates")
+
+_MASK = (1 << 32) - 1
+_SHINGLE_BASE = 0x01000193
+# Odd multipliers and offsets of the permutations x -> (a * x + b) mod 2**32
+_PERM_A = [(zlib.crc32(f"a{i}".encode()) | 1) for i in range(NUM_PERM)]
+_PERM_B = [zlib.crc32(f"b{i}".encode()) for i in range(NUM_PERM)]
+
+# One token per match, without groups so that findall returns the tokens: comments and
+# #include lines, raw strings (up to the first ')delim"'), literals, numbers, identifiers and
+# punctuators
+_TOKEN_PATTERN = re.compile(
+    rb'//[^\n]*|/\*.*?(?:\*/|\Z)|\#[ \t]*include[^\n]*'
+    rb'|R"[^()\\\s"]{0,16}\(.*?\)[^()\\\s"]{0,16}"'
+    rb'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"?|\'[^\'\\\n]*(?:\\.[^\'\\\n]*)*\'?'
+    rb'|\.?[0-9](?:[\w.\']|[eEpP][+-])*'
+    rb'|[A-Za-z_]\w*'
+    rb'|->\*?|<<=?|>>=?|::|\+\+|--|&&|\|\||\.\.\.|[-+*/%^&|=!<>]=|\S',
+    re.DOTALL)
+_LITERAL_CODE = zlib.crc32(b'"')
+_NUMBER_CODE = zlib.crc32(b'0')
+_DIGITS = b'0123456789'
+
+def _token_code(token: bytes) -> Optional[int]:
+    """Code of a token; None for comments and #include lines, one code for all literals and numbers."""
+    if len(token) > 1 and (token[:2] in (b'//', b'/*') or token[:1] == b'#'):
+        return None
+    if token[:1] in (b'"', b"'") or (len(token) > 2 and token[:2] == b'R"'):
+        return _LITERAL_CODE
+    if token[0] in _DIGITS or (len(token) > 1 and token[0] == 0x2e and token[1] in _DIGITS):
+        return _NUMBER_CODE
+    return zlib.crc32(token)
+
+def tokenize(data) -> List[int]:
+    """
+    CRC-32 of each token of C++ source, without whitespace, comments and #include lines.
+    Literals and numbers are normalized, so blocks that only differ in constants still match.
+    """
+    tokens = _TOKEN_PATTERN.findall(data)
+    codes = {token: _token_code(token) for token in set(tokens)}
+    return [code for code in map(codes.__getitem__, tokens) if code is not None]
+
+def block_signatures(codes: List[int]) -> List[List[int]]:
+    """
+    MinHash signatures of the overlapping blocks of a token sequence. Block i holds the
+    shingles [i * BLOCK_STRIDE, (i + 2) * BLOCK_STRIDE); sequences of fewer than
+    BLOCK_STRIDE shingles have no blocks.
+    """
+    count = len(codes) - SHINGLE_TOKENS + 1
+    if count < BLOCK_STRIDE:
+        return []
+    if numpy is not None:
+        return _block_signatures_numpy(codes, count)
+    shingles = [0] * count
+    for j in range(SHINGLE_TOKENS):
+        shingles = [(value * _SHINGLE_BASE + code) & _MASK for value, code in zip(shingles, codes[j:j + count])]
+    halves = range(0, count, BLOCK_STRIDE)
+    blocks = max(len(halves) - 1, 1)
+    signatures = [[0] * NUM_PERM for _ in range(blocks)]
+    for p, (a, b) in enumerate(zip(_PERM_A, _PERM_B)):
+        hashed = [(a * value + b) & _MASK for value in shingles]
+        minima = [min(hashed[start:start + BLOCK_STRIDE]) for start in halves]
+        for i in range(blocks):
+            signatures[i][p] = min(minima[i:i + 2])
+    return signatures
+
+def _block_signatures_numpy(codes: List[int], count: int) -> List[List[int]]:
+    tokens = numpy.asarray(codes, dtype=numpy.uint64)
+    shingles = numpy.zeros(count, dtype=numpy.uint64)
+    for j in range(SHINGLE_TOKENS):
+        shingles = (shingles * numpy.uint64(_SHINGLE_BASE) + tokens[j:j + count]) & numpy.uint64(_MASK)
+    hashed = (numpy.asarray(_PERM_A, dtype=numpy.uint64)[:, None] * shingles[None, :]
+              + numpy.asarray(_PERM_B, dtype=numpy.uint64)[:, None]) & numpy.uint64(_MASK)
+    minima = numpy.minimum.reduceat(hashed, numpy.arange(0, count, BLOCK_STRIDE), axis=1)
+    if minima.shape[1] > 1:
+        minima = numpy.minimum(minima[:, :-1], minima[:, 1:])
+    return minima.T.tolist()
+
+def lsh_bands(min_similarity: float) -> Tuple[int, int]:
+    """
+    (bands, rows) of the LSH banding for a similarity threshold: blocks sharing all rows of a
+    band are candidates, which catches pairs above a similarity of about
+    (1 / bands) ** (1 / rows). Of the splits of NUM_PERM, this picks the one whose threshold is
+    closest at or below min_similarity; candidates are then checked against min_similarity.
+    """
+    best = (NUM_PERM, 1)
+    for rows in range(1, NUM_PERM + 1):
+        bands = NUM_PERM // rows
+        if (1 / bands) ** (1 / rows) <= min_similarity:
+            best = (bands, rows)
+    return best
+
+def block_span(index: int, tokens: int) -> Tuple[int, int]:
+    """Tokens [start, end) covered by block index of a file of tokens tokens."""
+    count = tokens - SHINGLE_TOKENS + 1
+    return index * BLOCK_STRIDE, min((index + 2) * BLOCK_STRIDE, count) + SHINGLE_TOKENS - 1
+
+def file_signatures(file_path: str, cache=None) -> Tuple[int, List[List[int]], bool]:
+    """(tokens, block signatures, cache hit) of a file; signatures are cached per blob."""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    if cache is not None:
+        key = analysis_cache.blob_oid(data)
+        entry = cache.get(key, DUPLICATES_NAMESPACE)
+        if entry is not None:
+            return entry["tokens"], entry["signatures"], True
+    codes = tokenize(data)
+    result = (len(codes), block_signatures(codes))
+    if cache is not None:
+        cache.put(key, {"tokens": result[0], "signatures": result[1]}, DUPLICATES_NAMESPACE)
+    return result + (False,)
+
+def _signature_chunk(file_paths: list, cache=None) -> list:
+    """Process pool task: file_signatures of a chunk of files; unreadable files have none."""
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append(file_signatures(file_path, cache))
+        except OSError:
+            results.append((0, [], False))
+    return results
+
+class DuplicateIndex:
+    """
+    Block signatures of a set of files and the duplicated blocks among them. Blocks are found
+    through LSH banding (sorting the band keys with NumPy, or hashing them without), so only
+    blocks that share a band are ever compared. With NumPy, signatures are kept as one
+    uint32 array per file.
+    """
+
+    def __init__(self, min_similarity: float = DEFAULT_MIN_SIMILARITY):
+        self.min_similarity = min_similarity
+        self.bands, self.rows = lsh_bands(min_similarity)
+        self.paths: List[str] = []
+        self.tokens: List[int] = []
+        self._signatures = []
+        # Per block: file index and position in the file
+        self.block_file = array('i')
+        self.block_index = array('i')
+
+    def add(self, path: str, tokens: int, signatures: List[List[int]]):
+        file_index = len(self.paths)
+        self.paths.append(path)
+        self.tokens.append(tokens)
+        if signatures:
+            self._signatures.append(numpy.asarray(signatures, dtype=numpy.uint32) if numpy is not None
+                                    else [tuple(signature) for signature in signatures])
+        self.block_file.extend([file_index] * len(signatures))
+        self.block_index.extend(range(len(signatures)))
+
+    def _candidates(self, signatures) -> List[Tuple[int, int]]:
+        """Pairs (a < b) of blocks sharing an LSH bucket, each pair once."""
+        found = set()
+        rows = self.rows
+        for band in range(self.bands):
+            by_key: Dict[tuple, list] = {}
+            for block, signature in enumerate(signatures):
+                by_key.setdefault(signature[band * rows:(band + 1) * rows], []).append(block)
+            for members in by_key.values():
+                if len(members) > MAX_BUCKET:
+                    pairs = ((members[0], other) for other in members[1:])
+                elif len(members) > 1:
+                    pairs = combinations(members, 2)
+                else:
+                    continue
+                found.update((a, b) if a < b else (b, a) for a, b in pairs)
+        return sorted(found)
+
+    def _candidates_numpy(self, signatures) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+        """
+        _candidates as two arrays of block ids: the band keys are sorted, and the pairs of
+        each run of equal keys are generated per distance within the run, not per bucket.
+        """
+        count = len(signatures)
+        found = []
+        rows = self.rows
+        for band in range(self.bands):
+            keys = numpy.zeros(count, dtype=numpy.uint64)
+            for row in range(band * rows, (band + 1) * rows):
+                keys = keys * numpy.uint64(0x100000001B3) + signatures[:, row]
+            order = numpy.argsort(keys, kind='stable')
+            ordered = keys[order]
+            starts = numpy.flatnonzero(numpy.concatenate(([True], ordered[1:] != ordered[:-1])))
+            sizes = numpy.diff(numpy.append(starts, count))
+            start_of = numpy.repeat(starts, sizes)
+            end_of = numpy.repeat(starts + sizes, sizes)
+            big = numpy.repeat(sizes > MAX_BUCKET, sizes)
+            positions = numpy.arange(count)
+            # Members of large buckets pair with the first member only
+            others = positions[big & (positions != start_of)]
+            pairs = [(order[start_of[others]], order[others])]
+            active = positions[~big & (end_of - positions > 1)]
+            distance = 1
+            while len(active):
+                pairs.append((order[active], order[active + distance]))
+                distance += 1
+                active = active[active + distance < end_of[active]]
+            for a, b in pairs:
+                found.append(numpy.minimum(a, b).astype(numpy.int64) * count + numpy.maximum(a, b))
+        found = numpy.unique(numpy.concatenate(found)) if found else numpy.zeros(0, dtype=numpy.int64)
+        return found // count, found % count
+
+    def find(self) -> Tuple[List[bool], Dict[Tuple[int, int], int]]:
+        """
+        (duplicated flag per block, matching blocks per pair of file indexes). Candidates from
+        the buckets are kept if their signatures agree on at least min_similarity of the rows
+        and they are not overlapping blocks of one file.
+        """
+        duplicated = [False] * len(self.block_file)
+        pairs: Dict[Tuple[int, int], int] = {}
+        if not self._signatures:
+            return duplicated, pairs
+        needed = self.min_similarity * NUM_PERM
+        if numpy is not None:
+            return self._find_numpy(numpy.concatenate(self._signatures), needed)
+        signatures = [signature for chunk in self._signatures for signature in chunk]
+        candidates = self._candidates(signatures)
+        agree = [sum(x == y for x, y in zip(signatures[a], signatures[b])) for a, b in candidates]
+        block_file, block_index = self.block_file, self.block_index
+        for (a, b), count in zip(candidates, agree):
+            if count < needed or (block_file[a] == block_file[b] and block_index[b] - block_index[a] < 2):
+                continue
+            duplicated[a] = duplicated[b] = True
+            key = (block_file[a], block_file[b])
+            pairs[key] = pairs.get(key, 0) + 1
+        return duplicated, pairs
+
+    def _find_numpy(self, signatures, needed: float, chunk: int = 1 << 20):
+        a, b = self._candidates_numpy(signatures)
+        agree = numpy.concatenate([(signatures[a[start:start + chunk]] == signatures[b[start:start + chunk]]).sum(axis=1)
+                                   for start in range(0, len(a), chunk)] or [numpy.zeros(0, dtype=numpy.int64)])
+        block_file = numpy.asarray(self.block_file, dtype=numpy.int64)
+        block_index = numpy.asarray(self.block_index, dtype=numpy.int64)
+        file_a, file_b = block_file[a], block_file[b]
+        keep = (agree >= needed) & ~((file_a == file_b) & (block_index[b] - block_index[a] < 2))
+        flags = numpy.zeros(len(block_file), dtype=bool)
+        flags[a[keep]] = True
+        flags[b[keep]] = True
+        files = len(self.paths)
+        keys, counts = numpy.unique(file_a[keep] * files + file_b[keep], return_counts=True)
+        pairs = {(key // files, key % files): count for key, count in zip(keys.tolist(), counts.tolist())}
+        return flags.tolist(), pairs
+
+def build_duplicate_index(file_paths: Dict[str, str], cache=None, jobs: int = 1,
+                          min_similarity: float = DEFAULT_MIN_SIMILARITY, chunk_size: int = 64) -> DuplicateIndex:
+    """Signatures of the files (dashboard path -> file path), computed on jobs processes."""
+    profiler = get_profiler()
+    index = DuplicateIndex(min_similarity)
+    paths = list(file_paths.items())
+    chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+    task = functools.partial(_signature_chunk, cache=cache)
+    hits = 0
+    with profiler.stage("duplicate signatures"):
+        if jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as processes:
+                results = processes.map(task, [[file_path for _, file_path in chunk] for chunk in chunks])
+                for chunk, chunk_results in zip(chunks, results):
+                    for (path, _), (tokens, signatures, hit) in zip(chunk, chunk_results):
+                        index.add(path, tokens, signatures)
+                        hits += hit
+        else:
+            for path, file_path in paths:
+                tokens, signatures, hit = profiler.call("duplicates", file_path, file_signatures, file_path, cache)
+                index.add(path, tokens, signatures)
+                hits += hit
+    if cache is not None:
+        logging.info(f"Duplicate signatures: {hits} cached, {len(paths) - hits} computed")
+    return index
+
+def _covered(spans: List[Tuple[int, int]]) -> int:
+    """Number of tokens in the union of [start, end) spans."""
+    total = 0
+    reach = 0
+    for start, end in sorted(spans):
+        if end > reach:
+            total += end - max(start, reach)
+            reach = end
+    return total
+
+def apply_duplicates(root: dict, repo_root: str, cache=None, jobs: int = 1,
+                     min_similarity: float = DEFAULT_MIN_SIMILARITY, top: int = DUPLICATES_TOP) -> DuplicateIndex:
+    """
+    Adds the DUPLICATE_METRICS to the nodes of a dashboard tree, in place: tokens (C++ tokens
+    outside comments), dup_tokens (those in blocks duplicated elsewhere, possibly in the same
+    file), duplicated (their percentage) and, for files, duplicates: the top [path, matching
+    blocks] partners. Folders sum the tokens of their files.
+    """
+    files = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node["type"] == "file":
+            files[node["path"]] = os.path.join(repo_root, node["path"])
+        stack.extend(node.get("children", ()))
+    index = build_duplicate_index(files, cache=cache, jobs=jobs, min_similarity=min_similarity)
+
+    with get_profiler().stage("duplicate matching"):
+        duplicated, pairs = index.find()
+    spans: Dict[int, list] = {}
+    for block, is_duplicated in enumerate(duplicated):
+        if is_duplicated:
+            file_index = index.block_file[block]
+            spans.setdefault(file_index, []).append(block_span(index.block_index[block],
+                                                               index.tokens[file_index]))
+    partners: Dict[int, list] = {}
+    for (a, b), blocks in pairs.items():
+        for file_index, other in ((a, b), (b, a)) if a != b else ((a, a),):
+            heap = partners.setdefault(file_index, [])
+            # On ties the smaller path ranks higher, as in the displayed order
+            entry = (blocks, _Reversed(index.paths[other]))
+            if len(heap) < top:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+    logging.info(f"Duplicates: {sum(duplicated)} of {len(duplicated)} blocks in "
+                 f"{len(spans)} of {len(index.paths)} files")
+
+    positions = {path: i for i, path in enumerate(index.paths)}
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        metrics = node["metrics"]
+        if node["type"] == "file":
+            file_index = positions[node["path"]]
+            metrics["tokens"] = index.tokens[file_index]
+            metrics["dup_tokens"] = _covered(spans.get(file_index, []))
+            metrics["duplicates"] = [[path.value, blocks] for blocks, path in
+                                     sorted(partners.get(file_index, []), reverse=True)]
+        elif not visited:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node.get("children", ()))
+            continue
+        else:
+            for key in ("tokens", "dup_tokens"):
+                metrics[key] = sum(child["metrics"][key] for child in node.get("children", ()))
+        metrics["duplicated"] = round(100 * metrics["dup_tokens"] / metrics["tokens"], 1) if metrics["tokens"] else 0
+    return index
+
+def strip_duplicates(root: dict):
+    """Removes the DUPLICATE_METRICS from all nodes of a dashboard tree."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for key in DUPLICATE_METRICS:
+            node["metrics"].pop(key, None)
+        stack.extend(node.get("children", ()))
@@ -0,0 +1,676 @@
+import os
+import re
+import mmap
+import zlib
+import struct
+import hashlib
+import logging
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from external_metrics import ReportPaths, ReportProvider, register_provider
+from profiler import get_profiler
+
+SYMBOLS_NAMESPACE = "symbols-v1"
+SYMBOL_METRICS = ("symbol_size", "code_size", "data_size")
+# Files of a build directory read as artifacts; anything else is skipped without being opened
+ARTIFACT_EXTENSIONS = (".o", ".obj", ".a")
+
+ELF_MAGIC = b"\x7fELF"
+ARCHIVE_MAGIC = b"!<arch>\n"
+
+_SHT_SYMTAB = 2
+_SHT_RELA = 4
+_SHT_NOBITS = 8
+_SHT_REL = 9
+_SHT_DYNSYM = 11
+_SHF_COMPRESSED = 0x800
+_ELFCOMPRESS_ZLIB = 1
+_SHN_UNDEF = 0
+_SHN_LORESERVE = 0xff00
+_SHN_COMMON = 0xfff2
+_SHN_XINDEX = 0xffff
+_CODE_TYPES = frozenset((2, 10))     # STT_FUNC, STT_GNU_IFUNC
+_DATA_TYPES = frozenset((1, 5, 6))   # STT_OBJECT, STT_COMMON, STT_TLS
+
+_DW_AT_NAME = 0x03
+_DW_AT_COMP_DIR = 0x1b
+_DW_AT_STR_OFFSETS_BASE = 0x72
+_DW_FORM_ADDR = 0x01
+_DW_FORM_STRING = 0x08
+_DW_FORM_REF_ADDR = 0x10
+_DW_FORM_INDIRECT = 0x16
+_DW_FORM_STRP = 0x0e
+_DW_FORM_LINE_STRP = 0x1f
+_DW_FORM_IMPLICIT_CONST = 0x21
+# Forms by encoded size in bytes
+_FIXED_FORMS = {0x0b: 1, 0x05: 2, 0x06: 4, 0x07: 8, 0x1e: 16, 0x0c: 1, 0x19: 0, 0x11: 1, 0x12: 2, 0x13: 4,
+                0x14: 8, 0x1c: 4, 0x20: 8, 0x21: 0, 0x24: 8, 0x25: 1, 0x26: 2, 0x27: 3, 0x28: 4, 0x29: 1,
+                0x2a: 2, 0x2b: 3, 0x2c: 4}
+# Section offsets: 4 bytes in 32-bit DWARF, 8 in 64-bit DWARF
+_OFFSET_FORMS = frozenset((0x0e, 0x17, 0x1d, 0x1f, 0x1f20, 0x1f21))
+_LEB_FORMS = frozenset((0x0d, 0x0f, 0x15, 0x1a, 0x1b, 0x22, 0x23, 0x1f01, 0x1f02))
+# Blocks by size of their length prefix; None is a ULEB128 length
+_BLOCK_FORMS = {0x0a: 1, 0x03: 2, 0x04: 4, 0x09: None, 0x18: None}
+_STRX_FORMS = frozenset((0x1a, 0x25, 0x26, 0x27, 0x28, 0x1f02))
+
+# GNU ld: " .text  0x0000000000401126  0x16 main.o", the section name may sit on a line of its own
+_GNU_INPUT = re.compile(r"^ (\S+)?\s+0x([0-9a-fA-F]+)\s+0x([0-9a-fA-F]+)\s+(\S.*?)\s*$")
+_GNU_NAME = re.compile(r"^ (\S+)\s*$")
+# lld: "  401126  401126  16  16  main.o:(.text)"
+_LLD_INPUT = re.compile(r"^\s*[0-9a-fA-F]+\s+[0-9a-fA-F]+\s+([0-9a-fA-F]+)\s+\d+\s+(\S.*):\((\S+)\)\s*$")
+_ARCHIVE_MEMBER = re.compile(r"^(.*)\(([^()]+)\)$")
+
+
+class _Section:
+    __slots__ = ("name", "type", "flags", "offset", "size", "link", "info", "entsize")
+
+    def __init__(self, name, type, flags, offset, size, link, info, entsize):
+        self.name = name
+        self.type = type
+        self.flags = flags
+        self.offset = offset
+        self.size = size
+        self.link = link
+        self.info = info
+        self.entsize = entsize
+
+class ElfImage:
+    """
+    The section headers of an ELF image at [base, base + size) of buf, a read-only mmap of
+    an object file or of a static library holding it. Sections are read in place through
+    struct.unpack_from and memoryview slices; only compressed debug sections are copied.
+    """
+
+    def __init__(self, buf, base: int = 0, size: Optional[int] = None):
+        self.buf = buf
+        self.base = base
+        self.end = base + (len(buf) - base if size is None else size)
+        ident = buf[base:base + 16]
+        if len(ident) < 16 or ident[:4] != ELF_MAGIC or ident[4] not in (1, 2) or ident[5] not in (1, 2):
+            raise ValueError("not an ELF image")
+        self.is64 = ident[4] == 2
+        self.order = "little" if ident[5] == 1 else "big"
+        self.endian = "<" if ident[5] == 1 else ">"
+        self.sections: List[_Section] = []
+        self.index: Dict[str, int] = {}
+        self._decompressed = {}
+
+        if self.is64:
+            shoff, = struct.unpack_from(self.endian + "Q", buf, base + 0x28)
+            shentsize, shnum, shstrndx = struct.unpack_from(self.endian + "HHH", buf, base + 0x3a)
+            header = self.endian + "IIQQQQIIQQ"
+        else:
+            shoff, = struct.unpack_from(self.endian + "I", buf, base + 0x20)
+            shentsize, shnum, shstrndx = struct.unpack_from(self.endian + "HHH", buf, base + 0x2e)
+            header = self.endian + "IIIIIIIIII"
+        if not shoff:
+            return
+        if shentsize < struct.calcsize(header):
+            raise ValueError("bad section header size")
+        # With 0xff00 sections or more, the count and the string table index move to section 0
+        first = struct.unpack_from(header, buf, base + shoff)
+        shnum = shnum or first[5]
+        if shstrndx == _SHN_XINDEX:
+            shstrndx = first[6]
+        if base + shoff + shnum * shentsize > self.end or shstrndx >= shnum:
+            raise ValueError("truncated section headers")
+        raw = [struct.unpack_from(header, buf, base + shoff + i * shentsize) for i in range(shnum)]
+        names = base + raw[shstrndx][4]
+        for name, kind, flags, _, offset, size, link, info, _, entsize in raw:
+            if kind != _SHT_NOBITS and base + offset + size > self.end:
+                raise ValueError("section beyond the end of the image")
+            section = _Section(self._cstring(buf, names + name, self.end), kind, flags, base + offset, size,
+                               link, info, entsize)
+            self.index.setdefault(section.name, len(self.sections))
+            self.sections.append(section)
+
+    @staticmethod
+    def _cstring(buf, start: int, end: int) -> str:
+        stop = buf.find(b"\0", start, end)
+        return bytes(buf[start:stop if stop >= 0 else end]).decode("utf-8", "replace")
+
+    def data(self, index: int) -> Tuple[object, int, int]:
+        """(buffer, start, end) of a section's contents; compressed sections are inflated once."""
+        section = self.sections[index]
+        if section.type == _SHT_NOBITS:
+            return b"", 0, 0
+        if not section.flags & _SHF_COMPRESSED:
+            return self.buf, section.offset, section.offset + section.size
+        if index not in self._decompressed:
+            fmt = self.endian + ("IIQQ" if self.is64 else "III")
+            if struct.unpack_from(fmt, self.buf, section.offset)[0] != _ELFCOMPRESS_ZLIB:
+                raise ValueError(f"unsupported compression of {section.name}")
+            start = section.offset + struct.calcsize(fmt)
+            self._decompressed[index] = zlib.decompress(self.buf[start:section.offset + section.size])
+        data = self._decompressed[index]
+        return data, 0, len(data)
+
+    def string(self, section_name: str, offset: int) -> Optional[str]:
+        index = self.index.get(section_name)
+        if index is None:
+            return None
+        buf, start, end = self.data(index)
+        if not 0 <= offset < end - start:
+            return None
+        return self._cstring(buf, start + offset, end)
+
+    def symbols(self, section: _Section) -> Iterator[Tuple[int, int, int, int, int]]:
+        """(name offset, st_info, section index, value, size) of each entry of a symbol table."""
+        fmt = self.endian + ("IBBHQQ" if self.is64 else "IIIBBH")
+        size = struct.calcsize(fmt)
+        if section.entsize not in (0, size):
+            raise ValueError("unexpected symbol entry size")
+        end = section.offset + section.size - section.size % size
+        entries = struct.iter_unpack(fmt, memoryview(self.buf)[section.offset:end])
+        if self.is64:
+            for name, info, _, shndx, value, symbol_size in entries:
+                yield name, info, shndx, value, symbol_size
+        else:
+            for name, value, symbol_size, info, _, shndx in entries:
+                yield name, info, shndx, value, symbol_size
+
+    def symbol_value(self, symtab: _Section, index: int) -> int:
+        fmt = self.endian + ("IBBHQQ" if self.is64 else "IIIBBH")
+        entry = struct.unpack_from(fmt, self.buf, symtab.offset + index * struct.calcsize(fmt))
+        return entry[4] if self.is64 else entry[1]
+
+    def relocations(self, target: int, offsets: Sequence[int]) -> Dict[int, Tuple[int, Optional[int]]]:
+        """
+        (symbol value, addend) of the relocations of section target at the given offsets;
+        the addend is None for REL entries, whose addend is the value stored in place.
+        Linked images have no relocations for their debug sections, so this is empty.
+        """
+        wanted = set(offsets)
+        found = {}
+        for section in self.sections:
+            if not wanted:
+                break
+            if section.type not in (_SHT_REL, _SHT_RELA) or section.info != target:
+                continue
+            rela = section.type == _SHT_RELA
+            fmt = self.endian + (("QQq" if rela else "QQ") if self.is64 else ("IIi" if rela else "II"))
+            shift = 32 if self.is64 else 8
+            size = struct.calcsize(fmt)
+            symtab = self.sections[section.link]
+            end = section.offset + section.size - section.size % size
+            # Assemblers emit relocations in offset order, so the first few are usually enough
+            for entry in struct.iter_unpack(fmt, memoryview(self.buf)[section.offset:end]):
+                if entry[0] in wanted:
+                    found[entry[0]] = (self.symbol_value(symtab, entry[1] >> shift), entry[2] if rela else None)
+                    wanted.discard(entry[0])
+                    if not wanted:
+                        break
+        return found
+
+def _relocated(raw: int, relocation: Optional[Tuple[int, Optional[int]]]) -> int:
+    if relocation is None:
+        return raw
+    value, addend = relocation
+    return value + (raw if addend is None else addend)
+
+def _uleb(buf, pos: int) -> Tuple[int, int]:
+    """(value, next position) of the ULEB128 at pos; also skips SLEB128 values, which have the same length."""
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _abbreviation(buf, pos: int, end: int, code: int) -> Optional[List[Tuple[int, int]]]:
+    """(attribute, form) pairs of abbreviation code in the table at pos of .debug_abbrev."""
+    while pos < end:
+        entry, pos = _uleb(buf, pos)
+        if entry == 0:
+            return None
+        _, pos = _uleb(buf, pos)
+        # DW_CHILDREN flag
+        pos += 1
+        attributes = []
+        while True:
+            attribute, pos = _uleb(buf, pos)
+            form, pos = _uleb(buf, pos)
+            if form == _DW_FORM_IMPLICIT_CONST:
+                _, pos = _uleb(buf, pos)
+            if attribute == 0 and form == 0:
+                break
+            attributes.append((attribute, form))
+        if entry == code:
+            return attributes
+    return None
+
+def compile_unit(image: ElfImage) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    (DW_AT_name, DW_AT_comp_dir) of the first compile unit in .debug_info (DWARF 2 to 5),
+    or None without debug info. Relocations are applied to the string offsets of relocatable
+    objects, whose .debug_info refers to .debug_str through them.
+    """
+    info_index = image.index.get(".debug_info")
+    abbrev_index = image.index.get(".debug_abbrev")
+    if info_index is None or abbrev_index is None:
+        return None
+    buf, start, end = image.data(info_index)
+    order = image.order
+
+    def uint(at: int, size: int) -> int:
+        return int.from_bytes(buf[at:at + size], order)
+
+    pos = start
+    offset_size = 4
+    if uint(pos, 4) == 0xffffffff:
+        offset_size = 8
+        pos += 8
+    pos += 4
+    version = uint(pos, 2)
+    pos += 2
+    if version >= 5:
+        unit_type = buf[pos]
+        address_size = buf[pos + 1]
+        abbrev_pos = pos + 2
+        pos = abbrev_pos + offset_size
+        # DW_UT_compile and DW_UT_partial; skeleton and split units carry an 8 byte id
+        if unit_type in (4, 5):
+            pos += 8
+        elif unit_type not in (1, 3):
+            return None
+    elif version >= 2:
+        abbrev_pos = pos
+        address_size = buf[pos + offset_size]
+        pos += offset_size + 1
+    else:
+        return None
+    abbrev_offset = _relocated(uint(abbrev_pos, offset_size),
+                               image.relocations(info_index, [abbrev_pos - start]).get(abbrev_pos - start))
+    code, pos = _uleb(buf, pos)
+    abbrev_buf, abbrev_start, abbrev_end = image.data(abbrev_index)
+    attributes = _abbreviation(abbrev_buf, abbrev_start + abbrev_offset, abbrev_end, code) if code else None
+    if attributes is None:
+        return None
+
+    # attribute -> (form, offset in .debug_info, raw value)
+    wanted = {}
+    for attribute, form in attributes:
+        while form == _DW_FORM_INDIRECT:
+            form, pos = _uleb(buf, pos)
+        at = pos
+        raw = None
+        if form in _FIXED_FORMS:
+            raw = uint(pos, _FIXED_FORMS[form])
+            pos += _FIXED_FORMS[form]
+        elif form in _OFFSET_FORMS:
+            raw = uint(pos, offset_size)
+            pos += offset_size
+        elif form in _LEB_FORMS:
+            raw, pos = _uleb(buf, pos)
+        elif form == _DW_FORM_ADDR:
+            pos += address_size
+        elif form == _DW_FORM_REF_ADDR:
+            pos += address_size if version == 2 else offset_size
+        elif form == _DW_FORM_STRING:
+            stop = buf.find(b"\0", pos, end)
+            if stop < 0:
+                return None
+            raw = bytes(buf[pos:stop]).decode("utf-8", "replace")
+            pos = stop + 1
+        elif form in _BLOCK_FORMS:
+            prefix = _BLOCK_FORMS[form]
+            if prefix is None:
+                length, pos = _uleb(buf, pos)
+            else:
+                length = uint(pos, prefix)
+                pos += prefix
+            pos += length
+        else:
+            return None
+        if pos > end:
+            return None
+        if attribute in (_DW_AT_NAME, _DW_AT_COMP_DIR, _DW_AT_STR_OFFSETS_BASE):
+            wanted[attribute] = (form, at - start, raw)
+
+    relocations = image.relocations(info_index, [at for form, at, _ in wanted.values() if form in _OFFSET_FORMS])
+    str_offsets_base = None
+    if _DW_AT_STR_OFFSETS_BASE in wanted:
+        _, at, raw = wanted[_DW_AT_STR_OFFSETS_BASE]
+        str_offsets_base = _relocated(raw, relocations.get(at))
+
+    def string(attribute: int) -> Optional[str]:
+        if attribute not in wanted:
+            return None
+        form, at, raw = wanted[attribute]
+        if form == _DW_FORM_STRING:
+            return raw
+        if form == _DW_FORM_STRP:
+            return image.string(".debug_str", _relocated(raw, relocations.get(at)))
+        if form == _DW_FORM_LINE_STRP:
+            return image.string(".debug_line_str", _relocated(raw, relocations.get(at)))
+        if form in _STRX_FORMS:
+            offsets_index = image.index.get(".debug_str_offsets")
+            if offsets_index is None:
+                return None
+            # Without DW_AT_str_offsets_base, the entries follow the 8 (16) byte table header
+            entry = (str_offsets_base if str_offsets_base is not None else 2 * offset_size) + raw * offset_size
+            offsets_buf, offsets_start, offsets_end = image.data(offsets_index)
+            if offsets_start + entry + offset_size > offsets_end:
+                return None
+            value = int.from_bytes(offsets_buf[offsets_start + entry:offsets_start + entry + offset_size], order)
+            return image.string(".debug_str", _relocated(value, image.relocations(offsets_index, [entry]).get(entry)))
+        return None
+
+    name = string(_DW_AT_NAME)
+    return (name, string(_DW_AT_COMP_DIR)) if name else None
+
+def object_sizes(image: ElfImage) -> Tuple[int, int]:
+    """
+    (code, data) bytes of the defined, sized symbols of an ELF image: functions are code,
+    objects, TLS and common symbols data. Aliases (several names for the same address) count
+    once. Images without .symtab fall back to their dynamic symbols.
+    """
+    tables = [section for section in image.sections if section.type == _SHT_SYMTAB] \
+        or [section for section in image.sections if section.type == _SHT_DYNSYM]
+    code = data = 0
+    for symtab in tables:
+        # (section, address) or, for common symbols, the name -> size; code sizes are negative
+        seen = {}
+        for name, info, shndx, value, size in image.symbols(symtab):
+            if not size or shndx == _SHN_UNDEF or (_SHN_LORESERVE <= shndx != _SHN_COMMON):
+                continue
+            kind = info & 0xf
+            if kind in _CODE_TYPES:
+                size = -size
+            elif kind not in _DATA_TYPES:
+                continue
+            key = ("common", name) if shndx == _SHN_COMMON else (shndx, value)
+            if abs(size) > abs(seen.get(key, 0)):
+                seen[key] = size
+        code -= sum(size for size in seen.values() if size < 0)
+        data += sum(size for size in seen.values() if size > 0)
+    return code, data
+
+def archive_members(buf, size: int) -> Iterator[Tuple[str, int, int]]:
+    """(name, offset, size) of the members of an ar archive (GNU and BSD long names)."""
+    pos = len(ARCHIVE_MAGIC)
+    long_names = b""
+    while pos + 60 <= size:
+        header = bytes(buf[pos:pos + 60])
+        if header[58:60] != b"`\n":
+            raise ValueError(f"bad archive member header at {pos}")
+        name = header[:16].decode("utf-8", "replace").rstrip(" ")
+        length = int(header[48:58].strip() or 0)
+        start = pos + 60
+        pos = start + length + (length & 1)
+        if name == "//":
+            long_names = bytes(buf[start:start + length])
+        elif name in ("/", "/SYM64/", "__.SYMDEF", "__.SYMDEF SORTED"):
+            continue
+        elif name.startswith("#1/"):
+            name_length = int(name[3:])
+            name = bytes(buf[start:start + name_length]).rstrip(b"\0").decode("utf-8", "replace")
+            yield name, start + name_length, length - name_length
+        elif name[:1] == "/" and name[1:].isdigit():
+            offset = int(name[1:])
+            stop = long_names.find(b"/\n", offset)
+            yield long_names[offset:stop if stop >= 0 else None].decode("utf-8", "replace"), start, length
+        else:
+            yield name.rstrip("/"), start, length
+
+def _artifact_objects(buf, size: int) -> List[list]:
+    """[member, code, data, source name, compile dir] of the ELF objects in an artifact."""
+    if buf[:len(ARCHIVE_MAGIC)] == ARCHIVE_MAGIC:
+        members = archive_members(buf, size)
+    elif buf[:4] == ELF_MAGIC:
+        members = [("", 0, size)]
+    else:
+        return []
+    objects = []
+    for member, start, length in members:
+        if buf[start:start + 4] != ELF_MAGIC:
+            continue
+        try:
+            image = ElfImage(buf, start, length)
+            code, data = object_sizes(image)
+            unit = compile_unit(image) or (None, None)
+        except (ValueError, IndexError, struct.error, zlib.error) as e:
+            logging.debug(f"Skipping malformed ELF object {member or '(file)'}: {e}")
+            continue
+        objects.append([member, code, data, unit[0], unit[1]])
+    return objects
+
+def read_artifact(path: str, cache=None) -> Tuple[List[list], bool]:
+    """
+    (objects, cache hit) of an object file or static library, read through a read-only
+    mmap (see _artifact_objects for the entries). Results are cached by path, mtime and size,
+    so artifacts the build did not touch are not opened again.
+    """
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    key = hashlib.sha1(f"{path}\0{st.st_mtime_ns}\0{st.st_size}".encode("utf-8", "surrogateescape")).hexdigest()
+    if cache is not None:
+        entry = cache.get(key, SYMBOLS_NAMESPACE)
+        if entry is not None:
+            return entry["objects"], True
+    objects = []
+    if st.st_size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            objects = _artifact_objects(buf, len(buf))
+    if cache is not None:
+        cache.put(key, {"objects": objects}, SYMBOLS_NAMESPACE)
+    return objects, False
+
+def _artifact_chunk(paths: list, cache=None) -> list:
+    """Process pool task: read_artifact of a chunk of artifacts; unreadable ones have no objects."""
+    results = []
+    for path in paths:
+        try:
+            results.append(read_artifact(path, cache))
+        except OSError as e:
+            logging.debug(f"Skipping unreadable artifact {path}: {e}")
+            results.append(([], False))
+    return results
+
+def find_artifacts(build_dir: str) -> List[str]:
+    """Object files and static libraries below build_dir, in a stable order."""
+    found = []
+    for root, dirs, files in os.walk(build_dir):
+        dirs.sort()
+        found.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(ARTIFACT_EXTENSIONS))
+    return found
+
+def ingest_artifacts(paths: Sequence[str], cache=None, jobs: int = 1,
+                     chunk_size: int = 16) -> Dict[Tuple[str, str], list]:
+    """
+    The objects of all artifacts, keyed by (real path of the artifact, archive member or ""),
+    as [code, data, source name, compile dir]; artifacts are read on jobs processes.
+    """
+    paths = list(dict.fromkeys(os.path.realpath(path) for path in paths))
+    chunks = [paths[start:start + chunk_size] for start in range(0, len(paths), chunk_size)]
+    task = functools.partial(_artifact_chunk, cache=cache)
+    objects = {}
+    hits = 0
+    with get_profiler().stage("symbols"):
+        if jobs > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as processes:
+                results = [result for chunk_results in processes.map(task, chunks) for result in chunk_results]
+        else:
+            results = [result for chunk in chunks for result in task(chunk)]
+    for path, (artifact_objects, hit) in zip(paths, results):
+        hits += hit
+        if cache is not None:
+            cache.record(hit)
+        for member, code, data, name, comp_dir in artifact_objects:
+            objects[(path, member)] = [code, data, name, comp_dir]
+    logging.info(f"Symbols: {len(objects)} objects in {len(paths)} artifacts"
+                 + (f" ({hits} cached)" if cache is not None else ""))
+    return objects
+
+def _map_section_kind(name: str) -> Optional[str]:
+    if name.startswith(".text") or name in (".init", ".fini"):
+        return "code"
+    if name == "COMMON" or name.startswith((".data", ".rodata", ".bss", ".tdata", ".tbss", ".sdata", ".sbss")):
+        return "data"
+    return None
+
+def parse_link_map(map_path: str) -> Dict[str, List[int]]:
+    """
+    [code, data] bytes per input object of a GNU ld or lld map file (-Wl,-Map=FILE), summed
+    over the input sections the linker placed; discarded sections are not listed there.
+    Objects are named as in the map: "dir/file.o" or "lib.a(member.o)".
+    """
+    sizes: Dict[str, List[int]] = {}
+
+    def add(section: str, size: int, obj: str):
+        kind = _map_section_kind(section)
+        if kind is not None and size:
+            entry = sizes.setdefault(obj, [0, 0])
+            entry[0 if kind == "code" else 1] += size
+
+    in_memory_map = False
+    pending = None
+    with open(map_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            match = _LLD_INPUT.match(line)
+            if match:
+                add(match.group(3), int(match.group(1), 16), match.group(2))
+                continue
+            if not in_memory_map:
+                # GNU ld lists discarded input sections before the memory map
+                in_memory_map = line.startswith("Linker script and memory map")
+                continue
+            match = _GNU_INPUT.match(line)
+            if match and (match.group(1) or pending):
+                add(match.group(1) or pending, int(match.group(3), 16), match.group(4))
+                pending = None
+                continue
+            match = _GNU_NAME.match(line)
+            pending = match.group(1) if match else None
+    return sizes
+
+def object_source(object_path: str) -> Optional[str]:
+    """
+    The source path an object was compiled from, from its name alone: CMake names objects
+    <build dir>/CMakeFiles/<target>.dir/<source path relative to the source dir>.o.
+    """
+    path = object_path.replace("\\", "/")
+    marker = path.rfind("/CMakeFiles/")
+    stem, extension = os.path.splitext(path)
+    if marker < 0 or extension not in (".o", ".obj") or not os.path.splitext(stem)[1]:
+        return None
+    target_dir = stem.find("/", marker + len("/CMakeFiles/"))
+    return stem[target_dir + 1:] if target_dir >= 0 else None
+
+class SymbolSizeProvider(ReportProvider):
+    """
+    symbol_size (code_size + data_size) per source file from the ELF objects and static
+    libraries of a build. load() takes build directories (scanned for ARTIFACT_EXTENSIONS),
+    single artifacts or linker map files; finish() reads the artifacts on jobs processes.
+    Without a map, sizes are those of the defined symbols of each object, so inline
+    functions count in every object that emitted them. With a map, they are the input
+    sections the linker kept. Objects are attributed to the source of their first DWARF
+    compile unit, or without debug info to the source CMake named them after.
+    """
+    name = "elf"
+
+    def __init__(self, paths: ReportPaths, cache=None, jobs: int = 1):
+        super().__init__(paths, cache, jobs)
+        self.artifacts: List[str] = []
+        self.maps: List[str] = []
+        self.build_dirs: List[str] = []
+        self.unattributed = 0
+
+    def load(self, report_path: str):
+        if os.path.isdir(report_path):
+            self.build_dirs.append(os.path.abspath(report_path))
+            self.artifacts.extend(find_artifacts(report_path))
+            return
+        with open(report_path, "rb") as f:
+            magic = f.read(len(ARCHIVE_MAGIC))
+        if magic == ARCHIVE_MAGIC or magic[:4] == ELF_MAGIC:
+            self.artifacts.append(report_path)
+        else:
+            self.maps.append(report_path)
+
+    def finish(self):
+        objects = ingest_artifacts(self.artifacts, cache=self.cache, jobs=self.jobs)
+        if self.maps:
+            by_name = {}
+            for key in objects:
+                by_name.setdefault(os.path.basename(key[1] or key[0]), []).append(key)
+            for map_path in self.maps:
+                bases = [os.path.dirname(os.path.abspath(map_path))] + self.build_dirs
+                for obj, (code, data) in parse_link_map(map_path).items():
+                    key = self._map_object(obj, bases, objects, by_name)
+                    unit = objects.get(key) if key else None
+                    self._add(unit, (key[1] or key[0]) if key else obj, code, data)
+        else:
+            # Objects of static libraries are usually also in the build tree as loose objects
+            seen = set()
+            for (path, member), unit in objects.items():
+                self._add(unit, member or path, unit[0], unit[1], seen)
+        if self.unattributed:
+            logging.info(f"Symbols: {self.unattributed} objects without a known source file")
+        self.artifacts = []
+
+    @staticmethod
+    def _map_object(obj: str, bases: Sequence[str], objects: dict, by_name: dict) -> Optional[Tuple[str, str]]:
+        """
+        The objects key of an object named in a map. Relative names are relative to the
+        directory the linker ran in, so they are looked up under the map's and the build
+        directories, then matched as a path suffix of the ingested objects.
+        """
+        match = _ARCHIVE_MEMBER.match(obj)
+        path, member = (match.group(1), match.group(2)) if match else (obj, "")
+        candidates = [path] if os.path.isabs(path) else [os.path.join(base, path) for base in bases]
+        for candidate in candidates:
+            key = (os.path.realpath(candidate), member)
+            if key in objects:
+                return key
+        # Leading ../ components are not part of the suffix; other leading dots are
+        path = os.path.normpath(path)
+        while path.startswith(os.pardir + os.sep):
+            path = path[len(os.pardir + os.sep):]
+        suffix = os.sep + path
+        for key in by_name.get(os.path.basename(member or path), ()):
+            if key[1] == member and key[0].endswith(suffix):
+                return key
+        return None
+
+    def _add(self, unit: Optional[list], object_name: str, code: int, data: int, seen: Optional[set] = None):
+        if unit is not None and unit[2]:
+            rel_path = self._resolve(unit[2], [unit[3]] if unit[3] else [])
+        else:
+            source = object_source(object_name)
+            if source is None:
+                self.unattributed += 1
+                return
+            rel_path = self._resolve(source)
+        if rel_path is None:
+            return
+        if seen is not None:
+            key = (rel_path, os.path.basename(object_name), code, data)
+            if key in seen:
+                return
+            seen.add(key)
+        entry = self.index.setdefault(rel_path, {key: 0 for key in SYMBOL_METRICS})
+        entry["symbol_size"] += code + data
+        entry["code_size"] += code
+        entry["data_size"] += data
+
+    def symbol_size(self, path: str) -> int:
+        """Bytes attributed to a file, by absolute or repository-relative path."""
+        rel_path = self.paths.resolve(path)
+        return self.index.get(rel_path, {}).get("symbol_size", 0) if rel_path is not None else 0
+
+register_provider(SymbolSizeProvider)
+
+def load_symbol_sizes(repo_root: str, artifacts: Sequence[str], base_dir: Optional[str] = None,
+                      cache=None, jobs: int = 1) -> SymbolSizeProvider:
+    """A finished SymbolSizeProvider over build directories, artifacts and map files."""
+    provider = SymbolSizeProvider(ReportPaths(repo_root, base_dir), cache=cache, jobs=jobs)
+    for path in artifacts:
+        provider.load(path)
+    provider.finish()
+    return provider
@@ -1,3 +1,15 @@
+import os
+import json
+import logging
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+import xml.etree.ElementTree as ElementTree
+from typing import Iterator, List, Optional, Sequence, Tuple
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 def get_critical_misra_violations(file_path: str) -> int:
     """Placeholder for external MISRA check."""
     return 0
@@ -14,9 +26,13 @@ def get_heap_usage(file_path: str) -> int:
     """Placeholder for heap usage analysis (bytes)."""
     return 0
 
-def get_symbol_sizes(file_path: str) -> int:
-    """Placeholder for symbol size analysis (bytes)."""
-    return 0
+def get_symbol_sizes(file_path: str, symbols=None) -> int:
+    """
+    Code and data bytes attributed to a file by the build artifacts indexed in symbols (an
+    elf_symbols.SymbolSizeProvider), 0 without one. get_all_external_metrics passes none, so
+    cached metrics only depend on file content; the sizes are overlaid as an "elf" report.
+    """
+    return symbols.symbol_size(file_path) if symbols is not None else 0
 
 def get_all_external_metrics(file_path: str) -> dict:
     """Collects all external metrics for a file."""
@@ -27,3 +43,310 @@ def get_all_external_metrics(file_path: str) -> dict:
         "heap_usage": get_heap_usage(file_path),
         "symbol_size": get_symbol_sizes(file_path)
     }
+
+
+class ReportPaths:
+    """
+    Maps file paths found in reports to repository rel_paths (os.sep separated, as in the
+    file records). Accepts absolute paths, file:// URIs, Windows separators and paths relative
+    to base_dir (default: the repository root) or to a report-specific base. Paths outside the
+    repository resolve to None. Results are cached, so each distinct path is resolved once.
+    """
+
+    def __init__(self, repo_root: str, base_dir: Optional[str] = None):
+        self.repo_root = os.path.realpath(repo_root)
+        self.base_dir = os.path.abspath(base_dir or repo_root)
+        self._cache = {}
+
+    def resolve(self, path: str, bases: Sequence[str] = ()) -> Optional[str]:
+        """
+        Resolves path against the first of bases (then base_dir) under which it exists;
+        with a single candidate the file does not have to exist.
+        """
+        key = (path, tuple(bases))
+        if key not in self._cache:
+            self._cache[key] = self._resolve(path, bases)
+        return self._cache[key]
+
+    def _resolve(self, path: str, bases: Sequence[str]) -> Optional[str]:
+        if path.startswith('file:'):
+            path = url2pathname(unquote(urlparse(path).path))
+        path = path.replace('\\', '/')
+        if os.path.isabs(path):
+            candidates = [path]
+        else:
+            candidates = [os.path.join(base, path) for base in list(bases) + [self.base_dir]]
+        resolved = None
+        for candidate in candidates:
+            rel_path = os.path.relpath(os.path.realpath(candidate), self.repo_root)
+            if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+                continue
+            if len(candidates) == 1 or os.path.isfile(candidate):
+                return rel_path
+            resolved = resolved or rel_path
+        return resolved
+
+class ReportProvider:
+    """
+    Base class of external report providers. A provider reads each report once with a
+    streaming parser and keeps a rel_path keyed index, so per-file lookups are O(1).
+    Subclasses set name and implement load(); metrics(rel_path) returns the entries of
+    get_all_external_metrics the provider knows for that file. Providers that read many
+    inputs may use the analysis cache and jobs processes.
+    """
+    name = ""
+
+    def __init__(self, paths: ReportPaths, cache=None, jobs: int = 1):
+        self.paths = paths
+        self.cache = cache
+        self.jobs = jobs
+        self.index = {}
+        self.skipped = 0
+
+    def load(self, report_path: str):
+        raise NotImplementedError
+
+    def finish(self):
+        """Called once after all reports are loaded."""
+
+    def metrics(self, rel_path: str) -> dict:
+        return self.index.get(rel_path, {})
+
+    def _resolve(self, path: str, bases: Sequence[str] = ()) -> Optional[str]:
+        rel_path = self.paths.resolve(path, bases)
+        if rel_path is None:
+            self.skipped += 1
+        return rel_path
+
+# A hit count is non-zero iff it starts with one of these ("0", "0.0", "-1" and "-" are not hits)
+_NONZERO_DIGITS = frozenset('123456789')
+
+class LineCoverageProvider(ReportProvider):
+    """
+    Coverage from per-line hit counts. Lines are kept in one bytearray per file
+    (1 = instrumented, 2 = hit), so several reports of the same file are merged as the union
+    of their covered lines, like lcov --add-tracefile does.
+    """
+
+    def __init__(self, paths: ReportPaths, cache=None, jobs: int = 1):
+        super().__init__(paths, cache, jobs)
+        self._lines = {}
+
+    def _file_lines(self, rel_path: str) -> bytearray:
+        lines = self._lines.get(rel_path)
+        if lines is None:
+            lines = self._lines[rel_path] = bytearray()
+        return lines
+
+    @staticmethod
+    def _add_line(lines: bytearray, line: int, hit: bool):
+        if line >= len(lines):
+            lines.extend(bytes(line + 1 - len(lines)))
+        if hit:
+            lines[line] = 2
+        elif not lines[line]:
+            lines[line] = 1
+
+    def finish(self):
+        for rel_path, lines in self._lines.items():
+            hit = lines.count(2)
+            found = hit + lines.count(1)
+            self.index[rel_path] = {"coverage": round(100.0 * hit / found, 2) if found else 0.0}
+        self._lines = {}
+
+class LcovProvider(LineCoverageProvider):
+    """lcov tracefiles (geninfo/llvm-cov export -format=lcov), read line by line."""
+    name = "lcov"
+
+    def load(self, report_path: str):
+        # DA lines are the bulk of a tracefile, so _add_line is inlined here
+        lines = None
+        with open(report_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('DA:'):
+                    if lines is not None:
+                        comma = line.index(',', 3)
+                        number = int(line[3:comma])
+                        if number >= len(lines):
+                            lines.extend(bytes(number + 1 - len(lines)))
+                        if line[comma + 1] in _NONZERO_DIGITS:
+                            lines[number] = 2
+                        elif not lines[number]:
+                            lines[number] = 1
+                elif line.startswith('SF:'):
+                    rel_path = self._resolve(line[3:].rstrip('\r\n'))
+                    lines = self._file_lines(rel_path) if rel_path is not None else None
+                elif line.startswith('end_of_record'):
+                    lines = None
+
+class CoberturaProvider(LineCoverageProvider):
+    """
+    Cobertura XML (gcovr --xml, coverage.py, OpenCppCoverage), parsed with iterparse;
+    <class> elements are dropped once read, so memory does not grow with the report.
+    Class filenames are relative to one of the <source> directories.
+    """
+    name = "cobertura"
+
+    def load(self, report_path: str):
+        sources = []
+        tags = []
+        elements = []
+        lines = None
+        for event, elem in ElementTree.iterparse(report_path, events=('start', 'end')):
+            if event == 'start':
+                tags.append(elem.tag)
+                elements.append(elem)
+                if elem.tag == 'class':
+                    rel_path = self._resolve(elem.get('filename', ''), sources)
+                    lines = self._file_lines(rel_path) if rel_path is not None else None
+                continue
+            tags.pop()
+            elements.pop()
+            if elem.tag == 'source' and elem.text:
+                sources.append(os.path.join(os.path.dirname(os.path.abspath(report_path)), elem.text.strip()))
+            elif elem.tag == 'line' and lines is not None and tags[-2:] == ['class', 'lines']:
+                # Lines under <methods> repeat the class lines
+                self._add_line(lines, int(elem.get('number')), elem.get('hits', '0')[:1] in _NONZERO_DIGITS)
+            elif elem.tag == 'class':
+                lines = None
+                elem.clear()
+                if elements:
+                    elements[-1].remove(elem)
+
+class SarifProvider(ReportProvider):
+    """
+    MISRA findings from SARIF logs (cppcheck --output-format=sarif, clang-tidy, Helix QAC ...).
+    Results with level "error" count as critical and "warning" (the SARIF default) as medium.
+    Streamed with ijson when installed, otherwise read with json.load.
+    """
+    name = "sarif"
+    LEVELS = {"error": "misra_critical", "warning": "misra_medium"}
+
+    def load(self, report_path: str):
+        # Findings per (run, uriBaseId, uri); base ids are resolved once the run is read
+        counts = {}
+        bases = {}
+        for run, kind, value in _iter_sarif(report_path):
+            if kind == 'bases':
+                bases[run] = value
+                continue
+            key = self.LEVELS.get(value.get('level', 'warning'))
+            location = _sarif_location(value)
+            if key is None or location is None:
+                continue
+            counts.setdefault((run,) + location, {"misra_critical": 0, "misra_medium": 0})[key] += 1
+
+        for (run, base_id, uri), found in counts.items():
+            base_uri = _sarif_base_uri(bases.get(run, {}), base_id)
+            # Artifact locations are URI references; file:// URIs are decoded by ReportPaths
+            path = uri if uri.startswith('file:') else unquote(uri)
+            if base_uri is not None:
+                rel_path = self._resolve(path, [url2pathname(unquote(urlparse(base_uri).path))])
+            else:
+                rel_path = self._resolve(path)
+            if rel_path is None:
+                continue
+            entry = self.index.setdefault(rel_path, {"misra_critical": 0, "misra_medium": 0})
+            entry["misra_critical"] += found["misra_critical"]
+            entry["misra_medium"] += found["misra_medium"]
+
+def _sarif_location(result: dict) -> Optional[Tuple[Optional[str], str]]:
+    locations = result.get('locations') or []
+    if not locations:
+        return None
+    artifact = (locations[0].get('physicalLocation') or {}).get('artifactLocation') or {}
+    if 'uri' not in artifact:
+        return None
+    return artifact.get('uriBaseId'), artifact['uri']
+
+def _sarif_base_uri(bases: dict, base_id: Optional[str]) -> Optional[str]:
+    """Follows a chain of originalUriBaseIds entries to an absolute URI."""
+    uri = ''
+    seen = set()
+    while base_id is not None and base_id in bases and base_id not in seen:
+        seen.add(base_id)
+        entry = bases[base_id]
+        uri = entry.get('uri', '') + uri
+        base_id = entry.get('uriBaseId')
+    return uri or None
+
+def _iter_sarif(report_path: str) -> Iterator[Tuple[int, str, dict]]:
+    """Yields (run index, 'bases' or 'result', object) for a SARIF log."""
+    if ijson is None:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            log = json.load(f)
+        for run_index, run in enumerate(log.get('runs') or []):
+            yield run_index, 'bases', run.get('originalUriBaseIds') or {}
+            for result in run.get('results') or []:
+                yield run_index, 'result', result
+        return
+
+    wanted = {'runs.item.originalUriBaseIds': 'bases', 'runs.item.results.item': 'result'}
+    run_index = -1
+    builder = None
+    with open(report_path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f):
+            if builder is not None:
+                builder.event(event, value)
+                depth += {'start_map': 1, 'start_array': 1, 'end_map': -1, 'end_array': -1}.get(event, 0)
+                if depth == 0:
+                    yield run_index, kind, builder.value
+                    builder = None
+            elif prefix == 'runs.item' and event == 'start_map':
+                run_index += 1
+            elif prefix in wanted and event == 'start_map':
+                kind = wanted[prefix]
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                depth = 1
+
+# Built-in providers by report format; register_provider adds more
+PROVIDERS = {provider.name: provider for provider in (LcovProvider, CoberturaProvider, SarifProvider)}
+
+def register_provider(provider_class: type):
+    """Makes a ReportProvider subclass available under its name."""
+    PROVIDERS[provider_class.name] = provider_class
+
+class ExternalMetricsIndex:
+    """
+    External metrics loaded from tool reports, overlaid on get_all_external_metrics per file.
+    Reports are loaded once up front; providers that report the same metric for a file are
+    applied in load order, so the last one wins.
+    """
+
+    def __init__(self, repo_root: str, base_dir: Optional[str] = None, cache=None, jobs: int = 1):
+        self.paths = ReportPaths(repo_root, base_dir)
+        self.cache = cache
+        self.jobs = jobs
+        self.providers = {}
+
+    def load(self, report_format: str, report_path: str):
+        provider = self.providers.get(report_format)
+        if provider is None:
+            if report_format not in PROVIDERS:
+                raise ValueError(f"Unknown report format: {report_format}")
+            provider = self.providers[report_format] = PROVIDERS[report_format](self.paths, cache=self.cache, jobs=self.jobs)
+        provider.load(report_path)
+
+    def finish(self):
+        for name, provider in self.providers.items():
+            provider.finish()
+            logging.info(f"{name}: metrics for {len(provider.index)} files"
+                         + (f", {provider.skipped} paths outside the repository" if provider.skipped else ""))
+
+    def overlay(self, rel_path: str, metrics: dict) -> dict:
+        """Returns metrics updated with the report values for rel_path."""
+        result = dict(metrics)
+        for provider in self.providers.values():
+            result.update(provider.metrics(rel_path))
+        return result
+
+def load_external_reports(repo_root: str, reports: List[Tuple[str, str]], base_dir: Optional[str] = None,
+                          cache=None, jobs: int = 1) -> ExternalMetricsIndex:
+    """Loads (format, path) reports into an ExternalMetricsIndex."""
+    index = ExternalMetricsIndex(repo_root, base_dir, cache=cache, jobs=jobs)
+    for report_format, report_path in reports:
+        logging.info(f"Loading {report_format} report {report_path}...")
+        index.load(report_format, report_path)
+    index.finish()
+    return index
@@ -0,0 +1,509 @@
+import os
+import math
+import operator
+import itertools
+import collections
+from typing import Dict, Iterable, List, Optional, Tuple
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# How folder metrics are rolled up from their direct children
+SUM_METRICS = ("loc", "comment_loc", "size", "classes", "includes", "included_by", "misra_crit", "misra_med",
+               "symbol_size", "code_size", "data_size")
+# Rebuild impact of a folder is that of its most included file
+MAX_METRICS = ("included_by_transitive", "rebuild_tus")
+# Plain average over the direct children; a subfolder counts as one child
+MEAN_METRICS = ("staleness", "coverage")
+# LOC-weighted average over all files below: weighted metric -> file metric
+WEIGHTED_METRICS = {"staleness_weighted": "staleness", "coverage_weighted": "coverage"}
+# Percentiles over all files below: metric -> (file metric, percentile)
+PERCENTILE_METRICS = {"staleness_p50": ("staleness", 50), "staleness_p90": ("staleness", 90)}
+
+MIXED_OWNER = "Mixed"
+NO_OWNER = "Unassigned"
+# Line ownership from git blame, present only when blame was collected
+BLAME_METRICS = ("blame_owner", "blame_share", "blame_authors")
+# Authors listed per folder in blame_authors; files list all of theirs
+BLAME_TOP_AUTHORS = 5
+
+def empty_folder_metrics() -> dict:
+    return {
+        "loc": 0, "comment_loc": 0, "size": 0, "classes": 0, "includes": 0, "included_by": 0,
+        "included_by_transitive": 0, "rebuild_tus": 0,
+        "misra_crit": 0, "misra_med": 0, "symbol_size": 0, "code_size": 0, "data_size": 0,
+        "staleness": 0, # Avg?
+        "coverage": 0.0, # Avg?
+        "staleness_weighted": 0, "coverage_weighted": 0.0, "staleness_p50": 0, "staleness_p90": 0
+    }
+
+def weighted_value(metrics: dict, key: str):
+    """The LOC-weighted value of a child: its own metric for files, the rolled up one for folders."""
+    return metrics.get(key, metrics.get(WEIGHTED_METRICS[key], 0))
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear interpolation between the closest ranks (numpy.percentile's default)."""
+    pos = (len(sorted_values) - 1) * q / 100
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def percentile_metrics(values: Dict[str, Iterable[float]], presorted: bool = False) -> dict:
+    """
+    PERCENTILE_METRICS from the values of all files below a folder, per file metric; with
+    presorted, the values are sorted lists and are used as they are.
+    """
+    result = {}
+    for key, (metric, q) in PERCENTILE_METRICS.items():
+        ordered = values.get(metric, ()) if presorted else sorted(values.get(metric, ()))
+        result[key] = round(percentile(ordered, q), 2) if ordered else 0
+    return result
+
+def blame_metrics(counts: Dict[str, int], top: Optional[int] = None) -> dict:
+    """
+    Line ownership from surviving lines per author (git_analyzer.BlameIndex): blame_owner is
+    the author of most lines, blame_share their percentage of all lines and blame_authors the
+    [author, lines] pairs by lines, the first top of them if given.
+    """
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    total = sum(counts.values())
+    return {
+        "blame_owner": ranked[0][0] if ranked else NO_OWNER,
+        "blame_share": round(100 * ranked[0][1] / total, 1) if total else 0,
+        "blame_authors": [[author, lines] for author, lines in (ranked[:top] if top is not None else ranked)],
+    }
+
+def blame_counts(metrics: dict) -> Dict[str, int]:
+    """Surviving lines per author of a file node's metrics (empty without blame)."""
+    return dict(metrics.get("blame_authors", ()))
+
+def merge_blame_counts(total: Dict[str, int], counts: Dict[str, int]):
+    for author, lines in counts.items():
+        total[author] = total.get(author, 0) + lines
+
+class FolderTree:
+    """
+    The dashboard folder tree as flat arrays: node i has parent[i] (-1 for the root), depth[i],
+    name[i] and path[i]; folders are created before anything below them, so a parent always
+    has a smaller index than its children. File nodes are kept as given, folder metrics are
+    columns rolled up bottom-up without recursion: the files into their folders in one pass,
+    then the folders one depth level at a time (NumPy segment sums when available).
+    """
+
+    def __init__(self, repo_root: str):
+        self.repo_root = repo_root
+        self.parent = [-1]
+        self.depth = [0]
+        self.name = ["Root"]
+        self.path = ["."]
+        self.full_path = [repo_root]
+        # File node dicts by index; folders have no entry
+        self.files = {}
+        self.folder_indexes = [0]
+        self._folders = {".": 0}
+        # Records usually arrive folder by folder
+        self._last_folder = (".", 0)
+
+    def __len__(self):
+        return len(self.parent)
+
+    def _add_node(self, parent: int, name: str, path: str, full_path: str) -> int:
+        self.parent.append(parent)
+        self.depth.append(self.depth[parent] + 1)
+        self.name.append(name)
+        self.path.append(path)
+        self.full_path.append(full_path)
+        return len(self.parent) - 1
+
+    def _folder(self, path: str) -> int:
+        """Index of the folder at path, created with its missing ancestors (top-down)."""
+        index = self._folders.get(path)
+        if index is not None:
+            return index
+        missing = []
+        while path not in self._folders:
+            missing.append(path)
+            path = path.rpartition(os.sep)[0] or "."
+        index = self._folders[path]
+        for path in reversed(missing):
+            name = path.rpartition(os.sep)[2]
+            index = self._folders[path] = self._add_node(index, name, path, os.path.join(self.full_path[index], name))
+            self.folder_indexes.append(index)
+        return index
+
+    def add_file(self, node: dict):
+        """Adds a file node (metrics_collector.build_file_node), creating its folders."""
+        parent_path = node["path"].rpartition(os.sep)[0] or "."
+        if parent_path == self._last_folder[0]:
+            parent = self._last_folder[1]
+        else:
+            parent = self._folder(parent_path)
+            self._last_folder = (parent_path, parent)
+        index = self._add_node(parent, node["name"], node["path"], node["full_path"])
+        self.files[index] = node
+
+    def add_files(self, nodes: Iterable[dict]):
+        """
+        add_file for many file nodes: only their folders are looked up one by one, the node
+        columns are appended in bulk after all folders exist (so files follow the folders).
+        """
+        nodes = list(nodes)
+        parents = []
+        last_path, last = self._last_folder
+        for node in nodes:
+            parent_path = node["path"].rpartition(os.sep)[0] or "."
+            if parent_path != last_path:
+                last_path, last = parent_path, self._folder(parent_path)
+            parents.append(last)
+        self._last_folder = (last_path, last)
+        start = len(self.parent)
+        depth = self.depth
+        depth.extend([depth[p] + 1 for p in parents])
+        self.parent.extend(parents)
+        self.name.extend(map(operator.itemgetter("name"), nodes))
+        self.path.extend(map(operator.itemgetter("path"), nodes))
+        self.full_path.extend(map(operator.itemgetter("full_path"), nodes))
+        self.files.update(zip(range(start, start + len(nodes)), nodes))
+
+    def rollup(self) -> List[Optional[dict]]:
+        """Folder metrics by node index (None for files)."""
+        indexes, values = self._file_values()
+        if numpy is not None:
+            folder_columns = self._rollup_numpy(indexes, values)
+        else:
+            folder_columns = self._rollup_python(indexes, values)
+        percentiles = self._percentiles(indexes, values)
+        blame = self._blame()
+
+        metrics = [None] * len(self)
+        for i in self.folder_indexes:
+            row = empty_folder_metrics()
+            if folder_columns["count"][i]:
+                for key in SUM_METRICS + MAX_METRICS:
+                    row[key] = int(folder_columns[key][i])
+                for key in MEAN_METRICS + tuple(WEIGHTED_METRICS):
+                    row[key] = folder_columns[key][i]
+                for key in PERCENTILE_METRICS:
+                    row[key] = percentiles[key][i]
+            row["owner"] = folder_columns["owner"][i]
+            if i in blame:
+                row.update(blame_metrics(blame[i], BLAME_TOP_AUTHORS))
+            metrics[i] = row
+        return metrics
+
+    def to_nested(self) -> dict:
+        """
+        The nested dashboard tree: folders before files, each sorted by name, folder metrics
+        from rollup(). Same structure as metrics_collector.aggregate_metrics_for_dashboard.
+        """
+        metrics = self.rollup()
+        parent = self.parent
+        nodes = [None] * len(self)
+        subfolders = [None] * len(self)
+        files = [None] * len(self)
+        for i in self.folder_indexes:
+            nodes[i] = {"name": self.name[i], "type": "folder", "path": self.path[i],
+                        "full_path": self.full_path[i], "children": [], "metrics": metrics[i]}
+            subfolders[i] = []
+            files[i] = []
+        for i in self.folder_indexes[1:]:
+            subfolders[parent[i]].append(nodes[i])
+        # Appends every file node to its folder's list in one C-level pass
+        collections.deque(map(list.append, map(files.__getitem__, map(parent.__getitem__, self.files)),
+                              self.files.values()), maxlen=0)
+        by_name = operator.itemgetter("name")
+        for i in self.folder_indexes:
+            nodes[i]["children"] = sorted(subfolders[i], key=by_name) + sorted(files[i], key=by_name)
+        return nodes[0]
+
+    def _file_values(self) -> Tuple[List[int], Dict[str, list]]:
+        """File node indexes and, per metric (and owner), the files' values in the same order."""
+        # Column by column: per-file row tuples would be tracked by the garbage collector
+        file_metrics = [node["metrics"] for node in self.files.values()]
+        values = {}
+        for key in SUM_METRICS + MAX_METRICS + MEAN_METRICS + ("owner",):
+            default = None if key == "owner" else 0
+            try:
+                # Metrics every file has (the usual case) are gathered without a Python loop
+                values[key] = list(map(operator.itemgetter(key), file_metrics))
+            except KeyError:
+                values[key] = [m.get(key, default) for m in file_metrics]
+        return list(self.files), values
+
+    def _folder_levels(self) -> List[List[int]]:
+        """Folder indexes by depth, in index order."""
+        levels = [[] for _ in range(max(self.depth) + 1)]
+        depth = self.depth
+        for i in self.folder_indexes:
+            levels[depth[i]].append(i)
+        return levels
+
+    def _rollup_python(self, indexes: List[int], values: Dict[str, list]) -> dict:
+        n = len(self)
+        parent = self.parent
+        sums = {key: [0] * n for key in SUM_METRICS + MAX_METRICS}
+        # Sums over a folder's files, and separately over its subfolders, until the folder is
+        # complete; then its rolled up value. Both paths add up in this order, so float results
+        # match _rollup_numpy exactly.
+        means = {key: [0] * n for key in MEAN_METRICS}
+        weighted = {key: [0] * n for key in WEIGHTED_METRICS}
+        plain = {key: [0] * n for key in WEIGHTED_METRICS}
+        folder_means = {key: [0] * n for key in MEAN_METRICS}
+        folder_weighted = {key: [0] * n for key in WEIGHTED_METRICS}
+        folder_plain = {key: [0] * n for key in WEIGHTED_METRICS}
+        count = [0] * n
+        owner_sets = [None] * n
+        owners = [None] * n
+
+        # Files: sorted by parent, the files of each folder are one run, so every metric is
+        # gathered in one C-level map and reduced per folder with sum/max
+        file_parents = list(map(parent.__getitem__, indexes))
+        order = sorted(range(len(indexes)), key=file_parents.__getitem__)
+        runs = []
+        start = 0
+        for p, group in itertools.groupby(map(file_parents.__getitem__, order)):
+            end = start + sum(1 for _ in group)
+            runs.append((p, start, end))
+            count[p] = end - start
+            start = end
+        for key in SUM_METRICS + MAX_METRICS + MEAN_METRICS:
+            reduce = max if key in MAX_METRICS else sum
+            column = means[key] if key in MEAN_METRICS else sums[key]
+            gathered = list(map(values[key].__getitem__, order))
+            for p, start, end in runs:
+                column[p] = reduce(gathered[start:end])
+        file_loc = list(map(values["loc"].__getitem__, order))
+        for key, metric in WEIGHTED_METRICS.items():
+            gathered = list(map(values[metric].__getitem__, order))
+            products = list(map(operator.mul, file_loc, gathered))
+            weighted_column, plain_column = weighted[key], plain[key]
+            for p, start, end in runs:
+                weighted_column[p] = sum(products[start:end])
+                plain_column[p] = sum(gathered[start:end])
+        gathered = list(map(values["owner"].__getitem__, order))
+        for p, start, end in runs:
+            owner_sets[p] = set(gathered[start:end])
+
+        # Then folders, one depth level at a time from the deepest: a level's folders are
+        # complete, they are finished and folded into their parents one level up
+        loc = sums["loc"]
+        for level in reversed(self._folder_levels()):
+            for i in level:
+                owner_set = owner_sets[i] or set()
+                owner_set.discard(None)
+                owners[i] = next(iter(owner_set)) if len(owner_set) == 1 else \
+                    (MIXED_OWNER if owner_set else NO_OWNER)
+                if count[i]:
+                    for key in MEAN_METRICS:
+                        means[key][i] = round((means[key][i] + folder_means[key][i]) / count[i], 2)
+                    for key in WEIGHTED_METRICS:
+                        weighted[key][i] = round((weighted[key][i] + folder_weighted[key][i]) / loc[i] if loc[i] > 0
+                                                 else (plain[key][i] + folder_plain[key][i]) / count[i], 2)
+            for i in level:
+                p = parent[i]
+                if p < 0:
+                    continue
+                count[p] += 1
+                for key in SUM_METRICS:
+                    sums[key][p] += sums[key][i]
+                for key in MAX_METRICS:
+                    if sums[key][i] > sums[key][p]:
+                        sums[key][p] = sums[key][i]
+                for key in MEAN_METRICS:
+                    folder_means[key][p] += means[key][i]
+                for key in WEIGHTED_METRICS:
+                    folder_weighted[key][p] += loc[i] * weighted[key][i]
+                    folder_plain[key][p] += weighted[key][i]
+                if owner_sets[p] is None:
+                    owner_sets[p] = set()
+                owner_sets[p].add(owners[i])
+
+        result = dict(sums)
+        result.update(means)
+        result.update(weighted)
+        result["count"] = count
+        result["owner"] = owners
+        return result
+
+    def _rollup_numpy(self, indexes: List[int], values: Dict[str, list]) -> dict:
+        n = len(self)
+        parent = numpy.array(self.parent, dtype=numpy.int64)
+        files = numpy.array(indexes, dtype=numpy.int64)
+        file_parents = parent[files]
+
+        def column(metric):
+            result = numpy.zeros(n, dtype=numpy.float64)
+            result[files] = values[metric]
+            return result
+
+        sums = {key: column(key) for key in SUM_METRICS + MAX_METRICS}
+        means = {key: column(key) for key in MEAN_METRICS}
+        weighted = {key: column(metric) for key, metric in WEIGHTED_METRICS.items()}
+        count = numpy.bincount(parent[1:], minlength=n)
+        loc = sums["loc"]
+
+        # Owners as codes: a folder is uniform if min and max of its children's codes agree
+        owner_names = [MIXED_OWNER, NO_OWNER]
+        owner_codes = {MIXED_OWNER: 0, NO_OWNER: 1}
+        file_codes = []
+        for owner in values["owner"]:
+            code = owner_codes.get(owner)
+            if code is None:
+                code = owner_codes[owner] = len(owner_names)
+                owner_names.append(owner)
+            file_codes.append(code)
+        codes = numpy.full(n, -1, dtype=numpy.int64)
+        codes[files] = file_codes
+        low = numpy.full(n, numpy.iinfo(numpy.int64).max, dtype=numpy.int64)
+        high = numpy.full(n, -1, dtype=numpy.int64)
+
+        def fold(children, parents):
+            """Sums over the children per parent; same order as _rollup_python."""
+            for key in SUM_METRICS:
+                sums[key] += numpy.bincount(parents, weights=sums[key][children], minlength=n)
+            for key in MAX_METRICS:
+                numpy.maximum.at(sums[key], parents, sums[key][children])
+            mean_sums = {key: numpy.bincount(parents, weights=means[key][children], minlength=n)
+                         for key in MEAN_METRICS}
+            weighted_sums = {key: numpy.bincount(parents, weights=loc[children] * weighted[key][children],
+                                                 minlength=n) for key in WEIGHTED_METRICS}
+            plain_sums = {key: numpy.bincount(parents, weights=weighted[key][children], minlength=n)
+                          for key in WEIGHTED_METRICS}
+            child_codes = codes[children]
+            known = child_codes >= 0
+            numpy.minimum.at(low, parents[known], child_codes[known])
+            numpy.maximum.at(high, parents[known], child_codes[known])
+            return mean_sums, weighted_sums, plain_sums
+
+        # Files in one pass, then folders one depth level at a time from the deepest: a level's
+        # folders are complete, they are finished and folded into their parents one level up
+        file_sums = fold(files, file_parents)
+        zeros = numpy.zeros(n, dtype=numpy.float64)
+        folder_sums = ({key: zeros for key in MEAN_METRICS}, {key: zeros for key in WEIGHTED_METRICS},
+                       {key: zeros for key in WEIGHTED_METRICS})
+        for level in reversed(self._folder_levels()):
+            folders = numpy.array(level, dtype=numpy.int64)
+            folders = folders[count[folders] > 0]
+            # Python round, so values match metrics_collector.aggregate_folder exactly
+            for key in MEAN_METRICS:
+                values = (file_sums[0][key][folders] + folder_sums[0][key][folders]) / count[folders]
+                means[key][folders] = [round(v, 2) for v in values.tolist()]
+            for key in WEIGHTED_METRICS:
+                has_loc = loc[folders] > 0
+                values = numpy.where(has_loc, (file_sums[1][key][folders] + folder_sums[1][key][folders]) /
+                                     numpy.where(has_loc, loc[folders], 1),
+                                     (file_sums[2][key][folders] + folder_sums[2][key][folders]) / count[folders])
+                weighted[key][folders] = [round(v, 2) for v in values.tolist()]
+            codes[folders] = numpy.where(high[folders] < 0, 1, numpy.where(low[folders] == high[folders],
+                                                                           low[folders], 0))
+            children = numpy.array(level, dtype=numpy.int64)
+            children = children[parent[children] >= 0]
+            if children.size:
+                level_sums = fold(children, parent[children])
+                folder_sums = tuple({key: folder_sums[part][key] + level_sums[part][key] for key in level_sums[part]}
+                                    for part in range(3))
+
+        owners = [None] * n
+        for i, code in zip(self.folder_indexes, codes[self.folder_indexes].tolist()):
+            owners[i] = owner_names[code] if code >= 0 else NO_OWNER
+        result = {key: values.tolist() for key, values in sums.items()}
+        result.update({key: values.tolist() for key, values in means.items()})
+        result.update({key: values.tolist() for key, values in weighted.items()})
+        result["count"] = count.tolist()
+        result["owner"] = owners
+        return result
+
+    def _blame(self) -> Dict[int, Dict[str, int]]:
+        """Surviving lines per author of every folder with blamed files below it."""
+        counts = {}
+        for index, node in self.files.items():
+            # Most runs have no blame: skip the files without building empty counts
+            if node["metrics"].get("blame_authors"):
+                counts[index] = blame_counts(node["metrics"])
+        if not counts:
+            return counts
+        # Children have larger indexes than their parents: walking backwards completes every
+        # node before it is merged into its parent
+        parent = self.parent
+        for i in range(len(self) - 1, 0, -1):
+            node_counts = counts.get(i)
+            if node_counts:
+                merge_blame_counts(counts.setdefault(parent[i], {}), node_counts)
+        return {i: counts[i] for i in self.folder_indexes if i in counts}
+
+    def _percentiles(self, indexes: List[int], values: Dict[str, list]) -> dict:
+        """PERCENTILE_METRICS per folder over all files below it."""
+        n = len(self)
+        result = {key: [0] * n for key in PERCENTILE_METRICS}
+        metrics = {metric for metric, _ in PERCENTILE_METRICS.values()}
+        if numpy is None:
+            # Bottom-up: a folder's values are those of its files plus its subfolders' (already
+            # sorted) lists, which sort merges as runs; each list is handed on to the parent
+            # once done, so every value is copied once per ancestor in C, not in Python.
+            parent = self.parent
+            file_parents = list(map(parent.__getitem__, indexes))
+            folder_values = {}
+            for metric in metrics:
+                for p, value in zip(file_parents, values[metric]):
+                    found = folder_values.get(p)
+                    if found is None:
+                        found = folder_values[p] = {metric: [] for metric in metrics}
+                    found[metric].append(value)
+            for folder in reversed(self.folder_indexes):
+                found = folder_values.pop(folder, None)
+                if found is None:
+                    continue
+                for ordered in found.values():
+                    ordered.sort()
+                for key, value in percentile_metrics(found, presorted=True).items():
+                    result[key][folder] = value
+                p = parent[folder]
+                if p >= 0:
+                    above = folder_values.setdefault(p, {metric: [] for metric in metrics})
+                    for metric, ordered in found.items():
+                        above[metric].extend(ordered)
+            return result
+
+        # (ancestor, file) pairs for every file and each of its ancestors; sorted by ancestor
+        # then value, each folder's values form one sorted segment. Sorting one integer key
+        # (ancestor, rank of the value) is several times faster than lexsort.
+        parent = numpy.array(self.parent, dtype=numpy.int64)
+        ancestors = []
+        pair_files = []
+        current = parent[numpy.array(indexes, dtype=numpy.int64)]
+        current_files = numpy.arange(len(indexes))
+        while current.size:
+            ancestors.append(current)
+            pair_files.append(current_files)
+            keep = parent[current] >= 0
+            current_files = current_files[keep]
+            current = parent[current[keep]]
+        if not ancestors:
+            return result
+        ancestors = numpy.concatenate(ancestors)
+        pair_files = numpy.concatenate(pair_files)
+        counts = numpy.bincount(ancestors, minlength=n)
+        offsets = numpy.cumsum(counts) - counts
+        folders = numpy.flatnonzero(counts)
+        folder_counts = counts[folders]
+        folder_offsets = offsets[folders]
+        for metric in metrics:
+            file_values = numpy.array(values[metric], dtype=numpy.float64)
+            ranks = numpy.empty(len(indexes), dtype=numpy.int64)
+            ranks[numpy.argsort(file_values, kind='stable')] = numpy.arange(len(indexes))
+            order = numpy.argsort(ancestors * len(indexes) + ranks[pair_files])
+            ordered = file_values[pair_files[order]]
+            for key, (key_metric, q) in PERCENTILE_METRICS.items():
+                if key_metric != metric:
+                    continue
+                # Same arithmetic as percentile()
+                pos = (folder_counts - 1) * q / 100
+                lo = numpy.floor(pos).astype(numpy.int64)
+                hi = numpy.minimum(lo + 1, folder_counts - 1)
+                low_values = ordered[folder_offsets + lo]
+                found = low_values + (ordered[folder_offsets + hi] - low_values) * (pos - lo)
+                column = result[key]
+                for folder, value in zip(folders.tolist(), found.tolist()):
+                    column[folder] = round(value, 2)
+        return result
@@ -1,56 +1,396 @@
 import os
+import re
+import hashlib
+import logging
 import subprocess
 import time
-from typing import Dict, Any, Optional
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 
-def get_git_info(file_path: str, repo_root: str) -> Optional[Dict[str, Any]]:
-    """Extracts commit count, last author, and staleness info."""
+from profiler import get_profiler
+
+# Window used for commit counts and the staleness scale
+HISTORY_WINDOW = "3.years.ago"
+HISTORY_WINDOW_DAYS = 365 * 3
+# Checked in this order by parse_codeowners; the first one that exists is used
+CODEOWNERS_LOCATIONS = ("CODEOWNERS", ".github/CODEOWNERS", ".gitlab/CODEOWNERS", "docs/CODEOWNERS")
+
+# Time staleness is measured at; None for the current time (see set_reference_time)
+_reference_time = None
+
+def set_reference_time(timestamp: Optional[float]) -> Optional[float]:
+    """Pins the time staleness is measured at, so separate runs (e.g. shards) agree; returns the previous one."""
+    global _reference_time
+    previous, _reference_time = _reference_time, timestamp
+    return previous
+
+def reference_time() -> float:
+    return _reference_time if _reference_time is not None else time.time()
+
+def _build_git_info(last_modified: float, author: str, commit_count: int, now: Optional[float] = None) -> Dict[str, Any]:
+    """Builds the git info dict shared by the per-file and indexed lookups."""
+    if now is None:
+        now = reference_time()
+    days_silent = (now - last_modified) / (24 * 3600)
+
+    # Staleness score (0-100), 100 is > 3 years silent
+    staleness_score = min(100, (days_silent / HISTORY_WINDOW_DAYS) * 100)
+
+    return {
+        "days_silent": round(days_silent, 2),
+        "last_author": author,
+        "commit_count": commit_count,
+        "staleness_score": round(staleness_score, 2),
+        "last_modified_ts": last_modified
+    }
+
+def git_info_at(git_info: Dict[str, Any], now: float) -> Dict[str, Any]:
+    """git_info with staleness measured at now instead; defaults of files without history stay as they are."""
+    if not git_info.get("last_modified_ts"):
+        return git_info
+    return _build_git_info(git_info["last_modified_ts"], git_info["last_author"], git_info["commit_count"], now)
+
+def get_git_info(file_path: str, repo_root: str, history: Optional["GitHistoryIndex"] = None) -> Optional[Dict[str, Any]]:
+    """
+    Extracts commit count, last author, and staleness info.
+    If a GitHistoryIndex is given the answer comes from it instead of spawning git.
+    """
     try:
         # Rel path for git commands
         rel_path = os.path.relpath(file_path, repo_root)
-        
+
+        if history is not None:
+            return history.lookup(rel_path)
+
         # Get unix timestamp and author name of last commit
         cmd_log = ['git', 'log', '-1', '--format=%ct|%an', rel_path]
-        output_log = subprocess.check_output(cmd_log, cwd=repo_root, stderr=subprocess.DEVNULL).decode('utf-8').strip()
+        with get_profiler().subprocess(cmd_log):
+            output_log = subprocess.check_output(cmd_log, cwd=repo_root, stderr=subprocess.DEVNULL).decode('utf-8').strip()
         
         if not output_log:
             return None
 
         timestamp_str, author = output_log.split('|', 1)
         last_modified = float(timestamp_str)
-        days_silent = (time.time() - last_modified) / (24 * 3600)
 
         # Get commit count (all time or since X years? Implementation plan said "integration logic", sticking to general for now)
         # Using 3 years as default derived from staleness script logic usually
-        since_date = "3.years.ago" 
-        cmd_count = ['git', 'rev-list', '--count', f'--since={since_date}', 'HEAD', '--', rel_path]
-        output_count = subprocess.check_output(cmd_count, cwd=repo_root, stderr=subprocess.DEVNULL).decode('utf-8').strip()
+        cmd_count = ['git', 'rev-list', '--count', f'--since={HISTORY_WINDOW}', 'HEAD', '--', rel_path]
+        with get_profiler().subprocess(cmd_count):
+            output_count = subprocess.check_output(cmd_count, cwd=repo_root, stderr=subprocess.DEVNULL).decode('utf-8').strip()
         commit_count = int(output_count) if output_count else 0
-        
-        # Staleness score (0-100), 100 is > 3 years silent
-        staleness_score = min(100, (days_silent / (365 * 3)) * 100)
-
-        return {
-            "days_silent": round(days_silent, 2),
-            "last_author": author,
-            "commit_count": commit_count,
-            "staleness_score": round(staleness_score, 2),
-            "last_modified_ts": last_modified
-        }
+
+        return _build_git_info(last_modified, author, commit_count)
     except Exception:
         return None
 
-def parse_codeowners(repo_root: str) -> Dict[str, str]:
+def iter_log_commits(repo_root: str, extra_args: Iterable[str] = (),
+                     rev: str = "HEAD") -> Iterator[Tuple[str, float, str, List[str]]]:
+    """
+    Streams `git log --name-only` of the history of rev in a single process.
+    Yields (commit id, commit_timestamp, author, [rel_paths]) newest first. Paths are relative
+    to repo_root (which may be a subdirectory of the work tree).
+    """
+    cmd = ['git', 'log', '-z', '--no-renames', '--relative', '--name-only',
+           '--format=%x01%H|%ct|%an'] + list(extra_args) + [rev, '--']
+    with get_profiler().subprocess(cmd):
+        yield from _read_log(subprocess.Popen(cmd, cwd=repo_root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL))
+
+def _read_log(proc) -> Iterator[Tuple[str, float, str, List[str]]]:
+    """Parses the output of the iter_log_commits process and waits for it."""
+    try:
+        pending = b''
+        header = None
+        paths = []
+        while True:
+            chunk = proc.stdout.read(1 << 16)
+            if not chunk:
+                break
+            tokens = (pending + chunk).split(b'\0')
+            pending = tokens.pop()
+            for token in tokens:
+                # The first path after a header is preceded by a newline
+                token = token.lstrip(b'\n')
+                if not token:
+                    continue
+                if token.startswith(b'\x01'):
+                    if header is not None:
+                        yield header[0], header[1], header[2], paths
+                    commit, ts_str, author = token[1:].decode('utf-8', 'replace').split('|', 2)
+                    header = (commit, float(ts_str), author)
+                    paths = []
+                else:
+                    paths.append(os.path.normpath(token.decode('utf-8', 'surrogateescape')))
+        token = pending.lstrip(b'\n')
+        if token and header is not None and not token.startswith(b'\x01'):
+            paths.append(os.path.normpath(token.decode('utf-8', 'surrogateescape')))
+        if header is not None:
+            yield header[0], header[1], header[2], paths
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+def resolve_git_date(repo_root: str, spec: str = HISTORY_WINDOW) -> Optional[float]:
+    """Resolves an approxidate such as '3.years.ago' to a unix timestamp the way git does."""
+    try:
+        cmd = ['git', 'rev-parse', f'--since={spec}']
+        with get_profiler().subprocess(cmd):
+            output = subprocess.check_output(cmd, cwd=repo_root, stderr=subprocess.DEVNULL).decode('utf-8').strip()
+        return float(output.split('=', 1)[1])
+    except Exception:
+        return None
+
+class GitHistoryIndex:
+    """
+    Per-path table of last commit time, last author, commit count in the history window
+    and last commit id, built from a single `git log` pass over the repository.
+    Answers the same questions as the per-file `git log -1` / `git rev-list --count` calls.
+    A truncated index holds only the commits since since_ts: paths without commits in it were
+    last changed before the window and count as fully stale.
+    """
+
+    def __init__(self, since_ts: Optional[float] = None, truncated: bool = False):
+        self.since_ts = since_ts
+        self.truncated = truncated and since_ts is not None
+        # rel_path -> [last_modified, last_author, commit_count, last_commit]
+        self.entries: Dict[str, list] = {}
+
+    def add_commit(self, timestamp: float, author: str, paths: List[str], commit: Optional[str] = None):
+        """Adds one commit; commits must arrive newest first (git log order)."""
+        in_window = self.since_ts is None or timestamp >= self.since_ts
+        entries = self.entries
+        for path in paths:
+            entry = entries.get(path)
+            if entry is None:
+                entries[path] = [timestamp, author, 1 if in_window else 0, commit]
+            elif in_window:
+                entry[2] += 1
+
+    def lookup(self, rel_path: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(os.path.normpath(rel_path))
+        if entry is None:
+            return _build_git_info(self.since_ts, "Unknown", 0, now) if self.truncated else None
+        return _build_git_info(entry[0], entry[1], entry[2], now)
+
+    def last_commit(self, rel_path: str) -> Optional[str]:
+        """Id of the last commit that changed the path, or None if it has none in the index."""
+        entry = self.entries.get(os.path.normpath(rel_path))
+        return entry[3] if entry is not None else None
+
+    def __len__(self):
+        return len(self.entries)
+
+def build_history_index(repo_root: str, rev: str = "HEAD") -> GitHistoryIndex:
+    """Builds a GitHistoryIndex of the history of rev (empty if it is not a git repository)."""
+    index = GitHistoryIndex(resolve_git_date(repo_root))
+    try:
+        for commit, timestamp, author, paths in iter_log_commits(repo_root, rev=rev):
+            index.add_commit(timestamp, author, paths, commit)
+    except Exception as e:
+        logging.warning(f"Failed to build git history index: {e}")
+    logging.debug(f"Indexed git history for {len(index)} paths.")
+    return index
+
+def build_window_index(repo_root: str, rev: str, now: float) -> GitHistoryIndex:
+    """
+    Truncated GitHistoryIndex of the history window before now (a commit time of rev): reads
+    only the commits the staleness scale and commit counts can see, however long the history.
+    """
+    since_ts = now - HISTORY_WINDOW_DAYS * 24 * 3600
+    index = GitHistoryIndex(since_ts, truncated=True)
+    try:
+        for commit, timestamp, author, paths in iter_log_commits(repo_root, [f'--since=@{int(since_ts)}'], rev=rev):
+            if timestamp >= since_ts:
+                index.add_commit(timestamp, author, paths, commit)
+    except Exception as e:
+        logging.warning(f"Failed to build git history index of {rev}: {e}")
+    return index
+
+# Cache namespace of blame results; entries are keyed by path, blob id and last commit at HEAD
+BLAME_NAMESPACE = "blame-v2"
+DEFAULT_BLAME_JOBS = 4
+
+def parse_blame_incremental(output: bytes) -> Dict[str, int]:
+    """
+    Surviving lines per author from `git blame --incremental` output: every group of lines
+    starts with "<commit> <orig line> <final line> <lines>", the commit's headers (author, ...)
+    follow the first group of that commit only, and "filename <path>" ends the group.
+    """
+    lines_by_commit = {}
+    authors = {}
+    commit = None
+    for line in output.split(b'\n'):
+        if commit is None:
+            if not line:
+                continue
+            commit, _, _, count = line.split(b' ')
+            lines_by_commit[commit] = lines_by_commit.get(commit, 0) + int(count)
+        elif line.startswith(b'author '):
+            authors[commit] = line[7:].decode('utf-8', 'replace')
+        elif line.startswith(b'filename '):
+            commit = None
+
+    result = {}
+    for commit, count in lines_by_commit.items():
+        author = authors.get(commit, "Unknown")
+        result[author] = result.get(author, 0) + count
+    return result
+
+def list_tree(repo_root: str, rev: str = "HEAD") -> List[Tuple[str, str, int]]:
+    """
+    (rel_path, blob id, size) of every file in the tree of rev below repo_root, from one
+    `git ls-tree` call; empty if rev cannot be resolved. Works in bare repositories.
+    """
+    cmd = ['git', 'ls-tree', '-r', '-z', '-l', rev]
+    try:
+        with get_profiler().subprocess(cmd):
+            output = subprocess.check_output(cmd, cwd=repo_root, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    files = []
+    for record in output.split(b'\0'):
+        if not record:
+            continue
+        info, _, path = record.partition(b'\t')
+        _, kind, oid, size = info.split()
+        # Submodules are commits, symlinks are blobs without a C++ name
+        if kind == b'blob':
+            files.append((os.path.normpath(os.fsdecode(path)), oid.decode('ascii'), int(size)))
+    return files
+
+def _head_blobs(repo_root: str) -> Dict[str, str]:
+    """rel_path -> blob id of every file at HEAD below repo_root."""
+    return {rel_path: oid for rel_path, oid, _ in list_tree(repo_root)}
+
+class CatFileBatch:
+    """
+    One persistent `git cat-file --batch` process reading objects straight from the object
+    store, so no checkout is needed and bare repositories work. read() is one round trip
+    through the pipe; close the reader (or use it as a context manager) when done.
     """
-    Parses CODEOWNERS file to build a map of pattern -> owner.
+
+    def __init__(self, repo_root: str):
+        self.repo_root = repo_root
+        cmd = ['git', 'cat-file', '--batch']
+        # Timed as one subprocess from start to close
+        self._timer = get_profiler().subprocess(cmd)
+        self._timer.__enter__()
+        self._proc = subprocess.Popen(cmd, cwd=repo_root, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL)
+
+    def read(self, spec: str) -> Optional[Tuple[str, str, bytes]]:
+        """(object id, type, content) of an object name such as an id or 'v1.0^{commit}', or None if missing."""
+        self._proc.stdin.write(spec.encode('utf-8') + b'\n')
+        self._proc.stdin.flush()
+        header = self._proc.stdout.readline()
+        if not header:
+            raise IOError(f"git cat-file exited while reading {spec}")
+        fields = header.split()
+        if len(fields) != 3:
+            # "<spec> missing" or "<spec> ambiguous"
+            return None
+        oid, kind, size = fields
+        data = self._proc.stdout.read(int(size) + 1)[:-1]
+        return oid.decode('ascii'), kind.decode('ascii'), data
+
+    def close(self):
+        if self._proc.poll() is None:
+            self._proc.stdin.close()
+            self._proc.wait()
+            self._proc.stdout.close()
+            self._timer.__exit__(None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BlameIndex:
+    """
+    Line-level authorship at HEAD: surviving lines per author of each file, from
+    `git blame --incremental` run by a pool of at most jobs worker threads. Results are stored
+    in an analysis_cache.AnalysisCache (if given) under the file's path, blob id and last commit
+    at HEAD, so a file whose content and history are unchanged is never blamed again. Blame
+    depends on the history of the path, not only on its content: a copy of a file, or a revert
+    to an earlier content, is attributed to the commit that made it. The last commits come from
+    a GitHistoryIndex of HEAD (history, or one built on the first cached blame).
+    Files not in HEAD have no blame.
+    """
+
+    def __init__(self, repo_root: str, cache=None, jobs: int = DEFAULT_BLAME_JOBS,
+                 history: Optional[GitHistoryIndex] = None):
+        self.repo_root = repo_root
+        self.cache = cache
+        self.jobs = max(1, jobs)
+        self.blobs = _head_blobs(repo_root)
+        self.history = history
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def refresh(self):
+        """Re-reads the blob ids and last commits after HEAD moved; unchanged files stay cached."""
+        self.blobs = _head_blobs(self.repo_root)
+        with self._lock:
+            self.history = None
+
+    def _cache_key(self, rel_path: str, oid: str) -> str:
+        with self._lock:
+            if self.history is None:
+                self.history = build_history_index(self.repo_root)
+            history = self.history
+        commit = history.last_commit(rel_path) or ''
+        key = f"{rel_path.replace(os.sep, '/')}\0{oid}\0{commit}"
+        return hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()
+
+    def blame(self, rel_path: str) -> Optional[Dict[str, int]]:
+        """author -> surviving lines of the file at HEAD, or None if it is not in HEAD."""
+        rel_path = os.path.normpath(rel_path)
+        oid = self.blobs.get(rel_path)
+        if oid is None:
+            return None
+        key = None
+        if self.cache is not None:
+            key = self._cache_key(rel_path, oid)
+            cached = self.cache.get(key, BLAME_NAMESPACE)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                return cached
+        cmd = ['git', 'blame', '--incremental', 'HEAD', '--', rel_path]
+        try:
+            with get_profiler().subprocess(cmd):
+                output = subprocess.check_output(cmd, cwd=self.repo_root, stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.debug(f"git blame failed for {rel_path}: {e}")
+            return None
+        authors = parse_blame_incremental(output)
+        with self._lock:
+            self.misses += 1
+        if self.cache is not None:
+            self.cache.put(key, authors, BLAME_NAMESPACE)
+        return authors
+
+    def submit(self, rel_path: str) -> Future:
+        """Blames the file on the worker pool; the future's result is that of blame()."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.jobs)
+        return self._pool.submit(get_profiler().call, "blame", rel_path, self.blame, rel_path)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+def parse_codeowners(repo_root: str) -> "CodeOwners":
+    """
+    Parses CODEOWNERS file into a compiled CodeOwners matcher.
     Checks .github/CODEOWNERS, .gitlab/CODEOWNERS, or root CODEOWNERS.
     """
-    possible_locations = [
-        os.path.join(repo_root, "CODEOWNERS"),
-        os.path.join(repo_root, ".github", "CODEOWNERS"),
-        os.path.join(repo_root, ".gitlab", "CODEOWNERS"),
-        os.path.join(repo_root, "docs", "CODEOWNERS"),
-    ]
+    possible_locations = [os.path.join(repo_root, *location.split('/')) for location in CODEOWNERS_LOCATIONS]
     
     codeowners_file = None
     for loc in possible_locations:
@@ -59,46 +399,180 @@ def parse_codeowners(repo_root: str) -> Dict[str, str]:
             break
             
     if not codeowners_file:
-        return {}
+        return CodeOwners([])
         
-    owners_map = {} # Simple list of (pattern, owner) tuples would be better for glob matching
-                    # But for now, we'll return a list of rules
-    
-    rules = []
-    
     try:
         with open(codeowners_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                
-                parts = line.split()
-                if len(parts) >= 2:
-                    pattern = parts[0]
-                    owner = parts[1] # First owner only for simplicity
-                    rules.append((pattern, owner))
+            return parse_codeowners_lines(f)
     except Exception:
-        pass
+        return CodeOwners([])
+
+def parse_codeowners_lines(lines: Iterable[str]) -> "CodeOwners":
+    """Compiles the lines of a CODEOWNERS file, e.g. one read from the object store."""
+    rules = []
+    for line in lines:
+        line = line.strip()
+        # Skip comments and GitLab section headers
+        if not line or line.startswith('#') or line.startswith('[') or line.startswith('^['):
+            continue
         
-    return rules
+        parts = line.split()
+        owners = []
+        for part in parts[1:]:
+            if part.startswith('#'):
+                break
+            owners.append(part)
+        # A pattern without owners is valid and clears ownership of its paths
+        rules.append((parts[0], owners))
+    return CodeOwners(rules)
 
-def get_owner(file_path: str, repo_root: str, rules: list) -> str:
-    """Matches file path against codeowner rules."""
-    # This is a simplified matcher. Real CODEOWNERS uses .gitignore style globbing.
-    # We will use fnmatch for basic support.
-    import fnmatch
-    
-    rel_path = os.path.relpath(file_path, repo_root).replace(os.sep, '/')
-    
-    # Iterate in reverse to find last matching rule (standard precedence)
-    for pattern, owner in reversed(rules):
-        # Handle "folder/" pattern matching anything inside
-        if pattern.endswith('/'):
-            if rel_path.startswith(pattern) or rel_path == pattern[:-1]:
-                return owner
-        # Handle wildcard
-        elif fnmatch.fnmatch(rel_path, pattern):
-            return owner
-            
-    return "Unassigned"
+_GLOB_CHARS = set('*?[\\')
+
+def compile_glob(pattern: str) -> Tuple[bool, bool, str]:
+    """
+    Translates a gitignore-style pattern into a regex source that matches repository-relative
+    paths ('/'-separated) it covers, including everything below a matched directory.
+    Returns (anchored, dir_only, regex_source).
+    """
+    dir_only = pattern.endswith('/')
+    body = pattern.rstrip('/')
+    # A slash anywhere but at the end anchors the pattern to the repository root
+    anchored = '/' in body
+    body = body.lstrip('/')
+
+    out = []
+    i = 0
+    n = len(body)
+    if body.startswith('**/'):
+        out.append('(?:.*/)?')
+        i = 3
+    while i < n:
+        c = body[i]
+        if body.startswith('/**/', i):
+            out.append('/(?:.*/)?')
+            i += 4
+        elif body.startswith('/**', i) and i + 3 == n:
+            out.append('/.*')
+            i += 3
+        elif c == '*':
+            while i < n and body[i] == '*':
+                i += 1
+            # A segment that is only '*' must match a non-empty name
+            alone = (i == n or body[i] == '/') and (body[:i].rstrip('*') == '' or body[:i].rstrip('*').endswith('/'))
+            out.append('[^/]+' if alone else '[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = body.find(']', i + 2)
+            if end == -1:
+                out.append('\\[')
+                i += 1
+            else:
+                chars = body[i + 1:end]
+                if chars[0] in '!^':
+                    chars = '^' + chars[1:]
+                out.append('[' + chars.replace('\\', '\\\\') + ']')
+                i = end + 1
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(body[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+
+    prefix = '' if anchored else '(?:.*/)?'
+    if dir_only:
+        tail = '/.*'
+    elif anchored and body.endswith('/*'):
+        # CODEOWNERS: "docs/*" owns files directly in docs, not nested ones
+        tail = ''
+    else:
+        tail = '(?:/.*)?'
+    return anchored, dir_only, prefix + ''.join(out) + tail
+
+class CodeOwners:
+    """
+    Precompiled CODEOWNERS matcher with gitignore semantics and last-match-wins precedence.
+    Literal rules live in a path trie (anchored) or a name table (unanchored); glob rules are
+    combined into one regex per leading directory, ordered so the first alternative that
+    matches is the last rule in the file.
+    """
+
+    def __init__(self, rules: List[Tuple[str, List[str]]]):
+        self.rules = rules
+        # Trie node: {component: child, None: [best rule, best dir-only rule]}
+        self._trie: Dict[Any, Any] = {}
+        self._names: Dict[str, list] = {}
+        glob_groups: Dict[Optional[str], list] = {}
+
+        for index, (pattern, _) in enumerate(rules):
+            anchored, dir_only, regex = compile_glob(pattern)
+            body = pattern.strip('/')
+            slot = 1 if dir_only else 0
+            if body and not _GLOB_CHARS.intersection(body):
+                if anchored:
+                    node = self._trie
+                    for part in body.split('/'):
+                        node = node.setdefault(part, {})
+                    entry = node.setdefault(None, [-1, -1])
+                else:
+                    entry = self._names.setdefault(body, [-1, -1])
+                entry[slot] = index
+            else:
+                first = body.split('/', 1)[0]
+                key = first if anchored and '/' in body and not _GLOB_CHARS.intersection(first) else None
+                glob_groups.setdefault(key, []).append((index, regex))
+
+        # key -> (compiled regex, group number -> rule index)
+        self._globs = {}
+        for key, entries in glob_groups.items():
+            entries.reverse()
+            source = '|'.join(f'({regex})' for _, regex in entries)
+            self._globs[key] = (re.compile(source, re.DOTALL), [None] + [index for index, _ in entries])
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, rel_path: str, is_dir: bool = False) -> int:
+        """Returns the index of the rule that applies to rel_path, or -1."""
+        path = rel_path.replace(os.sep, '/').strip('/')
+        parts = path.split('/')
+        last = len(parts) - 1
+        best = -1
+
+        node = self._trie
+        for k, part in enumerate(parts):
+            node = node.get(part)
+            if node is None:
+                break
+            entry = node.get(None)
+            if entry is not None:
+                best = max(best, entry[0], entry[1] if (k < last or is_dir) else -1)
+
+        if self._names:
+            for k, part in enumerate(parts):
+                entry = self._names.get(part)
+                if entry is not None:
+                    best = max(best, entry[0], entry[1] if (k < last or is_dir) else -1)
+
+        if self._globs:
+            subject = path + '/' if is_dir else path
+            for key in (None, parts[0]):
+                group = self._globs.get(key)
+                if group is None:
+                    continue
+                m = group[0].fullmatch(subject)
+                if m is not None:
+                    best = max(best, group[1][m.lastindex])
+        return best
+
+    def owners_for(self, rel_path: str, is_dir: bool = False) -> List[str]:
+        """All owners of a file (or, with is_dir, a folder) by repository-relative path."""
+        index = self.match(rel_path, is_dir)
+        return self.rules[index][1] if index >= 0 else []
+
+def get_owner(file_path: str, repo_root: str, rules: "CodeOwners") -> str:
+    """Matches file path against codeowner rules. Multiple owners are space separated."""
+    owners = rules.owners_for(os.path.relpath(file_path, repo_root))
+    return " ".join(owners) if owners else "Unassigned"
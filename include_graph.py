@@ -0,0 +1,309 @@
+import os
+import json
+import shlex
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Files that are compiled on their own; everything else only matters through includes
+SOURCE_EXTENSIONS = {'.c', '.cpp', '.cc', '.cxx'}
+
+_INCLUDE_FLAGS = ('-I', '-iquote', '-isystem', '-idirafter', '/I')
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:
+    def _popcount(value: int) -> int:
+        return bin(value).count('1')
+
+class IncludePaths:
+    """
+    Include search paths used to resolve #include directives.
+    global_dirs apply to every file; per_file_dirs (from compile_commands.json) replace them
+    for the translation units they were recorded for. All paths are absolute.
+    """
+
+    def __init__(self, global_dirs: Sequence[str] = (), per_file_dirs: Optional[Dict[str, List[str]]] = None,
+                 translation_units: Optional[Iterable[str]] = None):
+        self.global_dirs = [os.path.abspath(d) for d in global_dirs]
+        self.per_file_dirs = per_file_dirs or {}
+        self.translation_units = set(translation_units) if translation_units is not None else None
+
+def _extract_include_dirs(args: List[str], directory: str) -> List[str]:
+    dirs = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        for flag in _INCLUDE_FLAGS:
+            if arg == flag and i + 1 < len(args):
+                dirs.append(args[i + 1])
+                i += 1
+                break
+            if arg.startswith(flag) and len(arg) > len(flag):
+                dirs.append(arg[len(flag):])
+                break
+        i += 1
+    return [os.path.normpath(os.path.join(directory, d)) for d in dirs]
+
+def load_compile_commands(path: str, extra_dirs: Sequence[str] = ()) -> IncludePaths:
+    """Reads include directories from a compile_commands.json compilation database."""
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    global_dirs = [os.path.abspath(d) for d in extra_dirs]
+    seen = set(global_dirs)
+    per_file = {}
+    for entry in entries:
+        directory = entry.get("directory", os.path.dirname(os.path.abspath(path)))
+        if "arguments" in entry:
+            args = list(entry["arguments"])
+        else:
+            args = shlex.split(entry.get("command", ""))
+        dirs = _extract_include_dirs(args, directory)
+        file_path = os.path.normpath(os.path.join(directory, entry["file"]))
+        per_file[file_path] = dirs + [d for d in global_dirs if d not in dirs]
+        for d in dirs:
+            if d not in seen:
+                seen.add(d)
+                global_dirs.append(d)
+    logging.debug(f"Loaded {len(per_file)} compile commands with {len(global_dirs)} include directories.")
+    return IncludePaths(global_dirs, per_file, translation_units=per_file.keys())
+
+class IncludeResolver:
+    """
+    Resolves include directives to repository files. Tries the including file's directory,
+    then the include search paths. Without configured search paths, a unique path-suffix
+    match is tried last (closest directory wins when several files share the suffix); with
+    them, an include they do not find is a system or third-party header, and e.g.
+    <string.h> must not land on some repository file named string.h.
+    """
+
+    def __init__(self, rel_paths: Iterable[str], repo_root: str, include_paths: Optional[IncludePaths] = None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.include_paths = include_paths or IncludePaths()
+        self.suffix_fallback = not (self.include_paths.global_dirs or self.include_paths.per_file_dirs)
+        self.files = set(rel_paths)
+        self.by_name: Dict[str, List[str]] = {}
+        for rel_path in self.files:
+            self.by_name.setdefault(os.path.basename(rel_path), []).append(rel_path)
+        self._global_dirs = self._relative_dirs(self.include_paths.global_dirs)
+        self._per_file_dirs = {}
+        for file_path, dirs in self.include_paths.per_file_dirs.items():
+            rel = os.path.relpath(file_path, self.repo_root)
+            self._per_file_dirs[rel] = self._relative_dirs(dirs)
+
+    def _relative_dirs(self, dirs: Sequence[str]) -> List[str]:
+        rel_dirs = []
+        for d in dirs:
+            rel = os.path.relpath(d, self.repo_root)
+            # Directories outside the repository cannot contain analyzed files
+            if rel != os.pardir and not rel.startswith(os.pardir + os.sep):
+                rel_dirs.append('' if rel == os.curdir else rel)
+        return rel_dirs
+
+    def resolve(self, includer: str, include: str) -> Optional[str]:
+        include = os.path.normpath(include)
+        candidate = os.path.normpath(os.path.join(os.path.dirname(includer), include))
+        if candidate in self.files:
+            return candidate
+        for d in self._per_file_dirs.get(includer, self._global_dirs):
+            candidate = os.path.normpath(os.path.join(d, include))
+            if candidate in self.files:
+                return candidate
+        if not self.suffix_fallback:
+            return None
+
+        candidates = self.by_name.get(os.path.basename(include))
+        if not candidates:
+            return None
+        suffix = os.sep + include
+        matches = [c for c in candidates if c == include or c.endswith(suffix)]
+        if len(matches) == 1:
+            return matches[0]
+        if not matches:
+            return None
+        # Several files share the suffix: take the one closest to the includer
+        includer_parts = includer.split(os.sep)[:-1]
+
+        def shared_depth(path):
+            depth = 0
+            for a, b in zip(includer_parts, path.split(os.sep)[:-1]):
+                if a != b:
+                    break
+                depth += 1
+            return depth
+        ranked = sorted(((shared_depth(m), m) for m in matches), reverse=True)
+        if ranked[0][0] == ranked[1][0]:
+            return None
+        return ranked[0][1]
+
+class IncludeGraph:
+    """
+    Include graph over compact integer node ids; an edge u -> v means u includes v.
+    Transitive includers are computed on the SCC condensation with bitset reachability;
+    a component's bitset is released as soon as the component has been processed.
+    """
+
+    def __init__(self, paths: Sequence[str]):
+        self.paths = list(paths)
+        self.ids = {path: i for i, path in enumerate(self.paths)}
+        self.edges: List[List[int]] = [[] for _ in self.paths]
+
+    def add_edge(self, src: int, dst: int):
+        if src != dst and dst not in self.edges[src]:
+            self.edges[src].append(dst)
+
+    def strongly_connected_components(self) -> List[List[int]]:
+        """Iterative Tarjan; components come out in reverse topological order."""
+        n = len(self.paths)
+        index = [-1] * n
+        low = [0] * n
+        on_stack = [False] * n
+        stack = []
+        components = []
+        counter = 0
+        for start in range(n):
+            if index[start] != -1:
+                continue
+            work = [(start, 0)]
+            index[start] = low[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack[start] = True
+            while work:
+                node, edge_pos = work[-1]
+                edges = self.edges[node]
+                if edge_pos < len(edges):
+                    work[-1] = (node, edge_pos + 1)
+                    succ = edges[edge_pos]
+                    if index[succ] == -1:
+                        index[succ] = low[succ] = counter
+                        counter += 1
+                        stack.append(succ)
+                        on_stack[succ] = True
+                        work.append((succ, 0))
+                    elif on_stack[succ]:
+                        low[node] = min(low[node], index[succ])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+        return components
+
+    def transitive_includers(self, translation_units: Sequence[bool]) -> Tuple[List[int], List[int]]:
+        """
+        For every node, counts the files that include it directly or indirectly, and how many
+        of those are translation units (i.e. how many TUs rebuild when the node changes).
+        """
+        components = self.strongly_connected_components()
+        components.reverse()  # topological order: includers before included files
+        n = len(self.paths)
+        comp_of = [0] * n
+        # Bit positions follow topological order, so a component's ancestor set only uses
+        # bits below its own position and stays as short as possible
+        position = [0] * n
+        next_position = 0
+        for c, members in enumerate(components):
+            for member in members:
+                comp_of[member] = c
+                position[member] = next_position
+                next_position += 1
+
+        successors: List[set] = [set() for _ in components]
+        for src, dsts in enumerate(self.edges):
+            cs = comp_of[src]
+            for dst in dsts:
+                cd = comp_of[dst]
+                if cd != cs:
+                    successors[cs].add(cd)
+
+        tu_bytes = bytearray((n + 7) // 8)
+        for i, is_tu in enumerate(translation_units):
+            if is_tu:
+                tu_bytes[position[i] >> 3] |= 1 << (position[i] & 7)
+        tu_mask = int.from_bytes(bytes(tu_bytes), 'little')
+
+        # incoming[c]: bitset of nodes that reach component c; dropped once c is processed
+        incoming: Dict[int, int] = {}
+        total = [0] * n
+        tus = [0] * n
+        for c, members in enumerate(components):
+            reach = incoming.pop(c, 0)
+            member_bits = 0
+            for member in members:
+                member_bits |= 1 << position[member]
+            reach_count = _popcount(reach)
+            reach_tus = _popcount(reach & tu_mask)
+            member_tus = _popcount(member_bits & tu_mask)
+            # Inside a cycle every other member includes a node indirectly
+            cycle = len(members) - 1
+            for member in members:
+                cycle_tus = (member_tus - (1 if translation_units[member] else 0)) if cycle else 0
+                total[member] = reach_count + cycle
+                tus[member] = reach_tus + cycle_tus
+
+            if successors[c]:
+                outgoing = reach | member_bits
+                for succ in successors[c]:
+                    incoming[succ] = incoming.get(succ, 0) | outgoing
+        return total, tus
+
+def resolve_include_graph(records: Iterable[Tuple[str, Sequence[str]]], repo_root: str,
+                          include_paths: Optional[IncludePaths] = None,
+                          paths: Optional[Sequence[str]] = None) -> Tuple[IncludeGraph, List[bool]]:
+    """
+    Resolves includes of (rel_path, includes) records against each other: the IncludeGraph
+    with node ids in record order, and for every node whether it is a translation unit.
+    Given the records' paths (in record order) up front, records are read once as they come.
+    """
+    if paths is None:
+        records = list(records)
+        paths = [rel_path for rel_path, _ in records]
+    resolver = IncludeResolver(paths, repo_root, include_paths)
+    graph = IncludeGraph(paths)
+    for src, (rel_path, includes) in enumerate(records):
+        for include in includes:
+            target = resolver.resolve(rel_path, include)
+            if target is not None:
+                graph.add_edge(src, graph.ids[target])
+
+    units = resolver.include_paths.translation_units
+    if units is not None:
+        is_tu = [os.path.join(resolver.repo_root, p) in units for p in paths]
+    else:
+        is_tu = [os.path.splitext(p)[1].lower() in SOURCE_EXTENSIONS for p in paths]
+    return graph, is_tu
+
+def compute_include_metrics(records: Iterable[Tuple[str, Sequence[str]]], repo_root: str,
+                            include_paths: Optional[IncludePaths] = None) -> Dict[str, dict]:
+    """
+    Resolves includes of (rel_path, includes) records against each other and returns
+    rel_path -> {"included_by": sorted direct includers, "included_by_transitive": count,
+    "rebuild_tus": translation units that transitively include the file}.
+    """
+    graph, is_tu = resolve_include_graph(records, repo_root, include_paths)
+    paths = graph.paths
+
+    direct: List[List[str]] = [[] for _ in paths]
+    for src, dsts in enumerate(graph.edges):
+        for dst in dsts:
+            direct[dst].append(paths[src])
+    total, tus = graph.transitive_includers(is_tu)
+
+    return {
+        path: {
+            "included_by": sorted(direct[i]),
+            "included_by_transitive": total[i],
+            "rebuild_tus": tus[i],
+        }
+        for i, path in enumerate(paths)
+    }
@@ -0,0 +1,347 @@
+import os
+import bisect
+import logging
+import subprocess
+from typing import Dict, List, Tuple
+
+import scan_repo
+import git_analyzer
+import metrics_collector
+import include_graph
+import external_metrics
+import folder_tree
+from profiler import get_profiler
+
+# Locations checked by git_analyzer.parse_codeowners
+CODEOWNERS_PATHS = {os.path.normpath(p) for p in git_analyzer.CODEOWNERS_LOCATIONS}
+
+def get_changed_files(repo_root: str, base_commit: str) -> List[Tuple[str, str, str]]:
+    """
+    Lists files changed between base_commit and the working tree.
+    Returns (status, old_rel_path, new_rel_path) tuples; status is one of A, M, D, R.
+    Copies count as additions and type changes as modifications.
+    """
+    cmd = ['git', 'diff', '--name-status', '-z', '-M', '--relative', base_commit, '--']
+    with get_profiler().subprocess(cmd):
+        output = subprocess.check_output(cmd, cwd=repo_root).decode('utf-8', 'surrogateescape')
+    tokens = output.split('\0')
+
+    changes = []
+    i = 0
+    while i < len(tokens) and tokens[i]:
+        status = tokens[i][0]
+        if status in ('R', 'C'):
+            old_path, new_path = os.path.normpath(tokens[i + 1]), os.path.normpath(tokens[i + 2])
+            i += 3
+            if status == 'C':
+                changes.append(('A', new_path, new_path))
+            else:
+                changes.append(('R', old_path, new_path))
+        else:
+            path = os.path.normpath(tokens[i + 1])
+            i += 2
+            changes.append((status if status in ('A', 'D') else 'M', path, path))
+    return changes
+
+class DashboardTree:
+    """
+    Path index over an aggregated dashboard tree (children already as lists). Percentiles and
+    blame need the values of all files below a folder; they are kept per folder (sorted
+    values, lines per author), built from the folder's subtree the first time it is
+    reaggregated and then updated by the changes of single files.
+    """
+
+    def __init__(self, root: dict, repo_root: str):
+        self.root = root
+        self.repo_root = repo_root
+        self.folders = {".": root}
+        self.files = {}
+        self.dirty = set()
+        # Files added, removed or changed since the last reaggregate
+        self.dirty_files = set()
+        self._percentile_keys = sorted({metric for metric, _ in folder_tree.PERCENTILE_METRICS.values()})
+        # folder path -> ({metric: sorted values}, {author: lines}) of all files below it
+        self._below: Dict[str, Tuple[Dict[str, list], Dict[str, int]]] = {}
+        # Folders whose aggregates the last reaggregate recomputed
+        self.reaggregated = set()
+
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for child in node.get("children", []):
+                if child["type"] == "folder":
+                    self.folders[child["path"]] = child
+                    stack.append(child)
+                else:
+                    self.files[child["path"]] = child
+        # What each file contributes to the folders above it, as of the last reaggregate
+        self._contributions = {path: self._contribution(node) for path, node in self.files.items()}
+
+    def _contribution(self, node: dict) -> Tuple[tuple, Dict[str, int]]:
+        metrics = node["metrics"]
+        return tuple(metrics.get(metric, 0) for metric in self._percentile_keys), folder_tree.blame_counts(metrics)
+
+    @staticmethod
+    def _parent_path(path: str) -> str:
+        return os.path.dirname(path) or "."
+
+    def _ensure_folder(self, path: str) -> dict:
+        folder = self.folders.get(path)
+        if folder is None:
+            parent = self._ensure_folder(self._parent_path(path))
+            folder = metrics_collector.build_folder_node(os.path.basename(path), path,
+                                                         os.path.join(self.repo_root, path))
+            parent["children"].append(folder)
+            self.folders[path] = folder
+            self.dirty.add(parent["path"])
+        return folder
+
+    def put_file(self, node: dict):
+        parent = self._ensure_folder(self._parent_path(node["path"]))
+        old = self.files.get(node["path"])
+        if old is not None:
+            parent["children"].remove(old)
+        parent["children"].append(node)
+        self.files[node["path"]] = node
+        self.dirty.add(parent["path"])
+        self.dirty_files.add(node["path"])
+
+    def remove_file(self, path: str):
+        node = self.files.pop(path, None)
+        if node is None:
+            return
+        parent_path = self._parent_path(path)
+        parent = self.folders[parent_path]
+        parent["children"].remove(node)
+        self.dirty.add(parent_path)
+        self.dirty_files.add(path)
+
+        # Drop folders left empty, a full run would not create them
+        while parent is not self.root and not parent["children"]:
+            del self.folders[parent_path]
+            self._below.pop(parent_path, None)
+            self.dirty.discard(parent_path)
+            parent_path = self._parent_path(parent_path)
+            grandparent = self.folders[parent_path]
+            grandparent["children"].remove(parent)
+            self.dirty.add(parent_path)
+            parent = grandparent
+
+    def mark_file_dirty(self, path: str):
+        self.dirty.add(self._parent_path(path))
+        self.dirty_files.add(path)
+
+    def _apply_contributions(self):
+        """Moves the dirty files' contributions in the folders whose values are kept, by delta."""
+        for path in self.dirty_files:
+            old = self._contributions.pop(path, None)
+            node = self.files.get(path)
+            new = self._contribution(node) if node is not None else None
+            if new is not None:
+                self._contributions[path] = new
+            if old == new:
+                continue
+            folder = self._parent_path(path)
+            while True:
+                below = self._below.get(folder)
+                if below is not None:
+                    values, blame = below
+                    if old is not None:
+                        for metric, value in zip(self._percentile_keys, old[0]):
+                            ordered = values[metric]
+                            del ordered[bisect.bisect_left(ordered, value)]
+                        for author, lines in old[1].items():
+                            remaining = blame[author] - lines
+                            if remaining:
+                                blame[author] = remaining
+                            else:
+                                del blame[author]
+                    if new is not None:
+                        for metric, value in zip(self._percentile_keys, new[0]):
+                            bisect.insort(values[metric], value)
+                        folder_tree.merge_blame_counts(blame, new[1])
+                if folder == ".":
+                    break
+                folder = self._parent_path(folder)
+        self.dirty_files.clear()
+
+    def files_below(self, path: str) -> List[str]:
+        """Paths of all files below the folder at path, from its subtree (none if there is no such folder)."""
+        folder = self.folders.get(path)
+        if folder is None:
+            return []
+        paths = []
+        stack = [folder]
+        while stack:
+            for child in stack.pop()["children"]:
+                if child["type"] == "folder":
+                    stack.append(child)
+                else:
+                    paths.append(child["path"])
+        return paths
+
+    def _values_below(self, path: str) -> Tuple[Dict[str, list], Dict[str, int]]:
+        """The kept values of a folder, collected from its subtree the first time."""
+        below = self._below.get(path)
+        if below is None:
+            values = {metric: [] for metric in self._percentile_keys}
+            blame = {}
+            for file_path in self.files_below(path):
+                file_values, counts = self._contributions[file_path]
+                for metric, value in zip(self._percentile_keys, file_values):
+                    values[metric].append(value)
+                folder_tree.merge_blame_counts(blame, counts)
+            for ordered in values.values():
+                ordered.sort()
+            below = self._below[path] = (values, blame)
+        return below
+
+    def reaggregate(self) -> int:
+        """Recomputes aggregates of dirty folders and their ancestors, deepest first."""
+        affected = set()
+        for path in self.dirty:
+            while path not in affected and path in self.folders:
+                affected.add(path)
+                if path == ".":
+                    break
+                path = self._parent_path(path)
+
+        for path in sorted(affected, key=lambda p: -1 if p == "." else p.count(os.sep), reverse=True):
+            folder = self.folders[path]
+            folder["children"].sort(key=lambda x: (x["type"] != "folder", x["name"]))
+            metrics_collector.aggregate_folder(folder)
+
+        # Percentiles and blame need the values of all files below, not just the children's metrics
+        self._apply_contributions()
+        for path in affected:
+            values, blame = self._values_below(path)
+            folder_metrics = self.folders[path]["metrics"]
+            folder_metrics.update(folder_tree.percentile_metrics(values, presorted=True))
+            if blame:
+                folder_metrics.update(folder_tree.blame_metrics(blame, folder_tree.BLAME_TOP_AUTHORS))
+            else:
+                for key in folder_tree.BLAME_METRICS:
+                    folder_metrics.pop(key, None)
+        self.dirty.clear()
+        self.reaggregated = affected
+        return len(affected)
+
+def update_dashboard(dashboard: dict, repo_root: str, base_commit: str, debug: bool = False,
+                     jobs: int = 1, cache=None, include_paths=None, scan_options=None, external=None,
+                     blame=None) -> dict:
+    """
+    Patches a previously generated dashboard tree in place with the changes since base_commit.
+    Only added, modified and renamed files are analyzed again; aggregates are recomputed along
+    the affected ancestor folders, and 'Included By' metrics are fixed up for touched headers.
+    Git info of all files comes from one history index pass, so staleness is measured at the
+    time of this run as in a full run. Changed paths outside the
+    include/exclude globs of scan_options are ignored. With report metrics (external, an
+    external_metrics.ExternalMetricsIndex), every file takes its values from the new reports.
+    With a git_analyzer.BlameIndex (blame), analyzed files get line-level ownership.
+    """
+    changes = get_changed_files(repo_root, base_commit)
+    logging.info(f"{len(changes)} changed paths since {base_commit}")
+    with get_profiler().stage("git history"):
+        git_history = git_analyzer.build_history_index(repo_root)
+    updated = apply_changes(DashboardTree(dashboard, repo_root), changes, debug=debug, jobs=jobs, cache=cache,
+                            include_paths=include_paths, scan_options=scan_options, external=external,
+                            blame=blame, git_history=git_history)
+    logging.info(f"Recomputed aggregates for {updated} folders.")
+    return dashboard
+
+def apply_changes(tree: "DashboardTree", changes: List[Tuple[str, str, str]], debug: bool = False, jobs: int = 1,
+                  cache=None, include_paths=None, scan_options=None, external=None,
+                  refresh_reports: bool = True, blame=None, git_history=None) -> int:
+    """
+    Applies (status, old_rel_path, new_rel_path) changes (see get_changed_files) to the tree and
+    returns the number of folders whose aggregates were recomputed. A changed path whose file
+    no longer exists, or that the git scanner of scan_options would not list because
+    .gitignore hides it, is removed. With refresh_reports, every file takes its report metrics from
+    external; otherwise only the analyzed files do. With a git_analyzer.GitHistoryIndex
+    (git_history), analyzed files take their git info from it and every other file is
+    refreshed from it too; without one, analyzed files look theirs up per file.
+    """
+    repo_root = tree.repo_root
+    to_remove = set()
+    to_analyze = []
+    for status, old_path, new_path in changes:
+        if status in ('D', 'R'):
+            to_remove.add(old_path)
+        if status != 'D' and scan_repo.is_collected_path(new_path, scan_options):
+            if os.path.isfile(os.path.join(repo_root, new_path)):
+                to_analyze.append(new_path)
+                to_remove.discard(new_path)
+            else:
+                to_remove.add(new_path)
+    ignored = scan_repo.ignored_paths(repo_root, to_analyze, scan_options)
+    if ignored:
+        to_analyze = [path for path in to_analyze if path not in ignored]
+        to_remove.update(ignored)
+
+    logging.info(f"{len(to_analyze)} files to analyze, {len(to_remove)} to remove")
+
+    for path in to_remove:
+        tree.remove_file(path)
+
+    file_paths = [os.path.join(repo_root, p) for p in to_analyze]
+    analyzed_files = metrics_collector.analyze_files(file_paths, repo_root, debug=debug, jobs=jobs, cache=cache,
+                                                     git_history=git_history, external=external, blame=blame)
+    analyzed_paths = set()
+    for file_data in analyzed_files:
+        tree.put_file(metrics_collector.build_file_node(file_data))
+        analyzed_paths.add(file_data["rel_path"])
+    # Files that failed to analyze must not keep stale data
+    for path in to_analyze:
+        if path not in analyzed_paths:
+            tree.remove_file(path)
+
+    # Staleness moves with time and commits since the previous run touch untouched files' history
+    if git_history is not None:
+        for path, node in tree.files.items():
+            if path in analyzed_paths:
+                continue
+            git_info = git_history.lookup(path) or metrics_collector.empty_git_info()
+            new = metrics_collector.git_node_metrics(git_info)
+            if any(node["metrics"].get(key) != value for key, value in new.items()):
+                node["metrics"].update(new)
+                tree.mark_file_dirty(path)
+
+    # A CODEOWNERS change can move ownership of any file
+    if any(old in CODEOWNERS_PATHS or new in CODEOWNERS_PATHS for _, old, new in changes):
+        rules = git_analyzer.parse_codeowners(repo_root)
+        for path, node in tree.files.items():
+            owner = git_analyzer.get_owner(os.path.join(repo_root, path), repo_root, rules)
+            if node["metrics"].get("owner") != owner:
+                node["metrics"]["owner"] = owner
+                tree.mark_file_dirty(path)
+
+    # Reports cover the whole tree, so any file's report metrics can change
+    if external is not None and refresh_reports:
+        for path, node in tree.files.items():
+            full_path = os.path.join(repo_root, path)
+            new = metrics_collector.external_node_metrics(
+                external.overlay(path, external_metrics.get_all_external_metrics(full_path)))
+            if any(node["metrics"].get(key) != value for key, value in new.items()):
+                node["metrics"].update(new)
+                tree.mark_file_dirty(path)
+
+    # Reverse edges: the include graph is rebuilt from every file's stored include list
+    # (no parsing), and only files whose include metrics changed are touched
+    with get_profiler().stage("include graph"):
+        include_metrics = include_graph.compute_include_metrics(
+            ((path, node["metrics"].get("includes_list", [])) for path, node in tree.files.items()),
+            repo_root, include_paths)
+    for path, node in tree.files.items():
+        new = include_metrics[path]
+        metrics = node["metrics"]
+        if (metrics.get("included_by_list") != new["included_by"]
+                or metrics.get("included_by_transitive") != new["included_by_transitive"]
+                or metrics.get("rebuild_tus") != new["rebuild_tus"]):
+            metrics["included_by_list"] = new["included_by"]
+            metrics["included_by"] = len(new["included_by"])
+            metrics["included_by_transitive"] = new["included_by_transitive"]
+            metrics["rebuild_tus"] = new["rebuild_tus"]
+            tree.mark_file_dirty(path)
+
+    with get_profiler().stage("aggregate"):
+        return tree.reaggregate()
@@ -0,0 +1,424 @@
+import os
+import json
+import gzip
+import time
+import ctypes
+import ctypes.util
+import errno
+import select
+import struct
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import scan_repo
+import incremental_update
+from incremental_update import CODEOWNERS_PATHS
+
+WATCH_MODES = ('auto', 'inotify', 'poll')
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Seconds between two polling passes over the tree
+DEFAULT_POLL_INTERVAL = 2.0
+# Files stat'ed per polling batch; the GIL is released between batches so requests are served
+POLL_BATCH_SIZE = 2000
+# After the first event, further events are collected for this long so that a save or a
+# checkout is applied as one batch
+SETTLE_SECONDS = 0.2
+
+DASHBOARD_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metrics_dashboard.html")
+DATA_PATH = "/dashboard_data.json"
+VERSION_PATH = "/version"
+# Response header that tells the dashboard page to poll for updates
+LIVE_HEADER = "X-Dashboard-Live"
+
+def _watched_extras(repo_root: str) -> Dict[str, str]:
+    """CODEOWNERS locations, which may be in hidden directories the scanners skip: rel_path -> full path."""
+    return {path: os.path.join(repo_root, path) for path in CODEOWNERS_PATHS}
+
+class PollingWatcher:
+    """
+    Detects changed files by comparing (mtime, size) of every collected file with the previous
+    pass. Files are stat'ed in batches; a pass also finds new and deleted files. Each pass lists
+    the files with the scanner of scan_options, so the git scanner leaves ignored files out.
+    """
+
+    def __init__(self, repo_root: str, scan_options: Optional[scan_repo.ScanOptions] = None,
+                 interval: float = DEFAULT_POLL_INTERVAL, batch_size: int = POLL_BATCH_SIZE):
+        self.repo_root = repo_root
+        self.scan_options = scan_repo.resolved_options(repo_root, scan_options)
+        self.interval = interval
+        self.batch_size = batch_size
+        self._snapshot = {}
+        self._next_pass = 0.0
+        self._scan()
+
+    def _stat(self, full_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _scan(self) -> Set[str]:
+        """One pass over the tree; updates the snapshot and returns the changed paths."""
+        snapshot = {}
+        paths = (rel_path.replace('/', os.sep) for rel_path in
+                 scan_repo.iter_scanned_paths(self.repo_root, self.scan_options))
+        batch = 0
+        for rel_path in paths:
+            state = self._stat(os.path.join(self.repo_root, rel_path))
+            if state is not None:
+                snapshot[rel_path] = state
+            batch += 1
+            if batch == self.batch_size:
+                batch = 0
+                time.sleep(0)
+        for rel_path, full_path in _watched_extras(self.repo_root).items():
+            state = self._stat(full_path)
+            if state is not None:
+                snapshot[rel_path] = state
+
+        previous = self._snapshot
+        changed = {path for path, state in snapshot.items() if previous.get(path) != state}
+        changed.update(path for path in previous if path not in snapshot)
+        self._snapshot = snapshot
+        return changed
+
+    def poll(self, timeout: float) -> Set[str]:
+        """Waits up to timeout seconds for changes; returns the changed repository-relative paths."""
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if now >= self._next_pass:
+                changed = self._scan()
+                self._next_pass = time.monotonic() + self.interval
+                if changed:
+                    return changed
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+            time.sleep(min(remaining, max(0.0, self._next_pass - time.monotonic())))
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """
+    Linux inotify watches on every directory the walk scanner descends into (through ctypes, no
+    extra dependency); with the git scanner, directories .gitignore hides are not watched.
+    Reports changed files and, for created, moved or deleted directories, the directory path;
+    "." if the kernel queue overflowed and everything must be rescanned.
+    """
+    IN_MODIFY = 0x2
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, repo_root: str, scan_options: Optional[scan_repo.ScanOptions] = None):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self._libc = libc
+        self.repo_root = repo_root
+        self.scan_options = scan_repo.resolved_options(repo_root, scan_options)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watch descriptor -> '/'-separated relative directory ('' for the root)
+        self._dirs = {}
+        try:
+            self._watch_tree('')
+            for rel_path in CODEOWNERS_PATHS:
+                rel_dir = os.path.dirname(rel_path).replace(os.sep, '/')
+                if rel_dir and os.path.isdir(os.path.join(repo_root, rel_dir)):
+                    self._add_watch(rel_dir)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, rel_dir: str):
+        path = os.fsencode(os.path.join(self.repo_root, rel_dir))
+        wd = self._libc.inotify_add_watch(self.fd, path, self.WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # A directory that vanished in the meantime is reported by its parent's watch
+            if error != errno.ENOENT:
+                raise OSError(error, f"inotify_add_watch failed for {rel_dir or '.'}: {os.strerror(error)}")
+            return
+        self._dirs[wd] = rel_dir
+
+    def _watch_tree(self, rel_dir: str):
+        """
+        Watches rel_dir and every directory below it that the scanner would enter, one level
+        at a time so that ignored directories are checked with one git call per level.
+        """
+        options = self.scan_options
+        level = [rel_dir] if not rel_dir or not scan_repo.ignored_paths(self.repo_root, [rel_dir], options) else []
+        while level:
+            below = []
+            for current in level:
+                self._add_watch(current)
+                try:
+                    with os.scandir(os.path.join(self.repo_root, current)) as it:
+                        for entry in it:
+                            rel = f"{current}/{entry.name}" if current else entry.name
+                            if entry.is_dir(follow_symlinks=False) and not entry.name.startswith('.') \
+                                    and not options.excludes_dir(rel):
+                                below.append(rel)
+                except OSError:
+                    pass
+            ignored = scan_repo.ignored_paths(self.repo_root, below, options)
+            level = [rel for rel in below if rel not in ignored]
+
+    def _read(self) -> Set[str]:
+        changed = set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                changed.add(".")
+                continue
+            rel_dir = self._dirs.get(wd)
+            if mask & self.IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if rel_dir is None or not name:
+                continue
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if mask & self.IN_ISDIR:
+                if name.startswith('.'):
+                    continue
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._watch_tree(rel_path)
+            changed.add(rel_path.replace('/', os.sep))
+        return changed
+
+    def poll(self, timeout: float) -> Set[str]:
+        """Waits up to timeout seconds for changes; returns the changed repository-relative paths."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = self._read()
+        deadline = time.monotonic() + SETTLE_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if readable:
+                changed |= self._read()
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def create_watcher(repo_root: str, scan_options: Optional[scan_repo.ScanOptions] = None, mode: str = 'auto',
+                   interval: float = DEFAULT_POLL_INTERVAL):
+    """An InotifyWatcher where available (mode 'auto' or 'inotify'), else a PollingWatcher."""
+    if mode not in WATCH_MODES:
+        raise ValueError(f"Unknown watch mode: {mode}")
+    if mode != 'poll':
+        try:
+            return InotifyWatcher(repo_root, scan_options)
+        except (OSError, AttributeError) as e:
+            if mode == 'inotify':
+                raise
+            logging.warning(f"inotify unavailable ({e}), polling every {interval}s instead")
+    return PollingWatcher(repo_root, scan_options, interval=interval)
+
+class LiveDashboard:
+    """
+    The analyzed dashboard tree kept in memory, patched with incremental_update.apply_changes
+    as files change, and its serialized form with a version number for HTTP clients. The JSON
+    of every folder is kept and only the folders the change reaggregated are serialized again;
+    the gzip'd form is made for the first client that asks for it.
+    """
+
+    def __init__(self, dashboard: dict, repo_root: str, **analysis_options):
+        self.tree = incremental_update.DashboardTree(dashboard, repo_root)
+        self.repo_root = repo_root
+        # debug, jobs, cache, include_paths, scan_options, external, blame as for apply_changes
+        self.analysis_options = analysis_options
+        if analysis_options.get("scan_options") is not None:
+            analysis_options["scan_options"] = scan_repo.resolved_options(repo_root, analysis_options["scan_options"])
+        # Versions start over with every process: the nonce keeps ETags of a restarted server
+        # from matching those of the previous one
+        self._nonce = os.urandom(4).hex()
+        self.version = 0
+        self._payload = None
+        # folder path -> JSON bytes of the folder and everything below it
+        self._fragments = {}
+        self._compressed = (0, b"")
+        self._compress_lock = threading.Lock()
+        self._publish(self.tree.folders)
+
+    def _fragment(self, folder: dict) -> bytes:
+        """The folder's JSON, with the kept JSON of its subfolders."""
+        children = []
+        for child in folder["children"]:
+            if child["type"] == "folder":
+                children.append(self._fragments[child["path"]])
+            else:
+                children.append(json.dumps(child, separators=(',', ':')).encode('utf-8'))
+        head = json.dumps({key: value for key, value in folder.items() if key != "children"},
+                          separators=(',', ':')).encode('utf-8')
+        return head[:-1] + b',"children":[' + b','.join(children) + b']}'
+
+    def _publish(self, changed_folders: Iterable[str]):
+        """Serializes the changed folders again, deepest first, and publishes a new version."""
+        for path in sorted(changed_folders, key=lambda p: -1 if p == "." else p.count(os.sep), reverse=True):
+            self._fragments[path] = self._fragment(self.tree.folders[path])
+        if len(self._fragments) > len(self.tree.folders):
+            for path in [path for path in self._fragments if path not in self.tree.folders]:
+                del self._fragments[path]
+        self.version += 1
+        # Immutable tuple, swapped in one assignment: request threads never see a partial update
+        self._payload = (self.version, f'"{self._nonce}-{self.version}"', self._fragments["."])
+
+    def payload(self) -> Tuple[int, str, bytes]:
+        """(version, ETag, JSON bytes) of the current tree."""
+        return self._payload
+
+    def compressed(self, payload: Tuple[int, str, bytes]) -> bytes:
+        """The gzip'd JSON bytes of a payload(), compressed once per version."""
+        with self._compress_lock:
+            version, data = self._compressed
+            if version != payload[0]:
+                data = gzip.compress(payload[2], compresslevel=5)
+                self._compressed = (payload[0], data)
+            return data
+
+    def _expand(self, rel_paths: Iterable[str]) -> Set[str]:
+        """Replaces directory paths (and "." for everything) by the files below them, on disk and in the tree."""
+        files = set()
+        options = self.analysis_options.get("scan_options")
+        for rel_path in rel_paths:
+            full_path = os.path.join(self.repo_root, rel_path)
+            if rel_path != "." and not os.path.isdir(full_path) and rel_path not in self.tree.folders:
+                files.add(rel_path)
+                continue
+            files.update(self.tree.files_below(rel_path))
+            if os.path.isdir(full_path):
+                # Listed like a full run would (git: tracked and non-ignored files only)
+                rel_dir = "" if rel_path == "." else rel_path.replace(os.sep, '/')
+                files.update(path.replace('/', os.sep)
+                             for path in scan_repo.iter_scanned_paths(self.repo_root, options, rel_dir))
+        return files
+
+    def apply(self, rel_paths: Iterable[str]) -> int:
+        """Re-analyzes the given changed paths and publishes a new version; returns the number of changed files."""
+        files = self._expand(rel_paths)
+        changes = [('M', path, path) for path in sorted(files)]
+        if not changes:
+            return 0
+        start = time.perf_counter()
+        blame = self.analysis_options.get("blame")
+        if blame is not None:
+            # Blame follows HEAD, which may have moved with the change
+            blame.refresh()
+        updated = incremental_update.apply_changes(self.tree, changes, refresh_reports=False, **self.analysis_options)
+        self._publish(self.tree.reaggregated)
+        logging.info(f"Applied {len(changes)} changed paths ({updated} folders) in "
+                     f"{time.perf_counter() - start:.2f}s, version {self.version}")
+        return len(changes)
+
+class _DashboardRequestHandler(BaseHTTPRequestHandler):
+    """Serves the dashboard page, the current data (with ETag) and the data version."""
+    server_version = "RepoAnalyzerLive"
+
+    def log_message(self, format, *args):
+        logging.debug("HTTP " + format % args)
+
+    def do_GET(self):
+        live = self.server.live
+        path = self.path.split('?', 1)[0]
+        if path in ("/", "/metrics_dashboard.html"):
+            try:
+                with open(DASHBOARD_HTML, 'rb') as f:
+                    self._send(200, "text/html; charset=utf-8", f.read())
+            except OSError:
+                self._send(404, "text/plain", b"metrics_dashboard.html not found")
+        elif path == DATA_PATH:
+            payload = live.payload()
+            version, etag, data = payload
+            if etag in (tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")):
+                self._send(304, None, b"", etag=etag)
+            elif "gzip" in self.headers.get("Accept-Encoding", ""):
+                self._send(200, "application/json", live.compressed(payload), etag=etag, encoding="gzip")
+            else:
+                self._send(200, "application/json", data, etag=etag)
+        elif path == VERSION_PATH:
+            version, etag, _ = live.payload()
+            self._send(200, "application/json", json.dumps({"version": version, "etag": etag}).encode('utf-8'))
+        else:
+            self._send(404, "text/plain", b"Not found")
+
+    def _send(self, status: int, content_type: Optional[str], body: bytes, etag: Optional[str] = None,
+              encoding: Optional[str] = None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header(LIVE_HEADER, "1")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+def create_server(live: LiveDashboard, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _DashboardRequestHandler)
+    server.daemon_threads = True
+    server.live = live
+    return server
+
+def serve(live: LiveDashboard, watcher, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          should_stop=lambda: False):
+    """
+    Serves the dashboard over HTTP and applies file changes reported by watcher until
+    interrupted (or should_stop() returns True).
+    """
+    server = create_server(live, host, port)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logging.info(f"Serving the live dashboard at http://{server.server_address[0]}:{server.server_address[1]}/ "
+                 f"({type(watcher).__name__})")
+    try:
+        while not should_stop():
+            changed = watcher.poll(timeout=1.0)
+            if changed:
+                try:
+                    live.apply(changed)
+                except Exception as e:
+                    logging.error(f"Failed to apply changes: {e}", exc_info=True)
+    except KeyboardInterrupt:
+        logging.info("Stopping the live dashboard")
+    finally:
+        server.shutdown()
+        server.server_close()
+        watcher.close()
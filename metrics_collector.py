@@ -1,270 +1,400 @@
 import os
 import logging
+import collections
+import functools
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 try:
     from tqdm import tqdm
 except ImportError:
-    def tqdm(iterable, desc=None):
+    def tqdm(iterable, desc=None, **kwargs):
         return iterable
 
 import scan_repo
 import cpp_parser
 import git_analyzer
 import external_metrics
+import analysis_cache
+import include_graph
+import folder_tree
+from profiler import get_profiler
 
-def collect_metrics_for_repo(repo_root: str, debug: bool = False):
+# Files handed to a worker per task in parallel mode
+DEFAULT_CHUNK_SIZE = 32
+# Blames queued per blame worker ahead of the record being yielded
+BLAME_QUEUE_PER_JOB = 4
+
+def collect_metrics_for_repo(repo_root: str, debug: bool = False, jobs: int = 1, cache=None,
+                             include_paths=None, scan_options=None, external=None, blame=None):
     """
     Main function to scan repo and collect all metrics.
     Returns a flat list of file artifacts with metrics.
+    With jobs > 1 files are analyzed in parallel; the result is identical to the serial run.
+    If an AnalysisCache is given, only files whose content changed are parsed again.
+    Includes are resolved against include_paths (an include_graph.IncludePaths).
+    Files are listed according to scan_options (a scan_repo.ScanOptions) and analyzed while
+    the scan is still running. Report metrics of an external_metrics.ExternalMetricsIndex
+    (external) replace the per-file external metrics. With a git_analyzer.BlameIndex (blame),
+    files get line-level ownership from git blame.
     """
-    files = scan_repo.collect_files(repo_root)
-    code_owner_rules = git_analyzer.parse_codeowners(repo_root)
-    
-    analyzed_files = []
-    
-    # Progress bar setup
-    iterator = tqdm(files, desc="Analyzing files") if not debug else files
-    
-    for file_path in iterator:
-        try:
-            # 1. Basic Info
-            size = os.path.getsize(file_path)
-            
-            # 2. Static Analysis
-            cpp_metrics = cpp_parser.parse_cpp_file(file_path)
-            
-            # 3. Git Info
-            git_info = git_analyzer.get_git_info(file_path, repo_root)
-            if not git_info:
-                # Default values if git info retrieval fails
-                git_info = {
-                    "days_silent": 0, "last_author": "Unknown", 
-                    "commit_count": 0, "staleness_score": 0, "last_modified_ts": 0
-                }
-                
-            # 4. Code Owner
-            owner = git_analyzer.get_owner(file_path, repo_root, code_owner_rules)
-            
-            # 5. External Metrics
-            ext_metrics = external_metrics.get_all_external_metrics(file_path)
-            
-            # Combine all
-            file_data = {
-                "name": os.path.basename(file_path),
-                "path": file_path,
-                "rel_path": os.path.relpath(file_path, repo_root),
-                "type": "file",
-                "size": size,
-                "loc": cpp_metrics["loc"],
-                "classes": cpp_metrics["classes"],
-                "includes": cpp_metrics["includes"],
-                "owner": owner,
-                "git": git_info,
-                "external": ext_metrics,
-                # Placeholders for "Included By" (calculated later if needed, or simplistic approach)
-                "included_by": [] 
-            }
-            analyzed_files.append(file_data)
-            
-        except Exception as e:
-            logging.error(f"Failed to analyze {file_path}: {e}")
+    profiler = get_profiler()
+    files = profiler.iterate("scan", scan_repo.iter_files(repo_root, scan_options))
+    # One pass over the history instead of two git processes per file
+    with profiler.stage("git history"):
+        git_history = git_analyzer.build_history_index(repo_root)
+
+    analyzed_files = analyze_files(files, repo_root, debug=debug, jobs=jobs, cache=cache, git_history=git_history,
+                                   external=external, blame=blame)
+
+    # Post-processing: Calculate 'Included By' from the resolved include graph
+    with profiler.stage("include graph"):
+        link_includes(analyzed_files, repo_root, include_paths)
             
-    # Post-processing: Calculate 'Included By'
-    # Build map of Header -> [Files including it]
-    # This is rough because C++ includes can be ambiguous (path relative vs absolute)
-    include_map = {}
+    return analyzed_files
+
+def analyze_files(files, repo_root: str, debug: bool = False, jobs: int = 1, cache=None, git_history=None,
+                  external=None, blame=None):
+    """
+    Analyzes the given files and returns their records in input order (without 'Included By').
+    Without a git history index, git info is looked up per file.
+    """
+    return list(iter_analyzed_files(files, repo_root, debug=debug, jobs=jobs, cache=cache, git_history=git_history,
+                                    external=external, blame=blame))
+
+def iter_analyzed_files(files, repo_root: str, debug: bool = False, jobs: int = 1, cache=None, git_history=None,
+                        external=None, blame=None):
+    """Generator version of analyze_files: yields each record as soon as it is ready."""
+    with get_profiler().stage("codeowners"):
+        code_owner_rules = git_analyzer.parse_codeowners(repo_root)
     
-    # First pass: Index all files by name (simple assumption) AND relative path
-    file_map = {f["name"]: f["rel_path"] for f in analyzed_files}
+    if jobs > 1:
+        results = _analyze_files_parallel(files, repo_root, code_owner_rules, git_history, jobs, cache=cache)
+    else:
+        results = _analyze_files_serial(files, repo_root, code_owner_rules, git_history, cache=cache)
+    if blame is not None:
+        results = _with_blame(results, blame)
+
+    # Progress bar setup
+    total = len(files) if hasattr(files, '__len__') else None
+    iterator = tqdm(results, desc="Analyzing files", total=total) if not debug else results
     
+    for file_path, file_data, error in iterator:
+        if error is not None:
+            logging.error(f"Failed to analyze {file_path}: {error}")
+        else:
+            # Report metrics depend on the report, not the file content, so they stay out of the cache
+            if external is not None:
+                file_data["external"] = external.overlay(file_data["rel_path"], file_data["external"])
+            yield file_data
+
+    if blame is not None:
+        logging.info(f"Blame: {blame.hits} cached, {blame.misses} blamed")
+    if cache is not None:
+        logging.info(f"Analysis cache: {cache.hits} hits, {cache.misses} misses")
+        cache.evict()
+
+def _with_blame(results, blame):
+    """
+    Adds file_data["blame"] (surviving lines per author) to analyzed records, in input order.
+    Blames of the next records run on the blame index's workers while a record waits.
+    """
+    window = blame.jobs * BLAME_QUEUE_PER_JOB
+    pending = collections.deque()
+    for file_path, file_data, error in results:
+        future = blame.submit(file_data["rel_path"]) if error is None else None
+        pending.append((file_path, file_data, error, future))
+        if len(pending) > window:
+            yield _blamed(*pending.popleft())
+    while pending:
+        yield _blamed(*pending.popleft())
+
+def _blamed(file_path: str, file_data, error, future) -> tuple:
+    if future is not None:
+        file_data["blame"] = future.result()
+    return file_path, file_data, error
+
+def link_includes(analyzed_files: list, repo_root: str, include_paths=None):
+    """Fills direct and transitive 'Included By' metrics of the file records in place."""
+    include_metrics = include_graph.compute_include_metrics(
+        ((f["rel_path"], f["includes"]) for f in analyzed_files), repo_root, include_paths)
     for f in analyzed_files:
-        for inc in f["includes"]:
-            # Clean up include path (remove < > " ")
-            inc_name = os.path.basename(inc)
-            if inc_name not in include_map:
-                include_map[inc_name] = []
-            include_map[inc_name].append(f["rel_path"])
-            
-    # Assign 'Included By'
-    for f in analyzed_files:
-        fname = f["name"]
-        if fname in include_map:
-            f["included_by"] = include_map[fname]
-            
-    return analyzed_files
+        f.update(include_metrics[f["rel_path"]])
 
 def aggregate_metrics_for_dashboard(analyzed_files: list, repo_root: str):
     """
     Converts flat file list into a nested folder structure with aggregated metrics.
-    Stores full system paths for file linking.
+    Stores full system paths for file linking. Folders are rolled up on a
+    folder_tree.FolderTree, so deep trees do not hit the recursion limit.
     """
-    root = {
-        "name": "Root",
+    tree = folder_tree.FolderTree(repo_root)
+    tree.add_files(map(build_file_node, analyzed_files))
+    return tree.to_nested()
+
+def build_folder_node(name: str, path: str, full_path: str, children=None) -> dict:
+    """Creates an empty folder node; metrics are filled in by aggregate_folder."""
+    return {
+        "name": name,
         "type": "folder",
-        "path": ".",
-        "full_path": repo_root,
-        "children": {},  # Use dict for easy lookup during construction
+        "path": path,
+        "full_path": full_path,
+        "children": children if children is not None else [],
         "metrics": _empty_metrics()
     }
-    
-    for file_data in analyzed_files:
-        parts = file_data["rel_path"].split(os.sep)
-        current = root
-        
-        # Traverse/Create folders
-        current_abs_path = repo_root
-        for i, part in enumerate(parts[:-1]):
-            current_abs_path = os.path.join(current_abs_path, part)
-            if part not in current["children"]:
-                current["children"][part] = {
-                    "name": part,
-                    "type": "folder",
-                    "path": os.path.join(current["path"], part) if current["path"] != "." else part,
-                    "full_path": current_abs_path,
-                    "children": {},
-                    "metrics": _empty_metrics()
-                }
-            current = current["children"][part]
-            
-        # Add file
-        filename = parts[-1]
-        # Flatten metrics for the node
-        file_node = {
-            "name": filename,
-            "type": "file",
-            "path": file_data["rel_path"],
-            "full_path": file_data["path"],
-            "metrics": {
-                "loc": file_data["loc"],
-                "size": file_data["size"],
-                "classes": len(file_data["classes"]),
-                "classes_list": file_data["classes"],
-                "includes": len(file_data["includes"]),
-                "includes_list": file_data["includes"],
-                "included_by": len(file_data["included_by"]),
-                "included_by_list": file_data["included_by"],
-                "owner": file_data["owner"],
-                "staleness": file_data["git"]["staleness_score"],
-                "last_author": file_data["git"]["last_author"],
-                "commit_count": file_data["git"]["commit_count"],
-                "misra_crit": file_data["external"]["misra_critical"],
-                "misra_med": file_data["external"]["misra_medium"],
-                "coverage": file_data["external"]["coverage"],
-                 # Add other external metrics if needed aggregated
-            }
+
+def build_file_node(file_data: dict) -> dict:
+    """Converts a per-file record into a dashboard file node with flattened metrics."""
+    return {
+        "name": file_data["name"],
+        "type": "file",
+        "path": file_data["rel_path"],
+        "full_path": file_data["path"],
+        "metrics": {
+            "loc": file_data["loc"],
+            "comment_loc": file_data["comment_loc"],
+            "size": file_data["size"],
+            "classes": len(file_data["classes"]),
+            "classes_list": file_data["classes"],
+            "includes": len(file_data["includes"]),
+            "includes_list": file_data["includes"],
+            "included_by": len(file_data["included_by"]),
+            "included_by_list": file_data["included_by"],
+            "included_by_transitive": file_data["included_by_transitive"],
+            "rebuild_tus": file_data["rebuild_tus"],
+            "owner": file_data["owner"],
+            **git_node_metrics(file_data["git"]),
+            **external_node_metrics(file_data["external"]),
+             # Add other external metrics if needed aggregated
+            **(folder_tree.blame_metrics(file_data["blame"]) if file_data.get("blame") else {}),
         }
-        current["children"][filename] = file_node
+    }
 
-    # Recursive Aggregation
-    _aggregate_recursive(root)
-    
-    # Convert 'children' dicts to lists for JSON
-    _convert_children_to_list(root)
-    
-    # Pass the root children as the result (or the root itself)
-    return root
+def git_node_metrics(git_info: dict) -> dict:
+    """The dashboard metrics taken from a file's git info."""
+    return {
+        "staleness": git_info["staleness_score"],
+        "last_author": git_info["last_author"],
+        "commit_count": git_info["commit_count"],
+    }
 
-def _empty_metrics():
+def external_node_metrics(ext_metrics: dict) -> dict:
+    """The dashboard metrics taken from a file's external metrics."""
     return {
-        "loc": 0, "size": 0, "classes": 0, "includes": 0, "included_by": 0,
-        "misra_crit": 0, "misra_med": 0, "staleness": 0, # Avg?
-        "coverage": 0.0 # Avg?
+        "misra_crit": ext_metrics["misra_critical"],
+        "misra_med": ext_metrics["misra_medium"],
+        "coverage": ext_metrics["coverage"],
+        # Only known with an "elf" report (elf_symbols); older cache entries lack the split
+        "symbol_size": ext_metrics.get("symbol_size", 0),
+        "code_size": ext_metrics.get("code_size", 0),
+        "data_size": ext_metrics.get("data_size", 0),
     }
 
-def _aggregate_recursive(node):
-    if node["type"] == "file":
-        return node["metrics"]
-    
-    # It's a folder
-    total_loc = 0
-    total_size = 0
-    total_classes = 0
-    total_includes = 0
-    total_included_by = 0
-    total_misra_crit = 0
-    total_misra_med = 0
-    
-    staleness_sum = 0
-    coverage_sum = 0
-    count = 0
-    
-    # We also keep ownership if uniform, or "Mixed"
-    owners = set()
-    
-    for child in node["children"].values():
-        start_node_type = child.get("type", "file") # safety
-        child_metrics = _aggregate_recursive(child)
-        
-        total_loc += child_metrics.get("loc", 0)
-        total_size += child_metrics.get("size", 0)
-        total_classes += child_metrics.get("classes", 0)
-        total_includes += child_metrics.get("includes", 0)
-        total_included_by += child_metrics.get("included_by", 0)
-        total_misra_crit += child_metrics.get("misra_crit", 0)
-        total_misra_med += child_metrics.get("misra_med", 0)
-        
-        staleness_sum += child_metrics.get("staleness", 0)
-        coverage_sum += child_metrics.get("coverage", 0)
-        
-        if "owner" in child_metrics:
-            owners.add(child_metrics["owner"])
-        elif "owner" in child: # File node stores it at root of obj, Folder in metrics? No wait.
-             # File node: 
-             # file_node["metrics"]... no owner there in my code above?
-             # Ah, I put owner in metrics for file_node in loop above. Yes.
-             pass
-             
-        # For folders, owner might be in metrics
-        if "owner" in child_metrics and child_metrics["owner"] != "Mixed":
-             owners.add(child_metrics["owner"])
-             
-        count += 1
-        
-    node["metrics"]["loc"] = total_loc
-    node["metrics"]["size"] = total_size
-    node["metrics"]["classes"] = total_classes
-    node["metrics"]["includes"] = total_includes
-    node["metrics"]["included_by"] = total_included_by
-    node["metrics"]["misra_crit"] = total_misra_crit
-    node["metrics"]["misra_med"] = total_misra_med
-    
-    if count > 0:
-        node["metrics"]["staleness"] = round(staleness_sum / count, 2)
-        node["metrics"]["coverage"] = round(coverage_sum / count, 2)
-        
+def _empty_metrics():
+    return folder_tree.empty_folder_metrics()
+
+def _iter_children(node):
+    children = node.get("children", [])
+    return children.values() if isinstance(children, dict) else children
+
+def aggregate_folder(node):
+    """
+    Recomputes a folder's metrics from the metrics of its direct children, rolled up as
+    described in folder_tree. Percentile metrics need the values of all files below the
+    folder and are left to the caller (folder_tree.percentile_metrics), as are the blame
+    metrics, which need the lines per author of all files below (folder_tree.blame_metrics).
+    Works on folders whose children are still a dict (construction) or already a list.
+    """
+    metrics = node["metrics"]
+    children = [child["metrics"] for child in _iter_children(node)]
+
+    for key in folder_tree.SUM_METRICS:
+        metrics[key] = sum(child.get(key, 0) for child in children)
+    for key in folder_tree.MAX_METRICS:
+        metrics[key] = max((child.get(key, 0) for child in children), default=0)
+
+    if children:
+        for key in folder_tree.MEAN_METRICS:
+            metrics[key] = round(sum(child.get(key, 0) for child in children) / len(children), 2)
+        for key in folder_tree.WEIGHTED_METRICS:
+            values = [folder_tree.weighted_value(child, key) for child in children]
+            if metrics["loc"] > 0:
+                weighted_sum = sum(child.get("loc", 0) * value for child, value in zip(children, values))
+                metrics[key] = round(weighted_sum / metrics["loc"], 2)
+            else:
+                metrics[key] = round(sum(values) / len(children), 2)
+
     # Owner Logic for Folder
     # If all children have same owner, folder has that owner.
     # If mixed, "Mixed".
-    # Need to check file nodes specifically too.
-    # Actually, let's simplify:
-    # If I see "owner" in child_metrics, I use it.
-    
-    # Wait, file_node has "owner" inside "metrics" dict in my code above:
-    # "owner": file_data["owner"], INSIDE "metrics" key?
-    # Yes: node["metrics"] = { ... "owner": ... }
-    
-    unique_owners = set()
-    for child in node["children"].values():
-         m = child["metrics"]
-         if "owner" in m:
-             unique_owners.add(m["owner"])
-             
+    # File nodes and aggregated folders both carry "owner" in their metrics
+    unique_owners = {child["owner"] for child in children if "owner" in child}
     if len(unique_owners) == 1:
-        node["metrics"]["owner"] = list(unique_owners)[0]
+        metrics["owner"] = next(iter(unique_owners))
     elif len(unique_owners) > 1:
-        node["metrics"]["owner"] = "Mixed"
+        metrics["owner"] = folder_tree.MIXED_OWNER
     else:
-        node["metrics"]["owner"] = "Unassigned"
-
-    return node["metrics"]
-
-def _convert_children_to_list(node):
-    if "children" in node and isinstance(node["children"], dict):
-        # Convert dict to list
-        children_list = list(node["children"].values())
-        # Sort by name (folders first? or mixed?)
-        # Let's sort folders first, then files
-        children_list.sort(key=lambda x: (x["type"] != "folder", x["name"]))
-        node["children"] = children_list
-        
-        for child in children_list:
-            _convert_children_to_list(child)
+        metrics["owner"] = folder_tree.NO_OWNER
+
+    return metrics
+
+def empty_git_info() -> dict:
+    """Default values if git info retrieval fails."""
+    return {
+        "days_silent": 0, "last_author": "Unknown", 
+        "commit_count": 0, "staleness_score": 0, "last_modified_ts": 0
+    }
+
+def _collect_file_context(file_path: str, repo_root: str, code_owner_rules, git_history):
+    """Size, git info and owner of a file (the I/O-bound steps)."""
+    # Basic Info
+    size = os.path.getsize(file_path)
+
+    profiler = get_profiler()
+
+    # Git Info
+    git_info = profiler.call("git", file_path, git_analyzer.get_git_info, file_path, repo_root, git_history)
+    if not git_info:
+        git_info = empty_git_info()
+
+    # Code Owner
+    owner = profiler.call("owner", file_path, git_analyzer.get_owner, file_path, repo_root, code_owner_rules)
+
+    return size, git_info, owner
+
+def _static_metrics(file_path: str, cache=None):
+    """
+    Parser output and external metrics of a file, served from the analysis cache when
+    the file content is unchanged. Returns (cpp_metrics, ext_metrics, cache_hit).
+    """
+    if cache is None:
+        return (cpp_parser.parse_cpp_file(file_path),
+                external_metrics.get_all_external_metrics(file_path), False)
+
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    key = analysis_cache.blob_oid(data)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry["cpp"], entry["external"], True
+
+    cpp_metrics = cpp_parser.parse_cpp_bytes(data)
+    ext_metrics = external_metrics.get_all_external_metrics(file_path)
+    cache.put(key, {"cpp": cpp_metrics, "external": ext_metrics})
+    return cpp_metrics, ext_metrics, False
+
+def build_file_data(file_path: str, repo_root: str, static: tuple, context: tuple) -> dict:
+    """Combines parser output and file context into the per-file record."""
+    cpp_metrics, ext_metrics, _ = static
+    size, git_info, owner = context
+    return {
+        "name": os.path.basename(file_path),
+        "path": file_path,
+        "rel_path": os.path.relpath(file_path, repo_root),
+        "type": "file",
+        "size": size,
+        "loc": cpp_metrics["loc"],
+        "comment_loc": cpp_metrics["comment_loc"],
+        "classes": cpp_metrics["classes"],
+        "includes": cpp_metrics["includes"],
+        "owner": owner,
+        "git": git_info,
+        "external": ext_metrics,
+        # Placeholders for "Included By", filled in by link_includes
+        "included_by": [],
+        "included_by_transitive": 0,
+        "rebuild_tus": 0
+    }
+
+def _analyze_files_serial(files, repo_root: str, code_owner_rules, git_history, cache=None):
+    """Yields (file_path, file_data, error) for each file, in order."""
+    profiler = get_profiler()
+    for file_path in files:
+        try:
+            context = _collect_file_context(file_path, repo_root, code_owner_rules, git_history)
+            # Static Analysis
+            static = profiler.call("parse", file_path, _static_metrics, file_path, cache)
+            profiler.add_bytes("parse", context[0])
+            if cache is not None:
+                cache.record(static[2])
+            yield file_path, build_file_data(file_path, repo_root, static, context), None
+        except Exception as e:
+            yield file_path, None, e
+
+def _static_chunk(file_paths: list, cache=None, profile: bool = False) -> tuple:
+    """
+    Process pool task: parsing and external metrics for a chunk of files.
+    Returns the results and, if profile is set, (start, wall, cpu, pid) per file for the
+    profiler of the parent process.
+    """
+    results = []
+    timings = [] if profile else None
+    for file_path in file_paths:
+        if profile:
+            start = time.perf_counter()
+            cpu = time.thread_time()
+        try:
+            results.append((_static_metrics(file_path, cache), None))
+        except Exception as e:
+            results.append((None, f"{e}"))
+        if profile:
+            timings.append((start, time.perf_counter() - start, time.thread_time() - cpu, os.getpid()))
+    return results, timings
+
+def _context_chunk(file_paths: list, repo_root: str, code_owner_rules, git_history) -> list:
+    """Thread pool task: I/O-bound steps for a chunk of files."""
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append((_collect_file_context(file_path, repo_root, code_owner_rules, git_history), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+def _iter_chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _analyze_files_parallel(files, repo_root: str, code_owner_rules, git_history, jobs: int,
+                            cache=None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Yields (file_path, file_data, error) for each file, in input order.
+    Parsing runs in a process pool and the remaining steps in a thread pool; files are
+    handed out in chunks and only a bounded number of chunks is in flight at once.
+    """
+    profiler = get_profiler()
+    static_task = functools.partial(_static_chunk, cache=cache, profile=profiler.enabled)
+    context_task = functools.partial(_context_chunk, repo_root=repo_root,
+                                     code_owner_rules=code_owner_rules, git_history=git_history)
+    max_pending = jobs * 2
+    pending = collections.deque()
+
+    def drain(entry):
+        chunk, static_future, context_future = entry
+        static_results, timings = static_future.result()
+        for i, (file_path, (static, static_error), (context, context_error)) in enumerate(zip(
+                chunk, static_results, context_future.result())):
+            if timings is not None:
+                start, wall, cpu, pid = timings[i]
+                profiler.record("parse", file_path, start, wall, cpu, tid=pid)
+                if context is not None:
+                    profiler.add_bytes("parse", context[0])
+            error = context_error or static_error
+            if error is not None:
+                yield file_path, None, error
+                continue
+            if cache is not None:
+                cache.record(static[2])
+            yield file_path, build_file_data(file_path, repo_root, static, context), None
+
+    with ProcessPoolExecutor(max_workers=jobs) as processes, ThreadPoolExecutor(max_workers=jobs) as threads:
+        for chunk in _iter_chunks(files, chunk_size):
+            pending.append((chunk, processes.submit(static_task, chunk), threads.submit(context_task, chunk)))
+            if len(pending) >= max_pending:
+                yield from drain(pending.popleft())
+        while pending:
+            yield from drain(pending.popleft())
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import heapq
+import itertools
+import threading
+import contextlib
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence
+
+# Slowest files kept per stage for the summary and the trace
+DEFAULT_TOP_FILES = 10
+# Subprocess events beyond this many are only counted, so the trace stays loadable
+MAX_SUBPROCESS_EVENTS = 10000
+
+class NullProfiler:
+    """
+    Profiler that records nothing; the active profiler unless --profile is given.
+    Every method returns immediately, so instrumented code costs one call when profiling is off.
+    """
+    enabled = False
+
+    def stage(self, name: str):
+        return _NULL_CONTEXT
+
+    def subprocess(self, cmd: Sequence[str]):
+        return _NULL_CONTEXT
+
+    def call(self, stage: str, key: str, func: Callable, *args):
+        return func(*args)
+
+    def iterate(self, stage: str, iterable: Iterable) -> Iterable:
+        return iterable
+
+    def record(self, stage: str, key: Optional[str], start: float, wall: float, cpu: float = 0.0,
+               tid: Optional[int] = None):
+        pass
+
+    def add_bytes(self, stage: str, count: int):
+        pass
+
+_NULL_CONTEXT = contextlib.nullcontext()
+NULL_PROFILER = NullProfiler()
+_active = NULL_PROFILER
+
+def get_profiler():
+    """The active profiler (NULL_PROFILER unless set_profiler was called)."""
+    return _active
+
+def set_profiler(profiler) -> None:
+    global _active
+    _active = profiler if profiler is not None else NULL_PROFILER
+
+class _StageStats:
+    __slots__ = ("calls", "wall", "cpu", "bytes_read", "slowest")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.bytes_read = 0
+        # Min-heap of (wall, seq, key, start, tid): the slowest files of the stage
+        self.slowest = []
+
+class Profiler:
+    """
+    Records wall and CPU time per stage, subprocess counts and durations, bytes read and the
+    slowest files per stage. Whole-run stages (stage()) and subprocesses become complete events
+    of a Chrome trace (write_trace), viewable in chrome://tracing or Perfetto; per-file stages
+    (call(), record()) are summed, and only their slowest files are added to the trace.
+    Safe to use from threads; timings of worker processes are passed in through record().
+    """
+    enabled = True
+
+    def __init__(self, top_files: int = DEFAULT_TOP_FILES):
+        self.top_files = top_files
+        self.pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._stages = {}
+        # Subprocess name ("git log") -> [count, wall]
+        self._subprocesses = {}
+        self._events = []
+        self._dropped_events = 0
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _stats(self, stage: str) -> _StageStats:
+        stats = self._stages.get(stage)
+        if stats is None:
+            stats = self._stages[stage] = _StageStats()
+        return stats
+
+    def _event(self, name: str, category: str, start: float, wall: float, tid: Optional[int] = None, args=None):
+        event = {"name": name, "cat": category, "ph": "X", "ts": round((start - self._origin) * 1e6, 1),
+                 "dur": round(wall * 1e6, 1), "pid": self.pid, "tid": tid or threading.get_ident()}
+        if args:
+            event["args"] = args
+        self._events.append(event)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Times a block as one call of stage name."""
+        start = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            cpu = time.process_time() - cpu
+            with self._lock:
+                stats = self._stats(name)
+                stats.calls += 1
+                stats.wall += wall
+                stats.cpu += cpu
+                self._event(name, "stage", start, wall, args={"cpu_ms": round(cpu * 1e3, 3)})
+
+    @contextlib.contextmanager
+    def subprocess(self, cmd: Sequence[str]):
+        """Times a subprocess from start until it has been waited for."""
+        name = " ".join(cmd[:2])
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            with self._lock:
+                entry = self._subprocesses.setdefault(name, [0, 0.0])
+                entry[0] += 1
+                entry[1] += wall
+                if sum(count for count, _ in self._subprocesses.values()) <= MAX_SUBPROCESS_EVENTS:
+                    self._event(name, "subprocess", start, wall, args={"cmd": " ".join(cmd)})
+                else:
+                    self._dropped_events += 1
+
+    def call(self, stage: str, key: str, func: Callable, *args):
+        """Calls func(*args) as the work of stage on one file (key)."""
+        start = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            return func(*args)
+        finally:
+            self.record(stage, key, start, time.perf_counter() - start, time.thread_time() - cpu)
+
+    def iterate(self, stage: str, iterable: Iterable) -> Iterator:
+        """Yields from iterable, counting the time spent producing items as stage."""
+        iterator = iter(iterable)
+        first = None
+        wall = cpu = 0.0
+        count = 0
+        while True:
+            start = time.perf_counter()
+            thread_cpu = time.thread_time()
+            if first is None:
+                first = start
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                wall += time.perf_counter() - start
+                cpu += time.thread_time() - thread_cpu
+            count += 1
+            yield item
+        with self._lock:
+            stats = self._stats(stage)
+            stats.calls += count
+            stats.wall += wall
+            stats.cpu += cpu
+            # Interleaved with the consumer: the event spans the whole iteration
+            self._event(stage, "stage", first, time.perf_counter() - first,
+                        args={"busy_ms": round(wall * 1e3, 3), "items": count})
+
+    def record(self, stage: str, key: Optional[str], start: float, wall: float, cpu: float = 0.0,
+               tid: Optional[int] = None):
+        """Adds one call of stage on file key, timed elsewhere (start is a perf_counter value)."""
+        with self._lock:
+            stats = self._stats(stage)
+            stats.calls += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            if key is not None and self.top_files > 0:
+                entry = (wall, next(self._seq), key, start, tid or threading.get_ident())
+                if len(stats.slowest) < self.top_files:
+                    heapq.heappush(stats.slowest, entry)
+                elif wall > stats.slowest[0][0]:
+                    heapq.heapreplace(stats.slowest, entry)
+
+    def add_bytes(self, stage: str, count: int):
+        with self._lock:
+            self._stats(stage).bytes_read += count
+
+    def slowest_files(self, stage: str) -> List[tuple]:
+        """(key, wall) of the slowest files of stage, slowest first."""
+        stats = self._stages.get(stage)
+        if stats is None:
+            return []
+        return [(key, wall) for wall, _, key, _, _ in sorted(stats.slowest, reverse=True)]
+
+    def trace_events(self) -> List[dict]:
+        events = list(self._events)
+        for stage, stats in self._stages.items():
+            for wall, _, key, start, tid in stats.slowest:
+                event = {"name": f"{stage} {os.path.basename(key)}", "cat": "file", "ph": "X",
+                         "ts": round((start - self._origin) * 1e6, 1), "dur": round(wall * 1e6, 1),
+                         "pid": self.pid, "tid": tid, "args": {"path": key}}
+                events.append(event)
+        events.sort(key=lambda e: e["ts"])
+        return events
+
+    def write_trace(self, output_path: str):
+        """Writes the Chrome trace-event JSON file."""
+        trace = {"traceEvents": self.trace_events(), "displayTimeUnit": "ms",
+                 "otherData": {"dropped_subprocess_events": self._dropped_events}}
+        try:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(trace, f)
+        except Exception as e:
+            raise IOError(f"Failed to write profile trace to {output_path}: {e}")
+
+    def summary(self) -> str:
+        """Summary table of stages, subprocesses and the slowest files per stage."""
+        lines = [f"{'Stage':<24}{'Calls':>10}{'Wall s':>10}{'CPU s':>10}{'MB read':>10}"]
+        for stage, stats in self._stages.items():
+            lines.append(f"{stage:<24}{stats.calls:>10}{stats.wall:>10.3f}{stats.cpu:>10.3f}"
+                         f"{stats.bytes_read / (1024 * 1024):>10.1f}")
+        if self._subprocesses:
+            lines.append("")
+            lines.append(f"{'Subprocess':<24}{'Count':>10}{'Wall s':>10}")
+            for name, (count, wall) in sorted(self._subprocesses.items(), key=lambda item: -item[1][1]):
+                lines.append(f"{name:<24}{count:>10}{wall:>10.3f}")
+        for stage in self._stages:
+            slowest = self.slowest_files(stage)
+            if slowest:
+                lines.append("")
+                lines.append(f"Slowest files ({stage}):")
+                lines.extend(f"  {wall * 1e3:10.2f} ms  {key}" for key, wall in slowest)
+        return "\n".join(lines)
@@ -0,0 +1,313 @@
+import os
+import re
+import csv
+import sys
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+STORE_FORMAT = "repo_analyzer-results"
+STORE_VERSION = 4
+# First bytes of every SQLite database file, checked by load_dashboard
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+# Metric columns of both tables; the full metrics of each node are kept as JSON next to them.
+# Metrics of optional passes (--coupling, --duplicates) are NULL in runs without them
+NUMERIC_COLUMNS = ("loc", "comment_loc", "size", "classes", "includes", "included_by", "included_by_transitive",
+                   "rebuild_tus", "misra_crit", "misra_med", "coverage", "staleness", "blame_share",
+                   "churn", "hotspot", "coupling", "tokens", "dup_tokens", "duplicated",
+                   "symbol_size", "code_size", "data_size")
+FILE_COLUMNS = NUMERIC_COLUMNS + ("commit_count", "owner", "last_author", "blame_owner")
+FOLDER_COLUMNS = NUMERIC_COLUMNS + ("staleness_weighted", "coverage_weighted", "staleness_p50", "staleness_p90",
+                                    "owner", "blame_owner")
+TEXT_COLUMNS = ("path", "name", "folder", "parent", "owner", "last_author", "blame_owner")
+AGGREGATES = ("sum", "avg", "min", "max")
+OUTPUT_FORMATS = ("table", "csv", "json")
+DEFAULT_TOP = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY, parent TEXT, position INTEGER, name TEXT, full_path TEXT,
+    {folder_columns}, metrics TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, folder TEXT, position INTEGER, name TEXT, full_path TEXT,
+    {file_columns}, metrics TEXT);
+CREATE TABLE IF NOT EXISTS includes (src TEXT, dst TEXT, PRIMARY KEY (src, dst)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS owners (path TEXT, owner TEXT, PRIMARY KEY (path, owner)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+CREATE INDEX IF NOT EXISTS files_owner ON files (owner);
+CREATE INDEX IF NOT EXISTS files_staleness ON files (staleness);
+CREATE INDEX IF NOT EXISTS files_loc ON files (loc);
+CREATE INDEX IF NOT EXISTS folders_parent ON folders (parent);
+CREATE INDEX IF NOT EXISTS folders_owner ON folders (owner);
+CREATE INDEX IF NOT EXISTS folders_staleness ON folders (staleness);
+CREATE INDEX IF NOT EXISTS folders_loc ON folders (loc);
+CREATE INDEX IF NOT EXISTS includes_dst ON includes (dst);
+CREATE INDEX IF NOT EXISTS owners_owner ON owners (owner);
+"""
+
+def _column_defs(columns: Sequence[str]) -> str:
+    return ", ".join(f"{name} {'TEXT' if name in TEXT_COLUMNS else 'NUMERIC'}" for name in columns)
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Opens (creating it if needed) a results store of this version."""
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_SCHEMA.format(folder_columns=_column_defs(FOLDER_COLUMNS),
+                                      file_columns=_column_defs(FILE_COLUMNS)))
+    meta = dict(conn.execute("SELECT key, value FROM meta"))
+    if meta and (meta.get("format"), meta.get("version")) != (STORE_FORMAT, str(STORE_VERSION)):
+        conn.close()
+        raise ValueError(f"{db_path} is not a results store of this version")
+    return conn
+
+def _open_readonly(db_path: str) -> sqlite3.Connection:
+    if not os.path.isfile(db_path):
+        raise FileNotFoundError(f"No results store at {db_path}")
+    conn = sqlite3.connect(Path(os.path.abspath(db_path)).as_uri() + "?mode=ro", uri=True)
+    meta = dict(conn.execute("SELECT key, value FROM meta"))
+    if (meta.get("format"), meta.get("version")) != (STORE_FORMAT, str(STORE_VERSION)):
+        conn.close()
+        raise ValueError(f"{db_path} is not a results store of this version")
+    return conn
+
+def _node_rows(root: dict) -> Tuple[Dict[str, tuple], Dict[str, tuple]]:
+    """(folder rows, file rows) of a dashboard tree, keyed by path."""
+    folders, files = {}, {}
+    stack = [(root, None, 0)]
+    while stack:
+        node, parent, position = stack.pop()
+        metrics = node["metrics"]
+        is_file = node["type"] == "file"
+        columns = FILE_COLUMNS if is_file else FOLDER_COLUMNS
+        row = (node["path"], parent, position, node["name"], node["full_path"],
+               *(metrics.get(name) for name in columns), json.dumps(metrics, sort_keys=True, separators=(',', ':')))
+        (files if is_file else folders)[node["path"]] = row
+        for child_position, child in enumerate(node.get("children", ())):
+            stack.append((child, node["path"], child_position))
+    return folders, files
+
+def _sync(conn: sqlite3.Connection, table: str, rows: Dict[str, tuple]) -> Tuple[List[str], List[str]]:
+    """Writes the rows that differ from the stored ones and deletes the rest; returns (written, deleted)."""
+    stored = {row[0]: row for row in conn.execute(f"SELECT * FROM {table}")}
+    written = [path for path, row in rows.items() if stored.get(path) != row]
+    deleted = [path for path in stored if path not in rows]
+    if written:
+        placeholders = ", ".join("?" * len(rows[written[0]]))
+        conn.executemany(f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", (rows[path] for path in written))
+    conn.executemany(f"DELETE FROM {table} WHERE path = ?", ((path,) for path in deleted))
+    return written, deleted
+
+def write_results_db(aggregated_data: dict, db_path: str) -> int:
+    """
+    Stores a dashboard tree in the SQLite results store at db_path: one row per file and
+    folder with its metrics as indexed columns, the include edges and the owners of each
+    file. An existing store is updated in place: only rows whose node changed are written
+    and nodes no longer in the tree are deleted. Returns the number of rows written or deleted.
+    """
+    folders, files = _node_rows(aggregated_data)
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [("format", STORE_FORMAT), ("version", str(STORE_VERSION))])
+            folders_written, folders_deleted = _sync(conn, "folders", folders)
+            written, deleted = _sync(conn, "files", files)
+            # Edges and owners are derived from the file rows, so they follow them
+            stale = [(path,) for path in written + deleted]
+            conn.executemany("DELETE FROM includes WHERE dst = ?", stale)
+            conn.executemany("DELETE FROM owners WHERE path = ?", stale)
+            for path in written:
+                metrics = json.loads(files[path][-1])
+                conn.executemany("INSERT OR IGNORE INTO includes VALUES (?, ?)",
+                                 ((src, path) for src in metrics.get("included_by_list", ())))
+                conn.executemany("INSERT OR IGNORE INTO owners VALUES (?, ?)",
+                                 ((path, owner) for owner in str(metrics.get("owner") or "").split()))
+    finally:
+        conn.close()
+    return len(folders_written) + len(folders_deleted) + len(written) + len(deleted)
+
+def load_results_tree(db_path: str) -> dict:
+    """Rebuilds the dashboard tree stored by write_results_db."""
+    conn = _open_readonly(db_path)
+    try:
+        nodes = {}
+        children = {}
+        for path, parent, position, name, full_path, metrics in conn.execute(
+                "SELECT path, parent, position, name, full_path, metrics FROM folders"):
+            nodes[path] = {"name": name, "type": "folder", "path": path, "full_path": full_path,
+                           "children": [], "metrics": json.loads(metrics)}
+            children.setdefault(parent, []).append((position, nodes[path]))
+        for path, folder, position, name, full_path, metrics in conn.execute(
+                "SELECT path, folder, position, name, full_path, metrics FROM files"):
+            children.setdefault(folder, []).append((position, {"name": name, "type": "file", "path": path,
+                                                               "full_path": full_path, "metrics": json.loads(metrics)}))
+    finally:
+        conn.close()
+    roots = children.pop(None, [])
+    if len(roots) != 1:
+        raise ValueError(f"{db_path} holds no dashboard tree")
+    for parent, entries in children.items():
+        nodes[parent]["children"] = [node for _, node in sorted(entries, key=lambda entry: entry[0])]
+    return roots[0][1]
+
+def _prefix_range(prefix: str) -> Optional[Tuple[str, str, str]]:
+    """(path, low, high): prefix itself and the bounds of the paths below it, for an indexed range scan."""
+    prefix = os.path.normpath(prefix)
+    if prefix == ".":
+        return None
+    below = prefix + os.sep
+    return prefix, below, below[:-1] + chr(ord(os.sep) + 1)
+
+_CONDITION = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*(.*?)\s*$")
+
+def parse_condition(text: str) -> Tuple[str, str, object]:
+    """Parses 'METRIC<op>VALUE' (e.g. 'included_by>500'); numeric values are compared as numbers."""
+    match = _CONDITION.match(text)
+    if match is None:
+        raise ValueError(f"Expected a condition as METRIC<op>VALUE, got {text!r}")
+    column, op, value = match.groups()
+    try:
+        value = float(value)
+    except ValueError:
+        pass
+    return column, op, value
+
+def query(db_path: str, folders: bool = False, where: Sequence[str] = (), owner: Optional[str] = None,
+          prefix: Optional[str] = None, glob: Optional[str] = None, columns: Optional[Sequence[str]] = None,
+          sort: Optional[str] = None, ascending: bool = False, top: Optional[int] = DEFAULT_TOP,
+          group_by: Optional[str] = None, agg: str = "sum") -> Tuple[List[str], List[tuple]]:
+    """
+    Runs a report against the results store and returns (headers, rows). Files (or folders)
+    are filtered by the where conditions, an owner, a path prefix and a path glob, then
+    either listed or grouped by a column with the agg of each column per group, ordered by
+    sort (default: descending) and cut to the top rows. Grouping files by owner counts a
+    file with several owners once for each of them.
+    """
+    table = "folders" if folders else "files"
+    known = ("path", "name", "parent" if folders else "folder") + (FOLDER_COLUMNS if folders else FILE_COLUMNS)
+    if columns is None:
+        columns = ["loc"] if group_by else ["loc", "staleness", "owner"]
+    for column in list(columns) + [c for c in (sort, group_by) if c not in (None, "count")]:
+        if column not in known:
+            raise ValueError(f"Unknown column: {column} (one of {', '.join(known)})")
+
+    conditions, params = [], []
+    for text in where:
+        column, op, value = parse_condition(text)
+        if column not in known:
+            raise ValueError(f"Unknown column: {column} (one of {', '.join(known)})")
+        conditions.append(f"t.{column} {op} ?")
+        params.append(value)
+    if owner is not None:
+        if folders:
+            conditions.append("t.owner = ?")
+        else:
+            conditions.append("t.path IN (SELECT path FROM owners WHERE owner = ?)")
+        params.append(owner)
+    bounds = _prefix_range(prefix) if prefix else None
+    if bounds is not None:
+        conditions.append("(t.path = ? OR (t.path >= ? AND t.path < ?))")
+        params.extend(bounds)
+    if glob is not None:
+        conditions.append("t.path GLOB ?")
+        params.append(glob)
+
+    source = f"{table} AS t"
+    if group_by:
+        if agg not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {agg}")
+        key = "t." + group_by
+        if group_by == "owner" and not folders:
+            source += " JOIN owners AS o ON o.path = t.path"
+            key = "o.owner"
+        headers = [group_by, "count"] + [f"{agg}_{column}" for column in columns]
+        select = [key, "COUNT(*)"] + [f"{agg.upper()}(t.{column})" for column in columns]
+        order = "count" if sort in (None, "count") else f"{agg}_{sort}" if sort in columns else None
+        if order is None:
+            raise ValueError(f"Sort column {sort} is not aggregated; add it to the columns")
+        order_by = f"{headers.index(order) + 1} {'ASC' if ascending else 'DESC'}, 1"
+        group = f" GROUP BY {key}"
+    else:
+        headers = ["path"] + [column for column in columns if column != "path"]
+        if sort and sort not in headers:
+            headers.append(sort)
+        select = ["t." + column for column in headers]
+        order_by = f"t.{sort} {'ASC' if ascending else 'DESC'}, t.path" if sort else "t.path"
+        group = ""
+    sql = f"SELECT {', '.join(select)} FROM {source}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f"{group} ORDER BY {order_by}"
+    if top is not None and top > 0:
+        sql += f" LIMIT {int(top)}"
+
+    conn = _open_readonly(db_path)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+    return headers, rows
+
+def _format_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.2f}"
+    return str(value)
+
+def format_table(headers: Sequence[str], rows: Sequence[tuple]) -> str:
+    """Aligned text table, numbers right-aligned."""
+    cells = [list(headers)] + [[_format_value(value) for value in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    numeric = [all(isinstance(row[i], (int, float)) or row[i] is None for row in rows) for i in range(len(headers))]
+    lines = []
+    for row in cells:
+        lines.append("  ".join(cell.rjust(width) if is_number else cell.ljust(width)
+                               for cell, width, is_number in zip(row, widths, numeric)).rstrip())
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+def query_main(argv: Optional[Sequence[str]] = None) -> int:
+    """Entry point of 'analyzer_main.py query'."""
+    parser = argparse.ArgumentParser(prog="analyzer_main.py query",
+                                     description="Top-N, filter and group-by reports over a results store (--db).")
+    parser.add_argument("db", help="Results store written with --db")
+    parser.add_argument("--folders", action="store_true", help="Report on folders instead of files")
+    parser.add_argument("--where", action="append", default=[], metavar="COND",
+                        help="Condition METRIC<op>VALUE with op one of > >= < <= = != (repeatable), "
+                             "e.g. 'included_by>500'")
+    parser.add_argument("--owner", help="Only files with this CODEOWNERS owner, e.g. @team-x")
+    parser.add_argument("--prefix", metavar="PATH", help="Only paths in this folder")
+    parser.add_argument("--glob", metavar="PATTERN", help="Only paths matching this glob, e.g. '*.h'")
+    parser.add_argument("--columns", metavar="COLS",
+                        help="Comma-separated columns to show (aggregated with --group-by)")
+    parser.add_argument("--sort", metavar="COLUMN",
+                        help="Order by this column, descending (with --group-by: 'count' or an aggregated column)")
+    parser.add_argument("--asc", action="store_true", help="Order ascending")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, metavar="N",
+                        help=f"Number of rows, 0 for all (default: {DEFAULT_TOP})")
+    parser.add_argument("--group-by", metavar="COLUMN", help="Group rows by this column, e.g. owner or folder")
+    parser.add_argument("--agg", choices=AGGREGATES, default="sum", help="Aggregate of --group-by (default: sum)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="table", help="Output format (default: table)")
+    args = parser.parse_args(argv)
+
+    columns = [column.strip() for column in args.columns.split(",") if column.strip()] if args.columns else None
+    try:
+        headers, rows = query(args.db, folders=args.folders, where=args.where, owner=args.owner, prefix=args.prefix,
+                              glob=args.glob, columns=columns, sort=args.sort, ascending=args.asc, top=args.top,
+                              group_by=args.group_by, agg=args.agg)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        parser.error(str(e))
+    if args.format == "json":
+        json.dump([dict(zip(headers, row)) for row in rows], sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif args.format == "csv":
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow(headers)
+        writer.writerows(rows)
+    else:
+        print(format_table(headers, rows))
+    return 0
@@ -0,0 +1,177 @@
+import os
+import json
+import logging
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+import scan_repo
+import cpp_parser
+import git_analyzer
+import external_metrics
+import folder_tree
+from profiler import get_profiler
+from metrics_collector import build_file_data, build_file_node, empty_git_info, link_includes
+
+TREND_FORMAT = "repo_analyzer-trend"
+TREND_VERSION = 1
+# Folder metrics recorded per revision
+TREND_METRICS = ("loc", "classes", "included_by", "included_by_transitive", "staleness", "staleness_weighted",
+                 "staleness_p90")
+
+def recent_tags(repo_root: str, count: int) -> List[str]:
+    """The count most recently created tags, oldest first."""
+    cmd = ['git', 'for-each-ref', '--sort=creatordate', '--format=%(refname:short)', 'refs/tags']
+    try:
+        with get_profiler().subprocess(cmd):
+            output = subprocess.check_output(cmd, cwd=repo_root, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    tags = output.decode('utf-8', 'replace').split()
+    return tags[-count:] if count > 0 else []
+
+def _commit_time(data: bytes) -> float:
+    """Committer timestamp of a raw commit object."""
+    for line in data.split(b'\n'):
+        if not line:
+            break
+        if line.startswith(b'committer '):
+            return float(line.rsplit(b' ', 2)[1])
+    return 0.0
+
+class RevisionAnalyzer:
+    """
+    Analyzes the tree of any revision without checking it out: file contents are read from
+    the object store through one git_analyzer.CatFileBatch process, so bare repositories
+    work too. Parser results are kept per blob id (and in the analysis cache, if given), so a
+    blob shared by several revisions is parsed once. Coverage and MISRA reports describe the
+    checked out files and are not applied.
+    """
+
+    def __init__(self, repo_root: str, cache=None, include_paths=None, scan_options=None):
+        self.repo_root = repo_root
+        self.cache = cache
+        self.include_paths = include_paths
+        self.scan_options = scan_options
+        self.objects = git_analyzer.CatFileBatch(repo_root)
+        # blob id -> (cpp metrics, external metrics)
+        self._static: Dict[str, tuple] = {}
+        self.parsed = 0
+
+    def close(self):
+        self.objects.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def resolve(self, rev: str) -> Tuple[str, float]:
+        """(commit id, commit timestamp) of rev."""
+        found = self.objects.read(f"{rev}^{{commit}}")
+        if found is None:
+            raise ValueError(f"Unknown revision: {rev}")
+        return found[0], _commit_time(found[2])
+
+    def _codeowners(self, tree: Dict[str, tuple]) -> git_analyzer.CodeOwners:
+        for location in git_analyzer.CODEOWNERS_LOCATIONS:
+            entry = tree.get(os.path.normpath(location))
+            if entry is not None:
+                found = self.objects.read(entry[0])
+                if found is not None:
+                    return git_analyzer.parse_codeowners_lines(found[2].decode('utf-8', 'replace').splitlines())
+        return git_analyzer.CodeOwners([])
+
+    def _static_metrics(self, file_path: str, oid: str) -> tuple:
+        """Parser output and external metrics of a blob; read and parsed only on its first use."""
+        static = self._static.get(oid)
+        if static is not None:
+            return static
+        entry = self.cache.get(oid) if self.cache is not None else None
+        if entry is not None:
+            static = (entry["cpp"], entry["external"])
+        else:
+            found = self.objects.read(oid)
+            data = found[2] if found is not None else b''
+            get_profiler().add_bytes("parse", len(data))
+            static = (cpp_parser.parse_cpp_bytes(data), external_metrics.get_all_external_metrics(file_path))
+            self.parsed += 1
+            if self.cache is not None:
+                self.cache.put(oid, {"cpp": static[0], "external": static[1]})
+        if self.cache is not None:
+            self.cache.record(entry is not None)
+        self._static[oid] = static
+        return static
+
+    def analyze(self, rev: str, history: Optional[git_analyzer.GitHistoryIndex] = None,
+                now: Optional[float] = None) -> List[dict]:
+        """
+        File records of the tree of rev, with 'Included By', as collect_metrics_for_repo
+        returns them for a checkout of rev. Git info comes from history (by default an index of
+        the whole history of rev), staleness is measured at now (default: the current time).
+        """
+        profiler = get_profiler()
+        commit, _ = self.resolve(rev)
+        tree = {rel_path: (oid, size) for rel_path, oid, size in git_analyzer.list_tree(self.repo_root, commit)}
+        rules = self._codeowners(tree)
+        if history is None:
+            with profiler.stage("git history"):
+                history = git_analyzer.build_history_index(self.repo_root, rev=commit)
+
+        records = []
+        for rel_path, (oid, size) in tree.items():
+            if not scan_repo.is_collected_path(rel_path, self.scan_options):
+                continue
+            file_path = os.path.join(self.repo_root, rel_path)
+            static = profiler.call("parse", file_path, self._static_metrics, file_path, oid)
+            git_info = history.lookup(rel_path, now) or empty_git_info()
+            owner = profiler.call("owner", file_path, git_analyzer.get_owner, file_path, self.repo_root, rules)
+            records.append(build_file_data(file_path, self.repo_root, static + (False,), (size, git_info, owner)))
+
+        with profiler.stage("include graph"):
+            link_includes(records, self.repo_root, self.include_paths)
+        return records
+
+def build_trend(analyzer: RevisionAnalyzer, revisions: List[str]) -> dict:
+    """
+    Time series of the TREND_METRICS of every folder over the given revisions, in commit
+    order. Each revision is analyzed from the object store with staleness and commit counts
+    as of its commit time; a folder missing from a revision has null values there.
+    """
+    profiler = get_profiler()
+    points = sorted(((*analyzer.resolve(rev), rev) for rev in revisions), key=lambda point: point[1])
+    folders = {}
+    result = []
+    for position, (commit, timestamp, rev) in enumerate(points):
+        with profiler.stage("git history"):
+            history = git_analyzer.build_window_index(analyzer.repo_root, commit, timestamp)
+        records = analyzer.analyze(commit, history=history, now=timestamp)
+
+        with profiler.stage("aggregate"):
+            tree = folder_tree.FolderTree(analyzer.repo_root)
+            tree.add_files(map(build_file_node, records))
+            metrics = tree.rollup()
+        for index in tree.folder_indexes:
+            series = folders.get(tree.path[index])
+            if series is None:
+                series = folders[tree.path[index]] = {key: [None] * len(points) for key in TREND_METRICS}
+            for key in TREND_METRICS:
+                series[key][position] = metrics[index][key]
+        result.append({"rev": rev, "commit": commit, "timestamp": timestamp, "files": len(records)})
+        logging.info(f"{rev}: {len(records)} files, {analyzer.parsed} distinct blobs parsed so far")
+
+    return {
+        "format": TREND_FORMAT,
+        "version": TREND_VERSION,
+        "metrics": list(TREND_METRICS),
+        "revisions": result,
+        "folders": folders,
+    }
+
+def write_trend_json(trend: dict, output_path: str):
+    """Writes build_trend output for the dashboard's trend charts."""
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(trend, f, separators=(',', ':'))
+    except Exception as e:
+        raise IOError(f"Failed to write trend data to {output_path}: {e}")
@@ -1,29 +1,306 @@
 import os
+import re
+import time
+import heapq
+import operator
 import logging
+import itertools
+import tempfile
+import subprocess
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Set
+
+from git_analyzer import compile_glob
+from profiler import get_profiler
 
 # Supported Extensions
 CPP_EXTENSIONS = {'.c', '.cpp', '.h', '.hpp', '.cc', '.cxx', '.hxx'}
 
-def collect_files(repo_root: str):
+SCANNER_MODES = ('auto', 'git', 'walk')
+
+# Bytes read from `git ls-files` at a time
+_READ_SIZE = 1 << 16
+# Strings sorted in memory at a time by sorted_on_disk; longer inputs are merged from sorted runs on disk
+SORT_CHUNK = 200000
+
+_entry_name = operator.attrgetter('name')
+
+class ScanOptions:
+    """
+    How the repository is listed.
+    mode: 'git' lists files with `git ls-files` (tracked and untracked, .gitignore respected),
+    'walk' (the default) uses os.scandir, 'auto' picks git when repo_root is inside a work tree.
+    include/exclude are gitignore-style globs on repository-relative paths; a file is collected
+    when it matches an include pattern (if any are given) and no exclude pattern.
+    """
+
+    def __init__(self, mode: str = 'walk', include: Sequence[str] = (), exclude: Sequence[str] = (),
+                 submodules: bool = False):
+        if mode not in SCANNER_MODES:
+            raise ValueError(f"Unknown scanner mode: {mode}")
+        self.mode = mode
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.submodules = submodules
+        self._include_regex = _compile_globs(self.include)
+        self._exclude_regex = _compile_globs(self.exclude)
+
+    def accepts(self, rel_path: str) -> bool:
+        """Checks the include/exclude globs for a '/'-separated repository-relative file path."""
+        if self._exclude_regex is not None and self._exclude_regex.fullmatch(rel_path):
+            return False
+        return self._include_regex is None or self._include_regex.fullmatch(rel_path) is not None
+
+    def excludes_dir(self, rel_dir: str) -> bool:
+        """True if everything below the '/'-separated directory is excluded."""
+        return self._exclude_regex is not None and self._exclude_regex.fullmatch(rel_dir + '/') is not None
+
+def _compile_globs(patterns: List[str]):
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?:{compile_glob(p)[2]})' for p in patterns), re.DOTALL)
+
+def collect_files(repo_root: str, options: Optional[ScanOptions] = None):
     """
     Walks the repository and collects all relevant files.
     Returns a list of absolute file paths to analyze.
     """
-    file_list = []
-    
-    for root, dirs, files in os.walk(repo_root):
-        # Skip hidden directories (like .git)
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
-        
-        for file in files:
-            _, ext = os.path.splitext(file)
-            if ext.lower() in CPP_EXTENSIONS or file == 'CODEOWNERS':
-                file_list.append(os.path.join(root, file))
-                
-    logging.debug(f"Found {len(file_list)} files to analyze.")
-    return file_list
+    return list(iter_files(repo_root, options))
+
+def iter_files(repo_root: str, options: Optional[ScanOptions] = None, tree_order: bool = False) -> Iterator[str]:
+    """
+    Yields absolute paths of the files to analyze while the repository is still being listed,
+    so the caller can start analyzing before the scan is finished.
+    Hidden directories (like .git) are skipped in every mode.
+    The walk scanner always yields in tree order (see tree_order_key); with tree_order the git
+    listing is sorted into it as well, which needs the whole listing up front (sorted on disk
+    beyond SORT_CHUNK paths).
+    """
+    options = options or ScanOptions(mode='walk')
+    mode = resolve_mode(repo_root, options)
+
+    start = time.perf_counter()
+    count = 0
+    if mode == 'git':
+        paths = _iter_git_files(repo_root, options)
+        if tree_order:
+            paths = sorted_on_disk(paths, key=tree_order_key)
+    else:
+        paths = _iter_walk_files(repo_root, options)
+    for rel_path in paths:
+        if options.accepts(rel_path):
+            count += 1
+            yield os.path.join(repo_root, rel_path.replace('/', os.sep))
+
+    logging.debug(f"Found {count} files to analyze.")
+    logging.info(f"Scanned repository ({mode}) in {time.perf_counter() - start:.2f}s: {count} files")
+
+def resolve_mode(repo_root: str, options: Optional[ScanOptions] = None) -> str:
+    """The scanner options select for repo_root: 'auto' is 'git' inside a work tree, else 'walk'."""
+    mode = options.mode if options is not None else 'walk'
+    if mode == 'auto':
+        mode = 'git' if _is_git_work_tree(repo_root) else 'walk'
+    return mode
+
+def resolved_options(repo_root: str, options: Optional[ScanOptions] = None) -> ScanOptions:
+    """A copy of options with 'auto' resolved, for callers that scan the same tree repeatedly."""
+    options = options or ScanOptions(mode='walk')
+    return ScanOptions(resolve_mode(repo_root, options), include=options.include, exclude=options.exclude,
+                       submodules=options.submodules)
+
+def iter_scanned_paths(repo_root: str, options: Optional[ScanOptions] = None, rel_dir: str = '') -> Iterator[str]:
+    """
+    '/'-separated repository-relative paths of the files the scanner of options collects below
+    the '/'-separated rel_dir ('' for the whole tree), include/exclude globs applied. Unlike
+    iter_files it does not log, for callers that rescan often; only the walk is in tree order.
+    """
+    options = options or ScanOptions(mode='walk')
+    if resolve_mode(repo_root, options) == 'git':
+        prefix = rel_dir + '/' if rel_dir else ''
+        # Run from rel_dir, git lists the paths below it relative to it
+        paths = (prefix + path for path in _iter_git_files(os.path.join(repo_root, rel_dir), options))
+    else:
+        paths = _iter_walk_files(repo_root, options, rel_dir)
+    for rel_path in paths:
+        if options.accepts(rel_path):
+            yield rel_path
+
+def ignored_paths(repo_root: str, rel_paths: Iterable[str], options: Optional[ScanOptions] = None) -> Set[str]:
+    """
+    Those of the repository-relative files and directories that .gitignore hides from the git
+    scanner (one `git check-ignore` for all of them); empty for the walk scanner. As with
+    `git ls-files`, tracked files are never ignored.
+    """
+    rel_paths = list(rel_paths)
+    if not rel_paths or resolve_mode(repo_root, options) != 'git':
+        return set()
+    cmd = ['git', 'check-ignore', '-z', '--stdin']
+    listing = b''.join(os.fsencode(path.replace(os.sep, '/')) + b'\0' for path in rel_paths)
+    with get_profiler().subprocess(cmd):
+        result = subprocess.run(cmd, cwd=repo_root, input=listing, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    # Exit status 1: none of the paths is ignored
+    if result.returncode not in (0, 1):
+        raise subprocess.CalledProcessError(result.returncode, cmd, stderr=result.stderr)
+    ignored = {os.fsdecode(record) for record in result.stdout.split(b'\0') if record}
+    return {path for path in rel_paths if path.replace(os.sep, '/') in ignored}
+
+def sorted_on_disk(items: Iterable[str], key: Optional[Callable] = None,
+                   chunk_size: Optional[int] = None) -> Iterator[str]:
+    """
+    The strings of items (without NUL characters) sorted by key, with at most chunk_size of them
+    (default SORT_CHUNK) in memory: items are read up front in sorted runs of chunk_size,
+    spilled to temporary files and merged. Inputs of a single run stay in memory.
+    """
+    chunk_size = chunk_size or SORT_CHUNK
+    items = iter(items)
+    runs = []
+    while True:
+        chunk = sorted(itertools.islice(items, chunk_size), key=key)
+        if len(chunk) < chunk_size and not runs:
+            return iter(chunk)
+        if chunk:
+            run = tempfile.TemporaryFile('w+', encoding='utf-8', errors='surrogateescape', newline='')
+            run.write('\0'.join(chunk) + '\0')
+            run.seek(0)
+            runs.append(run)
+        if len(chunk) < chunk_size:
+            return _merge_runs(runs, key)
+
+def _merge_runs(runs: List, key: Optional[Callable]) -> Iterator[str]:
+    try:
+        yield from heapq.merge(*(_read_run(run) for run in runs), key=key)
+    finally:
+        for run in runs:
+            run.close()
+
+def _read_run(run) -> Iterator[str]:
+    pending = ''
+    while True:
+        block = run.read(_READ_SIZE)
+        if not block:
+            return
+        *records, pending = (pending + block).split('\0')
+        yield from records
+
+def tree_order_key(rel_path: str):
+    """
+    Sort key for '/'-separated paths that matches the dashboard tree: within a folder,
+    subfolders come before files and both are sorted by name.
+    """
+    parts = rel_path.split('/')
+    return tuple((0, part) for part in parts[:-1]) + ((1, parts[-1]),)
+
+def _is_git_work_tree(repo_root: str) -> bool:
+    cmd = ['git', 'rev-parse', '--is-inside-work-tree']
+    try:
+        with get_profiler().subprocess(cmd):
+            result = subprocess.run(cmd, cwd=repo_root, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    except (subprocess.CalledProcessError, OSError):
+        return False
+    return result.stdout.strip() == b'true'
+
+def _iter_walk_files(repo_root: str, options: ScanOptions, rel_dir: str = '') -> Iterator[str]:
+    """
+    os.scandir walk in tree order; yields '/'-separated relative paths of collected files
+    below rel_dir. The files of a directory come after those of its subdirectories, each
+    sorted by name.
+    """
+    stack = [_scan_dir(repo_root, rel_dir, options)]
+    while stack:
+        sub_dirs, files = stack[-1]
+        rel_dir = next(sub_dirs, None)
+        if rel_dir is None:
+            stack.pop()
+            yield from files
+        else:
+            stack.append(_scan_dir(repo_root, rel_dir, options))
+
+def _scan_dir(repo_root: str, rel_dir: str, options: ScanOptions):
+    """Returns (iterator over subdirectories to descend into, collected files) of one directory."""
+    prefix = rel_dir + '/' if rel_dir else ''
+    sub_dirs = []
+    files = []
+    try:
+        with os.scandir(os.path.join(repo_root, rel_dir)) as it:
+            entries = sorted(it, key=_entry_name)
+    except OSError:
+        return iter(sub_dirs), files
+    for entry in entries:
+        name = entry.name
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            # Like os.walk: symlinked directories are not followed
+            if not name.startswith('.') and not entry.is_symlink() and not options.excludes_dir(prefix + name):
+                sub_dirs.append(prefix + name)
+        elif _is_collected_name(name):
+            files.append(prefix + name)
+    return iter(sub_dirs), files
+
+def _iter_git_files(repo_root: str, options: ScanOptions) -> Iterator[str]:
+    """
+    `git ls-files` listing: tracked files that still exist plus untracked, non-ignored ones.
+    With submodules, tracked files of checked out submodules are listed as well.
+    """
+    # Let git filter by file name so only candidates cross the pipe
+    pathspecs = [f':(icase)*{ext}' for ext in sorted(CPP_EXTENSIONS)] + ['CODEOWNERS', '*/CODEOWNERS']
+    deleted = set(_run_ls_files(repo_root, ['--deleted'], pathspecs))
+    if options.submodules:
+        # --recurse-submodules only supports tracked files, so untracked ones are listed separately
+        listings = (['--cached', '--recurse-submodules'], ['--others', '--exclude-standard'])
+    else:
+        listings = (['--cached', '--others', '--exclude-standard'],)
+
+    for args in listings:
+        for rel_path in _run_ls_files(repo_root, args, pathspecs):
+            rel_dir = rel_path.rpartition('/')[0]
+            if rel_path in deleted or rel_dir.startswith('.') or '/.' in rel_dir:
+                continue
+            yield rel_path
+
+def _run_ls_files(repo_root: str, args: List[str], pathspecs: List[str]) -> Iterator[str]:
+    """Streams NUL-separated paths (relative to repo_root) from `git ls-files`."""
+    cmd = ['git', 'ls-files', '-z'] + args + ['--'] + pathspecs
+    # stderr goes to a file: a pipe read only after stdout ends could fill up and stall git
+    with get_profiler().subprocess(cmd), tempfile.TemporaryFile() as errors:
+        yield from _read_ls_files(subprocess.Popen(cmd, cwd=repo_root, stdout=subprocess.PIPE, stderr=errors),
+                                  cmd, errors)
+
+def _read_ls_files(proc, cmd: List[str], errors) -> Iterator[str]:
+    """Splits the output of a `git ls-files -z` process and checks its exit status (stderr in errors)."""
+    try:
+        tail = b''
+        while True:
+            chunk = proc.stdout.read(_READ_SIZE)
+            if not chunk:
+                break
+            records = (tail + chunk).split(b'\0')
+            tail = records.pop()
+            for record in records:
+                if record:
+                    yield os.fsdecode(record)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+    if proc.returncode != 0:
+        errors.seek(0)
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=errors.read())
 
 def is_cpp_file(file_path: str) -> bool:
     """Checks if the file is a C++ source/header file."""
     _, ext = os.path.splitext(file_path)
     return ext.lower() in CPP_EXTENSIONS
+
+def _is_collected_name(file_name: str) -> bool:
+    _, ext = os.path.splitext(file_name)
+    return ext.lower() in CPP_EXTENSIONS or file_name == 'CODEOWNERS'
+
+def is_collected_path(rel_path: str, options: Optional[ScanOptions] = None) -> bool:
+    """Checks if collect_files would pick up a file at this repository-relative path."""
+    parts = os.path.normpath(rel_path).split(os.sep)
+    if any(part.startswith('.') for part in parts[:-1]):
+        return False
+    if options is not None and not options.accepts('/'.join(parts)):
+        return False
+    return _is_collected_name(parts[-1])
@@ -0,0 +1,140 @@
+import os
+import json
+import zlib
+import logging
+from typing import List, Optional, Sequence
+
+import scan_repo
+import git_analyzer
+from profiler import get_profiler
+from metrics_collector import analyze_files, link_includes
+
+SHARD_MODES = ("hash", "prefix")
+PARTIAL_FORMAT = "repo_analyzer-partial"
+PARTIAL_VERSION = 1
+
+class Shard:
+    """
+    Shard index (1-based) of count: the files whose key hashes to it. The key is the
+    repository-relative path ('hash', even spread) or its top-level directory ('prefix',
+    a directory stays on one runner). CRC-32 of the '/'-separated key, so every runner and
+    platform picks the same files.
+    """
+
+    def __init__(self, index: int, count: int, mode: str = "hash"):
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"Invalid shard {index}/{count}")
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode: {mode}")
+        self.index = index
+        self.count = count
+        self.mode = mode
+
+    @classmethod
+    def parse(cls, text: str, mode: str = "hash") -> "Shard":
+        """Parses 'K/N'."""
+        index, _, count = text.partition('/')
+        try:
+            return cls(int(index), int(count), mode)
+        except ValueError:
+            raise ValueError(f"Expected a shard as K/N with 1 <= K <= N, got {text!r}")
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    def key(self, rel_path: str) -> str:
+        parts = os.path.normpath(rel_path).split(os.sep)
+        if self.mode == "prefix":
+            return parts[0] if len(parts) > 1 else ""
+        return '/'.join(parts)
+
+    def contains(self, rel_path: str) -> bool:
+        return zlib.crc32(self.key(rel_path).encode('utf-8')) % self.count == self.index - 1
+
+    def to_dict(self) -> dict:
+        return {"index": self.index, "count": self.count, "mode": self.mode}
+
+def analyze_shard(repo_root: str, shard: Shard, debug: bool = False, jobs: int = 1, cache=None,
+                  scan_options=None, external=None, blame=None) -> dict:
+    """
+    Analyzes the files of one shard and returns the partial result: their records without
+    'Included By' (includers may live in other shards) and the time staleness was measured at.
+    """
+    profiler = get_profiler()
+    files = (file_path for file_path in profiler.iterate("scan", scan_repo.iter_files(repo_root, scan_options))
+             if shard.contains(os.path.relpath(file_path, repo_root)))
+    with profiler.stage("git history"):
+        git_history = git_analyzer.build_history_index(repo_root)
+    # Every record of the shard is measured at the same time, which the merge can rebase
+    now = git_analyzer.reference_time()
+    previous = git_analyzer.set_reference_time(now)
+    try:
+        records = analyze_files(files, repo_root, debug=debug, jobs=jobs, cache=cache, git_history=git_history,
+                                external=external, blame=blame)
+    finally:
+        git_analyzer.set_reference_time(previous)
+    logging.info(f"Shard {shard}: analyzed {len(records)} files")
+    return {
+        "format": PARTIAL_FORMAT,
+        "version": PARTIAL_VERSION,
+        "shard": shard.to_dict(),
+        "now": now,
+        "records": records,
+    }
+
+def write_partial(partial: dict, output_path: str):
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(partial, f, separators=(',', ':'))
+    except Exception as e:
+        raise IOError(f"Failed to write partial result to {output_path}: {e}")
+
+def load_partial(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        partial = json.load(f)
+    if partial.get("format") != PARTIAL_FORMAT or partial.get("version") != PARTIAL_VERSION:
+        raise ValueError(f"{path} is not a partial result of this version")
+    return partial
+
+def merge_partials(partial_paths: Sequence[str], repo_root: str, include_paths=None,
+                   now: Optional[float] = None) -> List[dict]:
+    """
+    Combines the partial results of all shards of one run into the file records of a
+    single-node run: 'Included By' is resolved over all shards, paths are rebuilt under
+    repo_root (runners may check out elsewhere) and, if the shards measured staleness at
+    different times, it is measured again at now (default: the latest shard time).
+    Raises ValueError unless every shard is present exactly once.
+    """
+    partials = [load_partial(path) for path in partial_paths]
+    if not partials:
+        raise ValueError("No partial results to merge")
+    count, mode = partials[0]["shard"]["count"], partials[0]["shard"]["mode"]
+    seen = {}
+    for path, partial in zip(partial_paths, partials):
+        shard = partial["shard"]
+        if (shard["count"], shard["mode"]) != (count, mode):
+            raise ValueError(f"{path} is shard {shard['index']}/{shard['count']} by {shard['mode']}, "
+                             f"expected one of {count} by {mode}")
+        if shard["index"] in seen:
+            raise ValueError(f"Shard {shard['index']}/{count} is in both {seen[shard['index']]} and {path}")
+        seen[shard["index"]] = path
+    missing = [str(index) for index in range(1, count + 1) if index not in seen]
+    if missing:
+        raise ValueError(f"Missing shards {', '.join(missing)} of {count}")
+
+    times = {partial["now"] for partial in partials}
+    if now is None:
+        now = max(times)
+    restale = times != {now}
+    records = []
+    for partial in partials:
+        for file_data in partial["records"]:
+            file_data["path"] = os.path.join(repo_root, file_data["rel_path"])
+            if restale:
+                file_data["git"] = git_analyzer.git_info_at(file_data["git"], now)
+            records.append(file_data)
+    logging.info(f"Merged {len(records)} files from {count} shards")
+
+    with get_profiler().stage("include graph"):
+        link_includes(records, repo_root, include_paths)
+    return records
@@ -0,0 +1,208 @@
+import os
+import json
+import logging
+import tempfile
+from array import array
+from typing import Iterable, Iterator, List, TextIO, Tuple
+
+import scan_repo
+import git_analyzer
+import include_graph
+import folder_tree
+from profiler import get_profiler
+from metrics_collector import iter_analyzed_files, build_folder_node, build_file_node, aggregate_folder
+
+# Indentation of the dashboard JSON, same as generate_dashboard_json
+INDENT = 2
+# Digits of the node id that prefixes each spilled include edge, so edges sort by it as strings
+EDGE_ID_WIDTH = 10
+
+class DashboardStreamWriter:
+    """
+    Writes the dashboard tree as JSON while files arrive in tree order (scan_repo.tree_order_key).
+    Only the folders on the path to the current file are open; a folder is aggregated and closed
+    as soon as a file outside of it arrives. The output is byte-identical to
+    generate_dashboard_json(aggregate_metrics_for_dashboard(...)). For the percentile metrics
+    each open folder keeps the values of the files below it (8 bytes per file and metric); for
+    the blame metrics, the lines per author below it.
+    """
+
+    def __init__(self, out: TextIO, repo_root: str):
+        self.out = out
+        self.repo_root = repo_root
+        # Open folders from the root down:
+        # [node without children, child metrics, child count, file values for percentiles,
+        #  lines per author]
+        self._stack = []
+        self._last_key = None
+        self._open_folder(build_folder_node("Root", ".", repo_root))
+
+    def add_file(self, file_data: dict):
+        """Writes one file record; its 'Included By' metrics must already be filled in."""
+        parts = file_data["rel_path"].split(os.sep)
+        key = scan_repo.tree_order_key('/'.join(parts))
+        if self._last_key is not None and key <= self._last_key:
+            raise ValueError(f"{file_data['rel_path']} is not in tree order")
+        self._last_key = key
+
+        dirs = parts[:-1]
+        common = 0
+        while common < len(dirs) and common + 1 < len(self._stack) \
+                and self._stack[common + 1][0]["name"] == dirs[common]:
+            common += 1
+        while len(self._stack) > common + 1:
+            self._close_folder()
+        for part in dirs[common:]:
+            parent = self._stack[-1][0]
+            path = os.path.join(parent["path"], part) if parent["path"] != "." else part
+            self._open_folder(build_folder_node(part, path, os.path.join(parent["full_path"], part)))
+
+        node = build_file_node(file_data)
+        self._write_child(json.dumps(node, indent=INDENT))
+        self._stack[-1][1].append(_aggregation_metrics(node["metrics"]))
+        for metric, values in self._stack[-1][3].items():
+            values.append(node["metrics"].get(metric, 0))
+        folder_tree.merge_blame_counts(self._stack[-1][4], folder_tree.blame_counts(node["metrics"]))
+
+    def close(self):
+        """Aggregates and closes all open folders, including the root."""
+        while self._stack:
+            self._close_folder()
+
+    @staticmethod
+    def _pad(depth: int, level: int) -> str:
+        """Indentation of a folder at depth: level 0 is its brace, 1 its keys, 2 its children."""
+        return " " * (INDENT * (2 * depth + level))
+
+    def _open_folder(self, node: dict):
+        depth = len(self._stack)
+        if self._stack:
+            self._start_child()
+        self.out.write("{")
+        inner = self._pad(depth, 1)
+        for key in ("name", "type", "path", "full_path"):
+            self.out.write(f"\n{inner}{json.dumps(key)}: {json.dumps(node[key])},")
+        self.out.write(f"\n{inner}\"children\": [")
+        self._stack.append([node, [], 0, {metric: array('d') for metric, _ in folder_tree.PERCENTILE_METRICS.values()},
+                            {}])
+
+    def _start_child(self):
+        entry = self._stack[-1]
+        self.out.write(",\n" if entry[2] else "\n")
+        self.out.write(self._pad(len(self._stack) - 1, 2))
+        entry[2] += 1
+
+    def _write_child(self, text: str):
+        self._start_child()
+        self.out.write(text.replace("\n", "\n" + self._pad(len(self._stack) - 1, 2)))
+
+    def _close_folder(self):
+        node, child_metrics, count, values, blame = self._stack.pop()
+        node["children"] = [{"metrics": m} for m in child_metrics]
+        aggregate_folder(node)
+        metrics = node["metrics"]
+        metrics.update(folder_tree.percentile_metrics(values))
+        if blame:
+            metrics.update(folder_tree.blame_metrics(blame, folder_tree.BLAME_TOP_AUTHORS))
+
+        depth = len(self._stack)
+        inner = self._pad(depth, 1)
+        self.out.write(f"\n{inner}]" if count else "]")
+        metrics_text = json.dumps(metrics, indent=INDENT).replace("\n", "\n" + inner)
+        self.out.write(f",\n{inner}\"metrics\": {metrics_text}\n{self._pad(depth, 0)}}}")
+        if self._stack:
+            self._stack[-1][1].append(_aggregation_metrics(metrics))
+            for metric, parent_values in self._stack[-1][3].items():
+                parent_values.extend(values[metric])
+            folder_tree.merge_blame_counts(self._stack[-1][4], blame)
+
+def _aggregation_metrics(metrics: dict) -> dict:
+    """Drops the per-file lists, which folder aggregation does not read."""
+    return {k: v for k, v in metrics.items() if not k.endswith("_list")}
+
+def _spool_records(records: Iterable[dict], spool: TextIO) -> List[str]:
+    """Writes the records to the spool and returns their paths."""
+    paths = []
+    for file_data in records:
+        spool.write(json.dumps(file_data))
+        spool.write("\n")
+        paths.append(file_data["rel_path"])
+    return paths
+
+def _read_spool(spool: TextIO) -> Iterator[dict]:
+    spool.seek(0)
+    for line in spool:
+        yield json.loads(line)
+
+def _include_records(spool: TextIO) -> Iterator[Tuple[str, list]]:
+    for file_data in _read_spool(spool):
+        yield file_data["rel_path"], file_data["includes"]
+
+def _include_metrics(spool: TextIO, paths: List[str], repo_root: str, include_paths) -> Iterator[dict]:
+    """
+    'Included By' metrics of the spooled files (paths), in spool order. The includes are
+    resolved as they are read back; after the transitive counts, only those stay in memory
+    (two integers per file), the direct includers are spilled as "<node id> <includer>"
+    lines, sorted on disk and read back node by node.
+    """
+    graph, is_tu = include_graph.resolve_include_graph(_include_records(spool), repo_root, include_paths,
+                                                       paths=paths)
+    total, tus = graph.transitive_includers(is_tu)
+    total, tus = array('q', total), array('q', tus)
+    edges = scan_repo.sorted_on_disk(f"{dst:0{EDGE_ID_WIDTH}d}\t{graph.paths[src]}"
+                                     for src, dsts in enumerate(graph.edges) for dst in dsts)
+    count = len(graph.paths)
+    del graph, is_tu
+    return _merge_include_metrics(edges, total, tus, count)
+
+def _merge_include_metrics(edges: Iterator[str], total: array, tus: array, count: int) -> Iterator[dict]:
+    pending = next(edges, None)
+    for node in range(count):
+        includers = []
+        while pending is not None and int(pending[:EDGE_ID_WIDTH]) == node:
+            includers.append(pending[EDGE_ID_WIDTH + 1:])
+            pending = next(edges, None)
+        yield {"included_by": includers, "included_by_transitive": total[node], "rebuild_tus": tus[node]}
+
+def stream_dashboard_json(repo_root: str, output_path: str, debug: bool = False, jobs: int = 1, cache=None,
+                          include_paths=None, scan_options=None, external=None, blame=None) -> int:
+    """
+    Scans, analyzes and writes the dashboard JSON without holding the file records in memory.
+    Pass 1 streams scanned files through the analysis into a temporary JSON-lines spool; pass 2
+    reads it back in tree order, fills in 'Included By' and feeds DashboardStreamWriter.
+    The git listing (tree order needs it up front) and the direct includers of every file are
+    sorted on disk (scan_repo.sorted_on_disk). Memory proportional to the tree depth is not met
+    for three structures, which are kept by design:
+    - the git history index, one entry per path in the history;
+    - the include graph while includes are resolved and transitive includers counted, which
+      needs the whole graph; afterwards two integers per file are kept;
+    - the staleness values of the open folders, 8 bytes per file and percentile metric at the
+      root: exact percentiles keep the output identical to a normal run, which a bounded
+      quantile sketch would not.
+    Returns the number of files written.
+    """
+    profiler = get_profiler()
+    files = profiler.iterate("scan", scan_repo.iter_files(repo_root, scan_options, tree_order=True))
+    with profiler.stage("git history"):
+        git_history = git_analyzer.build_history_index(repo_root)
+
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+        paths = _spool_records(iter_analyzed_files(files, repo_root, debug=debug, jobs=jobs, cache=cache,
+                                                   git_history=git_history, external=external, blame=blame),
+                               spool)
+        count = len(paths)
+        logging.info(f"Analyzed {count} files, resolving includes...")
+        with profiler.stage("include graph"):
+            include_metrics = _include_metrics(spool, paths, repo_root, include_paths)
+            del paths
+
+        try:
+            with profiler.stage("write"), open(output_path, 'w', encoding='utf-8') as f:
+                writer = DashboardStreamWriter(f, repo_root)
+                for file_data, metrics in zip(_read_spool(spool), include_metrics):
+                    file_data.update(metrics)
+                    writer.add_file(file_data)
+                writer.close()
+        except OSError as e:
+            raise IOError(f"Failed to write dashboard data to {output_path}: {e}")
+    return count
@@ -0,0 +1,22 @@
+"""Helpers for tests that need a throwaway git repository."""
+import os
+import subprocess
+
+
+def run_git(repo, *args, env=None):
+    subprocess.check_call(['git'] + list(args), cwd=repo, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def commit_files(repo, author, timestamp, files):
+    for rel_path, content in files.items():
+        full_path = os.path.join(repo, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+    env = dict(os.environ,
+               GIT_AUTHOR_NAME=author, GIT_AUTHOR_EMAIL='dev@example.com',
+               GIT_COMMITTER_NAME=author, GIT_COMMITTER_EMAIL='dev@example.com',
+               GIT_AUTHOR_DATE=f'{timestamp} +0000', GIT_COMMITTER_DATE=f'{timestamp} +0000')
+    run_git(repo, 'add', '-A', env=env)
+    run_git(repo, 'commit', '-q', '-m', 'change', env=env)
@@ -0,0 +1,80 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from analysis_cache import ANALYSIS_NAMESPACE, AnalysisCache, blob_oid, default_cache_dir
+from metrics_collector import collect_metrics_for_repo
+
+
+class TestAnalysisCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.repo = os.path.join(self.test_dir, "repo")
+        self.cache_dir = os.path.join(self.test_dir, "cache")
+        os.makedirs(self.repo)
+        for i in range(5):
+            with open(os.path.join(self.repo, f"file{i}.cpp"), "w") as f:
+                f.write(f'#include "file{i}.h"\nclass C{i} {{}};\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_blob_oid_matches_git(self):
+        # `printf 'hello\n' | git hash-object --stdin`
+        self.assertEqual(blob_oid(b"hello\n"), "ce013625030ba8dba906f756967f9e9ca394464a")
+
+    def test_rerun_only_parses_changed_files(self):
+        first_cache = AnalysisCache(self.cache_dir)
+        first = collect_metrics_for_repo(self.repo, debug=True, cache=first_cache)
+        self.assertEqual((first_cache.hits, first_cache.misses), (0, 5))
+
+        with open(os.path.join(self.repo, "file0.cpp"), "a") as f:
+            f.write("struct Added {};\n")
+        second_cache = AnalysisCache(self.cache_dir)
+        second = collect_metrics_for_repo(self.repo, debug=True, jobs=2, cache=second_cache)
+        self.assertEqual((second_cache.hits, second_cache.misses), (4, 1))
+        self.assertEqual(second, collect_metrics_for_repo(self.repo, debug=True))
+        changed = next(f for f in second if f["name"] == "file0.cpp")
+        self.assertEqual(changed["classes"], ["C0", "Added"])
+
+    def test_eviction_drops_least_recently_used(self):
+        cache = AnalysisCache(self.cache_dir, max_bytes=250)
+        keys = [f"{i:040x}" for i in range(5)]
+        for i, key in enumerate(keys):
+            cache.put(key, {"payload": "x" * 80})
+            past = time.time() - 100 + i
+            os.utime(cache._entry_path(key, ANALYSIS_NAMESPACE), (past, past))
+        # A hit makes the oldest entry the most recently used one
+        self.assertIsNotNone(cache.get(keys[0]))
+        cache.evict()
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[4]))
+
+    def test_eviction_walks_only_over_the_limit(self):
+        cache = AnalysisCache(self.cache_dir, max_bytes=1000)
+        for i in range(5):
+            cache.put(f"{i:040x}", {"payload": "x" * 80})
+        # The journal of the puts says the cache fits, so it is not walked
+        with mock.patch('analysis_cache.os.walk', side_effect=AssertionError("walked")):
+            self.assertEqual(cache.evict(), 0)
+        # Entries written by another process (e.g. a worker) are in the journal too
+        AnalysisCache(self.cache_dir).put(f"{5:040x}", {"payload": "x" * 800})
+        cache.max_bytes = 600
+        self.assertGreater(cache.evict(), 0)
+        with mock.patch('analysis_cache.os.walk', side_effect=AssertionError("walked")):
+            self.assertEqual(cache.evict(), 0)
+
+    def test_default_cache_dir_is_outside_the_repository(self):
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.cache_dir}):
+            cache_dir = default_cache_dir(self.repo)
+            self.assertEqual(os.path.dirname(os.path.dirname(cache_dir)), self.cache_dir)
+            self.assertEqual(default_cache_dir(os.path.join(self.repo, '.')), cache_dir)
+            self.assertNotEqual(default_cache_dir(self.test_dir), cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 import os
 import tempfile
 import shutil
-from cpp_parser import parse_cpp_file
+from cpp_parser import parse_cpp_bytes, parse_cpp_file
 from scan_repo import is_cpp_file
 
 class TestAnalyzer(unittest.TestCase):
@@ -37,5 +37,34 @@ class TestAnalyzer(unittest.TestCase):
         self.assertEqual(len(metrics['classes']), 1)
         self.assertEqual(metrics['classes'][0], 'MyClass')
 
+    def test_cpp_parser_skips_comments_and_strings(self):
+        source = (
+            b'// header\r\n'
+            b'/* block\r\n'
+            b' * #include <in_block.h>\r\n'
+            b'\r\n'
+            b' */\r\n'
+            b'#include <vector> // trailing\r\n'
+            b'  #  include "a/b.h"\r\n'
+            b'const char* s = "#include <fake.h> class Fake {";\r\n'
+            b'// class Commented {\r\n'
+            b'int x; /* inline */ int y;\r\n'
+            b'/* a */ /* b */\r\n'
+            b'auto r = R"x(\n#include <raw.h>\n)x";\r\n'
+            b'class Foo : public Bar<int> {\r\n'
+            b'};\r\n'
+            b'myclass NotAClass {};\r\n'
+        )
+        metrics = parse_cpp_bytes(source)
+        self.assertEqual(metrics['includes'], ['vector', 'a/b.h'])
+        self.assertEqual(metrics['classes'], ['Foo'])
+        self.assertEqual(metrics['comment_loc'], 6)
+        self.assertEqual(metrics['loc'], 10)
+
+    def test_cpp_parser_empty_file(self):
+        file_path = os.path.join(self.test_dir, "empty.h")
+        open(file_path, "w").close()
+        self.assertEqual(parse_cpp_file(file_path), {"loc": 0, "comment_loc": 0, "includes": [], "classes": []})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import shutil
+import tempfile
+from git_helpers import run_git, commit_files
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from change_coupling import ChangeCoupling, apply_change_coupling, build_change_coupling, strip_change_coupling
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestChangeCoupling(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {
+            'core/engine.cpp': 'class Engine {};\n', 'core/engine.h': 'class Engine;\n',
+            'ui/view.cpp': 'class View {};\n', 'docs/notes.md': 'v0\n',
+        })
+        for i in range(1, 4):
+            # engine.h always changes with engine.cpp, twice with view.cpp
+            files = {'core/engine.cpp': f'class Engine {{}};\n// {i}\n', 'core/engine.h': f'class Engine;\n// {i}\n',
+                     'docs/notes.md': f'v{i}\n'}
+            if i < 3:
+                files['ui/view.cpp'] = f'class View {{}};\n// {i}\n'
+            commit_files(self.repo, 'Bob', 1700000000 + i * 1000, files)
+        commit_files(self.repo, 'Bob', 1700010000, {'core/engine.h': 'class Engine;\n// 4\n'})
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def test_coupling_metrics(self):
+        coupling = build_change_coupling(self.repo, min_support=2)
+        engine_cpp, engine_h, view = (os.path.join(*p.split('/')) for p in
+                                      ('core/engine.cpp', 'core/engine.h', 'ui/view.cpp'))
+        # Only analyzed files are counted
+        self.assertEqual(sorted(coupling.paths), [engine_cpp, engine_h, view])
+        self.assertEqual(coupling.changes[coupling.ids[engine_h]], 5)
+
+        tree = aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True), self.repo)
+        apply_change_coupling(tree, coupling)
+        nodes = {}
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            nodes[node["path"]] = node["metrics"]
+            stack.extend(node.get("children", ()))
+        # Degree: shared changes over the mean changes of both files (engine.cpp 4, engine.h 5, view.cpp 3)
+        self.assertEqual(nodes[engine_cpp]["coupled"], [[engine_h, 4, 88.9], [view, 3, 85.7]])
+        self.assertEqual(nodes[engine_h]["coupling"], 88.9)
+        self.assertEqual(nodes["ui"]["coupled"], [[engine_cpp, view, 3, 85.7], [engine_h, view, 3, 75.0]])
+        self.assertEqual(nodes["."]["coupled"][0], [engine_cpp, engine_h, 4, 88.9])
+        self.assertEqual((nodes[engine_h]["churn"], nodes[engine_h]["hotspot"]), (5, 5))
+        self.assertEqual(nodes["."]["churn"], 5 + 4 + 3)
+        self.assertEqual(nodes["."]["hotspot"], sum(nodes[p]["hotspot"] for p in (engine_cpp, engine_h, view)))
+
+        strip_change_coupling(tree)
+        self.assertNotIn("hotspot", tree["metrics"])
+        self.assertNotIn("coupled", nodes[view])
+
+    def test_large_commits_are_skipped(self):
+        coupling = build_change_coupling(self.repo, max_commit_files=2, min_support=2)
+        # The first three commits touch three analyzed files
+        self.assertEqual((coupling.commits, coupling.skipped), (5, 3))
+        self.assertEqual(coupling.coupled_pairs(), [])
+
+
+class TestPruning(unittest.TestCase):
+
+    def test_rare_pairs_are_pruned(self):
+        coupling = ChangeCoupling(min_support=1, max_pairs=4)
+        for _ in range(3):
+            coupling.add_commit(['a', 'b'])
+        coupling.add_commit(['c', 'd', 'e'])
+        self.assertEqual(len(coupling.pairs), 4)
+        coupling.add_commit(['f', 'g'])
+        # Pairs seen once were dropped; the frequent pair is exact
+        self.assertEqual(coupling.pruned_below, 2)
+        self.assertEqual([(coupling.paths[a], coupling.paths[b], shared) for a, b, shared, _ in
+                          coupling.coupled_pairs()], [('a', 'b', 3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from dashboard_generator import (decode_columnar, encode_columnar, generate_dashboard_columnar,
+                                 generate_dashboard_json, generate_dashboard_shards, load_dashboard)
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+
+DASHBOARD_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'metrics_dashboard.html')
+
+
+def _extract_js_function(html, name):
+    start = html.index(f"function {name}(")
+    depth = 0
+    for i in range(html.index('{', start), len(html)):
+        if html[i] == '{':
+            depth += 1
+        elif html[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return html[start:i + 1]
+    raise ValueError(name)
+
+
+class TestDashboardGenerator(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        files = {
+            'CODEOWNERS': '* @everyone\nui/ @ui-team @design\n',
+            'core/util.h': 'struct Util {};\n',
+            'core/core.cpp': '#include "util.h"\nclass Core {};\nclass Engine {};\n',
+            'ui/view.cpp': '#include "../core/util.h"\nclass View {};\n',
+            'main.cpp': 'int main() {}\n',
+        }
+        for rel_path, content in files.items():
+            full_path = os.path.join(self.repo, rel_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as f:
+                f.write(content)
+        self.tree = aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True), self.repo)
+        # A metric only some files have and a None value
+        self.tree["children"][0]["children"][0]["metrics"]["optional"] = None
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def test_columnar_round_trip(self):
+        encoded = encode_columnar(self.tree)
+        self.assertEqual(len(encoded["strings"]), len(set(encoded["strings"])))
+        self.assertEqual(encoded["metrics"]["classes_list"]["kind"], "list")
+        self.assertEqual(encoded["metrics"]["owner"]["kind"], "str")
+        self.assertEqual(decode_columnar(json.loads(json.dumps(encoded))), self.tree)
+
+    def test_load_dashboard_any_format(self):
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir)
+        json_path = os.path.join(out_dir, 'dashboard.json')
+        generate_dashboard_json(self.tree, json_path)
+        self.assertEqual(load_dashboard(json_path), self.tree)
+        for compress in (False, True):
+            path = os.path.join(out_dir, f'dashboard_{compress}.columnar')
+            generate_dashboard_columnar(self.tree, path, compress=compress)
+            self.assertEqual(load_dashboard(path), self.tree)
+            self.assertLess(os.path.getsize(path), os.path.getsize(json_path))
+
+    def test_rejects_underived_paths(self):
+        self.tree["children"][0]["path"] = "elsewhere"
+        with self.assertRaises(ValueError):
+            encode_columnar(self.tree)
+
+    def test_sharded_round_trip(self):
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir)
+        # Small limits so the root and its folders are split over several shards
+        count = generate_dashboard_shards(self.tree, out_dir, shard_nodes=2, inline_nodes=1)
+        self.assertGreater(count, 1)
+        with open(os.path.join(out_dir, 'index.json'), encoding='utf-8') as f:
+            root = json.load(f)["root"]
+        self.assertNotIn("children", root)
+        self.assertEqual(root["child_count"], len(self.tree["children"]))
+        self.assertEqual(root["metrics"], self.tree["metrics"])
+        self.assertEqual(load_dashboard(out_dir), self.tree)
+        self.assertEqual(load_dashboard(os.path.join(out_dir, 'index.json')), self.tree)
+
+    def test_sharded_rewrite_removes_stale_shards(self):
+        out_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, out_dir)
+        generate_dashboard_shards(self.tree, out_dir, shard_nodes=2, inline_nodes=1)
+        self.assertEqual(generate_dashboard_shards(self.tree, out_dir), 0)
+        self.assertEqual(os.listdir(os.path.join(out_dir, 'shards')), [])
+        self.assertEqual(load_dashboard(out_dir), self.tree)
+
+    @unittest.skipIf(shutil.which('node') is None, "node is not available")
+    def test_browser_decoder_matches(self):
+        with open(DASHBOARD_HTML, encoding='utf-8') as f:
+            decoder = _extract_js_function(f.read(), "decodeColumnar")
+        script = decoder + "\nlet input = ''; process.stdin.on('data', d => input += d);" \
+                           "\nprocess.stdin.on('end', () => process.stdout.write(JSON.stringify(decodeColumnar(JSON.parse(input)))));"
+        output = subprocess.run(['node', '-e', script], input=json.dumps(encode_columnar(self.tree)).encode(),
+                                stdout=subprocess.PIPE, check=True).stdout
+        self.assertEqual(json.loads(output), self.tree)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import os
+import shutil
+import tempfile
+import zlib
+from unittest import mock
+import duplicates
+from git_helpers import run_git, commit_files
+from analysis_cache import AnalysisCache
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from duplicates import apply_duplicates, block_signatures, lsh_bands, strip_duplicates, tokenize
+
+FUNCTION = "int update(State& state, int limit) {\n" + "".join(
+    f"    if (state.value{i} > limit) {{ state.total += state.value{i} * {i}; }}\n" for i in range(20)) + \
+    "    return state.total;\n}\n"
+
+
+class TestTokenize(unittest.TestCase):
+
+    def test_layout_comments_and_literals_are_ignored(self):
+        a = tokenize(b'#include "a.h"\nint x = f("text", 42); // note\n')
+        b = tokenize(b'#include <b.h>\n/* block */ int   x=\n  f( "other" , 7 ) ;\n')
+        self.assertEqual(a, b)
+        self.assertEqual(a[:2], [zlib.crc32(b'int'), zlib.crc32(b'x')])
+        self.assertNotEqual(tokenize(b'int x = f(y);'), a)
+
+    def test_numpy_and_python_signatures_agree(self):
+        codes = tokenize(FUNCTION.encode() * 3)
+        signatures = block_signatures(codes)
+        self.assertEqual(len(signatures), (len(codes) - duplicates.SHINGLE_TOKENS) // duplicates.BLOCK_STRIDE)
+        with mock.patch.object(duplicates, 'numpy', None):
+            self.assertEqual(block_signatures(codes), signatures)
+        self.assertEqual(block_signatures(codes[:20]), [])
+
+    def test_lsh_bands_follow_min_similarity(self):
+        for similarity in (0.3, 0.5, 0.7, 0.9):
+            bands, rows = lsh_bands(similarity)
+            self.assertLessEqual(bands * rows, duplicates.NUM_PERM)
+            # The S-curve crosses near the threshold: pairs at it are candidates more often
+            # than not, pairs well below it rarely
+            self.assertGreater(1 - (1 - similarity ** rows) ** bands, 0.6)
+            self.assertLess(1 - (1 - (similarity - 0.25) ** rows) ** bands, 0.35)
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestDuplicates(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {
+            'core/state.cpp': '#include "state.h"\n' + FUNCTION,
+            # Reformatted, commented copy with other constants
+            'ui/copy.cpp': '// Copied from core\n' + FUNCTION.replace('    ', '\t').replace('* 1', '* 9') +
+                           ''.join(f'void other{i}(Widget& w) {{ w.draw({i}); w.hide(); }}\n' for i in range(40)),
+            'ui/unrelated.cpp': ''.join(f'double scale{i}(double x) {{ return x / {i + 1}.0; }}\n' for i in range(40)),
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+        shutil.rmtree(self.cache_dir)
+
+    def _metrics(self, tree):
+        nodes = {}
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            nodes[node["path"]] = node["metrics"]
+            stack.extend(node.get("children", ()))
+        return nodes
+
+    def test_duplicate_metrics(self):
+        tree = aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True), self.repo)
+        cache = AnalysisCache(self.cache_dir)
+        apply_duplicates(tree, self.repo, cache=cache)
+        nodes = self._metrics(tree)
+        state, copy, unrelated = (os.path.join(*p.split('/')) for p in
+                                  ('core/state.cpp', 'ui/copy.cpp', 'ui/unrelated.cpp'))
+        self.assertEqual(nodes[state]["duplicated"], 100)
+        self.assertEqual(nodes[state]["duplicates"][0][0], copy)
+        # Matching is per block, so the copy's duplicated span may reach past the function
+        self.assertGreaterEqual(nodes[copy]["dup_tokens"], nodes[state]["tokens"])
+        self.assertLess(nodes[copy]["duplicated"], 100)
+        self.assertEqual((nodes[unrelated]["duplicated"], nodes[unrelated]["duplicates"]), (0, []))
+        self.assertEqual(nodes["ui"]["dup_tokens"], nodes[copy]["dup_tokens"])
+        self.assertEqual(nodes["."]["tokens"], sum(nodes[p]["tokens"] for p in (state, copy, unrelated)))
+
+        # Signatures come from the cache, and without NumPy the same blocks are found
+        again = aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True), self.repo)
+        with mock.patch.object(duplicates, 'numpy', None), \
+                mock.patch.object(duplicates, 'tokenize', side_effect=AssertionError("not cached")):
+            apply_duplicates(again, self.repo, cache=cache)
+        self.assertEqual(again, tree)
+
+        # At the cut-off the same partners are kept as are shown: most blocks, then smallest path
+        for name in ('b', 'a', 'c'):
+            with open(os.path.join(self.repo, 'ui', f'{name}.cpp'), 'w') as f:
+                f.write(FUNCTION)
+        again = aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True), self.repo)
+        apply_duplicates(again, self.repo, top=3)
+        partners = self._metrics(again)[state]["duplicates"]
+        self.assertEqual([path for path, _ in partners], [copy, os.path.join('ui', 'a.cpp'), os.path.join('ui', 'b.cpp')])
+
+        strip_duplicates(tree)
+        self.assertNotIn("duplicated", tree["metrics"])
+        self.assertNotIn("duplicates", nodes[copy])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+from git_helpers import run_git, commit_files
+from analysis_cache import AnalysisCache
+from external_metrics import get_symbol_sizes, load_external_reports
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from results_store import write_results_db, query
+from elf_symbols import SymbolSizeProvider, load_symbol_sizes, object_source, parse_link_map, read_artifact
+
+
+SOURCES = {
+    'src/table.cpp': 'int table[100] = {1};\nint lookup(int x) { return table[x] * 3; }\n',
+    'src/msg.c': 'const char msg[] = "hello world";\nint first(void) { return msg[0]; }\n'
+                 'int main(void) { return first(); }\n',
+    'lib/util.c': 'long counter[8];\nvoid bump(int i) { counter[i]++; }\n',
+}
+
+GNU_MAP = """Discarded input sections
+
+ .text          0x0000000000000000        0x0 obj/unused.o
+
+Linker script and memory map
+
+ .text          0x0000000000401000       0x20 obj/main.o
+                0x0000000000401000                main
+ .text.startup
+                0x0000000000401020       0x10 obj/main.o
+ .rodata        0x0000000000402000        0xc libutil.a(util.o)
+ *fill*         0x000000000040200c        0x4
+ COMMON         0x0000000000404000        0x8 obj/main.o
+ .debug_info    0x0000000000000000      0x100 obj/main.o
+.text           0x0000000000401000       0x30
+"""
+
+LLD_MAP = """             VMA              LMA     Size Align Out     In      Symbol
+          201000           201000       30    16 .text
+          201000           201000       20    16         obj/main.o:(.text)
+          201020           201020       10    16         libutil.a(util.o):(.text.bump)
+          202000           202000        c     1         obj/main.o:(.rodata.str1.1)
+"""
+
+
+def _compile(repo, build, source, obj, *flags):
+    os.makedirs(os.path.dirname(os.path.join(build, obj)), exist_ok=True)
+    compiler = 'g++' if source.endswith('.cpp') else 'gcc'
+    subprocess.check_call([compiler, '-O1', '-c', source, '-o', os.path.join(build, obj)] + list(flags), cwd=repo)
+
+
+class TestLinkMaps(unittest.TestCase):
+
+    def _parse(self, text):
+        with tempfile.NamedTemporaryFile('w', suffix='.map', delete=False) as f:
+            f.write(text)
+        try:
+            return parse_link_map(f.name)
+        finally:
+            os.remove(f.name)
+
+    def test_gnu_ld_map(self):
+        # Discarded sections, fill, debug sections and output sections are not counted
+        self.assertEqual(self._parse(GNU_MAP), {'obj/main.o': [0x30, 0x8], 'libutil.a(util.o)': [0, 0xc]})
+
+    def test_lld_map(self):
+        self.assertEqual(self._parse(LLD_MAP), {'obj/main.o': [0x20, 0xc], 'libutil.a(util.o)': [0x10, 0]})
+
+    def test_map_object_suffix(self):
+        objects = {('/b/.objs/io.o', ''): [1, 0], ('/b/objs/io.o', ''): [2, 0]}
+        by_name = {'io.o': list(objects)}
+        map_object = SymbolSizeProvider._map_object
+        self.assertEqual(map_object('.objs/io.o', ['/elsewhere'], objects, by_name), ('/b/.objs/io.o', ''))
+        self.assertEqual(map_object('../../objs/io.o', ['/elsewhere'], objects, by_name), ('/b/objs/io.o', ''))
+
+    def test_object_source(self):
+        self.assertEqual(object_source('/b/src/CMakeFiles/app.dir/core/io.cpp.o'), 'core/io.cpp')
+        self.assertIsNone(object_source('/b/obj/io.o'))
+
+
+@unittest.skipIf(not all(shutil.which(tool) for tool in ('gcc', 'g++', 'ar', 'git')), "gcc, ar or git is not available")
+class TestElfSymbols(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.build = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, SOURCES)
+        _compile(self.repo, self.build, 'src/table.cpp', 'table.o', '-g')
+        _compile(self.repo, self.build, 'src/msg.c', 'msg.o', '-g', '-gdwarf-4')
+        # No debug info: attributed through the CMake object name
+        _compile(self.repo, self.build, 'lib/util.c', 'CMakeFiles/util.dir/lib/util.c.o', '-g0')
+        subprocess.check_call(['ar', 'rcs', 'libtable.a', 'table.o'], cwd=self.build)
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+        shutil.rmtree(self.build)
+
+    def test_read_artifact(self):
+        [[member, code, data, name, comp_dir]], hit = read_artifact(os.path.join(self.build, 'table.o'))
+        self.assertEqual((member, data, name, hit), ('', 400, 'src/table.cpp', False))
+        self.assertGreater(code, 0)
+        self.assertEqual(os.path.realpath(comp_dir), os.path.realpath(self.repo))
+        # Archive members are read in place
+        objects, _ = read_artifact(os.path.join(self.build, 'libtable.a'))
+        self.assertEqual(objects, [['table.o', code, data, name, comp_dir]])
+
+        [[_, _, data, name, _]], _ = read_artifact(os.path.join(self.build, 'msg.o'))
+        self.assertEqual((data, name), (12, 'src/msg.c'))
+
+    def test_attribution(self):
+        symbols = load_symbol_sizes(self.repo, [self.build])
+        self.assertEqual(sorted(symbols.index), [os.path.join('lib', 'util.c'), os.path.join('src', 'msg.c'),
+                                                 os.path.join('src', 'table.cpp')])
+        # table.o and its copy in libtable.a count once
+        table = symbols.index[os.path.join('src', 'table.cpp')]
+        self.assertEqual(table['data_size'], 400)
+        self.assertEqual(table['symbol_size'], table['code_size'] + 400)
+        self.assertEqual(symbols.index[os.path.join('lib', 'util.c')]['data_size'], 64)
+        self.assertEqual(get_symbol_sizes(os.path.join(self.repo, 'src', 'table.cpp'), symbols),
+                         table['symbol_size'])
+        self.assertEqual(get_symbol_sizes(os.path.join(self.repo, 'src', 'table.cpp')), 0)
+
+    def test_link_map(self):
+        map_path = os.path.join(self.build, 'app.map')
+        subprocess.check_call(['gcc', f'-Wl,-Map={map_path}', 'msg.o', 'libtable.a', '-o', 'app'], cwd=self.build)
+        symbols = load_symbol_sizes(self.repo, [self.build, map_path])
+        # Nothing calls into libtable.a, so the linker did not pull table.o in
+        self.assertEqual(list(symbols.index), [os.path.join('src', 'msg.c')])
+        self.assertEqual(symbols.index[os.path.join('src', 'msg.c')]['data_size'], 12)
+
+    def test_cache_by_mtime_and_size(self):
+        cache = AnalysisCache(tempfile.mkdtemp(dir=self.build))
+        path = os.path.join(self.build, 'msg.o')
+        objects, hit = read_artifact(path, cache)
+        self.assertFalse(hit)
+        self.assertEqual(read_artifact(path, cache), (objects, True))
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertFalse(read_artifact(path, cache)[1])
+
+    def test_malformed_artifacts(self):
+        with open(os.path.join(self.build, 'table.o'), 'rb') as f:
+            data = f.read()
+        with open(os.path.join(self.build, 'truncated.o'), 'wb') as f:
+            f.write(data[:200])
+        open(os.path.join(self.build, 'empty.o'), 'wb').close()
+        self.assertEqual(read_artifact(os.path.join(self.build, 'truncated.o')), ([], False))
+        self.assertEqual(read_artifact(os.path.join(self.build, 'empty.o')), ([], False))
+
+    def test_folder_rollup(self):
+        external = load_external_reports(self.repo, [('elf', self.build)], jobs=2)
+        tree = aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, external=external), self.repo)
+        files = {child['name']: child for folder in tree['children'] for child in folder['children']}
+        self.assertEqual(files['util.c']['metrics']['data_size'], 64)
+        for key in ('symbol_size', 'code_size', 'data_size'):
+            self.assertEqual(tree['metrics'][key], sum(child['metrics'][key] for child in files.values()))
+        self.assertGreater(tree['metrics']['code_size'], 0)
+
+        db = os.path.join(self.build, 'results.db')
+        write_results_db(tree, db)
+        headers, rows = query(db, where=['data_size>=64'], sort='symbol_size', columns=['code_size', 'data_size'])
+        self.assertEqual(headers, ['path', 'code_size', 'data_size', 'symbol_size'])
+        table = files['table.cpp']['metrics']
+        self.assertEqual(rows[0], (os.path.join('src', 'table.cpp'), table['code_size'], 400, table['symbol_size']))
+        self.assertEqual([row[0] for row in rows[1:]], [os.path.join('lib', 'util.c')])
+        _, rows = query(db, folders=True, prefix='.', columns=['symbol_size'], top=1)
+        self.assertEqual(rows, [('.', tree['metrics']['symbol_size'])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import external_metrics
+from external_metrics import ExternalMetricsIndex, ReportPaths, load_external_reports
+from metrics_collector import collect_metrics_for_repo
+
+
+class TestExternalMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = os.path.realpath(tempfile.mkdtemp())
+        self.reports = tempfile.mkdtemp()
+        for rel_path in ('src/a.cpp', 'src/b.cpp', 'inc/c.h'):
+            full_path = os.path.join(self.repo, rel_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as f:
+                f.write('int x;\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+        shutil.rmtree(self.reports)
+
+    def _report(self, name, content):
+        path = os.path.join(self.reports, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_report_paths(self):
+        paths = ReportPaths(self.repo)
+        a = os.path.join('src', 'a.cpp')
+        self.assertEqual(paths.resolve(os.path.join(self.repo, 'src', 'a.cpp')), a)
+        self.assertEqual(paths.resolve('src/../src/a.cpp'), a)
+        self.assertEqual(paths.resolve('src\\a.cpp'), a)
+        self.assertEqual(paths.resolve('file://' + self.repo + '/src/a%2Ecpp'), a)
+        self.assertEqual(paths.resolve('a.cpp', [os.path.join(self.repo, 'inc'), os.path.join(self.repo, 'src')]), a)
+        self.assertIsNone(paths.resolve('/usr/include/stdio.h'))
+        self.assertIsNone(paths.resolve('../outside.cpp'))
+
+    def test_lcov_merges_records(self):
+        report = self._report('coverage.info', (
+            "TN:\nSF:{repo}/src/a.cpp\nDA:1,1\nDA:2,0\nDA:3,0\nDA:4,0\nLF:4\nLH:1\nend_of_record\n"
+            "TN:\nSF:{repo}/src/a.cpp\nDA:2,5\nDA:3,0\nend_of_record\n"
+            "SF:/usr/include/vector\nDA:1,1\nend_of_record\n"
+            "SF:src/b.cpp\nDA:1,0\nend_of_record\n").format(repo=self.repo))
+        index = load_external_reports(self.repo, [("lcov", report)])
+        base = {"coverage": 0.0, "misra_critical": 0}
+        self.assertEqual(index.overlay(os.path.join('src', 'a.cpp'), base), {"coverage": 50.0, "misra_critical": 0})
+        self.assertEqual(index.overlay(os.path.join('src', 'b.cpp'), base)["coverage"], 0.0)
+        self.assertEqual(index.overlay(os.path.join('inc', 'c.h'), base), base)
+        self.assertEqual(index.providers["lcov"].skipped, 1)
+
+    def test_cobertura_ignores_method_lines(self):
+        report = self._report('coverage.xml', f"""<?xml version="1.0" ?>
+<coverage line-rate="0.5">
+  <sources><source>{self.repo}/src</source><source>{self.repo}/inc</source></sources>
+  <packages><package name="p"><classes>
+    <class name="a" filename="a.cpp">
+      <methods><method name="f"><lines><line number="1" hits="1"/><line number="2" hits="1"/></lines></method></methods>
+      <lines><line number="1" hits="1"/><line number="2" hits="0"/><line number="3" hits="0"/></lines>
+    </class>
+    <class name="c" filename="c.h"><lines><line number="1" hits="3"/></lines></class>
+  </classes></package></packages>
+</coverage>
+""")
+        index = load_external_reports(self.repo, [("cobertura", report)])
+        self.assertEqual(index.overlay(os.path.join('src', 'a.cpp'), {})["coverage"], 33.33)
+        self.assertEqual(index.overlay(os.path.join('inc', 'c.h'), {})["coverage"], 100.0)
+
+    def _sarif_log(self):
+        return {"version": "2.1.0", "runs": [
+            {"tool": {"driver": {"name": "cppcheck"}},
+             "results": [
+                 {"ruleId": "misra-c2012-10.4", "level": "error",
+                  "locations": [{"physicalLocation": {"artifactLocation": {"uri": "src/a.cpp", "uriBaseId": "SRC"}}}]},
+                 {"ruleId": "misra-c2012-15.5",
+                  "locations": [{"physicalLocation": {"artifactLocation": {"uri": "src/a.cpp", "uriBaseId": "SRC"}}}]},
+                 {"ruleId": "misra-c2012-2.7", "level": "note",
+                  "locations": [{"physicalLocation": {"artifactLocation": {"uri": "src/a.cpp", "uriBaseId": "SRC"}}}]},
+                 {"ruleId": "misra-c2012-8.4", "level": "warning",
+                  "locations": [{"physicalLocation": {"artifactLocation": {"uri": f"file://{self.repo}/inc/c.h"}}}]},
+             ],
+             "originalUriBaseIds": {"SRC": {"uri": f"file://{self.repo}/"}}},
+        ]}
+
+    def test_sarif_counts_by_level(self):
+        report = self._report('misra.sarif', json.dumps(self._sarif_log()))
+        ijson = external_metrics.ijson
+        # Without ijson the log is read with json.load; both must agree
+        for module in {ijson, None}:
+            external_metrics.ijson = module
+            try:
+                index = load_external_reports(self.repo, [("sarif", report)])
+            finally:
+                external_metrics.ijson = ijson
+            self.assertEqual(index.overlay(os.path.join('src', 'a.cpp'), {"coverage": 1.0}),
+                             {"coverage": 1.0, "misra_critical": 1, "misra_medium": 1})
+            self.assertEqual(index.overlay(os.path.join('inc', 'c.h'), {})["misra_medium"], 1)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ExternalMetricsIndex(self.repo).load("gcov", "report")
+
+    def test_collector_overlays_reports(self):
+        report = self._report('coverage.info', "SF:src/a.cpp\nDA:1,1\nend_of_record\n")
+        external = load_external_reports(self.repo, [("lcov", report)])
+        records = {r["rel_path"]: r for r in collect_metrics_for_repo(self.repo, debug=True, external=external)}
+        self.assertEqual(records[os.path.join('src', 'a.cpp')]["external"]["coverage"], 100.0)
+        self.assertEqual(records[os.path.join('src', 'b.cpp')]["external"]["coverage"], 0.0)
+        self.assertEqual(records[os.path.join('src', 'a.cpp')]["external"]["misra_critical"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
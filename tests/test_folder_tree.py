@@ -0,0 +1,112 @@
+import unittest
+import os
+import sys
+import folder_tree
+from folder_tree import FolderTree
+
+
+def file_node(rel_path, loc, staleness, coverage=0.0, owner="@team"):
+    return {
+        "name": os.path.basename(rel_path),
+        "type": "file",
+        "path": rel_path,
+        "full_path": os.path.join("/repo", rel_path),
+        "metrics": {"loc": loc, "comment_loc": 0, "size": loc * 10, "classes": 1, "includes": 0,
+                    "included_by": 0, "included_by_transitive": loc, "rebuild_tus": 0,
+                    "misra_crit": 0, "misra_med": 0, "staleness": staleness, "coverage": coverage,
+                    "owner": owner},
+    }
+
+
+def build_tree(nodes):
+    tree = FolderTree("/repo")
+    for node in nodes:
+        tree.add_file(node)
+    return tree
+
+
+class TestFolderTree(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = [
+            file_node(os.path.join("src", "a.cpp"), 100, 10, 50.0),
+            file_node(os.path.join("src", "b.cpp"), 300, 90, 100.0),
+            file_node(os.path.join("src", "util", "c.cpp"), 0, 40, 0.0, owner="@other"),
+            file_node("main.cpp", 0, 20),
+        ]
+
+    def _folder(self, root, *names):
+        node = root
+        for name in names:
+            node = next(child for child in node["children"] if child["name"] == name)
+        return node
+
+    def test_blame_rollup(self):
+        self.nodes[0]["metrics"].update(folder_tree.blame_metrics({"Alice": 60, "Bob": 40}))
+        self.nodes[2]["metrics"].update(folder_tree.blame_metrics({"Bob": 30}))
+        self.nodes[3]["metrics"].update(folder_tree.blame_metrics({"Carol": 70}))
+        root = build_tree(self.nodes).to_nested()
+        self.assertEqual(self.nodes[0]["metrics"]["blame_authors"], [["Alice", 60], ["Bob", 40]])
+        src = self._folder(root, "src")["metrics"]
+        self.assertEqual((src["blame_owner"], src["blame_share"]), ("Bob", 53.8))
+        self.assertEqual(src["blame_authors"], [["Bob", 70], ["Alice", 60]])
+        self.assertEqual(root["metrics"]["blame_authors"], [["Bob", 70], ["Carol", 70], ["Alice", 60]])
+        self.assertEqual(root["metrics"]["blame_owner"], "Bob")
+
+        many = folder_tree.blame_metrics({f"dev{i}": i for i in range(1, 9)}, folder_tree.BLAME_TOP_AUTHORS)
+        self.assertEqual([author for author, _ in many["blame_authors"]], ["dev8", "dev7", "dev6", "dev5", "dev4"])
+        self.assertNotIn("blame_owner", build_tree(self.nodes[1:2]).to_nested()["metrics"])
+
+    def test_add_files_matches_add_file(self):
+        tree = FolderTree("/repo")
+        tree.add_files(self.nodes[:2])
+        tree.add_files(iter(self.nodes[2:]))
+        self.assertEqual(tree.to_nested(), build_tree(self.nodes).to_nested())
+        self.assertTrue(all(tree.parent[i] < i for i in range(1, len(tree))))
+
+    def test_rollup(self):
+        root = build_tree(self.nodes).to_nested()
+        self.assertEqual([child["name"] for child in root["children"]], ["src", "main.cpp"])
+        src = self._folder(root, "src")
+        self.assertEqual([child["name"] for child in src["children"]], ["util", "a.cpp", "b.cpp"])
+        metrics = src["metrics"]
+        self.assertEqual(metrics["loc"], 400)
+        self.assertEqual(metrics["included_by_transitive"], 300)
+        self.assertEqual(metrics["owner"], "Mixed")
+        # Plain average over direct children (util counts as one child)
+        self.assertEqual(metrics["staleness"], round((40 + 10 + 90) / 3, 2))
+        # LOC-weighted over all files below
+        self.assertEqual(metrics["staleness_weighted"], round((100 * 10 + 300 * 90) / 400, 2))
+        self.assertEqual(metrics["coverage_weighted"], 87.5)
+        self.assertEqual(metrics["staleness_p50"], 40)
+        self.assertEqual(metrics["staleness_p90"], 80)
+        self.assertEqual(root["metrics"]["staleness_p50"], 30)
+
+    def test_zero_loc_weighted_falls_back_to_mean(self):
+        util = self._folder(build_tree(self.nodes).to_nested(), "src", "util")
+        self.assertEqual(util["metrics"]["staleness_weighted"], 40)
+        self.assertEqual(util["metrics"]["owner"], "@other")
+
+    @unittest.skipIf(folder_tree.numpy is None, "NumPy is not installed")
+    def test_numpy_matches_python(self):
+        nodes = [file_node(os.path.join(f"d{i % 7}", f"e{i % 3}", f"f{i}.cpp"), i % 11, (i * 37) % 100,
+                           (i * 13) % 101, owner=f"@o{i % 5 // 4}") for i in range(500)]
+        with_numpy = build_tree(nodes).to_nested()
+        numpy_module = folder_tree.numpy
+        folder_tree.numpy = None
+        try:
+            without_numpy = build_tree(nodes).to_nested()
+        finally:
+            folder_tree.numpy = numpy_module
+        self.assertEqual(with_numpy, without_numpy)
+
+    def test_deep_tree(self):
+        depth = sys.getrecursionlimit() + 100
+        rel_path = os.path.join(*[f"d{i}" for i in range(depth)], "deep.cpp")
+        root = build_tree([file_node(rel_path, 5, 60)]).to_nested()
+        self.assertEqual(root["metrics"]["loc"], 5)
+        self.assertEqual(root["metrics"]["staleness_p90"], 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import unittest
+import os
+import shutil
+import tempfile
+import git_analyzer
+from analysis_cache import AnalysisCache
+from git_helpers import run_git, commit_files
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestGitHistoryIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        day = 24 * 3600
+        now = 1700000000
+        # One commit outside the 3 year window, then a few recent ones
+        commit_files(self.repo, 'Old Timer', now - 2000 * day, {'src/a.cpp': '1', 'src/util.h': '1'})
+        commit_files(self.repo, 'Alice', now - 30 * day, {'src/a.cpp': '2', 'lib/b.c': '1'})
+        commit_files(self.repo, 'Bob', now - 10 * day, {'src/a.cpp': '3', 'lib/sub dir/c.hpp': '1'})
+        run_git(self.repo, 'mv', 'lib/b.c', 'lib/d.c')
+        commit_files(self.repo, 'Carol', now - 5 * day, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def _assert_matches_per_file(self, repo_root, rel_paths):
+        index = git_analyzer.build_history_index(repo_root)
+        for rel_path in rel_paths:
+            full_path = os.path.join(repo_root, rel_path)
+            expected = git_analyzer.get_git_info(full_path, repo_root)
+            actual = git_analyzer.get_git_info(full_path, repo_root, history=index)
+            self.assertIsNotNone(expected, rel_path)
+            for key in ("last_author", "commit_count", "last_modified_ts"):
+                self.assertEqual(actual[key], expected[key], f"{rel_path}: {key}")
+            self.assertAlmostEqual(actual["staleness_score"], expected["staleness_score"], places=1)
+
+    def test_index_matches_per_file_lookup(self):
+        self._assert_matches_per_file(self.repo, ['src/a.cpp', 'src/util.h', 'lib/d.c',
+                                                  os.path.join('lib', 'sub dir', 'c.hpp')])
+
+    def test_index_from_subdirectory(self):
+        self._assert_matches_per_file(os.path.join(self.repo, 'lib'), ['d.c', os.path.join('sub dir', 'c.hpp')])
+
+    def test_untracked_file_has_no_info(self):
+        path = os.path.join(self.repo, 'src', 'new.cpp')
+        with open(path, 'w') as f:
+            f.write('x')
+        index = git_analyzer.build_history_index(self.repo)
+        self.assertIsNone(git_analyzer.get_git_info(path, self.repo, history=index))
+        self.assertIsNone(git_analyzer.get_git_info(path, self.repo))
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestBlameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {'src/a.cpp': 'a\nb\nc\nd\n', 'src/b.h': 'x\n'})
+        commit_files(self.repo, 'Bob', 1700100000, {'src/a.cpp': 'a\nB\nc\nD\ne\n'})
+        commit_files(self.repo, 'Alice', 1700200000, {'src/b.h': 'x\ny\n'})
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+        shutil.rmtree(self.cache_dir)
+
+    def test_surviving_lines_per_author(self):
+        blame = git_analyzer.BlameIndex(self.repo, jobs=2)
+        self.addCleanup(blame.close)
+        self.assertEqual(blame.blame(os.path.join('src', 'a.cpp')), {'Alice': 2, 'Bob': 3})
+        self.assertEqual(blame.submit(os.path.join('src', 'b.h')).result(), {'Alice': 2})
+        with open(os.path.join(self.repo, 'src', 'new.cpp'), 'w') as f:
+            f.write('x\n')
+        self.assertIsNone(blame.blame(os.path.join('src', 'new.cpp')))
+
+    def test_from_subdirectory(self):
+        blame = git_analyzer.BlameIndex(os.path.join(self.repo, 'src'))
+        self.assertEqual(blame.blame('a.cpp'), {'Alice': 2, 'Bob': 3})
+
+    def test_cached_by_blob(self):
+        first = git_analyzer.BlameIndex(self.repo, cache=AnalysisCache(self.cache_dir))
+        first.blame(os.path.join('src', 'a.cpp'))
+        first.blame(os.path.join('src', 'b.h'))
+        self.assertEqual((first.hits, first.misses), (0, 2))
+
+        commit_files(self.repo, 'Carol', 1700300000, {'src/b.h': 'x\ny\nz\n'})
+        second = git_analyzer.BlameIndex(self.repo, cache=AnalysisCache(self.cache_dir))
+        self.assertEqual(second.blame(os.path.join('src', 'a.cpp')), {'Alice': 2, 'Bob': 3})
+        self.assertEqual(second.blame(os.path.join('src', 'b.h')), {'Alice': 2, 'Carol': 1})
+        self.assertEqual((second.hits, second.misses), (1, 1))
+
+    def test_cache_keyed_by_path_and_history(self):
+        first = git_analyzer.BlameIndex(self.repo, cache=AnalysisCache(self.cache_dir))
+        self.assertEqual(first.blame(os.path.join('src', 'b.h')), {'Alice': 2})
+        self.assertEqual(first.blame(os.path.join('src', 'a.cpp')), {'Alice': 2, 'Bob': 3})
+
+        # Same blob as src/b.h, but every line comes from Carol's copy
+        commit_files(self.repo, 'Carol', 1700300000, {'src/copy.h': 'x\ny\n'})
+        second = git_analyzer.BlameIndex(self.repo, cache=AnalysisCache(self.cache_dir))
+        self.assertEqual(second.blame(os.path.join('src', 'copy.h')), {'Carol': 2})
+        self.assertEqual(second.blame(os.path.join('src', 'b.h')), {'Alice': 2})
+        self.assertEqual((second.hits, second.misses), (1, 1))
+
+        # Restoring a removed line brings back the cached blob, but the line is now Erin's
+        commit_files(self.repo, 'Dave', 1700400000, {'src/a.cpp': 'a\nB\nc\nD\n'})
+        commit_files(self.repo, 'Erin', 1700500000, {'src/a.cpp': 'a\nB\nc\nD\ne\n'})
+        third = git_analyzer.BlameIndex(self.repo, cache=AnalysisCache(self.cache_dir))
+        self.assertEqual(third.blame(os.path.join('src', 'a.cpp')), {'Alice': 2, 'Bob': 2, 'Erin': 1})
+
+    def test_parse_incremental_output(self):
+        output = (b"1111 1 1 2\nauthor Alice\nauthor-mail <a@x>\nsummary one\nfilename f.cpp\n"
+                  b"2222 3 3 1\nauthor Bob\nsummary two\nfilename f.cpp\n"
+                  b"1111 4 4 3\nfilename f.cpp\n")
+        self.assertEqual(git_analyzer.parse_blame_incremental(output), {'Alice': 5, 'Bob': 1})
+
+
+class TestCodeOwners(unittest.TestCase):
+
+    RULES = [
+        ("*", ["@global"]),
+        ("*.js", ["@js-owner"]),
+        ("/build/logs/", ["@build"]),
+        ("docs/*", ["@docs"]),
+        ("apps/", ["@apps"]),
+        ("/scripts/", ["@scripts", "@ops"]),
+        ("**/logs", ["@logs"]),
+        ("/apps/github", []),
+        ("src/**/*.h", ["@headers"]),
+        ("Makefile", ["@make"]),
+    ]
+
+    def test_gitignore_semantics_and_last_match_wins(self):
+        owners = git_analyzer.CodeOwners(self.RULES)
+        cases = {
+            "main.c": ["@global"],
+            "web/app/index.js": ["@js-owner"],
+            "build/logs/out.txt": ["@logs"],
+            "docs/getting-started.md": ["@docs"],
+            "docs/build-app/troubleshooting.md": ["@global"],
+            "nested/apps/tool.c": ["@apps"],
+            "apps/github/bot.c": [],
+            "scripts/run.sh": ["@scripts", "@ops"],
+            "deeply/nested/logs/a.log": ["@logs"],
+            "src/h.h": ["@headers"],
+            "src/a/b/h.h": ["@headers"],
+            "tools/Makefile": ["@make"],
+        }
+        for path, expected in cases.items():
+            self.assertEqual(owners.owners_for(path), expected, path)
+
+    def test_folder_owners(self):
+        owners = git_analyzer.CodeOwners(self.RULES)
+        self.assertEqual(owners.owners_for("scripts", is_dir=True), ["@scripts", "@ops"])
+        self.assertEqual(owners.owners_for("nested/apps", is_dir=True), ["@apps"])
+        self.assertEqual(owners.owners_for("docs/build-app", is_dir=True), ["@global"])
+        # "apps/" only matches directories
+        self.assertEqual(owners.owners_for("tools/apps"), ["@global"])
+
+    def test_parse_codeowners_keeps_all_owners(self):
+        repo = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(repo, ".github"))
+            with open(os.path.join(repo, ".github", "CODEOWNERS"), "w") as f:
+                f.write("# comment\n* @a\n/core/ @b @c # inline comment\n")
+            rules = git_analyzer.parse_codeowners(repo)
+            self.assertEqual(git_analyzer.get_owner(os.path.join(repo, "core", "x.cpp"), repo, rules), "@b @c")
+            self.assertEqual(git_analyzer.get_owner(os.path.join(repo, "x.cpp"), repo, rules), "@a")
+            self.assertEqual(git_analyzer.get_owner(os.path.join(repo, "x.cpp"), repo,
+                                                    git_analyzer.parse_codeowners(os.path.join(repo, "missing"))), "Unassigned")
+        finally:
+            shutil.rmtree(repo)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from include_graph import IncludeGraph, IncludePaths, compute_include_metrics, load_compile_commands
+
+
+def _p(path):
+    return path.replace('/', os.sep)
+
+
+class TestIncludeGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def test_same_basename_headers_are_kept_apart(self):
+        records = [
+            (_p("net/util.h"), []),
+            (_p("gfx/util.h"), []),
+            (_p("net/socket.cpp"), ["util.h"]),
+            (_p("gfx/draw.cpp"), ["util.h"]),
+            (_p("app/main.cpp"), ["net/util.h", "api.h"]),
+            (_p("include/api.h"), ["gfx/util.h"]),
+        ]
+        include_paths = IncludePaths([self.repo, os.path.join(self.repo, "include")])
+        metrics = compute_include_metrics(records, self.repo, include_paths)
+        self.assertEqual(metrics[_p("net/util.h")]["included_by"], [_p("app/main.cpp"), _p("net/socket.cpp")])
+        self.assertEqual(metrics[_p("gfx/util.h")]["included_by"], [_p("gfx/draw.cpp"), _p("include/api.h")])
+        # main.cpp -> api.h -> gfx/util.h
+        self.assertEqual(metrics[_p("gfx/util.h")]["included_by_transitive"], 3)
+        self.assertEqual(metrics[_p("gfx/util.h")]["rebuild_tus"], 2)
+        self.assertEqual(metrics[_p("app/main.cpp")]["rebuild_tus"], 0)
+
+    def test_suffix_fallback_only_without_search_paths(self):
+        records = [
+            (_p("compat/string.h"), []),
+            (_p("src/main.cpp"), ["string.h", "net/util.h"]),
+            (_p("lib/net/util.h"), []),
+        ]
+        metrics = compute_include_metrics(records, self.repo)
+        self.assertEqual(metrics[_p("compat/string.h")]["included_by"], [_p("src/main.cpp")])
+        self.assertEqual(metrics[_p("lib/net/util.h")]["included_by"], [_p("src/main.cpp")])
+
+        # With -I lib, only the search paths are tried: <string.h> is the system header
+        metrics = compute_include_metrics(records, self.repo, IncludePaths([os.path.join(self.repo, "lib")]))
+        self.assertEqual(metrics[_p("compat/string.h")]["included_by"], [])
+        self.assertEqual(metrics[_p("lib/net/util.h")]["included_by"], [_p("src/main.cpp")])
+
+    def test_transitive_counts_with_cycle(self):
+        graph = IncludeGraph(["a.cpp", "b.h", "c.h", "d.h", "e.cpp"])
+        for src, dst in [(0, 1), (1, 2), (2, 1), (2, 3), (4, 3)]:
+            graph.add_edge(src, dst)
+        total, tus = graph.transitive_includers([True, False, False, False, True])
+        # b.h and c.h include each other, both are reached from a.cpp
+        self.assertEqual(total, [0, 2, 2, 4, 0])
+        self.assertEqual(tus, [0, 1, 1, 2, 0])
+
+    def test_compile_commands_include_dirs(self):
+        db = [{"directory": self.repo, "file": "src/a.cpp",
+               "command": "c++ -Ithird_party -I include -isystem/usr/include -c src/a.cpp"},
+              {"directory": self.repo, "file": "src/b.cpp",
+               "arguments": ["c++", "-iquote", "gen", "-c", "src/b.cpp"]}]
+        path = os.path.join(self.repo, "compile_commands.json")
+        with open(path, "w") as f:
+            json.dump(db, f)
+        include_paths = load_compile_commands(path)
+        self.assertEqual(include_paths.per_file_dirs[os.path.join(self.repo, "src", "a.cpp")],
+                         [os.path.join(self.repo, "third_party"), os.path.join(self.repo, "include"), "/usr/include"])
+        self.assertIn(os.path.join(self.repo, "gen"), include_paths.global_dirs)
+        self.assertIn(os.path.join(self.repo, "src", "b.cpp"), include_paths.translation_units)
+
+
+if __name__ == '__main__':
+    unittest.main()
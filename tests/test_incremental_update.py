@@ -0,0 +1,137 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+from git_helpers import run_git, commit_files
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from git_analyzer import set_reference_time
+from incremental_update import DashboardTree, get_changed_files, update_dashboard
+from external_metrics import load_external_reports
+from folder_tree import FolderTree, blame_metrics
+
+
+def _full_run(repo, external=None):
+    return aggregate_metrics_for_dashboard(collect_metrics_for_repo(repo, debug=True, external=external), repo)
+
+
+def _file_node(rel_path, staleness, blame):
+    return {"name": os.path.basename(rel_path), "type": "file", "path": rel_path,
+            "full_path": os.path.join("/repo", rel_path),
+            "metrics": {"loc": 10, "staleness": staleness, "owner": "@team", **blame_metrics(blame)}}
+
+
+def _nested(nodes):
+    tree = FolderTree("/repo")
+    tree.add_files(dict(node, metrics=dict(node["metrics"])) for node in nodes)
+    return tree.to_nested()
+
+
+class TestDashboardTree(unittest.TestCase):
+
+    def test_repeated_updates_match_a_full_rollup(self):
+        nodes = {node["path"]: node for node in [
+            _file_node(os.path.join("a", "x.cpp"), 10, {"Alice": 5}),
+            _file_node(os.path.join("a", "b", "y.cpp"), 20, {"Bob": 7}),
+            _file_node(os.path.join("a", "b", "z.cpp"), 30, {"Alice": 1, "Bob": 2}),
+            _file_node("top.cpp", 40, {"Carol": 3}),
+        ]}
+        tree = DashboardTree(_nested(nodes.values()), "/repo")
+
+        # Each round changes, adds and removes files; the kept per-folder values follow
+        rounds = [
+            [("dirty", os.path.join("a", "x.cpp"), 90, {"Alice": 5, "Dave": 9})],
+            [("put", os.path.join("a", "b", "c", "w.cpp"), 5, {"Erin": 4}),
+             ("remove", os.path.join("a", "b", "y.cpp"), None, None)],
+            [("remove", os.path.join("a", "b", "c", "w.cpp"), None, None),
+             ("dirty", "top.cpp", 0, {})],
+        ]
+        for changes in rounds:
+            for action, path, staleness, blame in changes:
+                if action == "remove":
+                    tree.remove_file(path)
+                    del nodes[path]
+                    continue
+                node = _file_node(path, staleness, blame) if action == "put" else tree.files[path]
+                node["metrics"].update(staleness=staleness)
+                node["metrics"].pop("blame_authors", None)
+                if blame:
+                    node["metrics"].update(blame_metrics(blame))
+                if action == "put":
+                    tree.put_file(node)
+                else:
+                    tree.mark_file_dirty(path)
+                nodes[path] = node
+            tree.reaggregate()
+            self.assertEqual(tree.root, _nested(nodes.values()))
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestIncrementalUpdate(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {
+            'CODEOWNERS': '* @everyone\n',
+            'core/util.h': 'struct Util {};\n',
+            'core/core.cpp': '#include "util.h"\nclass Core {};\n',
+            'app/main.cpp': '#include "core/util.h"\nint main() {}\n',
+            'app/old/legacy.cpp': 'class Legacy {};\n',
+            'docs/readme.md': 'text\n',
+        })
+        self.base = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=self.repo).decode().strip()
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def test_update_matches_full_run(self):
+        previous = _full_run(self.repo)
+
+        os.remove(os.path.join(self.repo, 'app', 'old', 'legacy.cpp'))
+        run_git(self.repo, 'mv', 'core/core.cpp', 'core/engine.cpp')
+        commit_files(self.repo, 'Bob', 1700100000, {
+            'CODEOWNERS': '* @everyone\napp/ @app-team\n',
+            'app/main.cpp': 'int main() {}\n',
+            'lib/new/widget.cpp': '#include "util.h"\nclass Widget {};\n',
+            'docs/readme.md': 'more text\n',
+        })
+        # Uncommitted work tree change is picked up too
+        with open(os.path.join(self.repo, 'core', 'util.h'), 'a') as f:
+            f.write('struct Extra {};\n')
+
+        changes = get_changed_files(self.repo, self.base)
+        self.assertIn(('R', os.path.join('core', 'core.cpp'), os.path.join('core', 'engine.cpp')), changes)
+
+        updated = update_dashboard(previous, self.repo, self.base)
+        self.assertEqual(updated, _full_run(self.repo))
+
+    def test_update_refreshes_git_info_of_unchanged_files(self):
+        day = 24 * 3600
+        previous_time = set_reference_time(1700000000 + 30 * day)
+        self.addCleanup(set_reference_time, previous_time)
+        previous = _full_run(self.repo)
+        commit_files(self.repo, 'Bob', 1700000000 + 40 * day, {'app/main.cpp': 'int main() {}\n'})
+
+        # A later run: every file is staler, not just the changed one
+        set_reference_time(1700000000 + 400 * day)
+        updated = update_dashboard(previous, self.repo, self.base)
+        self.assertEqual(updated, _full_run(self.repo))
+        core = [c for c in updated["children"] if c["name"] == "core"][0]
+        self.assertEqual(core["metrics"]["staleness"], round(400 / (3 * 365) * 100, 2))
+
+    def test_update_applies_reports_to_unchanged_files(self):
+        previous = _full_run(self.repo)
+        report = os.path.join(self.repo, 'coverage.info')
+        with open(report, 'w') as f:
+            f.write('SF:core/core.cpp\nDA:1,1\nDA:2,0\nend_of_record\n')
+        external = load_external_reports(self.repo, [("lcov", report)])
+
+        updated = update_dashboard(previous, self.repo, self.base, external=external)
+        self.assertEqual(updated, _full_run(self.repo, external))
+        core = [c for c in updated["children"] if c["name"] == "core"][0]
+        self.assertEqual(core["metrics"]["coverage"], 25.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
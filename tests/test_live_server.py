@@ -0,0 +1,138 @@
+import unittest
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import live_server
+from git_helpers import run_git, commit_files
+from scan_repo import ScanOptions
+from live_server import InotifyWatcher, LiveDashboard, PollingWatcher, create_server
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+
+
+class TestLiveServer(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = os.path.realpath(tempfile.mkdtemp())
+        for rel_path in ('src/a.cpp', 'src/b.h', 'lib/c.cpp'):
+            self._write(rel_path, 'class A {\n};\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def _write(self, rel_path, content, mtime=None):
+        full_path = os.path.join(self.repo, rel_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(full_path, (mtime, mtime))
+
+    def _dashboard(self):
+        return aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True), self.repo)
+
+    def test_polling_watcher(self):
+        watcher = PollingWatcher(self.repo, interval=0)
+        self.assertEqual(watcher.poll(0), set())
+        self._write('src/a.cpp', 'class A {\n};\n', mtime=1000000000)
+        self._write('src/new.cpp', 'int x;\n')
+        os.remove(os.path.join(self.repo, 'lib', 'c.cpp'))
+        self._write('notes.txt', 'ignored')
+        self.assertEqual(watcher.poll(0), {os.path.join('src', 'a.cpp'), os.path.join('src', 'new.cpp'),
+                                           os.path.join('lib', 'c.cpp')})
+
+    def test_inotify_watcher(self):
+        try:
+            watcher = InotifyWatcher(self.repo)
+        except OSError as e:
+            self.skipTest(f"inotify unavailable: {e}")
+        try:
+            self._write('src/a.cpp', 'class B {\n};\n')
+            os.makedirs(os.path.join(self.repo, 'new', 'deep'))
+            changed = watcher.poll(2)
+            self.assertIn(os.path.join('src', 'a.cpp'), changed)
+            self.assertIn('new', changed)
+            # The new directory is watched from now on
+            self._write('new/deep/d.cpp', 'int d;\n')
+            self.assertIn(os.path.join('new', 'deep', 'd.cpp'), watcher.poll(2))
+        finally:
+            watcher.close()
+
+    def test_apply_and_serve(self):
+        live = LiveDashboard(self._dashboard(), self.repo, debug=True)
+        server = create_server(live, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_address[1]}{live_server.DATA_PATH}"
+        try:
+            with urllib.request.urlopen(url) as response:
+                etag = response.headers["ETag"]
+                self.assertEqual(response.headers[live_server.LIVE_HEADER], "1")
+                self.assertEqual(json.load(response)["metrics"]["classes"], 3)
+            with self.assertRaises(urllib.error.HTTPError) as unchanged:
+                urllib.request.urlopen(urllib.request.Request(url, headers={"If-None-Match": etag}))
+            self.assertEqual(unchanged.exception.code, 304)
+
+            self._write('src/a.cpp', 'class A {\n};\nclass B {\n};\n')
+            self._write('new/d.cpp', 'class D {\n};\n')
+            shutil.rmtree(os.path.join(self.repo, 'lib'))
+            self.assertEqual(live.apply([os.path.join('src', 'a.cpp'), 'new', 'lib']), 3)
+
+            with urllib.request.urlopen(urllib.request.Request(url, headers={"If-None-Match": etag})) as response:
+                self.assertNotEqual(response.headers["ETag"], etag)
+                served = json.load(response)
+            self.assertEqual(served, json.loads(json.dumps(self._dashboard())))
+
+            request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.headers["Content-Encoding"], "gzip")
+                self.assertEqual(json.loads(gzip.decompress(response.read())), served)
+
+            # A restarted server counts versions from 1 again, its ETags still differ
+            restarted = LiveDashboard(self._dashboard(), self.repo, debug=True)
+            self.assertEqual(restarted.payload()[0], 1)
+            self.assertNotEqual(restarted.payload()[1], etag)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @unittest.skipIf(shutil.which('git') is None, "git is not available")
+    def test_gitignore_with_git_scanner(self):
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {'.gitignore': 'build/\n*.gen.cpp\n'})
+        self._write('build/old.cpp', 'class Old {\n};\n')
+        options = ScanOptions('auto')
+
+        def full_run():
+            files = collect_metrics_for_repo(self.repo, debug=True, scan_options=options)
+            return aggregate_metrics_for_dashboard(files, self.repo)
+
+        polling = PollingWatcher(self.repo, options, interval=0)
+        try:
+            inotify = InotifyWatcher(self.repo, options)
+        except OSError:
+            inotify = None
+        live = LiveDashboard(full_run(), self.repo, debug=True, scan_options=options)
+        self._write('build/gen.cpp', 'class Gen {\n};\n')
+        self._write('src/x.gen.cpp', 'class X {\n};\n')
+        self._write('src/d.cpp', 'class D {\n};\n')
+
+        self.assertEqual(polling.poll(0), {os.path.join('src', 'd.cpp')})
+        live.apply([os.path.join('build', 'gen.cpp'), 'build', os.path.join('src', 'x.gen.cpp'),
+                    os.path.join('src', 'd.cpp')])
+        self.assertNotIn('build', live.tree.folders)
+        self.assertEqual(live.tree.root, full_run())
+        if inotify is not None:
+            try:
+                self.assertNotIn('build', inotify._dirs.values())
+                self.assertIn('src', inotify._dirs.values())
+            finally:
+                inotify.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import os
+import shutil
+import tempfile
+from metrics_collector import collect_metrics_for_repo
+
+
+class TestMetricsCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        for i in range(40):
+            sub = os.path.join(self.test_dir, f"mod{i % 4}")
+            os.makedirs(sub, exist_ok=True)
+            with open(os.path.join(sub, f"file{i}.cpp"), "w") as f:
+                f.write(f'#include "file{(i + 1) % 40}.h"\nclass C{i} {{\n}};\n')
+            with open(os.path.join(sub, f"file{i}.h"), "w") as f:
+                f.write(f'struct S{i} {{ int x; }};\n')
+        # Dangling symlink: getsize fails, the file must be skipped and logged
+        os.symlink(os.path.join(self.test_dir, "missing.cpp"), os.path.join(self.test_dir, "broken.cpp"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_parallel_matches_serial(self):
+        with self.assertLogs(level="ERROR") as serial_logs:
+            serial = collect_metrics_for_repo(self.test_dir, debug=True)
+        with self.assertLogs(level="ERROR") as parallel_logs:
+            parallel = collect_metrics_for_repo(self.test_dir, debug=True, jobs=3)
+        self.assertEqual(len(serial), 80)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(serial_logs.output, parallel_logs.output)
+        self.assertIn("broken.cpp", serial_logs.output[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from profiler import NULL_PROFILER, Profiler, get_profiler, set_profiler
+from metrics_collector import collect_metrics_for_repo
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        for i in range(12):
+            with open(os.path.join(self.test_dir, f"file{i}.cpp"), "w") as f:
+                f.write(f"class C{i} {{\n}};\n" * (i + 1))
+
+    def tearDown(self):
+        set_profiler(None)
+        shutil.rmtree(self.test_dir)
+
+    def test_null_profiler(self):
+        self.assertIs(get_profiler(), NULL_PROFILER)
+        self.assertEqual(NULL_PROFILER.call("parse", "a.cpp", max, 1, 2), 2)
+        items = [1, 2]
+        self.assertIs(NULL_PROFILER.iterate("scan", items), items)
+        with NULL_PROFILER.stage("scan"), NULL_PROFILER.subprocess(["git", "log"]):
+            pass
+
+    def test_stages_and_trace(self):
+        p = Profiler(top_files=2)
+        with p.stage("write"):
+            pass
+        with p.subprocess(["git", "log", "-1"]):
+            pass
+        self.assertEqual(list(p.iterate("scan", range(3))), [0, 1, 2])
+        for i, key in enumerate(("a.cpp", "b.cpp", "c.cpp")):
+            p.record("parse", key, 0.0, wall=[0.3, 0.1, 0.2][i])
+        self.assertEqual(p.slowest_files("parse"), [("a.cpp", 0.3), ("c.cpp", 0.2)])
+        summary = p.summary()
+        self.assertIn("git log", summary)
+        self.assertIn("Slowest files (parse)", summary)
+
+        trace_path = os.path.join(self.test_dir, "trace.json")
+        p.write_trace(trace_path)
+        with open(trace_path) as f:
+            events = json.load(f)["traceEvents"]
+        self.assertEqual({e["cat"] for e in events}, {"stage", "subprocess", "file"})
+        self.assertEqual(sorted(e["name"] for e in events if e["cat"] == "file"), ["parse a.cpp", "parse c.cpp"])
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+
+    def test_collect_metrics(self):
+        for jobs in (1, 2):
+            p = Profiler(top_files=3)
+            set_profiler(p)
+            collect_metrics_for_repo(self.test_dir, debug=True, jobs=jobs)
+            set_profiler(None)
+            stats = p._stages
+            for stage in ("scan", "parse", "git", "owner"):
+                self.assertEqual(stats[stage].calls, 12, (jobs, stage))
+            self.assertEqual(stats["parse"].bytes_read,
+                             sum(os.path.getsize(os.path.join(self.test_dir, n)) for n in os.listdir(self.test_dir)))
+            self.assertEqual(len(p.slowest_files("parse")), 3)
+            self.assertIn("include graph", stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
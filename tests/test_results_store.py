@@ -0,0 +1,127 @@
+import unittest
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+from git_helpers import run_git, commit_files
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from incremental_update import update_dashboard
+from dashboard_generator import load_dashboard
+from change_coupling import build_change_coupling, apply_change_coupling
+from duplicates import apply_duplicates
+from results_store import write_results_db, load_results_tree, query, parse_condition
+
+
+def _full_run(repo):
+    return aggregate_metrics_for_dashboard(collect_metrics_for_repo(repo, debug=True), repo)
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestResultsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.db = os.path.join(tempfile.mkdtemp(), 'results.db')
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {
+            'CODEOWNERS': '* @everyone\ncore/ @core @infra\n',
+            'main.cpp': '#include "core/util.h"\nint main() {}\n',
+            'core/util.h': 'struct Util {};\nstruct More {};\n',
+            'core/core.cpp': '#include "util.h"\nclass Core {};\n',
+            'ui/view.cpp': '#include "core/util.h"\nclass View {};\n',
+        })
+        self.base = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=self.repo).decode().strip()
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+        shutil.rmtree(os.path.dirname(self.db))
+
+    def _edges(self):
+        with sqlite3.connect(self.db) as conn:
+            return sorted(conn.execute("SELECT src, dst FROM includes"))
+
+    def test_round_trip(self):
+        tree = _full_run(self.repo)
+        # Root, two folders and five files
+        self.assertEqual(write_results_db(tree, self.db), 8)
+        self.assertEqual(write_results_db(tree, self.db), 0)
+        self.assertEqual(load_results_tree(self.db), tree)
+        self.assertEqual(load_dashboard(self.db), tree)
+        util = os.path.join('core', 'util.h')
+        self.assertEqual(self._edges(), [(os.path.join('core', 'core.cpp'), util), ('main.cpp', util),
+                                         (os.path.join('ui', 'view.cpp'), util)])
+
+    def test_incremental_update(self):
+        write_results_db(_full_run(self.repo), self.db)
+        os.remove(os.path.join(self.repo, 'ui', 'view.cpp'))
+        commit_files(self.repo, 'Bob', 1700100000, {'main.cpp': 'int main() {}\n'})
+
+        tree = update_dashboard(load_dashboard(self.db), self.repo, self.base)
+        # main.cpp, util.h (fewer includers), the root, core, the removed ui folder and file and
+        # CODEOWNERS, which moved up among the root's children
+        self.assertEqual(write_results_db(tree, self.db), 7)
+        self.assertEqual(load_results_tree(self.db), _full_run(self.repo))
+        self.assertEqual(self._edges(), [(os.path.join('core', 'core.cpp'), os.path.join('core', 'util.h'))])
+
+    def test_queries(self):
+        write_results_db(_full_run(self.repo), self.db)
+        headers, rows = query(self.db, sort='classes', top=2)
+        self.assertEqual(headers, ['path', 'loc', 'staleness', 'owner', 'classes'])
+        # Ties are ordered by path
+        self.assertEqual([row[0] for row in rows], [os.path.join('core', 'util.h'), os.path.join('core', 'core.cpp')])
+
+        _, rows = query(self.db, owner='@infra', where=['included_by>0'], columns=['included_by'])
+        self.assertEqual(rows, [(os.path.join('core', 'util.h'), 3)])
+        _, rows = query(self.db, prefix='core', glob='*.h', columns=['classes'])
+        self.assertEqual(rows, [(os.path.join('core', 'util.h'), 2)])
+        _, rows = query(self.db, folders=True, prefix='.', columns=['loc'], top=0)
+        self.assertEqual([row[0] for row in rows], ['.', 'core', 'ui'])
+
+        # Files with several owners count for each
+        headers, rows = query(self.db, group_by='owner', columns=['loc'])
+        self.assertEqual(headers, ['owner', 'count', 'sum_loc'])
+        self.assertEqual(rows, [('@everyone', 3, 6), ('@core', 2, 4), ('@infra', 2, 4)])
+
+        for kwargs in ({'columns': ['nope']}, {'where': ['1=1 OR loc>1']}, {'group_by': 'owner', 'sort': 'size'}):
+            with self.assertRaises(ValueError):
+                query(self.db, **kwargs)
+
+    def test_coupling_columns(self):
+        commit_files(self.repo, 'Bob', 1700100000, {'main.cpp': '#include "core/util.h"\nint main() { return 0; }\n',
+                                                    'ui/view.cpp': '#include "core/util.h"\nclass View;\n'})
+        tree = _full_run(self.repo)
+        apply_change_coupling(tree, build_change_coupling(self.repo, min_support=1))
+        write_results_db(tree, self.db)
+        headers, rows = query(self.db, sort='hotspot', columns=['churn', 'coupling'], top=2)
+        self.assertEqual(headers, ['path', 'churn', 'coupling', 'hotspot'])
+        self.assertEqual(rows, [('main.cpp', 2, 100, 4), (os.path.join('ui', 'view.cpp'), 2, 100, 4)])
+        _, rows = query(self.db, where=['coupling>50', 'churn<2'], columns=['coupling'], top=0)
+        self.assertEqual([row[0] for row in rows], ['CODEOWNERS', os.path.join('core', 'core.cpp'),
+                                                    os.path.join('core', 'util.h')])
+        _, rows = query(self.db, folders=True, sort='hotspot', columns=[], top=1)
+        self.assertEqual(rows, [('.', tree['metrics']['hotspot'])])
+
+    def test_duplicate_columns(self):
+        function = "int sum(const int* v, int n) {\n" + "".join(
+            f"    if (v[{i}] > n) {{ n += v[{i}] * {i}; }}\n" for i in range(20)) + "    return n;\n}\n"
+        commit_files(self.repo, 'Bob', 1700100000, {'core/sum.cpp': function, 'ui/sum_copy.cpp': function})
+        tree = _full_run(self.repo)
+        apply_duplicates(tree, self.repo)
+        write_results_db(tree, self.db)
+        headers, rows = query(self.db, where=['duplicated>50'], sort='dup_tokens', columns=['tokens', 'duplicated'])
+        self.assertEqual(headers, ['path', 'tokens', 'duplicated', 'dup_tokens'])
+        self.assertEqual([row[0] for row in rows], [os.path.join('core', 'sum.cpp'), os.path.join('ui', 'sum_copy.cpp')])
+        self.assertEqual(rows[0][1:], (rows[0][3], 100, rows[0][3]))
+        _, rows = query(self.db, folders=True, prefix='.', columns=['dup_tokens'], top=1)
+        self.assertEqual(rows, [('.', tree['metrics']['dup_tokens'])])
+
+    def test_parse_condition(self):
+        self.assertEqual(parse_condition('included_by >= 500'), ('included_by', '>=', 500.0))
+        self.assertEqual(parse_condition('owner=@team-x'), ('owner', '=', '@team-x'))
+        with self.assertRaises(ValueError):
+            parse_condition('loc ~ 5')
+
+
+if __name__ == '__main__':
+    unittest.main()
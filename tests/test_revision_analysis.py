@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import mock
+import git_analyzer
+from git_helpers import run_git, commit_files
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from revision_analysis import RevisionAnalyzer, build_trend, recent_tags
+
+DAY = 24 * 3600
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestRevisionAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        self.t0 = 1700000000
+        commit_files(self.repo, 'Alice', self.t0, {
+            'CODEOWNERS': '* @everyone\ncore/ @core\n',
+            'main.cpp': '#include "core/util.h"\nint main() {}\n',
+            'core/util.h': 'struct Util {};\n',
+            'README.md': 'not analyzed\n',
+        })
+        run_git(self.repo, 'tag', 'v1')
+        commit_files(self.repo, 'Bob', self.t0 + 100 * DAY, {
+            'core/util.h': 'struct Util {};\nstruct More {};\n',
+            'ui/view.cpp': '#include "core/util.h"\nclass View {};\n',
+        })
+        run_git(self.repo, 'tag', 'v2')
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def test_matches_working_tree_analysis(self):
+        with mock.patch.object(git_analyzer.time, 'time', return_value=self.t0 + 200 * DAY):
+            expected = aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True), self.repo)
+            with RevisionAnalyzer(self.repo) as analyzer:
+                actual = aggregate_metrics_for_dashboard(analyzer.analyze('HEAD'), self.repo)
+        self.assertEqual(actual, expected)
+
+    def test_bare_repository(self):
+        bare = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, bare)
+        subprocess.check_call(['git', 'clone', '-q', '--bare', self.repo, bare],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with RevisionAnalyzer(bare) as analyzer:
+            records = {r["rel_path"]: r for r in analyzer.analyze('v1')}
+        self.assertEqual(sorted(records), ['CODEOWNERS', os.path.join('core', 'util.h'), 'main.cpp'])
+        util = records[os.path.join('core', 'util.h')]
+        self.assertEqual((util["classes"], util["owner"], util["git"]["last_author"]), (["Util"], "@core", "Alice"))
+        self.assertEqual(util["included_by"], ["main.cpp"])
+        self.assertEqual(recent_tags(bare, 5), ['v1', 'v2'])
+
+    def test_trend(self):
+        with RevisionAnalyzer(self.repo) as analyzer:
+            trend = build_trend(analyzer, ['v2', 'v1'])
+            # main.cpp and CODEOWNERS are shared by both revisions
+            self.assertEqual(analyzer.parsed, 5)
+        self.assertEqual([r["rev"] for r in trend["revisions"]], ['v1', 'v2'])
+        self.assertEqual([r["files"] for r in trend["revisions"]], [3, 4])
+        root = trend["folders"]["."]
+        self.assertEqual(root["classes"], [1, 3])
+        self.assertEqual(root["included_by"], [1, 2])
+        self.assertEqual(trend["folders"]["ui"]["loc"], [None, 2])
+        # Staleness as of each revision's commit: CODEOWNERS and main.cpp are 100 days old at v2,
+        # next to the fresh core and ui folders
+        stale = round(100 / (365 * 3) * 100, 2)
+        self.assertEqual(root["staleness"], [0, round(2 * stale / 4, 2)])
+
+    def test_unknown_revision(self):
+        with RevisionAnalyzer(self.repo) as analyzer:
+            with self.assertRaises(ValueError):
+                analyzer.analyze('no-such-rev')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import shutil
+import tempfile
+from git_helpers import run_git, commit_files
+from scan_repo import ScanOptions, collect_files, is_collected_path, sorted_on_disk, tree_order_key
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestScanRepo(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {
+            '.gitignore': 'build/\n*.gen.h\n',
+            'CODEOWNERS': '* @everyone\n',
+            'src/main.cpp': 'int main() {}\n',
+            'src/util.h': 'struct Util {};\n',
+            'src/removed.cpp': 'int x;\n',
+            'third_party/lib/lib.c': 'int lib;\n',
+            '.hidden/skip.cpp': 'int hidden;\n',
+            'docs/readme.md': 'text\n',
+        })
+        os.remove(os.path.join(self.repo, 'src', 'removed.cpp'))
+        for rel_path in ('src/new.cc', 'build/out.cpp', 'src/table.gen.h'):
+            full_path = os.path.join(self.repo, rel_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as f:
+                f.write('int generated;\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def _scan(self, **kwargs):
+        files = collect_files(self.repo, ScanOptions(**kwargs))
+        return sorted(os.path.relpath(f, self.repo).replace(os.sep, '/') for f in files)
+
+    def test_git_mode_respects_gitignore(self):
+        expected = ['CODEOWNERS', 'src/main.cpp', 'src/new.cc', 'src/util.h', 'third_party/lib/lib.c']
+        self.assertEqual(self._scan(mode='git'), expected)
+        self.assertEqual(self._scan(mode='auto'), expected)
+
+    def test_walk_mode_lists_all_files(self):
+        self.assertEqual(self._scan(mode='walk'), [
+            'CODEOWNERS', 'build/out.cpp', 'src/main.cpp', 'src/new.cc', 'src/table.gen.h', 'src/util.h',
+            'third_party/lib/lib.c'])
+
+    def test_include_and_exclude(self):
+        self.assertEqual(self._scan(mode='walk', exclude=['third_party/', 'build', '*.gen.h']),
+                         ['CODEOWNERS', 'src/main.cpp', 'src/new.cc', 'src/util.h'])
+        self.assertEqual(self._scan(mode='git', include=['src/**', '*.c'], exclude=['*.cc']),
+                         ['src/main.cpp', 'src/util.h', 'third_party/lib/lib.c'])
+
+        options = ScanOptions(exclude=['third_party/'])
+        self.assertFalse(is_collected_path(os.path.join('third_party', 'lib', 'x.h'), options))
+        self.assertTrue(is_collected_path(os.path.join('src', 'x.h'), options))
+
+    def test_submodules(self):
+        sub_repo = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, sub_repo)
+        run_git(sub_repo, 'init', '-q')
+        commit_files(sub_repo, 'Bob', 1700000000, {'engine/core.cpp': 'int core;\n'})
+        run_git(self.repo, '-c', 'protocol.file.allow=always', 'submodule', 'add', '-q', sub_repo, 'ext/engine')
+
+        self.assertNotIn('ext/engine/engine/core.cpp', self._scan(mode='git'))
+        self.assertIn('ext/engine/engine/core.cpp', self._scan(mode='git', submodules=True))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            ScanOptions(mode='find')
+
+    def test_sorted_on_disk(self):
+        paths = ['b.cpp', 'a/z.h', 'a b/c.cpp', 'a/b/c.h', 'a.cpp', 'b/a.cpp', 'a/\u00e9.h']
+        expected = sorted(paths, key=tree_order_key)
+        for chunk_size in (1, 3, 7, 100):
+            self.assertEqual(list(sorted_on_disk(paths, key=tree_order_key, chunk_size=chunk_size)), expected)
+        self.assertEqual(list(sorted_on_disk([], chunk_size=2)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from git_helpers import run_git, commit_files
+from sharding import Shard, merge_partials
+
+ANALYZER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'analyzer_main.py')
+NOW = '1710000000'
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestSharding(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {
+            'CODEOWNERS': '* @everyone\nui/ @ui-team\ncore/detail/ @core\n',
+            'main.cpp': '#include "core/util.h"\nint main() {}\n',
+            'core/util.h': 'struct Util {};\n',
+            'core/core.cpp': '#include "util.h"\nclass Core {};\n',
+            'core/detail/impl.h': '#include "../util.h"\n',
+            'ui/view.cpp': '#include "core/util.h"\n#include "widgets/button.h"\nclass View : public Util {};\n',
+            'ui/widgets/button.h': 'class Button {};\n',
+            'tools/gen.cpp': '#include "ui/widgets/button.h"\n',
+        })
+        commit_files(self.repo, 'Bob', 1705000000, {'ui/widgets/button.h': 'class Button {};\nclass Icon {};\n'})
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+        shutil.rmtree(self.out_dir)
+
+    def _run(self, *args):
+        subprocess.check_call([sys.executable, ANALYZER, self.repo, '--no-cache', '--now', NOW] + list(args),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _read(self, name):
+        with open(os.path.join(self.out_dir, name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_merged_shards_match_single_run(self):
+        self._run('-o', os.path.join(self.out_dir, 'single.json'))
+        for mode in ('hash', 'prefix'):
+            partials = []
+            for index in range(1, 4):
+                partials.append(os.path.join(self.out_dir, f'{mode}_{index}.json'))
+                self._run('--shard', f'{index}/3', '--shard-by', mode, '-o', partials[-1])
+            # Partials may come in any order
+            self._run('--merge', *reversed(partials), '-o', os.path.join(self.out_dir, f'{mode}.json'))
+            self.assertEqual(self._read(f'{mode}.json'), self._read('single.json'), mode)
+
+    def test_merge_needs_every_shard_once(self):
+        partials = [os.path.join(self.out_dir, f'{index}.json') for index in (1, 2)]
+        for index, path in enumerate(partials, 1):
+            self._run('--shard', f'{index}/3', '-o', path)
+        with self.assertRaisesRegex(ValueError, "Missing shards 3 of 3"):
+            merge_partials(partials, self.repo)
+        with self.assertRaisesRegex(ValueError, "Shard 1/3 is in both"):
+            merge_partials(partials + partials[:1], self.repo)
+
+
+class TestShard(unittest.TestCase):
+
+    def test_assignment(self):
+        paths = [os.path.join('src', f'file{i}.cpp') for i in range(50)] + ['main.cpp']
+        for mode in ('hash', 'prefix'):
+            shards = [Shard(index, 4, mode) for index in range(1, 5)]
+            for path in paths:
+                self.assertEqual(sum(shard.contains(path) for shard in shards), 1, path)
+        prefix = [shard for shard in (Shard(index, 4, 'prefix') for index in range(1, 5))
+                  if shard.contains(paths[0])][0]
+        self.assertTrue(all(prefix.contains(path) for path in paths[:-1]))
+        self.assertEqual(str(Shard.parse('2/5')), '2/5')
+        for text in ('0/3', '4/3', '3', 'a/b'):
+            with self.assertRaises(ValueError):
+                Shard.parse(text)
+
+
+if __name__ == '__main__':
+    unittest.main()
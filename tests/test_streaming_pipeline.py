@@ -0,0 +1,92 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+import scan_repo
+from git_helpers import run_git, commit_files
+from metrics_collector import collect_metrics_for_repo, aggregate_metrics_for_dashboard
+from dashboard_generator import generate_dashboard_json
+from git_analyzer import BlameIndex
+from scan_repo import ScanOptions
+from streaming_pipeline import DashboardStreamWriter, stream_dashboard_json
+
+
+@unittest.skipIf(shutil.which('git') is None, "git is not available")
+class TestStreamingPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        run_git(self.repo, 'init', '-q')
+        commit_files(self.repo, 'Alice', 1700000000, {
+            'CODEOWNERS': '* @everyone\nui/ @ui-team\n',
+            'main.cpp': '#include "core/util.h"\nint main() {}\n',
+            'core/util.h': 'struct Util {};\n',
+            'core/core.cpp': '#include "util.h"\nclass Core {};\n',
+            'core/detail/impl.h': '#include "../util.h"\n',
+            'core-extra/extra.h': 'class Extra {};\n',
+            'core.d/x.cpp': 'int x;\n',
+            'ui/view.cpp': '#include "core/util.h"\nclass View : public Util {};\n',
+            'ui/widgets/button.h': 'class Button {};\n',
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+        shutil.rmtree(self.out_dir)
+
+    def _read(self, name):
+        with open(os.path.join(self.out_dir, name), encoding='utf-8') as f:
+            return f.read()
+
+    def test_matches_in_memory_output(self):
+        expected_path = os.path.join(self.out_dir, 'expected.json')
+        generate_dashboard_json(aggregate_metrics_for_dashboard(collect_metrics_for_repo(self.repo, debug=True),
+                                                                self.repo), expected_path)
+        expected = self._read('expected.json')
+
+        # A sort chunk of 2 spills the git listing and the include edges to several sorted runs
+        for mode, jobs, sort_chunk in (('walk', 1, scan_repo.SORT_CHUNK), ('git', 2, scan_repo.SORT_CHUNK),
+                                       ('git', 1, 2)):
+            name = f'{mode}-{sort_chunk}.json'
+            with mock.patch.object(scan_repo, 'SORT_CHUNK', sort_chunk):
+                count = stream_dashboard_json(self.repo, os.path.join(self.out_dir, name), debug=True, jobs=jobs,
+                                              scan_options=ScanOptions(mode))
+            self.assertEqual(count, 9)
+            self.assertEqual(self._read(name), expected, name)
+
+    def test_matches_in_memory_output_with_blame(self):
+        commit_files(self.repo, 'Bob', 1700100000, {'core/util.h': 'struct Util {};\nstruct More {};\n'})
+        blame = BlameIndex(self.repo)
+        self.addCleanup(blame.close)
+        expected_path = os.path.join(self.out_dir, 'expected.json')
+        records = collect_metrics_for_repo(self.repo, debug=True, blame=blame)
+        generate_dashboard_json(aggregate_metrics_for_dashboard(records, self.repo), expected_path)
+        self.assertIn('"blame_owner": "Alice"', self._read('expected.json'))
+        self.assertEqual(next(r for r in records if r["rel_path"] == os.path.join('core', 'util.h'))["blame"],
+                         {'Alice': 1, 'Bob': 1})
+
+        output_path = os.path.join(self.out_dir, 'blame.json')
+        stream_dashboard_json(self.repo, output_path, debug=True, jobs=2, blame=blame)
+        self.assertEqual(self._read('blame.json'), self._read('expected.json'))
+
+    def test_empty_repository(self):
+        empty = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, empty)
+        expected_path = os.path.join(self.out_dir, 'expected.json')
+        generate_dashboard_json(aggregate_metrics_for_dashboard([], empty), expected_path)
+        stream_dashboard_json(empty, os.path.join(self.out_dir, 'empty.json'), debug=True)
+        self.assertEqual(self._read('empty.json'), self._read('expected.json'))
+
+    def test_rejects_files_out_of_tree_order(self):
+        records = collect_metrics_for_repo(self.repo, debug=True)
+        by_path = {f["rel_path"]: f for f in records}
+        writer = DashboardStreamWriter(io.StringIO(), self.repo)
+        writer.add_file(by_path['main.cpp'])
+        with self.assertRaises(ValueError):
+            writer.add_file(by_path[os.path.join('core', 'util.h')])
+
+
+if __name__ == '__main__':
+    unittest.main()